@@ -43,16 +43,12 @@ Some terminology in use:
 """
 from __future__ import with_statement
 
-try:
-    import gdata
-except:
-    print "Unable to find python gdata library."
-    print "See http://code.google.com/p/googlecl/wiki/Install"
-    exit(5)
-
-
 __author__ = 'tom.h.miller@gmail.com (Tom Miller)'
+import time
+# As close to the start of the process as --profile can get.
+START_TIME = time.time()
 import glob
+import imp
 import logging
 import optparse
 import os
@@ -60,8 +56,15 @@ import sys
 import traceback
 import webbrowser
 import googlecl
+import googlecl.profiling
+if '--profile' in sys.argv:
+  # Enabled before the remaining imports, so that they are timed as well.
+  googlecl.profiling.enable(START_TIME)
 import googlecl.authentication
 import googlecl.config
+import googlecl.daemon
+import googlecl.registry
+import googlecl.stats
 try: # Fails if Discovery stuff is unavailable
   from googlecl.discovery import DiscoveryManager
   apis = True
@@ -74,12 +77,14 @@ safe_decode = googlecl.safe_decode
 
 VERSION = '0.9.14'
 
-AVAILABLE_SERVICES = ['help', 'picasa', 'blogger', 'youtube', 'docs',
-                      'contacts', 'calendar', 'finance', 'sites']
+AVAILABLE_SERVICES = ['help'] + googlecl.registry.SERVICES
 LOG = logging.getLogger(googlecl.LOGGER_NAME)
 
 discovery = None
 AVAILABLE_APIS = None
+# googlecl.daemon.ClientPool of authenticated clients, when running as the
+# daemon.
+CLIENT_POOL = None
 
 class NonFatalOptionParser(optparse.OptionParser):
   def error(self, message):
@@ -156,7 +161,14 @@ def authenticate(auth_manager, options, config, section_header):
 
   if options.force_auth or not skip_auth:
     LOG.debug('Checking access token...')
-    valid_token = auth_manager.check_access_token()
+    if options.force_auth:
+      max_age = 0
+    else:
+      max_age = 60 * config.lazy_get(
+          section_header, 'token_check_minutes',
+          default=googlecl.authentication.DEFAULT_TOKEN_CHECK_MINUTES,
+          option_type=float)
+    valid_token = auth_manager.check_access_token(max_age)
     if not valid_token:
       display_name = auth_manager.get_display_name(options.hostid)
       browser_str = config.lazy_get(section_header, 'auth_browser',
@@ -396,6 +408,19 @@ def import_at_runtime(module):
   # with Jython?) and contain a string in the list.
   return __import__(module, globals(), fromlist=['0'])
 
+def check_gdata():
+  """Exit with a pointer to the install instructions if gdata is missing.
+
+  Only looks for the package; it is imported with the service that needs it.
+  """
+  try:
+    imp.find_module('gdata')
+  except ImportError:
+    print "Unable to find python gdata library."
+    print "See http://code.google.com/p/googlecl/wiki/Install"
+    exit(5)
+
+
 def import_service(service, config_file_path):
   """Import vital information about a service.
 
@@ -416,6 +441,7 @@ def import_service(service, config_file_path):
       config is a configuration file parser.
   """
   LOG.debug('Your pythonpath: ' + str(os.environ.get('PYTHONPATH')))
+  check_gdata()
   try:
     package = import_at_runtime('googlecl.' + service)
   except ImportError, err:
@@ -518,7 +544,11 @@ def print_more_help():
   Enter "> help <service> <fields>" for additional info
   You may also add a '-v' or '--verbose' tag for even more detailed information.
 
+  Add '--all-pages' to a list method to print the items of every page
+  of the results, instead of only the first page.
+
   Enter "> refresh apis" to update the Discovery APIs list
+  and download their Discovery documents again.
   This will allow you to use the latest APIs by default.
   Older APIs may be used by calling '> <service> <version> <etc>'
 
@@ -615,11 +645,11 @@ def run_once(options, args):
        (args[0] == 'help' and len(args) == 1) or \
        (args[0] == 'help' and len(args)>1 and \
         args[1] not in AVAILABLE_SERVICES):
-      # Is there a better approach than using the calendar API to get the email
-      # address?
-      service_class, tasks, section_header, config = import_service('calendar',
-                                                                    None)
-      email = config.lazy_get(section_header, 'user')
+      # Is there a better approach than using the calendar config to get the
+      # email address?
+      config = googlecl.config.load_configuration(None)
+      email = config.lazy_get(
+          googlecl.registry.get_section_header('calendar'), 'user')
       discovery = DiscoveryManager(email)
       global AVAILABLE_APIS
       AVAILABLE_APIS = discovery.apis_list()
@@ -656,8 +686,8 @@ def run_once(options, args):
   # May have to change if/when those are brought over to Discovery...
   if service == 'help':
     if task_name in AVAILABLE_SERVICES and not conflict:
-      service_class, tasks, section_header, config = import_service(task_name,
-                                                                options.config)
+      # Help comes from the manifest, without importing the service.
+      tasks = googlecl.registry.get_tasks(task_name)
       if tasks:
         print_help(task_name, tasks)
         return
@@ -686,16 +716,6 @@ def run_once(options, args):
     return
   if not service_class:
     return
-  client = service_class(config)
-  # Activate debugging output from HTTP requests. "service" clients only!
-  # "client" versions need to set self.http_client.debug in their own __init__
-  client.debug = config.lazy_get(section_header,
-                                 'debug',
-                                 default=options.debug,
-                                 option_type=bool)
-  # XXX: Not the best place for this.
-  if hasattr(client, 'http_client'):
-    client.http_client.debug = client.debug
   try:
     task = tasks[task_name]
     task.name = task_name
@@ -715,6 +735,27 @@ def run_once(options, args):
   # fill_out_options will read the key from file if necessary, but will not set
   # it since it will always get a non-empty value beforehand.
   fill_out_options(args, section_header, task, options, config)
+  pool_key = (service, options.user)
+  warm_client = None
+  if CLIENT_POOL and not options.force_auth and not options.offline:
+    warm_client = CLIENT_POOL.checkout(pool_key, config)
+  if warm_client:
+    LOG.debug('Reusing authenticated client')
+    client = warm_client
+    client.reset_command_state()
+  else:
+    client = service_class(config)
+  # Activate debugging output from HTTP requests. "service" clients only!
+  # "client" versions need to set self.http_client.debug in their own __init__
+  client.debug = config.lazy_get(section_header,
+                                 'debug',
+                                 default=options.debug,
+                                 option_type=bool)
+  # XXX: Not the best place for this.
+  if hasattr(client, 'http_client'):
+    client.http_client.debug = client.debug
+  if not options.cache:
+    client.feed_cache = None
   client.email = options.user
 
   if options.blog:
@@ -756,8 +797,19 @@ def run_once(options, args):
           LOG.debug(safe_encode('Option ' + attr_name + ': ' + unicode(attr)))
   LOG.debug(safe_encode('args: ' + unicode(args)))
 
-  auth_manager = googlecl.authentication.AuthenticationManager(service, client)
-  authenticated = authenticate(auth_manager, options, config, section_header)
+  if options.offline:
+    # Everything comes from the local mirror, so there is nothing to log in to.
+    authenticated = True
+  elif warm_client:
+    # Authenticated by an earlier command in this process.
+    authenticated = True
+  else:
+    with googlecl.profiling.phase('authentication'):
+      auth_manager = googlecl.authentication.AuthenticationManager(service,
+                                                                   client)
+      client.unauthorized_callback = auth_manager.forget_check
+      authenticated = authenticate(auth_manager, options, config,
+                                   section_header)
 
   if not authenticated:
     LOG.debug('Authentication failed, exiting run_once')
@@ -769,7 +821,8 @@ def run_once(options, args):
   config.write_out_parser()
   run_error = None
   try:
-    task.run(client, options, args)
+    with googlecl.profiling.phase('task'):
+      task.run(client, options, args)
   except AttributeError, run_error:
     err_str = safe_decode(run_error)
     if err_str.startswith("'OAuth"):
@@ -781,21 +834,70 @@ def run_once(options, args):
     type, value, traceback_obj = sys.exc_info()
     LOG.debug(''.join(traceback.format_exception(type, value, traceback_obj)))
     return -1
+  if CLIENT_POOL and not options.offline:
+    CLIENT_POOL.checkin(pool_key, client)
   return 0
 
 
+def run_forwarded(argv):
+  """Run a command that googlecl.daemon.forward sent to this daemon.
+
+  Keyword arguments:
+    argv: Command line arguments, without the program name.
+
+  Returns:
+    What run_once returned.
+  """
+  parser = setup_parser('--help' in argv)
+  (options, args) = parse_command_line(parser, argv)
+  googlecl.daemon.set_log_level(get_log_level(options))
+  # The daemon only runs where there are Unix domain sockets.
+  args = expand_args(args, True, False, False)
+  insert_stdin(options, args)
+  return run_once(options, args)
+
+
+def needs_terminal(options, args):
+  """Return True if a command may run a program on the user's terminal.
+
+  The daemon relays prompts, but an editor started by the daemon would not
+  get the terminal the command was run from, so these commands are not
+  forwarded.
+
+  Keyword arguments:
+    options: Options from the command line.
+    args: Arguments left on the command line, starting with the service.
+
+  Returns:
+    True if the command has to run in the process it was given to.
+  """
+  service = args[0]
+  task_name = len(args) > 1 and args[1]
+  if options.editor or service == 'edit':
+    return True
+  if service == 'docs' and task_name == 'edit':
+    return True
+  # Discovery APIs may open an editor for a missing request body, and
+  # authorize through a browser and a local web server.
+  return service not in AVAILABLE_SERVICES and service != 'refresh'
+
+
+def get_log_level(options):
+  """Return the logging level asked for by --debug, --verbose or --quiet."""
+  if options.debug or options.verbose:
+    return logging.DEBUG
+  elif options.quiet:
+    return logging.ERROR
+  else:
+    return logging.INFO
+
+
 def setup_logger(options):
   """Setup the global (root, basic) configuration for logging."""
   msg_format = '%(message)s'
   if options.debug:
-    level = logging.DEBUG
     msg_format = '%(levelname)s:%(name)s:%(message)s'
-  elif options.verbose:
-    level = logging.DEBUG
-  elif options.quiet:
-    level = logging.ERROR
-  else:
-    level = logging.INFO
+  level = get_log_level(options)
   # basicConfig does nothing if it's been called before
   # (e.g. in run_interactive loop)
   logging.basicConfig(level=level, format=msg_format)
@@ -803,8 +905,10 @@ def setup_logger(options):
   LOG.setLevel(level)
   # XXX: Inappropriate location (style-wise).
   if options.debug or options.verbose:
-    import gdata
-    LOG.debug('Gdata will be imported from ' + gdata.__file__)
+    try:
+      LOG.debug('Gdata will be imported from ' + imp.find_module('gdata')[1])
+    except ImportError:
+      LOG.debug('Gdata could not be found')
 
 
 def setup_parser(loading_usage):
@@ -852,8 +956,8 @@ def setup_parser(loading_usage):
     for service in AVAILABLE_SERVICES:
       if service == 'help':
         continue
-      service_package = import_at_runtime('googlecl.' + service)
-      usage += get_task_help(service, service_package.TASKS) + '\n'
+      usage += get_task_help(service,
+                             googlecl.registry.get_tasks(service)) + '\n'
 
   parser = NonFatalOptionParser(usage=usage, version=sys.argv[0] + VERSION)
   parser.add_option('--access', dest='access',
@@ -883,6 +987,11 @@ def setup_parser(loading_usage):
                           'Can also specify a range with a comma.\n'
                           'Picasa only - sets the date of the album\n'
                           'Finance only - transaction creation date'))
+  parser.add_option('--daemon', dest='daemon',
+                    action='store_true',
+                    help='Stay running and serve the commands of other'
+                    ' "google" invocations over a Unix domain socket,'
+                    ' keeping authenticated clients between them.')
   parser.add_option('--debug', dest='debug',
                     action='store_true',
                     help=('Enable all debugging output, including HTTP data'))
@@ -918,16 +1027,33 @@ def setup_parser(loading_usage):
                     help='Sites: max results to return for list. Overrides config.')
   parser.add_option('-n', '--title', dest='title',
                     help='Title of the item')
+  parser.add_option('--no-cache', dest='cache',
+                    action='store_false', default=True,
+                    help='Do not use or update the on-disk cache of feeds.')
   parser.add_option('--no-convert', dest='convert',
                     action='store_false', default=True,
                     help='Google Apps Premier only - do not convert the file' +
                     ' on upload. (Else converts to native Google Docs format)')
+  parser.add_option('--no-daemon', dest='use_daemon',
+                    action='store_false', default=True,
+                    help='Run the command in this process even if a daemon'
+                    ' started with --daemon is running.')
   parser.add_option('--notes', dest='notes',
                     help=("Finance only - specify notes for transaction"))
+  parser.add_option('--offline', dest='offline',
+                    action='store_true',
+                    help=('List tasks only - answer from the local mirror ' +
+                          'kept by the sync task, without the network.'))
   parser.add_option('-o', '--owner', dest='owner',
                     help=('Username or ID of the owner of the resource. ' +
                           'For example,' +
                           " 'picasa list-albums -o bob' to list bob's albums"))
+  parser.add_option('--output', dest='output', type='choice',
+                    choices=['jsonl', 'csv', 'tsv'],
+                    help=('List tasks only - print entries as JSON lines, ' +
+                          'CSV or tab separated values: jsonl, csv or tsv. ' +
+                          'Fields are still chosen with --fields. ' +
+                          'Overrides --delimiter.'))
   parser.add_option('--photo', dest='photo',
                     help='Picasa only - specify title or name of photo(s)')
   parser.add_option('--price', dest='price',
@@ -935,6 +1061,12 @@ def setup_parser(loading_usage):
   parser.add_option('-q', '--query', dest='query',
                     help=('Sites, Picasa: full text search with this string.'
                           + ' Picasa: searches on titles, captions, and tags.'))
+  parser.add_option('--profile', dest='profile',
+                    action='store_true',
+                    help='Print how long startup, authentication, the task'
+                    ' and output took, and the slowest imports, when done.'
+                    ' Also saves cProfile statistics to ' +
+                    googlecl.profiling.PSTATS_FILE_NAME + '.')
   parser.add_option('--quiet', dest='quiet',
                     action='store_true',
                     help='Print only prompts and error messages')
@@ -950,6 +1082,13 @@ def setup_parser(loading_usage):
                     help='Skip validation step for re-used access tokens.')
   parser.add_option('--src', dest='src',
                     help='Source. Typically files to upload.')
+  parser.add_option('--stats', dest='stats',
+                    action='store_const', const='table',
+                    help='Print a summary of request times, statuses, retries'
+                    ' and bytes transferred when done.')
+  parser.add_option('--stats-json', dest='stats',
+                    action='store_const', const='json',
+                    help='Like --stats, but print the summary as JSON.')
   parser.add_option('-s', '--summary', dest='summary',
                     help=('Description of the upload, ' +
                           'or file containing the description.'))
@@ -976,23 +1115,44 @@ def setup_parser(loading_usage):
 
 def main():
   """Entry point for GoogleCL script."""
+  global CLIENT_POOL
   loading_usage = '--help' in sys.argv
   parser = setup_parser(loading_usage)
 
   (options, args) = parse_command_line(parser, sys.argv[1:])
 
-  setup_logger(options)
-  if not args:
-    run_interactive(parser)
-  else:
-    is_windows = sys.platform == 'win32'
-    args = expand_args(args, True, is_windows, is_windows)
-    insert_stdin(options, args)
+  # Commands are sent to a running daemon, unless this process has to do
+  # something the daemon cannot do for it.
+  if (args and options.use_daemon and not options.daemon and
+      not options.profile and not options.stats and
+      not needs_terminal(options, args)):
+    status = googlecl.daemon.forward(sys.argv[1:])
+    if status is not None:
+      sys.exit(status)
 
-    try:
-      run_once(options, args)
-    except KeyboardInterrupt:
-      print ''
+  setup_logger(options)
+  if options.daemon:
+    CLIENT_POOL = googlecl.daemon.ClientPool()
+    sys.exit(googlecl.daemon.serve(run_forwarded, get_log_level(options)))
+  if options.stats:
+    googlecl.stats.enable()
+  try:
+    if not args:
+      run_interactive(parser)
+    else:
+      is_windows = sys.platform == 'win32'
+      args = expand_args(args, True, is_windows, is_windows)
+      insert_stdin(options, args)
+
+      try:
+        googlecl.profiling.run(run_once, options, args)
+      except KeyboardInterrupt:
+        print ''
+  finally:
+    if options.stats:
+      print >> sys.stderr, googlecl.stats.RECORDER.format(options.stats)
+    if options.profile:
+      googlecl.profiling.write_report(sys.stderr)
 
 
 def exit_from_int(*args):
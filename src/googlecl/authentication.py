@@ -16,12 +16,20 @@
 from __future__ import with_statement
 
 import logging
-import os
-import pickle
-import stat
+import time
 import googlecl
+import googlecl.tokenstore
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
 
 TOKENS_FILENAME_FORMAT = 'access_tok_%s'
+# Appended to the tokens file name for the file recording when each token was
+# last found to be valid.
+CHECKED_FILENAME_SUFFIX = '.checked'
+DEFAULT_TOKEN_CHECK_MINUTES = 60
 LOGGER_NAME = __name__
 LOG = logging.getLogger(LOGGER_NAME)
 
@@ -46,14 +54,23 @@ class AuthenticationManager(object):
       self.tokens_path = googlecl.get_data_path(TOKENS_FILENAME_FORMAT %
                                                 client.email,
                                                 create_missing_dir=True)
+    self.tokens = googlecl.tokenstore.TokenStore(self.tokens_path)
+    self.checked_path = self.tokens_path + CHECKED_FILENAME_SUFFIX
 
-  def check_access_token(self):
+  def check_access_token(self, max_age=0):
     """Checks that the client's access token is valid, remove it if not.
 
+    Args:
+      max_age: Seconds for which an earlier successful check is trusted
+          without asking the service again. Default 0 to always ask.
+
     Returns:
       True if the token is valid, False otherwise. False will be returned
       whether or not the token was successfully removed.
     """
+    if self.was_checked_within(max_age):
+      LOG.debug('Token was found valid less than %d seconds ago', max_age)
+      return True
     try:
       token_valid = self.client.IsTokenValid()
     except AttributeError, err:
@@ -63,8 +80,10 @@ class AuthenticationManager(object):
       LOG.debug('Caught AttributeError: ' + str(err))
     if token_valid:
       LOG.debug('Token valid!')
+      self.record_check()
       return True
     else:
+      self.forget_check()
       removed = self.remove_access_token()
       if removed:
         LOG.debug('Removed invalid token')
@@ -72,6 +91,55 @@ class AuthenticationManager(object):
         LOG.debug('Failed to remove invalid token')
       return False
 
+  def _read_checks(self):
+    try:
+      with open(self.checked_path, 'rb') as checked_file:
+        checks = json.load(checked_file)
+    except (IOError, ValueError):
+      return {}
+    if not isinstance(checks, dict):
+      return {}
+    return checks
+
+  def _write_checks(self, checks):
+    try:
+      googlecl.tokenstore.write_atomically(self.checked_path,
+                                           json.dumps(checks))
+    except EnvironmentError, err:
+      LOG.debug('Could not record token check: %s', err)
+
+  def was_checked_within(self, max_age):
+    """Check if the token was found valid less than max_age seconds ago.
+
+    A check only counts if the tokens file has not been written since.
+    """
+    if max_age <= 0:
+      return False
+    check = self._read_checks().get(self.service)
+    if not check or check.get('tokens_file') != self.tokens.get_stamp():
+      return False
+    age = time.time() - check.get('time', 0)
+    return 0 <= age < max_age
+
+  def record_check(self):
+    """Remember that the token was just found to be valid."""
+    stamp = self.tokens.get_stamp()
+    if stamp is None:
+      return
+    checks = self._read_checks()
+    checks[self.service] = {'time': time.time(), 'tokens_file': stamp}
+    self._write_checks(checks)
+
+  def forget_check(self):
+    """Make the next check_access_token ask the service again.
+
+    Called when a request is refused with 401 "unauthorized".
+    """
+    checks = self._read_checks()
+    if checks.pop(self.service, None) is not None:
+      LOG.debug('Forgetting that the %s token was valid', self.service)
+      self._write_checks(checks)
+
   def get_display_name(self, hostid):
     """Gets standard display name for access request.
 
@@ -84,21 +152,6 @@ class AuthenticationManager(object):
     """
     return 'GoogleCL %s' % hostid
 
-  def _move_failed_token_file(self):
-    """Backs up failed tokens file."""
-    new_path = self.tokens_path + '.failed'
-    LOG.debug('Moving ' + self.tokens_path + ' to ' + new_path)
-    if os.path.isfile(new_path):
-      LOG.debug(new_path + ' already exists. Deleting it.')
-      try:
-        os.remove(new_path)
-      except EnvironmentError, err:
-        LOG.debug('Cannot remove old failed token file: ' + str(err))
-    try:
-      os.rename(self.tokens_path, new_path)
-    except EnvironmentError, err:
-      LOG.debug('Cannot rename token file to ' + new_path + ': ' + str(err))
-
   def read_access_token(self):
     """Tries to read an authorization token from a file.
 
@@ -106,20 +159,7 @@ class AuthenticationManager(object):
       The access token, if it exists. If the access token cannot be read,
       returns None.
     """
-    if os.path.exists(self.tokens_path):
-      with open(self.tokens_path, 'rb') as tokens_file:
-        try:
-          tokens_dict = pickle.load(tokens_file)
-        except ImportError:
-          return None
-      try:
-        token = tokens_dict[self.service]
-      except KeyError:
-        return None
-      else:
-        return token
-    else:
-      return None
+    return self.tokens.get(self.service)
 
   def remove_access_token(self):
     """Removes an auth token.
@@ -127,38 +167,11 @@ class AuthenticationManager(object):
     Returns:
       True if the token was removed from the tokens file, False otherwise.
     """
-    success = False
-    file_invalid = False
-    if os.path.exists(self.tokens_path):
-      with open(self.tokens_path, 'r+') as tokens_file:
-        try:
-          tokens_dict = pickle.load(tokens_file)
-        except ImportError, err:
-          LOG.error(err)
-          LOG.info('You probably have been using different versions of gdata.')
-          self._move_failed_token_file()
-          return False
-        except IndexError, err:
-          LOG.error(err)
-          self._move_failed_token_file()
-          return False
-
-        try:
-          del tokens_dict[self.service]
-        except KeyError:
-          LOG.debug('No token for ' + self.service)
-        else:
-          try:
-            pickle.dump(tokens_dict, tokens_file)
-          except EnvironmentError, err:
-            # IOError (extends enverror) shouldn't happen, but I've seen
-            # IOError Errno 0 pop up on Windows XP with Python 2.5.
-            LOG.error(err)
-            if err.errno == 0:
-              _move_failed_token_file()
-          else:
-            success = True
-    return success
+    try:
+      return self.tokens.remove(self.service)
+    except EnvironmentError, err:
+      LOG.error(err)
+      return False
 
   def retrieve_access_token(self, display_name, browser_object):
     """Requests a new access token from Google, writes it upon retrieval.
@@ -179,6 +192,7 @@ class AuthenticationManager(object):
         # client.current_token for GDataService.
         self.write_access_token(self.client.auth_token or
                                 self.client.current_token)
+        self.record_check()
         return True
       else:
         LOG.error('You specified account ' + self.client.email +
@@ -195,17 +209,13 @@ class AuthenticationManager(object):
     Returns:
       True if the token was read and set, False otherwise.
     """
-    try:
-      token = self.read_access_token()
-    except (KeyError, IndexError):
-      LOG.warning('Token file appears to be corrupted. Not using.')
+    token = self.read_access_token()
+    if token:
+      LOG.debug('Loaded token from file')
+      self.client.SetOAuthToken(token)
+      return True
     else:
-      if token:
-        LOG.debug('Loaded token from file')
-        self.client.SetOAuthToken(token)
-        return True
-      else:
-        LOG.debug('read_access_token evaluated to False')
+      LOG.debug('read_access_token evaluated to False')
     return False
 
   def verify_email(self, given_account, authorized_account):
@@ -233,30 +243,7 @@ class AuthenticationManager(object):
     Args:
       token: Token object to store.
     """
-    if os.path.exists(self.tokens_path):
-      with open(self.tokens_path, 'rb') as tokens_file:
-        try:
-          tokens_dict = pickle.load(tokens_file)
-        except (KeyError, IndexError), err:
-          LOG.error(err)
-          LOG.error('Failed to load token file (may be corrupted?)')
-          file_invalid = True
-        except ImportError, err:
-          LOG.error(err)
-          LOG.info('You probably have been using different versions of gdata.')
-          file_invalid = True
-        else:
-          file_invalid = False
-      if file_invalid:
-        self._move_failed_token_file()
-        tokens_dict = {}
-    else:
-      tokens_dict = {}
-    tokens_dict[self.service] = token
-    with open(self.tokens_path, 'wb') as tokens_file:
-      # Ensure only the owner of the file has read/write permission
-      os.chmod(self.tokens_path, stat.S_IRUSR | stat.S_IWUSR)
-      pickle.dump(tokens_dict, tokens_file)
+    self.tokens.put(self.service, token)
 
 
 def get_hd_domain(username, default_domain='default'):
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for remembering that access tokens are valid."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import googlecl.authentication
+
+
+class FakeClient(object):
+  """Counts the token checks that would have gone to the service."""
+
+  email = 'me@example.com'
+
+  def __init__(self):
+    self.checks = 0
+    self.valid = True
+
+  def IsTokenValid(self):
+    self.checks += 1
+    return self.valid
+
+
+class TokenCheckTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.client = FakeClient()
+    self.manager = self.get_manager('docs')
+    self.manager.write_access_token('token')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def get_manager(self, service):
+    return googlecl.authentication.AuthenticationManager(
+        service, self.client, os.path.join(self.directory, 'access_tok'))
+
+  def testCheckIsRemembered(self):
+    self.assertTrue(self.manager.check_access_token(60))
+    self.assertTrue(self.manager.check_access_token(60))
+    self.assertTrue(self.get_manager('docs').check_access_token(60))
+    self.assertEqual(self.client.checks, 1)
+    self.assertTrue(self.manager.check_access_token(0))
+    self.assertEqual(self.client.checks, 2)
+
+  def testChecksArePerService(self):
+    self.manager.check_access_token(60)
+    self.get_manager('picasa').check_access_token(60)
+    self.assertEqual(self.client.checks, 2)
+
+  def testUnauthorizedForgetsCheck(self):
+    self.manager.check_access_token(60)
+    self.manager.forget_check()
+    self.client.valid = False
+    self.assertFalse(self.manager.check_access_token(60))
+    self.assertEqual(self.client.checks, 2)
+
+  def testNewTokenNeedsCheck(self):
+    self.manager.check_access_token(60)
+    self.manager.write_access_token('another token, of another size')
+    self.manager.check_access_token(60)
+    self.assertEqual(self.client.checks, 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
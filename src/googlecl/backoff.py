@@ -0,0 +1,236 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Retry pacing for requests: exponential backoff and a circuit breaker."""
+
+import collections
+import logging
+import random
+import rfc822
+import threading
+import time
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+# Statuses that indicate the server is overloaded, rather than that the
+# request itself was bad. These count against the circuit breaker.
+OVERLOAD_STATUSES = (429, 500, 502, 503, 504)
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_delay(attempt, base_delay, max_delay):
+  """Return how long to wait before the next attempt.
+
+  Uses "full jitter": a random delay between zero and an exponentially growing
+  ceiling, so that many clients backing off at once do not retry in lockstep.
+
+  Args:
+    attempt: Number of attempts that have failed so far (1 for the first).
+    base_delay: Ceiling of the delay after the first failure, in seconds.
+    max_delay: Largest ceiling to use, in seconds.
+
+  Returns:
+    Delay in seconds.
+  """
+  if base_delay <= 0:
+    return 0
+  ceiling = min(max_delay, base_delay * (2 ** min(attempt - 1, 30)))
+  return random.uniform(0, ceiling)
+
+
+def parse_retry_after(value, now=None):
+  """Parse the value of a Retry-After header.
+
+  Args:
+    value: Header value, either a number of seconds or an HTTP date.
+    now: Current time as a timestamp. Default None for time.time().
+
+  Returns:
+    Number of seconds to wait, or None if the value could not be parsed.
+  """
+  if value is None:
+    return None
+  value = str(value).strip()
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  parsed = rfc822.parsedate_tz(value)
+  if not parsed:
+    return None
+  if now is None:
+    now = time.time()
+  return max(0.0, rfc822.mktime_tz(parsed) - now)
+
+
+def get_retry_after(err):
+  """Return the Retry-After delay carried by a request error, if any.
+
+  Only gdata.client.RequestError exposes response headers; errors raised by
+  gdata.service never have one.
+
+  Args:
+    err: The request error.
+
+  Returns:
+    Number of seconds to wait, or None.
+  """
+  headers = getattr(err, 'headers', None)
+  if not headers:
+    return None
+  if isinstance(headers, dict):
+    headers = headers.items()
+  for name, value in headers:
+    if name.lower() == 'retry-after':
+      return parse_retry_after(value)
+  return None
+
+
+class CircuitBreaker(object):
+
+  """Pauses all requests to a service while its error rate is too high.
+
+  Outcomes are tracked over a sliding window. Once enough of them are
+  failures, the breaker "opens" and every caller of wait() blocks for a
+  cooldown period. The first request after the cooldown acts as a probe: if
+  it fails too, the breaker reopens with a longer cooldown.
+  """
+
+  def __init__(self, error_rate=0.5, window=30, min_requests=5, cooldown=5,
+               max_cooldown=60, clock=time.time, sleep=time.sleep):
+    """Constructor.
+
+    Args:
+      error_rate: Fraction of failed requests in the window that opens the
+          breaker. 0 or less disables the breaker.
+      window: Length of the sliding window, in seconds.
+      min_requests: Number of requests that must be in the window before the
+          breaker can open.
+      cooldown: Seconds to pause for the first time the breaker opens.
+      max_cooldown: Longest pause, in seconds.
+      clock: Function returning the current time.
+      sleep: Function used to wait.
+    """
+    self.error_rate = error_rate
+    self.window = window
+    self.min_requests = min_requests
+    self.cooldown = cooldown
+    self.max_cooldown = max_cooldown
+    self._clock = clock
+    self._sleep = sleep
+    self._outcomes = collections.deque()
+    self._failures = 0
+    self._open_until = 0
+    self._current_cooldown = cooldown
+    self._probing = False
+    self._lock = threading.Lock()
+
+  def _expire(self, now):
+    while self._outcomes and self._outcomes[0][0] < now - self.window:
+      _, failed = self._outcomes.popleft()
+      if failed:
+        self._failures -= 1
+
+  def _open(self, now, duration):
+    self._open_until = max(self._open_until, now + duration)
+    self._outcomes.clear()
+    self._failures = 0
+
+  def is_open(self):
+    """Return True if requests are currently being held back."""
+    return self._clock() < self._open_until
+
+  def wait(self):
+    """Block until requests are allowed through."""
+    while True:
+      self._lock.acquire()
+      try:
+        remaining = self._open_until - self._clock()
+      finally:
+        self._lock.release()
+      if remaining <= 0:
+        return
+      self._sleep(remaining)
+
+  def pause(self, seconds):
+    """Hold back all requests for the given number of seconds."""
+    self._lock.acquire()
+    try:
+      self._open_until = max(self._open_until, self._clock() + seconds)
+    finally:
+      self._lock.release()
+
+  def record(self, failed):
+    """Record the outcome of a request.
+
+    Args:
+      failed: True if the request failed because the server was overloaded.
+    """
+    if self.error_rate <= 0:
+      return
+    self._lock.acquire()
+    try:
+      now = self._clock()
+      if self._probing:
+        self._probing = False
+        if failed:
+          self._current_cooldown = min(self._current_cooldown * 2,
+                                       self.max_cooldown)
+          LOG.warning('Server still failing, pausing requests for %.1f '
+                      'seconds', self._current_cooldown)
+          self._open(now, self._current_cooldown)
+          self._probing = True
+          return
+        self._current_cooldown = self.cooldown
+      self._expire(now)
+      self._outcomes.append((now, failed))
+      if failed:
+        self._failures += 1
+      total = len(self._outcomes)
+      if (total >= self.min_requests and
+          float(self._failures) / total >= self.error_rate):
+        LOG.warning('High error rate (%d of last %d requests), pausing '
+                    'requests for %.1f seconds', self._failures, total,
+                    self._current_cooldown)
+        self._open(now, self._current_cooldown)
+        self._probing = True
+    finally:
+      self._lock.release()
+
+
+def get_circuit_breaker(name, **kwargs):
+  """Return the circuit breaker shared by everything talking to a service.
+
+  Args:
+    name: Name of the service.
+    **kwargs: Passed to the CircuitBreaker constructor when it is created.
+        Updates the settings of an existing breaker.
+
+  Returns:
+    CircuitBreaker
+  """
+  _BREAKERS_LOCK.acquire()
+  try:
+    breaker = _BREAKERS.get(name)
+    if breaker is None:
+      breaker = CircuitBreaker(**kwargs)
+      _BREAKERS[name] = breaker
+    else:
+      for attribute, value in kwargs.items():
+        setattr(breaker, attribute, value)
+    return breaker
+  finally:
+    _BREAKERS_LOCK.release()
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for retry backoff and the circuit breaker."""
+
+import unittest
+
+import googlecl.backoff
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 1000.0
+    self.slept = []
+
+  def time(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.slept.append(seconds)
+    self.now += seconds
+
+
+class FakeError(Exception):
+  def __init__(self, headers):
+    Exception.__init__(self)
+    self.headers = headers
+
+
+class DelayTest(unittest.TestCase):
+
+  def testDelayGrowsAndCaps(self):
+    for attempt in range(1, 20):
+      delay = googlecl.backoff.get_delay(attempt, 0.5, 8)
+      self.assertTrue(0 <= delay <= min(8, 0.5 * 2 ** (attempt - 1)))
+
+  def testNoBaseDelay(self):
+    self.assertEqual(googlecl.backoff.get_delay(3, 0, 8), 0)
+
+  def testParseRetryAfter(self):
+    parse = googlecl.backoff.parse_retry_after
+    self.assertEqual(parse('120'), 120)
+    self.assertEqual(parse('Thu, 01 Jan 1970 00:00:30 GMT', now=10), 20)
+    self.assertEqual(parse('Thu, 01 Jan 1970 00:00:30 GMT', now=60), 0)
+    self.assertEqual(parse('soon'), None)
+
+  def testGetRetryAfter(self):
+    get = googlecl.backoff.get_retry_after
+    self.assertEqual(get(FakeError([('Retry-After', '3')])), 3)
+    self.assertEqual(get(FakeError({'retry-after': '4'})), 4)
+    self.assertEqual(get(FakeError([('Content-Type', 'text/plain')])), None)
+    self.assertEqual(get(Exception()), None)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.breaker = googlecl.backoff.CircuitBreaker(
+        error_rate=0.5, window=30, min_requests=4, cooldown=5,
+        max_cooldown=20, clock=self.clock.time, sleep=self.clock.sleep)
+
+  def testStaysClosedOnSuccess(self):
+    for _ in range(10):
+      self.breaker.record(False)
+    self.breaker.wait()
+    self.assertEqual(self.clock.slept, [])
+
+  def testOpensOnErrorRate(self):
+    self.breaker.record(False)
+    self.breaker.record(True)
+    self.breaker.record(False)
+    self.assertFalse(self.breaker.is_open())
+    self.breaker.record(True)
+    self.assertTrue(self.breaker.is_open())
+    self.breaker.wait()
+    self.assertEqual(sum(self.clock.slept), 5)
+
+  def testProbeFailureBacksOff(self):
+    for _ in range(4):
+      self.breaker.record(True)
+    self.breaker.wait()
+    self.breaker.record(True)
+    self.breaker.wait()
+    self.assertEqual(self.clock.slept, [5, 10])
+    self.breaker.record(False)
+    self.assertFalse(self.breaker.is_open())
+
+  def testOldErrorsExpire(self):
+    self.breaker.record(True)
+    self.breaker.record(True)
+    self.clock.now += 60
+    self.breaker.record(True)
+    self.breaker.record(False)
+    self.breaker.record(False)
+    self.breaker.record(False)
+    self.assertFalse(self.breaker.is_open())
+
+  def testPause(self):
+    self.breaker.pause(7)
+    self.breaker.wait()
+    self.assertEqual(self.clock.slept, [7])
+
+  def testDisabled(self):
+    self.breaker.error_rate = 0
+    for _ in range(10):
+      self.breaker.record(True)
+    self.assertFalse(self.breaker.is_open())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -15,6 +15,14 @@
 
 """Basic abilities that all GoogleCL clients have."""
 import googlecl
+import googlecl.backoff
+import googlecl.cache
+import googlecl.fastparse
+import googlecl.output
+import googlecl.registry
+import googlecl.stats
+import googlecl.workers
+import itertools
 import logging
 import re
 import urllib
@@ -25,7 +33,7 @@ safe_encode = googlecl.safe_encode
 safe_decode = googlecl.safe_decode
 
 LOG = logging.getLogger(__name__)
-HTTP_ERROR_CODES_TO_RETRY_ON = [302, 500, 503]
+HTTP_ERROR_CODES_TO_RETRY_ON = [302, 429, 500, 503]
 
 
 class Error(Exception):
@@ -43,6 +51,16 @@ class BaseCL(object):
   # Subclass of Exception to catch when there is a request error.
   # Should be one of gdata.service.RequestError or gdata.client.RequestError
   request_error = None
+  # Whether the feeds of this service understand the partial response "fields"
+  # query parameter. See build_fields_selector.
+  supports_partial_response = False
+  # Whether entries of this service can be deleted and updated through batch
+  # feeds, and how many operations a batch feed may hold. See run_batch.
+  supports_batch = False
+  max_batch_size = 100
+  # Whether feeds list deleted entries when asked to with showdeleted, so
+  # that googlecl.mirror can drop them on incremental syncs.
+  supports_show_deleted = False
 
   def __init__(self, section, config, request_error_class):
     """Set some basic attributes common to all instances.
@@ -53,6 +71,7 @@ class BaseCL(object):
       request_error_class: Exception class raised when a request fails.
     """
     self.request_error = request_error_class
+    self.config_section = section
 
     # When this field is set to 10000, then googlecl returns only 500 blog posts.
     # When this is set to 500, then it returns the blog posts correctly.
@@ -84,6 +103,62 @@ class BaseCL(object):
                                             'retry_delay',
                                             default=0,
                                             option_type=float)
+    # retry_delay is the ceiling of the first backoff; later ones double, up to
+    # max_retry_delay. See googlecl.backoff.get_delay.
+    self.max_retry_delay = self.config.lazy_get(section,
+                                                'max_retry_delay',
+                                                default=60,
+                                                option_type=float)
+    # Shared by every client (and thread) talking to this service.
+    self.circuit_breaker = googlecl.backoff.get_circuit_breaker(
+        section,
+        error_rate=self.config.lazy_get(section,
+                                        'circuit_breaker_error_rate',
+                                        default=0.5,
+                                        option_type=float),
+        cooldown=self.config.lazy_get(section,
+                                      'circuit_breaker_cooldown',
+                                      default=5,
+                                      option_type=float),
+        max_cooldown=self.max_retry_delay)
+    self.use_partial_response = self.config.lazy_get(section,
+                                                     'partial_response',
+                                                     default=True,
+                                                     option_type=bool)
+    # Whether list tasks may parse feeds with googlecl.fastparse when every
+    # field they print can be read from its lite entries.
+    self.lite_parse = self.config.lazy_get(section,
+                                           'lite_parse',
+                                           default=True,
+                                           option_type=bool)
+    # Raw feed pages, revalidated with conditional GETs. None if disabled.
+    self.feed_cache = googlecl.cache.get_feed_cache(self.config, section)
+    # Number of feed pages to download at once when a feed spans more than
+    # one page. Set to 1 or less to walk the pages one at a time.
+    self.prefetch_threads = self.config.lazy_get(section,
+                                                 'prefetch_threads',
+                                                 default=4,
+                                                 option_type=int)
+    # Number of entries to delete at once, for deletes that cannot be batched.
+    # Set to 1 or less to delete one entry at a time.
+    self.delete_threads = self.config.lazy_get(section,
+                                               'delete_threads',
+                                               default=4,
+                                               option_type=int)
+    # Operations to send in each batch request, for services that support
+    # them. Set to 0 or less to send one request per entry.
+    self.batch_size = self.config.lazy_get(section,
+                                           'batch_size',
+                                           default=self.max_batch_size,
+                                           option_type=int)
+    # Timestamp iter_entries limits feeds to, for incremental syncs of
+    # googlecl.mirror. None for every entry.
+    self.updated_min = None
+    # Number of feeds iter_entries could not retrieve.
+    self.feed_errors = 0
+    # Called without arguments when a request fails with 401 "unauthorized",
+    # e.g. AuthenticationManager.forget_check.
+    self.unauthorized_callback = None
 
     try:
       service_name = self.auth_service
@@ -94,44 +169,232 @@ class BaseCL(object):
       LOG.warning('You are requesting only ' + str(self.max_results) +
                   ' results per query -- this may be slow')
 
+  def reset_command_state(self):
+    """Undo what a command did to this client, so that another can reuse it.
+
+    Used by googlecl.daemon, which keeps authenticated clients between
+    commands.
+    """
+    self.feed_cache = googlecl.cache.get_feed_cache(self.config,
+                                                    self.config_section)
+    self.updated_min = None
+    self.feed_errors = 0
+
   def delete_entry_list(self, entries, entry_type, prompt,
                         callback=None):
     """Extends Delete to handle a list of entries.
 
+    Entries are deleted with batch requests where the service supports them,
+    and otherwise up to delete_threads at a time. A failure to delete one
+    entry does not stop the others; failures are reported at the end.
+
     Keyword arguments:
       entries: List of entries to delete.
       entry_type: String describing the thing being deleted (e.g. album, post).
       prompt: Whether or not the user should be prompted to confirm deletion.
       callback: function which takes entry as an argument and deletes it
     """
-    if prompt:
-      prompt_message = ('Are you SURE you want to delete %s "%s"? (y/N): ' %
-                        (entry_type, '%s'))
-    for item in entries:
-      if prompt:
-        delete_str = raw_input(prompt_message % safe_encode(item.title.text))
-        if not delete_str:
-          delete = False
-        else:
-          delete = delete_str.lower() == 'y'
+    confirmed = _confirm_deletions(entries, entry_type, prompt)
+    if callback is None and self.can_batch():
+      # Deletes every confirmed entry that a batch feed can take, and leaves
+      # the others to be deleted one at a time.
+      confirmed = self.run_batch('delete', list(confirmed), entry_type)
+    elif self.delete_threads > 1:
+      # Ask about every entry before any are deleted, so that prompts are not
+      # mixed in with the output of deletes running in other threads.
+      confirmed = list(confirmed)
+    # if callback is provided then deletion is done by calling it
+    delete = callback or self._delete_entry
+    def delete_item(item):
+      try:
+        delete(item)
+      except self.request_error, err:
+        return item, err
+      return item, None
+    failures = []
+    attempted = 0
+    for item, err in googlecl.workers.imap_ordered(delete_item, confirmed,
+                                                   self.delete_threads):
+      attempted += 1
+      if err is not None:
+        LOG.warning('Could not delete ' + entry_type + ': ' + str(err))
+        failures.append(item)
+    if failures and attempted > 1:
+      LOG.warning('Could not delete %d of %d %ss: %s', len(failures),
+                  attempted, entry_type,
+                  ', '.join(['"%s"' % safe_encode(item.title.text)
+                             for item in failures]))
+
+  DeleteEntryList = delete_entry_list
+
+  def _delete_entry(self, entry):
+    """Delete a single entry."""
+    # Later versions are defined with lowercase function names.
+    # These versions take GDataEntry objects, older takes the edit link.
+    if hasattr(self, 'delete'):
+      self.delete(entry)
+    else:
+      self.Delete(entry.GetEditLink().href)
+
+  def can_batch(self):
+    """Check if operations on entries should be sent in batch feeds."""
+    return self.supports_batch and self.batch_size > 0
+
+  def get_batch_url(self, entry):
+    """Return the URL of the batch feed an entry belongs to.
+
+    The default works for feeds whose entries are edited at
+    <feed>/full/<id>[/<version>], and whose batch feed is <feed>/full/batch.
+
+    Keyword arguments:
+      entry: Entry to apply a batch operation to.
+
+    Returns:
+      URL of the batch feed, or None if the entry cannot be batched.
+    """
+    try:
+      href = entry.GetEditLink().href
+    except AttributeError:
+      return None
+    index = href.find('/full/')
+    if index == -1:
+      return None
+    return href[:index] + '/full/batch'
+
+  def _build_batch_feed(self, operation, items):
+    """Build a batch feed. Must be defined by subclasses.
+
+    Keyword arguments:
+      operation: 'delete' or 'update'.
+      items: List of (batch ID, entry) pairs to apply the operation to.
+
+    Returns:
+      The batch feed, ready to be posted.
+    """
+    raise NotImplementedError('_build_batch_feed must be defined!')
+
+  def _post_batch_feed(self, feed, uri):
+    """Post a batch feed, and return the response feed.
+
+    Must be defined by subclasses.
+    """
+    raise NotImplementedError('_post_batch_feed must be defined!')
+
+  def run_batch(self, operation, entries, entry_type='entry', uri=None):
+    """Apply an operation to many entries with batch requests.
+
+    Entries are grouped by the batch feed they belong to, and sent batch_size
+    at a time. The status of each operation is read from the response, and
+    the operations that failed with a status worth retrying on (see
+    HTTP_ERROR_CODES_TO_RETRY_ON), or that the server never got to, are sent
+    again in later batches, with backoff, as retry_operation does for single
+    requests. Other failures are logged.
+
+    Keyword arguments:
+      operation: 'delete' or 'update'.
+      entries: List of entries to apply the operation to.
+      entry_type: String describing the entries (e.g. contact, event), for
+                  log messages.
+      uri: URL of the batch feed to send every entry to. Default None to use
+           get_batch_url for each entry.
+
+    Returns:
+      If uri is given, the list of response entries of the operations that
+      got a response. Otherwise, the list of entries that have no batch feed,
+      or whose batch feed could not be posted at all, which are left for the
+      caller to handle one at a time.
+    """
+    unbatched = []
+    responses = {}
+    pending = []
+    for index, entry in enumerate(entries):
+      batch_url = uri or self.get_batch_url(entry)
+      if batch_url:
+        pending.append((batch_url, str(index), entry))
       else:
-        delete = True
-      if delete:
+        unbatched.append(entry)
+    # Callers that have no other way to apply the operation still batch when
+    # batching is turned off.
+    batch_size = self.batch_size
+    if batch_size <= 0:
+      batch_size = self.max_batch_size
+    try_forever = self.max_retries <= 0
+    attempts_failed = 0
+    while pending:
+      failed = []
+      for batch_url, batch in _split_batches(pending, batch_size):
         try:
-          if callback:
-            # if callback is provided then deletion is done by calling it
-            callback(item)
-          else:
-            # Later versions are defined with lowercase function names.
-            # These versions take GDataEntry objects, older takes the edit link.
-            if hasattr(self, 'delete'):
-              self.delete(item)
-            else:
-              self.Delete(item.GetEditLink().href)
+          failed.extend(self._send_batch(operation, batch_url, batch,
+                                         entry_type, responses))
         except self.request_error, err:
-          LOG.warning('Could not delete ' + entry_type + ': ' + str(err))
+          # The request itself has already been retried by retry_operation.
+          if uri:
+            for _, _, entry in batch:
+              LOG.warning('Could not %s %s: %s', operation, entry_type,
+                          safe_encode(entry.title.text))
+          else:
+            LOG.warning('Could not %s %d %ss in a batch (%s), trying them '
+                        'one at a time', operation, len(batch), entry_type,
+                        err)
+            unbatched.extend([entry for _, _, entry in batch])
+      if not failed:
+        break
+      attempts_failed += 1
+      if not try_forever and attempts_failed >= self.max_retries:
+        for _, _, entry in failed:
+          LOG.warning('Could not %s %s: %s', operation, entry_type,
+                      safe_encode(entry.title.text))
+        break
+      delay = googlecl.backoff.get_delay(attempts_failed, self.retry_delay,
+                                         self.max_retry_delay)
+      LOG.debug('Retrying %d failed batch operations in %.2f seconds',
+                len(failed), delay)
+      googlecl.stats.record_retry()
+      time.sleep(delay)
+      pending = failed
+    if uri:
+      return [responses[str(index)] for index in range(len(entries))
+              if str(index) in responses]
+    return unbatched
+
+  def _send_batch(self, operation, batch_url, batch, entry_type, responses):
+    """Post one batch feed, and sort out which of its operations failed.
 
-  DeleteEntryList = delete_entry_list
+    Keyword arguments:
+      operation: 'delete' or 'update'.
+      batch_url: URL of the batch feed.
+      batch: List of (batch URL, batch ID, entry) tuples.
+      entry_type: String describing the entries, for log messages.
+      responses: Dictionary to store the response entries in, by batch ID.
+
+    Returns:
+      List of the (batch URL, batch ID, entry) tuples to try again.
+
+    Raises:
+      request_error if the batch feed could not be posted.
+    """
+    feed = self._build_batch_feed(operation,
+                                  [(batch_id, entry)
+                                   for _, batch_id, entry in batch])
+    for _, batch_id, _ in batch:
+      # Drop the responses of earlier attempts.
+      responses.pop(batch_id, None)
+    response_feed = self._post_batch_feed(feed, batch_url)
+    for response in response_feed.entry:
+      if response.batch_id is not None:
+        responses[response.batch_id.text] = response
+    failed = []
+    for item in batch:
+      response = responses.get(item[1])
+      status = get_batch_status(response)
+      if status is None or status in HTTP_ERROR_CODES_TO_RETRY_ON:
+        # A batch the server cut short has no response for later operations.
+        failed.append(item)
+      elif status >= 300:
+        LOG.warning('Could not %s %s: %s (%s)', operation, entry_type,
+                    safe_encode(item[2].title.text),
+                    response.batch_status.reason)
+    return failed
 
 # XXX: This should be shortened. test simpler version with client and service.
   def get_email(self, _uri=None, redirects_remaining=4):
@@ -182,46 +445,268 @@ class BaseCL(object):
             'reason': server_response.reason, 'body': result_body}
     return email
 
-  def get_entries(self, uri, titles=None, converter=None, desired_class=None):
-    """Get a list of entries from a feed uri.
+  def _fetch_feed_page(self, uri, headers):
+    """Retrieve the raw body of a feed page.
 
     Keyword arguments:
-      uri: URI to get the feed from.
-      titles: string or list What to look for in entry.title.text.
-              Default None for all entries from feed.
-      converter: Converter to use on the feed. If specified, will be passed
-                 into the GetFeed method. If both converter and
-                 desired_class are None, GetFeed is called without those
-                 arguments.
-      desired_class: class descended from atom.core.XmlElement to which a
-                     successful response should be converted. If converter=None,
-                     then the desired_class will be used in calling the
-                     atom.core.parse function. If both converter and
-                     desired_class are None, GetFeed is called without those
-                     arguments.
+      uri: URI of the feed page.
+      headers: Dictionary of extra headers to send with the request.
+
     Returns:
-      List of entries.
+      Tuple of (status, headers, body). headers is a dictionary with
+      lower-cased header names. body is None if status is 304.
+
+    Raises:
+      self.request_error: The server returned an error status.
+    """
+    raise NotImplementedError('_fetch_feed_page must be defined!')
+
+  def _parse_feed(self, body, converter=None, desired_class=None):
+    """Parse the raw body of a feed page the way GetFeed would.
+
+    Keyword arguments:
+      body: Body of the feed page.
+      converter: Converter to use on the feed. See get_entries.
+      desired_class: Class to convert the feed into. See get_entries.
+
+    Returns:
+      The feed.
+    """
+    raise NotImplementedError('_parse_feed must be defined!')
+
+  def _get_cached_feed(self, uri, converter=None, desired_class=None):
+    """Get a feed page, revalidating a cached copy of it if there is one.
+
+    Keyword arguments:
+      uri: URI of the feed page.
+      converter: Converter to use on the feed. See get_entries.
+      desired_class: Class to convert the feed into. See get_entries.
+
+    Returns:
+      The feed.
+    """
+    identity = '%s:%s' % (self.config_section, getattr(self, 'email', ''))
+    key = self.feed_cache.get_key(identity, uri)
+    cached = self.feed_cache.get(key)
+    if cached:
+      request_headers = cached.get_conditional_headers()
+    else:
+      request_headers = {}
+    status, headers, body = self._fetch_feed_page(uri, request_headers)
+    if status == 304 and cached:
+      LOG.debug('Feed page not modified, using cached copy of ' + uri)
+      body = cached.body
+    else:
+      etag = headers.get('etag')
+      last_modified = headers.get('last-modified')
+      if etag or last_modified:
+        self.feed_cache.put(key, googlecl.cache.CachedPage(uri, body, etag,
+                                                           last_modified))
+      elif cached:
+        self.feed_cache.remove(key)
+    return self._parse_feed_page(body, converter, desired_class)
+
+  def _parse_feed_page(self, body, converter=None, desired_class=None):
+    """Parse the raw body of a feed page, recording how long it took."""
+    start_time = time.time()
+    feed = self._parse_feed(body, converter, desired_class)
+    googlecl.stats.record_parse(time.time() - start_time)
+    return feed
+
+  def _get_feed(self, uri, converter=None, desired_class=None):
+    """Get and parse a single page of a feed.
+
+    Keyword arguments:
+      uri: URI of the feed page.
+      converter: Converter to use on the feed. See get_entries.
+      desired_class: Class to convert the feed into. See get_entries.
+
+    Returns:
+      The feed, as returned by GetFeed.
+    """
+    if self.feed_cache is not None:
+      return self._get_cached_feed(uri, converter, desired_class)
+    if converter is googlecl.fastparse.parse_feed:
+      # Not every service's GetFeed takes a converter, so parse the raw page.
+      _, _, body = self._fetch_feed_page(uri, {})
+      return self._parse_feed_page(body, converter)
+    if converter or desired_class:
+      # desired_class param not available for GDataService,
+      # only GDClient.
+      try:
+        return self.GetFeed(uri, converter=converter,
+                            desired_class=desired_class)
+      except TypeError:
+        if converter:
+          return self.GetFeed(uri, converter=converter)
+    return self.GetFeed(uri)
+
+  def _get_page_uris(self, feed):
+    """Build the URIs for every page of a feed that follows the given one.
+
+    Uses the openSearch totalResults and startIndex of the feed, along with
+    the start-index of its next link, to determine the page size.
+
+    Keyword arguments:
+      feed: First page of a feed that has a next link.
+
+    Returns:
+      List of URIs in server order, or None if the feed does not describe its
+      paging well enough to build them.
+    """
+    next_uri = feed.GetNextLink().href
+    next_start = get_query_param(next_uri, 'start-index')
+    try:
+      total = int(feed.total_results.text)
+      start = int(feed.start_index.text)
+      next_start = int(next_start)
+    except (AttributeError, TypeError, ValueError):
+      return None
+    page_size = next_start - start
+    if page_size <= 0:
+      return None
+    return [set_query_param(next_uri, 'start-index', index)
+            for index in range(next_start, total + 1, page_size)]
+
+  def _iter_next_feeds(self, feed, converter=None, desired_class=None):
+    """Iterate over the pages of a feed that follow the given one.
+
+    If the feed reports its total size, the remaining pages are downloaded
+    concurrently with up to self.prefetch_threads threads. Otherwise, next
+    links are followed one page at a time.
+
+    Keyword arguments:
+      feed: Feed page to start after.
+      converter: Converter to use on each page. See get_entries.
+      desired_class: Class to convert each page into. See get_entries.
+
+    Yields:
+      Feed pages, in server order.
+    """
+    if not feed or not feed.GetNextLink():
+      return
+    # Mirror GetNext, which converts each page into the class of the last.
+    page_class = desired_class
+    if not converter and not page_class:
+      page_class = feed.__class__
+    page_uris = None
+    if self.prefetch_threads > 1:
+      page_uris = self._get_page_uris(feed)
+    if page_uris:
+      LOG.debug('Prefetching %d pages with %d threads', len(page_uris),
+                self.prefetch_threads)
+      get_page = lambda uri: self._get_feed(uri, converter, page_class)
+      for page in googlecl.workers.imap_ordered(get_page, page_uris,
+                                                self.prefetch_threads):
+        if page:
+          feed = page
+          yield page
+    # Pick up anything the prefetch did not cover (e.g. entries added since
+    # the first page was retrieved, or feeds that cannot be prefetched).
+    while feed and feed.GetNextLink():
+      if (self.feed_cache is not None or
+          isinstance(feed, googlecl.fastparse.LiteFeed)):
+        feed = self._get_feed(feed.GetNextLink().href, converter, page_class)
+      else:
+        feed = self.GetNext(feed)
+      if feed:
+        yield feed
+
+  def _build_title_filter(self, titles):
+    """Build a function that decides if an entry matches the given titles.
+
+    Keyword arguments:
+      titles: string or list What to look for in entry.title.text. See
+              get_entries.
+
+    Returns:
+      None if every entry matches, or a function taking an entry and returning
+      True if it matches.
+
+    Raises:
+      re.error: self.use_regex is True and titles is not a valid expression.
     """
     # XXX: Should probably go through all code and make sure title can only be
     # NoneType or list, not also maybe a string.
+    # Check if title is NoneType, empty string, empty list, or a single-item
+    # list containing any of the prior.
+    if not titles or (len(titles) == 1 and not titles[0]):
+      return None
+
+    if self.use_regex:
+      # Carefully build title regex.
+      if isinstance(titles, basestring):
+        title_regex = titles
+      else:
+        title_regex = safe_decode('|'.join(titles))
+      LOG.debug(safe_encode('Using regex: ' + title_regex))
+      title_pattern = re.compile(title_regex)
+      return lambda entry: (entry.title.text and
+                            title_pattern.match(safe_decode(entry.title.text)))
+    else:
+      if isinstance(titles, list):
+        title_list = titles
+      else:
+        title_list = [titles]
+      return lambda entry: safe_decode(entry.title.text) in title_list
+
+  def iter_entries(self, uri, titles=None, converter=None, desired_class=None,
+                   fields=None, lite=False, record_class=None):
+    """Iterate over the entries of a feed uri, one page at a time.
+
+    Entries are yielded as soon as the page containing them has been
+    retrieved, so callers can start working before the whole feed is
+    downloaded. See get_entries for a description of the other arguments.
+
+    Keyword arguments:
+      fields: Partial response selector (see build_fields_selector) naming the
+              parts of each entry that are needed, or None for full entries.
+              Ignored if the service does not support partial responses, and
+              dropped if the server rejects it.
+      lite: If True, and the lite_parse option allows it, parse the feed with
+            googlecl.fastparse instead of converter or desired_class. The
+            entries are then LiteEntry records, which only have the parts
+            of an entry that list tasks print. Default False.
+      record_class: EntryRecord subclass to snapshot each page's entries into
+                    (see get_record_class), so that the parsed page can be
+                    released before its entries are yielded. Default None to
+                    yield the entries themselves.
+
+    Yields:
+      Entries matching titles, in feed order.
+    """
+    if lite and self.lite_parse:
+      converter = googlecl.fastparse.parse_feed
+      desired_class = None
+    try:
+      title_filter = self._build_title_filter(titles)
+    except re.error, err:
+      LOG.error('Regular expression error: ' + str(err) + '!')
+      return
     if self.max_results is not None:
       uri = set_max_results(uri, self.max_results)
+    if self.updated_min:
+      uri = set_query_param(uri, 'updated-min',
+                            urllib.quote(self.updated_min))
+      if self.supports_show_deleted:
+        uri = set_query_param(uri, 'showdeleted', 'true')
     if isinstance(uri, unicode):
       uri = uri.encode('utf-8')
-    feed = None
+    full_uri = uri
+    if fields and self.supports_partial_response and self.use_partial_response:
+      uri = set_query_param(uri, 'fields', urllib.quote(fields, safe=',:()/@*'))
     try:
-      if converter or desired_class:
-        # desired_class param not available for GDataService,
-        # only GDClient.
-        try:
-          feed = self.GetFeed(uri, converter=converter,
-                              desired_class=desired_class)
-        except TypeError:
-          if converter:
-            feed = self.GetFeed(uri, converter=converter)
-      if not feed:
-        feed = self.GetFeed(uri)
+      try:
+        feed = self._get_feed(uri, converter, desired_class)
+      except self.request_error, err:
+        if uri == full_uri or get_status(err) != 400:
+          raise err
+        # The server did not like the selector. Fall back to full entries.
+        LOG.debug('Partial response rejected, retrieving full entries: %s',
+                  err)
+        feed = self._get_feed(full_uri, converter, desired_class)
     except self.request_error, err:
+      self.feed_errors += 1
       error_string = str(err)
       LOG.error('Failed to get entries: ' + error_string)
 
@@ -232,48 +717,55 @@ class BaseCL(object):
         print "python-gdata may not support this action. Please see this wiki page "
         print "for more details:"
         print "http://code.google.com/p/googlecl/wiki/UploadingGoogleDocs\n\n"
-      return []
-    all_entries = feed.entry
+      return
+    pages = [feed]
     if feed.GetNextLink():
       if self.cap_results:
         LOG.warning('Leaving data that matches query on server.' +
                     ' Increase max_results or set cap_results to False.')
       else:
-        while feed and feed.GetNextLink():
-          feed = self.GetNext(feed)
-          if feed:
-            all_entries.extend(feed.entry)
-    # Check if title is NoneType, empty string, empty list, or a single-item
-    # list containing any of the prior.
-    if not titles or (len(titles) == 1 and not titles[0]):
-      LOG.debug('Retrieved ' + str(len(all_entries)) +
-                ' entries, returning them all')
-      return all_entries
+        pages = itertools.chain(pages, self._iter_next_feeds(feed, converter,
+                                                             desired_class))
+    num_retrieved = 0
+    num_returned = 0
+    for page in pages:
+      entries = page.entry
+      num_retrieved += len(entries)
+      if title_filter is not None:
+        entries = [entry for entry in entries if title_filter(entry)]
+      if record_class is not None:
+        entries = [record_class(entry) for entry in entries]
+        # Let the parsed page go while its records are handed out.
+        page = None
+      for entry in entries:
+        num_returned += 1
+        yield entry
+    LOG.debug('Retrieved ' + str(num_retrieved) +
+              ' entries, returned ' + str(num_returned) + ' of them')
+
+  IterEntries = iter_entries
 
-    if self.use_regex:
-      # Carefully build title regex.
-      if isinstance(titles, basestring):
-        title_regex = titles
-      else:
-        title_regex = safe_decode('|'.join(titles))
-      LOG.debug(safe_encode('Using regex: ' + title_regex))
-      try:
-        entries = [entry for entry in all_entries
-                   if entry.title.text and
-                   re.match(title_regex, safe_decode(entry.title.text))]
-      except re.error, err:
-        LOG.error('Regular expression error: ' + str(err) + '!')
-        entries = []
-    else:
-      if isinstance(titles, list):
-        title_list = titles
-      else:
-        title_list = [titles]
-      entries = [entry for entry in all_entries
-                 if safe_decode(entry.title.text) in title_list]
-    LOG.debug('Retrieved ' + str(len(all_entries)) +
-              ' entries, returning ' + str(len(entries)) + ' of them')
-    return entries
+  def get_entries(self, uri, titles=None, converter=None, desired_class=None):
+    """Get a list of entries from a feed uri.
+
+    Keyword arguments:
+      uri: URI to get the feed from.
+      titles: string or list What to look for in entry.title.text.
+              Default None for all entries from feed.
+      converter: Converter to use on the feed. If specified, will be passed
+                 into the GetFeed method. If both converter and
+                 desired_class are None, GetFeed is called without those
+                 arguments.
+      desired_class: class descended from atom.core.XmlElement to which a
+                     successful response should be converted. If converter=None,
+                     then the desired_class will be used in calling the
+                     atom.core.parse function. If both converter and
+                     desired_class are None, GetFeed is called without those
+                     arguments.
+    Returns:
+      List of entries.
+    """
+    return list(self.iter_entries(uri, titles, converter, desired_class))
 
   GetEntries = get_entries
 
@@ -350,14 +842,21 @@ class BaseCL(object):
     raise NotImplementedError('request_access must be defined!')
   RequestAccess = request_access
 
-  def retry_operation(self, *args, **kwargs):
+  def retry_operation(self, operation, *args, **kwargs):
     """Retries an operation if certain status codes are returned.
 
-    Wraps self.original_operation in a try block for catching request errors.
-    self.original_operation should be an alias to the original method being
-    attempted. See BaseServiceCL.retry_(get/post/delete).
+    Wraps operation in a try block for catching request errors. operation
+    should be the original method being attempted, and is passed in rather
+    than stored on the instance so that several threads can retry requests
+    at once. See BaseServiceCL.retry_(get/post/delete).
+
+    Retries wait with exponential backoff and jitter, or as long as the
+    server's Retry-After header asks. Every attempt first waits on the
+    service's circuit breaker, which holds back all requests while the
+    server is failing most of them.
 
     Args:
+      operation: The original (unwrapped) method being attempted.
       *args: The *args passed to the operation being attempted.
       **kwargs: The **kwargs passed to the operation being attempted.
 
@@ -371,25 +870,42 @@ class BaseCL(object):
     """
     try_forever = self.max_retries <= 0
     attempts_remaining = self.max_retries
+    attempts_failed = 0
     err = None
+    method = googlecl.stats.get_method_name(operation, args, kwargs)
     while try_forever or attempts_remaining:
+      self.circuit_breaker.wait()
+      start_time = time.time()
       try:
-        return self.original_operation(*args, **kwargs)
+        result = operation(*args, **kwargs)
       except self.request_error, err:
-        try:
-          # RequestError defined in gdata.client
-          status_code = err.status
-        except AttributeError:
-          # RequestError defined in gdata.service (and raised by GDataService)
-          status_code = err.args[0]['status']
+        status_code = get_status(err)
+        googlecl.stats.record_request(method, status_code,
+                                      time.time() - start_time)
+        self.circuit_breaker.record(
+            status_code in googlecl.backoff.OVERLOAD_STATUSES)
+        if status_code == 401 and self.unauthorized_callback:
+          self.unauthorized_callback()
         if status_code in HTTP_ERROR_CODES_TO_RETRY_ON:
           attempts_remaining -= 1
+          attempts_failed += 1
           LOG.debug('Retrying when you would have failed otherwise!')
           LOG.debug('Arguments: %s' % str(args))
           LOG.debug('Keyword arguments: %s' % kwargs)
           LOG.debug('Error: %s' % err)
           if try_forever or attempts_remaining:
-            time.sleep(self.retry_delay)
+            retry_after = googlecl.backoff.get_retry_after(err)
+            if retry_after is not None:
+              delay = min(retry_after, self.max_retry_delay)
+              # The server asked everyone to back off, not just this request.
+              self.circuit_breaker.pause(delay)
+            else:
+              delay = googlecl.backoff.get_delay(attempts_failed,
+                                                 self.retry_delay,
+                                                 self.max_retry_delay)
+            LOG.debug('Waiting %.2f seconds before retrying' % delay)
+            googlecl.stats.record_retry()
+            time.sleep(delay)
         else:
           raise err
       except Exception, unexpected:
@@ -397,10 +913,209 @@ class BaseCL(object):
         LOG.debug('Arguments: %s' % str(args))
         LOG.debug('Keyword arguments: %s' % kwargs)
         raise unexpected
+      else:
+        # gdata.service methods return parsed results rather than responses,
+        # and only do so on success.
+        googlecl.stats.record_request(method, getattr(result, 'status', 200),
+                                      time.time() - start_time)
+        self.circuit_breaker.record(False)
+        return result
     # Can only leave above loop if err is set at least once.
     raise err
 
 
+def _confirm_deletions(entries, entry_type, prompt):
+  """Yield the entries the user agrees to delete, asking if prompt is set."""
+  if prompt:
+    prompt_message = ('Are you SURE you want to delete %s "%s"? (y/N): ' %
+                      (entry_type, '%s'))
+  for item in entries:
+    if prompt:
+      delete_str = raw_input(prompt_message % safe_encode(item.title.text))
+      if not delete_str:
+        delete = False
+      else:
+        delete = delete_str.lower() == 'y'
+    else:
+      delete = True
+    if delete:
+      yield item
+
+
+def _split_batches(items, batch_size):
+  """Group (batch URL, batch ID, entry) tuples into batches.
+
+  Keyword arguments:
+    items: List of (batch URL, batch ID, entry) tuples.
+    batch_size: Largest number of operations to put in one batch.
+
+  Returns:
+    List of (batch URL, list of items) tuples, in the order the batch URLs
+    first appear.
+  """
+  by_url = {}
+  urls = []
+  for item in items:
+    if item[0] not in by_url:
+      by_url[item[0]] = []
+      urls.append(item[0])
+    by_url[item[0]].append(item)
+  batches = []
+  for url in urls:
+    url_items = by_url[url]
+    for start in range(0, len(url_items), batch_size):
+      batches.append((url, url_items[start:start + batch_size]))
+  return batches
+
+
+def get_batch_status(response_entry):
+  """Return the status code of a batch response entry, or None if missing."""
+  try:
+    return int(response_entry.batch_status.code)
+  except (AttributeError, TypeError, ValueError):
+    return None
+
+
+def get_status(err):
+  """Return the HTTP status code of a request error."""
+  try:
+    # RequestError defined in gdata.client
+    return err.status
+  except AttributeError:
+    # RequestError defined in gdata.service (and raised by GDataService)
+    return err.args[0]['status']
+
+
+def build_fields_selector(wrapper_class, field_names):
+  """Build a partial response selector for the fields a list task prints.
+
+  Keyword arguments:
+    wrapper_class: BaseEntryToStringWrapper or subclass that will display the
+                   entries. Its FIELDS say which parts of an entry each
+                   field reads.
+    field_names: List of field names, as given to --fields.
+
+  Returns:
+    Value for the "fields" query parameter, or None if some field needs the
+    full entry.
+  """
+  # Titles are always needed to filter entries by title.
+  entry_selectors = ['title']
+  for name in field_names:
+    field = get_field(wrapper_class, name)
+    if not field or not field.selector:
+      LOG.debug('No partial response selector for field ' + name)
+      return None
+    for part in field.selector.split(','):
+      if part not in entry_selectors:
+        entry_selectors.append(part)
+  # Keep the feed elements that paging through the feed relies on.
+  return ('link,openSearch:totalResults,openSearch:startIndex,entry(%s)' %
+          ','.join(entry_selectors))
+
+
+def get_record_class(wrapper_class, field_names):
+  """Find the record class a list task can snapshot its entries into.
+
+  Keyword arguments:
+    wrapper_class: BaseEntryToStringWrapper or subclass that will display the
+                   entries. Its FIELDS say which fields can be printed from
+                   a record alone.
+    field_names: List of field names, as given to --fields.
+
+  Returns:
+    wrapper_class.RECORD_CLASS, or None if some field needs the full entry.
+  """
+  for name in field_names:
+    field = get_field(wrapper_class, name)
+    if not field or not field.record:
+      LOG.debug('Field %s needs full entries', name)
+      return None
+  return wrapper_class.RECORD_CLASS
+
+
+def get_parse_options(wrapper_class, field_names):
+  """Work out how a list task can fetch only what it prints.
+
+  Keyword arguments:
+    wrapper_class: BaseEntryToStringWrapper or subclass that will display the
+                   entries.
+    field_names: List of field names, as given to --fields.
+
+  Returns:
+    Dictionary of the fields (see build_fields_selector), lite (see
+    googlecl.fastparse.supports_fields) and record_class (see
+    get_record_class) arguments for get_entries and the methods built on it.
+  """
+  return {'fields': build_fields_selector(wrapper_class, field_names),
+          'lite': googlecl.fastparse.supports_fields(wrapper_class,
+                                                     field_names),
+          'record_class': get_record_class(wrapper_class, field_names)}
+
+
+def run_list(options, wrapper_class, iter_entries, client=None,
+             mirror_scope=None, field_names=None, out=None):
+  """Print the entries found by a list task.
+
+  Keyword arguments:
+    options: Options of the task. Reads offline, query, fields, delimiter and
+             output.
+    wrapper_class: BaseEntryToStringWrapper or subclass to print entries
+                   with. Its FIELDS decide what iter_entries is asked for.
+    iter_entries: Function taking the fields, lite and record_class keyword
+                  arguments returned by get_parse_options, and returning an
+                  iterator over the entries to print.
+    client: Client of the service. Only needed for --offline.
+    mirror_scope: (account, feed, titles, parents) tuple of what to read from
+                  the local mirror with --offline (see
+                  googlecl.mirror.iter_records), or None if the task cannot
+                  be run offline.
+    field_names: List of field names to print. Default None for those given
+                 to --fields.
+    out: File to write to. Default None for sys.stdout.
+
+  Returns:
+    Number of entries printed, or None if they could not be listed.
+  """
+  if field_names is None:
+    field_names = options.fields.split(',')
+  if options.offline and mirror_scope:
+    # googlecl.mirror imports this module.
+    from googlecl import mirror
+    if options.query:
+      LOG.warning('Ignoring --query, which needs the server.')
+    account, feed, titles, parents = mirror_scope
+    entries = mirror.iter_records(client, account, feed, wrapper_class,
+                                  field_names, titles, parents)
+    if entries is None:
+      return None
+  else:
+    entries = iter_entries(**get_parse_options(wrapper_class, field_names))
+  formatter = googlecl.output.build_formatter(field_names, options.delimiter,
+                                              options.output)
+  return googlecl.output.print_entries(
+      (wrapper_class(entry) for entry in entries), formatter, out)
+
+
+def get_query_param(uri, name):
+  """Return the value of a query parameter in a uri, or None if it is unset."""
+  match = re.search(r'[?&]%s=([^&#]*)' % re.escape(name), uri)
+  if match:
+    return match.group(1)
+  return None
+
+
+def set_query_param(uri, name, value):
+  """Set a query parameter in a uri, replacing any value it already has."""
+  pattern = re.compile(r'([?&])%s=[^&#]*' % re.escape(name))
+  param = '%s=%s' % (name, value)
+  if pattern.search(uri):
+    return pattern.sub(lambda match: match.group(1) + param, uri, 1)
+  if uri.find('?') == -1:
+    return uri + '?' + param
+  return uri + '&' + param
+
+
 def set_max_results(uri, max):
   """Set max-results parameter if it is not set already."""
   max_str = str(max)
@@ -413,108 +1128,168 @@ def set_max_results(uri, max):
       return uri
 
 
-# The use of login_required has been deprecated - all tasks now require
-# logging in, and google.py does not check whether or not a task
-# says otherwise.
-class Task(object):
-  """A container of requirements.
+# Defined with the service manifest, which must load without this module.
+Task = googlecl.registry.Task
+
+
+class cached_property(object):
+  """A read-only property that is computed once per instance.
 
-  Each requirement matches up with one of the attributes of the option parser
-  used to parse command line arguments. Requirements are given as lists.
-  For example, if a task needs to have attr1 and attr2 and either attr3 or 4,
-  the list would look like ['attr1', 'attr2', ['attr3', 'attr4']]
+  Values are cached per property object, so aliases (name = title) share a
+  value while overrides in subclasses do not.
   """
 
-  def __init__(self, description, callback=None, required=[], optional=[],
-               login_required=True, args_desc=''):
-    """Constructor.
+  def __init__(self, function):
+    self.function = function
+    self.__doc__ = function.__doc__
 
-    Keyword arguments:
-      description: Description of what the task does.
-      callback: Function to use to execute task.
-                (Default None, prints a message instead of running)
-      required: Required options for the task. (Default None)
-      optional: Optional options for the task. (Default None)
-      login_required: If logging in with a username is required to do this task.
-                If True, can typically ignore 'user' as a required attribute.
-                (Default True)
-      args_desc: Description of what the arguments should be.
-                 (Default '', for no arguments necessary for this task)
-    """
-    if isinstance(required, basestring):
-      required = [required]
-    if isinstance(optional, basestring):
-      optional = [optional]
-    self.description = description
-    self.run = callback or self._not_impl
-    self.required = required
-    self.optional = optional
-    self.login_required = login_required
-    # Take the "required" list, join all the terms by the following rules:
-    # 1) if the term is a string, leave it.
-    # 2) if the term is a list, join it with the ' OR ' string.
-    # Then join the resulting list with ' AND '.
-    if self.required:
-      req_str = ' AND '.join(['('+' OR '.join(a)+')' if isinstance(a, list) \
-                              else a for a in self.required])
-    else:
-      req_str = 'none'
-    if self.optional:
-      opt_str = ' Optional: ' + str(self.optional)[1:-1].replace("'", '')
-    else:
-      opt_str = ''
-    if args_desc:
-      args_desc = ' Arguments: ' + args_desc
-    self.usage = 'Requires: ' + req_str + opt_str + args_desc
+  def __get__(self, instance, owner):
+    if instance is None:
+      return self
+    try:
+      return instance._property_cache[self]
+    except AttributeError:
+      instance._property_cache = {}
+    except KeyError:
+      pass
+    value = instance._property_cache[self] = self.function(instance)
+    return value
 
-  def get_outstanding_requirements(self, options):
-    """Return a list of required options that are missing.
 
-    The requirements that have been specified in <options> are removed
-    from self.required, and any sublists in self.required have been replaced
-    by the first item in that sublist if none of the requirements in the
-    sublist were given.
+def get_text(element, *names):
+  """Follow a chain of attributes and return the text at its end.
 
-    Args:
-      options: instance Has attributes with names corresponding to the
-               requirements specified by self.required and self.optional
+  Keyword arguments:
+    element: Object to start from, such as a gdata entry.
+    names: Attribute names to follow, e.g. 'media', 'description'.
 
-    Returns:
-      A subset of self.required containing only strings representing unmet
-      requirements.
-    """
-    missing_options_set = set(attr for attr in dir(options)
-                              if not attr.startswith('_') and
-                              getattr(options, attr) is None)
-    missing_requirements = []
-    for requirement in self.required:
-      if isinstance(requirement, list):
-        sub_req_set = set(requirement)
-        # If every element in sub_req_set is in missing_options_set,
-        # add the first element of the requirements list to the missing
-        # requirements.
-        if sub_req_set <= missing_options_set:
-          missing_requirements.append(requirement[0])
-        # Otherwise, the user specified one of the elements of the list, so
-        # we can use that one.
-      elif requirement in missing_options_set:
-        missing_requirements.append(requirement)
-    return missing_requirements
-
-  def is_optional(self, attribute):
-    """See if an attribute is optional"""
-    # No list of lists in the optional fields
-    if attribute in self.optional:
-      return True
-    return False
+  Returns:
+    The text attribute of the last object, or None if anything along the way
+    is missing.
+  """
+  for name in names:
+    element = getattr(element, name, None)
+    if element is None:
+      return None
+  return getattr(element, 'text', None)
+
+
+class RecordItem(object):
+  """One labelled value of a repeated element, such as an email address."""
+  __slots__ = ('label', 'text')
+
+  def __init__(self, label, text):
+    self.label = label
+    self.text = text
+
+
+def snapshot_items(entry_list, text_extractor, label_attribute=None):
+  """Copy the labels and text of a list of elements into RecordItems.
+
+  Keyword arguments:
+    entry_list: Elements to copy, e.g. entry.email.
+    text_extractor: Function returning the text of an element.
+    label_attribute: Attribute holding the label, if it is not 'rel' or
+                     'label'. See BaseEntryToStringWrapper._extract_label.
+
+  Returns:
+    Tuple of RecordItems.
+  """
+  items = []
+  for element in entry_list or ():
+    label = None
+    for attribute in (label_attribute, 'rel', 'label'):
+      if attribute and hasattr(element, attribute):
+        label = getattr(element, attribute)
+        break
+    items.append(RecordItem(label, text_extractor(element)))
+  return tuple(items)
+
+
+class EntryRecord(object):
+
+  """Compact snapshot of the parts of an entry that wrappers print.
+
+  Built once from a gdata entry (or a googlecl.fastparse.LiteEntry), so the
+  entry itself can be released. Subclasses add the parts their wrapper
+  needs by extending __slots__ and snapshot.
+  """
+
+  __slots__ = ('title', 'html_link', 'content_src', 'summary',
+               'media_description')
 
-  def _not_impl(self, *args):
-    """Just use this as a place-holder for Task callbacks."""
-    LOG.error('Sorry, this task is not yet implemented!')
+  def __init__(self, entry):
+    self.snapshot(entry)
+
+  def snapshot(self, entry):
+    """Copy what is needed out of entry."""
+    title = get_text(entry, 'title')
+    self.title = title is not None and safe_decode(title) or None
+    link = entry.GetHtmlLink()
+    self.html_link = link and link.href or ''
+    self.content_src = getattr(getattr(entry, 'content', None), 'src', None)
+    self.summary = get_text(entry, 'summary')
+    self.media_description = get_text(entry, 'media', 'description')
+
+
+class Field(object):
+  """How a field of an EntryToStringWrapper reads an entry.
+
+  Attributes:
+    selector: Partial response selector for the entry elements the field
+        reads (see build_fields_selector), or None if it needs the full entry.
+    lite: Whether the field can be printed from a googlecl.fastparse.LiteEntry.
+    record: Whether the field can be printed from the wrapper's RECORD_CLASS
+        alone (see get_record_class).
+  """
+  __slots__ = ('selector', 'lite', 'record')
+
+  def __init__(self, selector=None, lite=False, record=False):
+    self.selector = selector
+    self.lite = lite
+    self.record = record
+
+
+def field_table(fields, base=None):
+  """Build the FIELDS table of an EntryToStringWrapper.
+
+  Keyword arguments:
+    fields: List of (names, Field) pairs, where names is a space separated
+            string of the field and its aliases.
+    base: FIELDS table of the parent wrapper to extend, or None.
+
+  Returns:
+    Dictionary mapping field names to Fields.
+  """
+  table = dict(base or {})
+  for names, field in fields:
+    for name in names.split():
+      table[name] = field
+  return table
+
+
+def get_field(wrapper_class, name):
+  """Return the Field of wrapper_class named name (as given to --fields)."""
+  return wrapper_class.FIELDS.get(name.replace('-', '_'))
 
 
 class BaseEntryToStringWrapper(object):
-  """Wraps GDataEntries to easily get human-readable data."""
+  """Wraps GDataEntries to easily get human-readable data.
+
+  Fields are read from a snapshot of the entry (see EntryRecord) and cached,
+  so set intra_property_delimiter and label_delimiter before reading them.
+  """
+  # How each field reads an entry (see Field). Fields that are missing (like
+  # xml) need the full entry.
+  FIELDS = field_table([
+      ('title name', Field('title', lite=True, record=True)),
+      ('url url_direct url_site', Field('link,content', lite=True,
+                                        record=True)),
+      ('summary description', Field('summary', lite=True, record=True))])
+
+  # Record class the wrapper reads from (see get_record_class).
+  RECORD_CLASS = EntryRecord
+
   def __init__(self, gdata_entry,
                intra_property_delimiter='',
                label_delimiter=' ',
@@ -522,7 +1297,8 @@ class BaseEntryToStringWrapper(object):
     """Constructor.
 
     Keyword arguments:
-      gdata_entry: The GDataEntry to extract data from.
+      gdata_entry: The GDataEntry to extract data from, or a record of it
+                   (an instance of RECORD_CLASS).
       intra_property_delimiter: Delimiter to distinguish between multiple
                    values in a single property (e.g. multiple email addresses).
                    Default '' (there will always be at least one space).
@@ -543,52 +1319,45 @@ class BaseEntryToStringWrapper(object):
     """dir(self.entry)."""
     return str(dir(self.entry))
 
-  @property
+  @cached_property
+  def record(self):
+    """Snapshot of the entry. See EntryRecord."""
+    if isinstance(self.entry, self.RECORD_CLASS):
+      return self.entry
+    return self.RECORD_CLASS(self.entry)
+
+  @cached_property
   def title(self):
     """Title or name. For Contacts v1, job title."""
-    return self.entry.title.text
+    return self.record.title
   name = title
 
-  @property
+  @cached_property
   def url(self):
     """url_direct or url_site, depending on url_field defined in config."""
     return self._url(self.default_url_field)
 
-  @property
+  @cached_property
   def url_direct(self):
     """Url that leads directly to content."""
     return self._url('direct')
 
-  @property
+  @cached_property
   def url_site(self):
     """Url that leads to site hosting content."""
     return self._url('site')
 
   def _url(self, subfield):
-    if not self.entry.GetHtmlLink():
-      href = ''
-    else:
-      href = self.entry.GetHtmlLink().href
-
+    href = self.record.html_link
     if subfield == 'direct':
-      return self.entry.content.src or href
-    return href or self.entry.content.src
+      return self.record.content_src or href
+    return href or self.record.content_src
 
-  @property
+  @cached_property
   def summary(self):
     """Summary or description."""
-    try:
-      # Try to access the "default" description
-      value = self.entry.media.description.text
-    except AttributeError:
-      # If it's not there, try the summary attribute
-      value = self.entry.summary.text
-    else:
-      if not value:
-        # If the "default" description was there, but it was empty,
-        # try the summary attribute.
-        value = self.entry.summary.text
-    return value
+    # Prefer the "default" description, unless it is missing or empty.
+    return self.record.media_description or self.record.summary
   description = summary
 
   @property
@@ -659,6 +1428,9 @@ def compile_entry_string(wrapped_entry, attribute_list, delimiter,
                          missing_field_value=None, newline_replacer=' '):
   """Return a useful string describing a gdata.data.GDEntry.
 
+  To print many entries, use googlecl.output.print_entries, which works out
+  how to read the fields only once.
+
   Keyword arguments:
     wrapped_entry: BaseEntryToStringWrapper or subclass to display.
     attribute_list: List of attributes to access
@@ -670,45 +1442,10 @@ def compile_entry_string(wrapped_entry, attribute_list, delimiter,
     newline_replacer: String to replace newlines with. Default ' '. Set to
                       NoneType to leave newlines in place.
   """
-  return_string = ''
-  if not delimiter:
-    delimiter = ','
-  if delimiter.strip() == ',':
-    wrapped_entry.intra_property_delimiter = ';'
-  else:
-    wrapped_entry.intra_property_delimiter = ','
-  for attr in attribute_list:
-    try:
-      # Get the value, replacing NoneTypes and empty strings
-      # with the missing field value.
-      val = getattr(wrapped_entry, attr.replace('-','_')) or missing_field_value
-    except ValueError, err:
-      LOG.debug(err.args[0] + ' (Did not add value for field ' + attr + ')')
-    except AttributeError, err:
-      LOG.debug(err.args[0] + ' (value for field ' + attr + ')')
-      try:
-        # Last ditch effort to blindly grab the attribute
-        val = getattr(wrapped_entry.entry, attr).text or missing_field_value
-      except AttributeError:
-        LOG.debug(err.args[0] + ' (value for field ' + attr + ')')
-        val = missing_field_value
-    # Apparently, atom(?) doesn't always return a Unicode type when there are
-    # non-latin characters, so force everything to Unicode.
-    val = safe_decode(val)
-    # Ensure the delimiter won't appear in a non-delineation role,
-    # but let it slide if the raw xml is being dumped
-    if attr != 'xml':
-      return_string += val.replace(delimiter, ' ') + delimiter
-    else:
-      return_string = val
-    # Don't do processing if attribute is xml
-    if attr != 'xml':
-      return_string = return_string.replace('\n', newline_replacer)
-
-  return_string = return_string.rstrip(delimiter)
-  return_string = return_string.encode(googlecl.TERMINAL_ENCODING,
-                                       'backslashreplace')
-  return return_string
+  formatter = googlecl.output.RowFormatter(attribute_list, delimiter,
+                                           missing_field_value,
+                                           newline_replacer)
+  return formatter.format(wrapped_entry)
 
 
 def generate_tag_sets(tags):
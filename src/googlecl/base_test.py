@@ -0,0 +1,596 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for feed retrieval in the base client."""
+
+import optparse
+import shutil
+import StringIO
+import tempfile
+import threading
+import time
+import unittest
+
+import googlecl.base
+import googlecl.cache
+import googlecl.fastparse
+import googlecl.picasa
+import googlecl.synthetic
+
+
+class FakeRequestError(Exception):
+  def __init__(self, status=500, headers=None):
+    Exception.__init__(self, status)
+    self.status = status
+    self.headers = headers or []
+
+
+class FakeConfig(object):
+  def __init__(self, **options):
+    self.options = options
+
+  def lazy_get(self, section, option, default=None, option_type=None):
+    return self.options.get(option, default)
+
+
+class FakeText(object):
+  def __init__(self, text):
+    self.text = text
+
+
+class FakeLink(object):
+  def __init__(self, href):
+    self.href = href
+
+
+class FakeTitle(object):
+  def __init__(self, text):
+    self.text = text
+
+
+class FakeEntry(object):
+  def __init__(self, title):
+    self.title = FakeTitle(title)
+
+  def GetHtmlLink(self):
+    return None
+
+
+class FakeFeed(object):
+  def __init__(self, entries, next_href=None, start=None, total=None):
+    self.entry = entries
+    self.next_href = next_href
+    if start is not None:
+      self.start_index = FakeText(str(start))
+    if total is not None:
+      self.total_results = FakeText(str(total))
+
+  def GetNextLink(self):
+    if self.next_href:
+      return FakeLink(self.next_href)
+    return None
+
+
+class FakeClient(googlecl.base.BaseCL):
+  """Serves a paged feed of num_entries entries, page_size at a time."""
+
+  # Avoids the warning about small max_results values.
+  service = 'youtube'
+
+  def __init__(self, num_entries, page_size, opensearch=True, **options):
+    options.setdefault('max_results', page_size)
+    googlecl.base.BaseCL.__init__(self, 'TEST', FakeConfig(**options),
+                                  FakeRequestError)
+    self.num_entries = num_entries
+    self.page_size = page_size
+    self.opensearch = opensearch
+    self.requested = []
+    self.uris = []
+    self.lock = threading.Lock()
+
+  def _page(self, start):
+    end = min(start + self.page_size, self.num_entries + 1)
+    entries = [FakeEntry('entry %d' % i) for i in range(start, end)]
+    next_href = None
+    if end <= self.num_entries:
+      next_href = googlecl.base.set_query_param(
+          '/feed?max-results=%d' % self.page_size, 'start-index', end)
+    if self.opensearch:
+      return FakeFeed(entries, next_href, start, self.num_entries)
+    return FakeFeed(entries, next_href)
+
+  def GetFeed(self, uri, converter=None, desired_class=None):
+    start = int(googlecl.base.get_query_param(uri, 'start-index') or 1)
+    # Finish later pages sooner, to shake out any ordering problems.
+    time.sleep(0.01 * (self.num_entries - start) / self.num_entries)
+    self.lock.acquire()
+    try:
+      self.requested.append(start)
+      self.uris.append(uri)
+    finally:
+      self.lock.release()
+    return self._page(start)
+
+  def GetNext(self, feed):
+    return self.GetFeed(feed.GetNextLink().href)
+
+
+class QueryParamTest(unittest.TestCase):
+
+  def testGetQueryParam(self):
+    uri = '/feed?max-results=25&start-index=26'
+    self.assertEqual(googlecl.base.get_query_param(uri, 'start-index'), '26')
+    self.assertEqual(googlecl.base.get_query_param(uri, 'q'), None)
+
+  def testSetQueryParam(self):
+    self.assertEqual(
+        googlecl.base.set_query_param('/feed?start-index=1&x=y',
+                                      'start-index', 51),
+        '/feed?start-index=51&x=y')
+    self.assertEqual(googlecl.base.set_query_param('/feed', 'a', 'b'),
+                     '/feed?a=b')
+    self.assertEqual(googlecl.base.set_query_param('/feed?c=d', 'a', 'b'),
+                     '/feed?c=d&a=b')
+
+
+class GetEntriesTest(unittest.TestCase):
+
+  def assertAllEntries(self, client, num_entries):
+    entries = client.get_entries('/feed')
+    self.assertEqual([e.title.text for e in entries],
+                     ['entry %d' % i for i in range(1, num_entries + 1)])
+
+  def testPrefetchKeepsOrder(self):
+    client = FakeClient(95, 10, prefetch_threads=4)
+    self.assertAllEntries(client, 95)
+    self.assertEqual(sorted(client.requested), range(1, 96, 10))
+
+  def testSerial(self):
+    client = FakeClient(95, 10, prefetch_threads=1)
+    self.assertAllEntries(client, 95)
+    self.assertEqual(client.requested, range(1, 96, 10))
+
+  def testNoOpenSearchFallsBackToNextLinks(self):
+    client = FakeClient(35, 10, opensearch=False, prefetch_threads=4)
+    self.assertAllEntries(client, 35)
+    self.assertEqual(client.requested, [1, 11, 21, 31])
+
+  def testSinglePage(self):
+    client = FakeClient(7, 10, prefetch_threads=4)
+    self.assertAllEntries(client, 7)
+    self.assertEqual(client.requested, [1])
+
+  def testIterEntriesStreams(self):
+    client = FakeClient(95, 10, prefetch_threads=1)
+    entries = client.iter_entries('/feed')
+    self.assertEqual(entries.next().title.text, 'entry 1')
+    self.assertEqual(client.requested, [1])
+    self.assertEqual(len(list(entries)), 94)
+
+  def testTitleFilter(self):
+    client = FakeClient(35, 10, regex=True)
+    entries = client.get_entries('/feed', titles=['entry 3.*'])
+    self.assertEqual([e.title.text for e in entries],
+                     ['entry 3'] + ['entry %d' % i for i in range(30, 36)])
+    client = FakeClient(35, 10, regex=False)
+    entries = client.get_entries('/feed', titles='entry 3')
+    self.assertEqual([e.title.text for e in entries], ['entry 3'])
+
+  def testCapResults(self):
+    client = FakeClient(35, 10, prefetch_threads=4, cap_results=True)
+    self.assertEqual(len(client.get_entries('/feed')), 10)
+
+
+class EntryRecordTest(unittest.TestCase):
+
+  def testCachedProperty(self):
+    class Wrapper(googlecl.base.BaseEntryToStringWrapper):
+      calls = []
+
+      @googlecl.base.cached_property
+      def title(self):
+        self.calls.append('title')
+        return 'overridden'
+
+    wrapper = Wrapper(FakeEntry('entry 1'))
+    self.assertEqual(wrapper.title, 'overridden')
+    self.assertEqual(wrapper.title, 'overridden')
+    self.assertEqual(wrapper.calls, ['title'])
+    # name is an alias of the base class's title, not of the override.
+    self.assertEqual(wrapper.name, u'entry 1')
+
+  def testWrapperReadsRecord(self):
+    body = googlecl.synthetic.build_feed(googlecl.synthetic.PHOTOS, 2)
+    entry = googlecl.fastparse.parse_feed(body).entry[1]
+    record = googlecl.picasa.PhotoRecord(entry)
+    self.assertEqual(record.title, u'IMG_000002.jpg')
+    self.assertTrue(isinstance(record.title, unicode))
+    self.assertEqual(record.html_link, 'http://localhost/photo/2')
+    fields = ['title', 'url-direct', 'tags', 'caption']
+    self.assertEqual(
+        googlecl.base.compile_entry_string(
+            googlecl.picasa.PhotoEntryToStringWrapper(record), fields, ','),
+        googlecl.base.compile_entry_string(
+            googlecl.picasa.PhotoEntryToStringWrapper(entry), fields, ','))
+
+  def testGetRecordClass(self):
+    wrapper = googlecl.picasa.PhotoEntryToStringWrapper
+    self.assertEqual(googlecl.base.get_record_class(wrapper, ['title', 'iso']),
+                     googlecl.picasa.PhotoRecord)
+    self.assertEqual(googlecl.base.get_record_class(wrapper, ['xml']), None)
+
+  def testIterEntriesYieldsRecords(self):
+    client = FakeClient(35, 10)
+    records = list(client.iter_entries('/feed', titles=['entry 3.*'],
+                                       record_class=googlecl.base.EntryRecord))
+    self.assertEqual([record.title for record in records],
+                     ['entry 3'] + ['entry %d' % i for i in range(30, 36)])
+    self.assertTrue(isinstance(records[0], googlecl.base.EntryRecord))
+
+
+class RetryOperationTest(unittest.TestCase):
+
+  def setUp(self):
+    self.client = FakeClient(1, 10, max_retries=3, retry_delay=0)
+    self.client.circuit_breaker.error_rate = 0
+    self.sleeps = []
+    self.original_sleep = googlecl.base.time.sleep
+    googlecl.base.time.sleep = self.sleeps.append
+
+  def tearDown(self):
+    googlecl.base.time.sleep = self.original_sleep
+
+  def failing(self, *errors):
+    errors = list(errors)
+    def operation():
+      if errors:
+        raise errors.pop(0)
+      return 'done'
+    return operation
+
+  def testRetriesThenSucceeds(self):
+    operation = self.failing(FakeRequestError(503), FakeRequestError(429))
+    self.assertEqual(self.client.retry_operation(operation), 'done')
+
+  def testHonorsRetryAfter(self):
+    error = FakeRequestError(429, [('Retry-After', '2')])
+    self.client.circuit_breaker.pause = lambda seconds: None
+    self.client.retry_operation(self.failing(error))
+    self.assertEqual(self.sleeps, [2])
+
+  def testGivesUp(self):
+    operation = self.failing(*[FakeRequestError(500) for _ in range(3)])
+    self.assertRaises(FakeRequestError, self.client.retry_operation, operation)
+
+  def testDoesNotRetryClientErrors(self):
+    operation = self.failing(FakeRequestError(404))
+    self.assertRaises(FakeRequestError, self.client.retry_operation, operation)
+
+
+class FakeBatchEntry(FakeEntry):
+  def __init__(self, title, edit_href=None):
+    FakeEntry.__init__(self, title)
+    self.edit_href = edit_href
+
+  def GetEditLink(self):
+    if self.edit_href:
+      return FakeLink(self.edit_href)
+    return None
+
+
+class FakeBatchStatus(object):
+  def __init__(self, code):
+    self.code = str(code)
+    self.reason = 'reason %d' % code
+
+
+class FakeBatchResponse(object):
+  def __init__(self, batch_id, code):
+    self.batch_id = FakeText(batch_id)
+    self.batch_status = FakeBatchStatus(code)
+
+
+class FakeBatchClient(FakeClient):
+  """Answers batch feeds with the statuses given for each entry title."""
+
+  supports_batch = True
+
+  def __init__(self, statuses, **options):
+    FakeClient.__init__(self, 0, 10, **options)
+    self.statuses = statuses
+    self.batches = []
+    self.deleted = []
+    self.post_error = None
+
+  def _build_batch_feed(self, operation, items):
+    return operation, items
+
+  def _post_batch_feed(self, feed, uri):
+    operation, items = feed
+    self.batches.append((uri, [entry.title.text for _, entry in items]))
+    if self.post_error:
+      raise self.post_error
+    responses = []
+    for batch_id, entry in items:
+      codes = self.statuses.get(entry.title.text)
+      code = 200
+      if codes:
+        code = codes.pop(0)
+      if code is not None:
+        responses.append(FakeBatchResponse(batch_id, code))
+    return FakeFeed(responses)
+
+  def delete(self, entry):
+    if entry.title.text in self.statuses.get('failing deletes', ()):
+      raise FakeRequestError(404)
+    self.deleted.append(entry.title.text)
+
+
+class BatchTest(unittest.TestCase):
+
+  def setUp(self):
+    self.original_sleep = googlecl.base.time.sleep
+    googlecl.base.time.sleep = lambda seconds: None
+
+  def tearDown(self):
+    googlecl.base.time.sleep = self.original_sleep
+
+  def entries(self, count, feed='/feeds/a'):
+    return [FakeBatchEntry('%s %d' % (feed, i),
+                           '%s/full/%d/version' % (feed, i))
+            for i in range(count)]
+
+  def testGroupsByFeedAndSize(self):
+    client = FakeBatchClient({}, batch_size=2)
+    entries = self.entries(3) + self.entries(1, '/feeds/b')
+    client.delete_entry_list(entries, 'entry', False)
+    self.assertEqual([(uri, len(titles)) for uri, titles in client.batches],
+                     [('/feeds/a/full/batch', 2), ('/feeds/a/full/batch', 1),
+                      ('/feeds/b/full/batch', 1)])
+    self.assertEqual(client.deleted, [])
+
+  def testRetriesOnlyFailedItems(self):
+    client = FakeBatchClient({'/feeds/a 1': [503], '/feeds/a 2': [None]},
+                             max_retries=2)
+    client.delete_entry_list(self.entries(4), 'entry', False)
+    self.assertEqual(client.batches[1],
+                     ('/feeds/a/full/batch', ['/feeds/a 1', '/feeds/a 2']))
+    self.assertEqual(len(client.batches), 2)
+
+  def testGivesUpAfterMaxRetries(self):
+    client = FakeBatchClient({'/feeds/a 0': [500, 500, 500],
+                              '/feeds/a 1': [404]}, max_retries=3)
+    client.delete_entry_list(self.entries(2), 'entry', False)
+    self.assertEqual([titles for _, titles in client.batches],
+                     [['/feeds/a 0', '/feeds/a 1'], ['/feeds/a 0'],
+                      ['/feeds/a 0']])
+
+  def testFallsBackToSingleDeletes(self):
+    entries = [FakeBatchEntry('no link')] + self.entries(1)
+    client = FakeBatchClient({})
+    client.delete_entry_list(entries, 'entry', False)
+    self.assertEqual(client.deleted, ['no link'])
+    client = FakeBatchClient({}, batch_size=0)
+    client.delete_entry_list(entries, 'entry', False)
+    self.assertEqual(client.batches, [])
+    self.assertEqual(client.deleted, ['no link', '/feeds/a 0'])
+
+  def testFailedPostFallsBackToSingleDeletes(self):
+    client = FakeBatchClient({'failing deletes': ['/feeds/a 1']},
+                             batch_size=2)
+    client.post_error = FakeRequestError(500)
+    warnings = []
+    original_warning = googlecl.base.LOG.warning
+    googlecl.base.LOG.warning = lambda *args: warnings.append(args)
+    try:
+      client.delete_entry_list(self.entries(3), 'entry', False)
+    finally:
+      googlecl.base.LOG.warning = original_warning
+    self.assertEqual(len(client.batches), 2)
+    self.assertEqual(sorted(client.deleted), ['/feeds/a 0', '/feeds/a 2'])
+    self.assertEqual(warnings[-1][1:], (1, 3, 'entry', '"/feeds/a 1"'))
+
+  def testFailedPostForUriReportsEveryEntry(self):
+    client = FakeBatchClient({})
+    client.post_error = FakeRequestError(500)
+    self.assertEqual(client.run_batch('update', self.entries(2),
+                                      uri='/batch'), [])
+    self.assertEqual(client.deleted, [])
+
+  def testReturnsResponsesForUri(self):
+    client = FakeBatchClient({'/feeds/a 1': [409]})
+    responses = client.run_batch('update', self.entries(2), uri='/batch')
+    self.assertEqual([(r.batch_id.text, r.batch_status.code)
+                      for r in responses], [('0', '200'), ('1', '409')])
+
+
+class ConcurrentDeleteTest(unittest.TestCase):
+
+  def deleter(self, failing_titles=()):
+    lock = threading.Lock()
+    state = {'running': 0, 'most': 0, 'deleted': []}
+    def delete(entry):
+      lock.acquire()
+      state['running'] += 1
+      state['most'] = max(state['most'], state['running'])
+      lock.release()
+      time.sleep(0.01)
+      lock.acquire()
+      state['running'] -= 1
+      lock.release()
+      if entry.title.text in failing_titles:
+        raise FakeRequestError(403)
+      state['deleted'].append(entry.title.text)
+    return delete, state
+
+  def testBoundedThreads(self):
+    client = FakeClient(0, 10, delete_threads=3)
+    delete, state = self.deleter()
+    entries = [FakeEntry('entry %d' % i) for i in range(12)]
+    client.delete_entry_list(entries, 'entry', False, callback=delete)
+    self.assertEqual(sorted(state['deleted']),
+                     sorted(['entry %d' % i for i in range(12)]))
+    self.assertEqual(state['most'], 3)
+
+  def testCollectsFailures(self):
+    client = FakeClient(0, 10, delete_threads=4)
+    delete, state = self.deleter(failing_titles=['entry 1', 'entry 3'])
+    warnings = []
+    original_warning = googlecl.base.LOG.warning
+    googlecl.base.LOG.warning = lambda *args: warnings.append(args)
+    try:
+      client.delete_entry_list([FakeEntry('entry %d' % i) for i in range(5)],
+                               'entry', False, callback=delete)
+    finally:
+      googlecl.base.LOG.warning = original_warning
+    self.assertEqual(len(state['deleted']), 3)
+    self.assertEqual(warnings[-1][1:], (2, 5, 'entry',
+                                        '"entry 1", "entry 3"'))
+
+  def testPromptsBeforeDeleting(self):
+    client = FakeClient(0, 10, delete_threads=2)
+    events = []
+    def answer(message):
+      events.append('prompt')
+      return 'y'
+    # Shadows the builtin for the module.
+    googlecl.base.raw_input = answer
+    try:
+      client.delete_entry_list([FakeEntry('a'), FakeEntry('b')], 'entry',
+                               True, callback=lambda item: events.append(
+                                   'delete'))
+    finally:
+      del googlecl.base.raw_input
+    self.assertEqual(events, ['prompt', 'prompt', 'delete', 'delete'])
+
+
+class RunListTest(unittest.TestCase):
+
+  def setUp(self):
+    self.options = optparse.Values({'fields': 'title', 'delimiter': ',',
+                                    'output': None, 'offline': False,
+                                    'query': None})
+    self.requested = []
+
+  def iter_entries(self, **kwargs):
+    self.requested.append(kwargs)
+    return iter([FakeEntry('first'), FakeEntry('second')])
+
+  def run_list(self, wrapper_class=googlecl.base.BaseEntryToStringWrapper):
+    out = StringIO.StringIO()
+    count = googlecl.base.run_list(self.options, wrapper_class,
+                                   self.iter_entries, out=out)
+    return count, out.getvalue()
+
+  def testPrintsWhatIterEntriesFinds(self):
+    self.assertEqual(self.run_list(), (2, 'first\nsecond\n'))
+    self.assertEqual(self.requested, [{
+        'fields': 'link,openSearch:totalResults,openSearch:startIndex,'
+                  'entry(title)',
+        'lite': True,
+        'record_class': googlecl.base.EntryRecord}])
+
+  def testFieldsNeedingFullEntries(self):
+    self.options.fields = 'title,xml'
+    self.run_list()
+    self.assertEqual(self.requested, [{'fields': None, 'lite': False,
+                                       'record_class': None}])
+
+  def testOfflineWithoutMirrorAsksServer(self):
+    self.options.offline = True
+    self.assertEqual(self.run_list()[0], 2)
+    self.assertEqual(len(self.requested), 1)
+
+
+class PartialResponseTest(unittest.TestCase):
+
+  def testBuildSelector(self):
+    selector = googlecl.base.build_fields_selector(
+        googlecl.base.BaseEntryToStringWrapper, ['title', 'url-site', 'url'])
+    self.assertEqual(selector, 'link,openSearch:totalResults,'
+                               'openSearch:startIndex,entry(title,link,content)')
+
+  def testUnknownFieldNeedsFullEntry(self):
+    self.assertEqual(googlecl.base.build_fields_selector(
+        googlecl.base.BaseEntryToStringWrapper, ['title', 'xml']), None)
+
+  def testFieldTableDrivesEveryPath(self):
+    class Wrapper(googlecl.base.BaseEntryToStringWrapper):
+      FIELDS = googlecl.base.field_table([
+          ('size bytes', googlecl.base.Field('gd:quotaBytesUsed', lite=True,
+                                             record=True))],
+          base=googlecl.base.BaseEntryToStringWrapper.FIELDS)
+    self.assertEqual(googlecl.base.build_fields_selector(Wrapper, ['bytes']),
+                     'link,openSearch:totalResults,openSearch:startIndex,'
+                     'entry(title,gd:quotaBytesUsed)')
+    self.assertTrue(googlecl.fastparse.supports_fields(Wrapper, ['size']))
+    self.assertEqual(googlecl.base.get_record_class(Wrapper, ['size']),
+                     googlecl.base.EntryRecord)
+    self.assertFalse(
+        'size' in googlecl.base.BaseEntryToStringWrapper.FIELDS)
+
+  def testFallsBackOnRejectedSelector(self):
+    client = FakeClient(5, 10)
+    client.supports_partial_response = True
+    get_feed = client.GetFeed
+    requested = []
+    def reject_fields(uri, converter=None, desired_class=None):
+      requested.append(uri)
+      if googlecl.base.get_query_param(uri, 'fields'):
+        raise FakeRequestError(400)
+      return get_feed(uri)
+    client.GetFeed = reject_fields
+    entries = list(client.iter_entries('/feed', fields='entry(title)'))
+    self.assertEqual(len(entries), 5)
+    self.assertEqual(len(requested), 2)
+    self.assertTrue('fields=entry(title)' in requested[0])
+
+  def testIgnoredWhenUnsupported(self):
+    client = FakeClient(5, 10)
+    list(client.iter_entries('/feed', fields='entry(title)'))
+    self.assertEqual(client.uris, ['/feed?max-results=10'])
+
+
+class CachedFeedTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.client = FakeClient(1, 10)
+    self.client.feed_cache = googlecl.cache.FeedCache(self.directory)
+    self.requests = []
+    self.etag = '"v1"'
+    self.client._fetch_feed_page = self.fetch
+    self.client._parse_feed = lambda body, converter, desired_class: body
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def fetch(self, uri, headers):
+    self.requests.append(headers)
+    if headers.get('If-None-Match') == self.etag:
+      return 304, {}, None
+    return 200, {'etag': self.etag}, 'body ' + self.etag
+
+  def testRevalidates(self):
+    self.assertEqual(self.client._get_feed('/feed'), 'body "v1"')
+    self.assertEqual(self.client._get_feed('/feed'), 'body "v1"')
+    self.assertEqual(self.requests, [{}, {'If-None-Match': '"v1"'}])
+    self.etag = '"v2"'
+    self.assertEqual(self.client._get_feed('/feed'), 'body "v2"')
+
+
+if __name__ == '__main__':
+  unittest.main()
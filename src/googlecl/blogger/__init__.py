@@ -13,9 +13,13 @@
 # limitations under the License.
 import googlecl
 import googlecl.base
+import googlecl.mirror
+import googlecl.registry
+import logging
 
 service_name = __name__.split('.')[-1]
 LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
 SECTION_HEADER = service_name.upper()
 
 
@@ -35,26 +39,42 @@ def _map_access_string(access_string):
   return True
 
 
+class PostRecord(googlecl.base.EntryRecord):
+  """Snapshot of a blog post entry. See googlecl.base.EntryRecord."""
+  __slots__ = ('draft', 'authors', 'terms')
+
+  def snapshot(self, entry):
+    googlecl.base.EntryRecord.snapshot(self, entry)
+    control = getattr(entry, 'control', None)
+    self.draft = bool(control and control.draft.text == 'yes')
+    self.authors = googlecl.base.snapshot_items(
+        entry.author, lambda author: googlecl.base.get_text(author, 'name'))
+    self.terms = tuple([c.term for c in entry.category if c.term])
+
+
 class BloggerEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
-  @property
+  FIELDS = googlecl.base.field_table([
+      ('author tags labels', googlecl.base.Field(lite=True, record=True)),
+      ('access', googlecl.base.Field(record=True))],
+      base=googlecl.base.BaseEntryToStringWrapper.FIELDS)
+  RECORD_CLASS = PostRecord
+
+  @googlecl.base.cached_property
   def access(self):
     """Access level (draft or public)."""
-    if self.entry.control and self.entry.control.draft.text == 'yes':
+    if self.record.draft:
       return 'draft'
     else:
       return 'public'
 
-  @property
+  @googlecl.base.cached_property
   def author(self):
     """Author."""
-    # Name of author 'x' name is in entry.author[x].name.text
-    text_extractor = lambda entry: getattr(getattr(entry, 'name'), 'text')
-    return self._join(self.entry.author, text_extractor=text_extractor)
+    return self._join(self.record.authors)
 
-  @property
+  @googlecl.base.cached_property
   def tags(self):
-    return self.intra_property_delimiter.join(
-                            [c.term for c in self.entry.category if c.term])
+    return self.intra_property_delimiter.join(self.record.terms)
   labels = tags
 #===============================================================================
 # Each of the following _run_* functions execute a particular task.
@@ -84,13 +104,37 @@ def _run_delete(client, options, args):
 
 def _run_list(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
-  entries = client.GetPosts(options.blog, titles_list,
-                            user_id=options.owner or 'default')
-  for entry in entries:
-    print googlecl.base.compile_entry_string(
-                                             BloggerEntryToStringWrapper(entry),
-                                             options.fields.split(','),
-                                             delimiter=options.delimiter)
+
+  def iter_entries(fields, lite, record_class):
+    return client.IterPosts(options.blog, titles_list,
+                            user_id=options.owner or 'default',
+                            lite=lite,
+                            record_class=record_class)
+  googlecl.base.run_list(options, BloggerEntryToStringWrapper, iter_entries,
+                         client=client,
+                         mirror_scope=(options.owner or options.user, 'posts',
+                                       titles_list, [options.blog]))
+
+
+def _run_sync(client, options, args):
+  blog_entry = client.GetSingleEntry('/feeds/' + (options.owner or 'default') +
+                                     '/blogs', options.blog)
+  if not blog_entry:
+    LOG.error('Did not find a blog with title matching %s', options.blog)
+    return
+  blog_id = blog_entry.GetSelfLink().href.split('/')[-1]
+  blog_title = googlecl.safe_decode(blog_entry.title.text)
+  mirror = googlecl.mirror.open_mirror()
+  if mirror is None:
+    return
+  try:
+    counts = googlecl.mirror.sync_scope(
+        mirror, client, options.owner or options.user, 'posts',
+        lambda: client.IterEntries('/feeds/' + blog_id + '/posts/default'),
+        PostRecord, scope=blog_id, parent=blog_title)
+    googlecl.mirror.report_sync('posts', counts, blog_title)
+  finally:
+    mirror.close()
 
 
 def _run_tag(client, options, args):
@@ -99,14 +143,10 @@ def _run_tag(client, options, args):
   client.LabelPosts(entries, options.tags)
 
 
-TASKS = {'delete': googlecl.base.Task('Delete a post.', callback=_run_delete,
-                                      required=['blog', 'title']),
-         'post': googlecl.base.Task('Post content.', callback=_run_post,
-                                    required=['src', 'blog'],
-                                    optional=['title', 'tags', 'access']),
-         'list': googlecl.base.Task('List posts in a blog',
-                                    callback=_run_list,
-                                    required=['fields', 'blog', 'delimiter'],
-                                    optional=['title', 'owner']),
-         'tag': googlecl.base.Task('Label posts', callback=_run_tag,
-                                   required=['blog', 'title', 'tags'])}
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'delete': _run_delete,
+    'post': _run_post,
+    'list': _run_list,
+    'tag': _run_tag,
+    'sync': _run_sync})
@@ -98,8 +98,9 @@ class BloggerServiceCL(gdata.blogger.service.BloggerService,
 
   IsTokenValid = is_token_valid
 
-  def get_posts(self, blog_title=None, post_titles=None, user_id='default'):
-    """Get entries for posts that match a title.
+  def iter_posts(self, blog_title=None, post_titles=None, user_id='default',
+                 lite=False, record_class=None):
+    """Iterate over entries for posts that match a title.
 
     Keyword arguments:
       blog_title: Name or title of the blog the post is in. (Default None)
@@ -107,16 +108,32 @@ class BloggerServiceCL(gdata.blogger.service.BloggerService,
                    Default None, for all posts
       user_id: Profile ID of blog's owner as seen in the profile view URL.
               (Default 'default' for authenticated user)
+      lite: Return lite entries. See BaseCL.iter_entries.
+      record_class: Snapshot entries into this record class. See
+                    BaseCL.iter_entries.
 
     Returns:
-      List of posts that match parameters, or [] if none do.
+      Iterator over posts that match parameters.
     """
     blog_id = self._get_blog_id(blog_title, user_id)
     if blog_id:
       uri = '/feeds/' + blog_id + '/posts/default'
-      return self.GetEntries(uri, post_titles)
+      return self.IterEntries(uri, post_titles, lite=lite,
+                              record_class=record_class)
     else:
-      return []
+      return iter([])
+
+  IterPosts = iter_posts
+
+  def get_posts(self, blog_title=None, post_titles=None, user_id='default'):
+    """Get entries for posts that match a title.
+
+    See iter_posts for a description of the arguments.
+
+    Returns:
+      List of posts that match parameters, or [] if none do.
+    """
+    return list(self.iter_posts(blog_title, post_titles, user_id))
 
   GetPosts = get_posts
 
@@ -0,0 +1,254 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""On-disk cache of raw feed pages, for conditional GETs.
+
+Each page is stored in its own file along with the validators (ETag and
+Last-Modified) the server sent with it. Least recently used pages are
+evicted once the cache grows past its size limit.
+
+"""
+from __future__ import with_statement
+
+import cPickle as pickle
+import errno
+import googlecl
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+CACHE_DIR_NAME = 'feed_cache'
+DEFAULT_MAX_SIZE_MB = 50
+_FILE_SUFFIX = '.feed'
+
+
+class CachedPage(object):
+
+  """A feed page as it was last sent by the server."""
+
+  def __init__(self, uri, body, etag=None, last_modified=None):
+    self.uri = uri
+    self.body = body
+    self.etag = etag
+    self.last_modified = last_modified
+
+  def get_conditional_headers(self):
+    """Return the headers that ask the server if this page has changed."""
+    headers = {}
+    if self.etag:
+      headers['If-None-Match'] = self.etag
+    if self.last_modified:
+      headers['If-Modified-Since'] = self.last_modified
+    return headers
+
+
+class FeedCache(object):
+
+  """Size-bounded LRU cache of feed pages, stored in a directory."""
+
+  def __init__(self, directory, max_size=DEFAULT_MAX_SIZE_MB * 1024 * 1024):
+    """Constructor.
+
+    Args:
+      directory: Directory to keep cached pages in. Created if missing.
+      max_size: Approximate maximum total size of the cache, in bytes.
+    """
+    self.directory = directory
+    self.max_size = max_size
+    self._lock = threading.Lock()
+    # Estimated total size of the cached pages, measured on the first write.
+    # Other processes sharing the directory are only accounted for when the
+    # estimate crosses max_size and evict() measures the directory again.
+    self._total_size = None
+    if not os.path.isdir(directory):
+      os.makedirs(directory, 0700)
+
+  def get_key(self, identity, uri):
+    """Return the cache key for a uri retrieved by a particular user.
+
+    Args:
+      identity: String identifying whose credentials fetch the page, so that
+          users sharing a data directory never see each other's pages.
+      uri: URI of the feed page.
+    """
+    return hashlib.sha1('%s\n%s' % (googlecl.safe_encode(identity, 'utf-8'),
+                                     googlecl.safe_encode(uri, 'utf-8'))
+                        ).hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self.directory, key + _FILE_SUFFIX)
+
+  def get(self, key):
+    """Return the CachedPage stored under key, or None."""
+    path = self._path(key)
+    try:
+      with open(path, 'rb') as cache_file:
+        page = pickle.load(cache_file)
+    except IOError, err:
+      if err.errno != errno.ENOENT:
+        LOG.debug('Could not read cached page %s: %s', path, err)
+      return None
+    except Exception, err:
+      # Truncated or otherwise corrupt entry. Treat it as a miss.
+      LOG.debug('Discarding unreadable cached page %s: %s', path, err)
+      self.remove(key)
+      return None
+    self.touch(key)
+    return page
+
+  def touch(self, key):
+    """Mark the page stored under key as recently used."""
+    try:
+      os.utime(self._path(key), None)
+    except OSError:
+      pass
+
+  def _get_size(self, path):
+    try:
+      return os.path.getsize(path)
+    except OSError:
+      return 0
+
+  def _measure(self):
+    """Return [(mtime, size, path)] for every cached page, and their total."""
+    entries = []
+    total = 0
+    for filename in os.listdir(self.directory):
+      if not filename.endswith(_FILE_SUFFIX):
+        continue
+      path = os.path.join(self.directory, filename)
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      entries.append((stat.st_mtime, stat.st_size, path))
+      total += stat.st_size
+    return entries, total
+
+  def _add_size(self, delta):
+    """Account for a page written or removed, and evict if now too large."""
+    self._lock.acquire()
+    try:
+      if self._total_size is None:
+        self._total_size = self._measure()[1]
+      else:
+        self._total_size = max(0, self._total_size + delta)
+      over = self._total_size > self.max_size
+    finally:
+      self._lock.release()
+    if over:
+      self.evict()
+
+  def put(self, key, page):
+    """Store a CachedPage under key, evicting old pages if necessary."""
+    path = self._path(key)
+    old_size = self._get_size(path)
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+    try:
+      with os.fdopen(fd, 'wb') as cache_file:
+        pickle.dump(page, cache_file, pickle.HIGHEST_PROTOCOL)
+      new_size = self._get_size(temp_path)
+      os.rename(temp_path, path)
+    except (IOError, OSError), err:
+      LOG.debug('Could not cache page %s: %s', page.uri, err)
+      try:
+        os.remove(temp_path)
+      except OSError:
+        pass
+      return
+    self._add_size(new_size - old_size)
+
+  def remove(self, key):
+    path = self._path(key)
+    size = self._get_size(path)
+    try:
+      os.remove(path)
+    except OSError:
+      return
+    self._lock.acquire()
+    try:
+      if self._total_size is not None:
+        self._total_size = max(0, self._total_size - size)
+    finally:
+      self._lock.release()
+
+  def evict(self):
+    """Remove least recently used pages until the cache fits in max_size.
+
+    Lists the whole directory, so it is only called once the estimated size
+    of the cache has crossed max_size.
+    """
+    self._lock.acquire()
+    try:
+      entries, total = self._measure()
+      if total > self.max_size:
+        entries.sort()
+        for _, size, path in entries:
+          if total <= self.max_size:
+            break
+          try:
+            os.remove(path)
+          except OSError:
+            continue
+          total -= size
+        LOG.debug('Evicted feed cache down to %d bytes', total)
+      self._total_size = total
+    finally:
+      self._lock.release()
+
+  def clear(self):
+    """Remove every cached page."""
+    for filename in os.listdir(self.directory):
+      if filename.endswith(_FILE_SUFFIX):
+        try:
+          os.remove(os.path.join(self.directory, filename))
+        except OSError:
+          pass
+    self._lock.acquire()
+    try:
+      self._total_size = 0
+    finally:
+      self._lock.release()
+
+
+def get_feed_cache(config, section):
+  """Return the feed cache to use for a service, according to config options.
+
+  Args:
+    config: Configuration parser (see googlecl.config.parser).
+    section: Section to look for options in.
+
+  Returns:
+    FeedCache, or None if caching is disabled. Caching is off unless the
+    feed_cache option is set, since the cached pages hold the contents of
+    private feeds (contacts, documents, calendars...).
+  """
+  if not config.lazy_get(section, 'feed_cache', default=False,
+                         option_type=bool):
+    return None
+  max_size_mb = config.lazy_get(section, 'feed_cache_size',
+                                default=DEFAULT_MAX_SIZE_MB,
+                                option_type=float)
+  if max_size_mb <= 0:
+    return None
+  directory = googlecl.get_data_path(CACHE_DIR_NAME, create_missing_dir=True)
+  try:
+    return FeedCache(directory, int(max_size_mb * 1024 * 1024))
+  except OSError, err:
+    LOG.debug('Feed cache disabled: %s', err)
+    return None
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the on-disk feed cache."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import googlecl.cache
+
+
+class FeedCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cache = googlecl.cache.FeedCache(self.directory, max_size=4096)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def put(self, name, size=100, etag='"1"', mtime=None):
+    key = self.cache.get_key('user', '/feeds/' + name)
+    self.cache.put(key, googlecl.cache.CachedPage('/feeds/' + name,
+                                                  'x' * size, etag))
+    if mtime is not None:
+      os.utime(os.path.join(self.directory, key + '.feed'), (mtime, mtime))
+    return key
+
+  def testRoundTrip(self):
+    key = self.put('a', etag='"abc"')
+    page = self.cache.get(key)
+    self.assertEqual(page.uri, '/feeds/a')
+    self.assertEqual(page.body, 'x' * 100)
+    self.assertEqual(page.get_conditional_headers(),
+                     {'If-None-Match': '"abc"'})
+
+  def testMiss(self):
+    self.assertEqual(self.cache.get(self.cache.get_key('user', '/none')), None)
+
+  def testKeysDependOnIdentity(self):
+    self.assertNotEqual(self.cache.get_key('bob', '/feed'),
+                        self.cache.get_key('alice', '/feed'))
+    self.assertEqual(self.cache.get_key(u'b\xf6b', '/feed'),
+                     self.cache.get_key(u'b\xf6b', '/feed'))
+
+  def testCorruptEntryIsDiscarded(self):
+    key = self.put('a')
+    path = os.path.join(self.directory, key + '.feed')
+    open(path, 'wb').write('not a pickle')
+    self.assertEqual(self.cache.get(key), None)
+    self.assertFalse(os.path.exists(path))
+
+  def testEvictsLeastRecentlyUsed(self):
+    old = self.put('old', size=1500, mtime=1000)
+    used = self.put('used', size=1500, mtime=2000)
+    self.cache.get(old)
+    self.put('new', size=1500)
+    self.assertNotEqual(self.cache.get(old), None)
+    self.assertEqual(self.cache.get(used), None)
+
+  def testDirectoryIsOnlyListedWhenFull(self):
+    measure = self.cache._measure
+    calls = []
+    def counting_measure():
+      calls.append(1)
+      return measure()
+    self.cache._measure = counting_measure
+    for name in 'abcd':
+      self.put(name, size=500)
+    self.assertEqual(len(calls), 1)
+    self.put('e', size=2000)
+    self.assertEqual(len(calls), 2)
+    self.assertTrue(self.cache._total_size <= 4096)
+
+  def testConditionalHeaders(self):
+    page = googlecl.cache.CachedPage('/feed', 'body',
+                                     last_modified='Sat, 01 Jan 2011')
+    self.assertEqual(page.get_conditional_headers(),
+                     {'If-Modified-Since': 'Sat, 01 Jan 2011'})
+
+
+if __name__ == '__main__':
+  unittest.main()
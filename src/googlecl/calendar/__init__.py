@@ -15,7 +15,13 @@
 import datetime
 import googlecl
 import googlecl.base
+import googlecl.fastparse
+import googlecl.mirror
+import googlecl.output
+import googlecl.registry
+import itertools
 import logging
+import operator
 import re
 import time
 from googlecl.calendar.date import DateRangeParser
@@ -88,7 +94,8 @@ def filter_single_events(events, recurrences_expanded):
   return [e for e in events if not is_single(e)]
 
 
-def filter_all_day_events_outside_range(start_date, end_date, events):
+def iter_events_inside_range(start_date, end_date, events):
+  """Yield the events that are not all-day events outside the date range."""
   if start_date:
     if start_date.all_day:
       start_datetime = start_date.local
@@ -103,7 +110,6 @@ def filter_all_day_events_outside_range(start_date, end_date, events):
       end_datetime = datetime.datetime(year=end_date.local.year,
                                        month=end_date.local.month,
                                        day=end_date.local.day)
-  new_events = []
   for event in events:
     try:
       start = datetime.datetime.strptime(event.when[0].start_time, '%Y-%m-%d')
@@ -113,11 +119,11 @@ def filter_all_day_events_outside_range(start_date, end_date, events):
         raise err
       else:
         #Errors that complain of unconverted data are events with duration
-        new_events.append(event)
+        yield event
     else:
       if ((not start_date or start >= start_datetime) and
           (not end_date or end <= inclusive_end_datetime)):
-        new_events.append(event)
+        yield event
       elif event.recurrence:
         # While writing the below comment, I was 90% sure it was true. Testing
         # this case, however, showed that things worked out just fine -- the
@@ -130,9 +136,28 @@ def filter_all_day_events_outside_range(start_date, end_date, events):
         # we will incorrectly return this event.
         # This is unavoidable unless we a) perform another query or b)
         # incorporate a recurrence parser.
-        new_events.append(event)
+        yield event
+
+
+def iter_records_inside_range(start_date, end_date, records):
+  """Yield the records of mirrored events that start inside the date range.
+
+  The server cannot be asked for the range, so events are compared by the day
+  they start on. Recurring events are always yielded.
+  """
+  start_day = start_date and start_date.local.date()
+  end_day = end_date and end_date.local.date()
+  for record in records:
+    if record.recurrence or not record.start_time:
+      yield record
+      continue
+    day = datetime.datetime.strptime(record.start_time[:10], '%Y-%m-%d').date()
+    if (not start_day or day >= start_day) and (not end_day or day <= end_day):
+      yield record
+
 
-  return new_events
+def filter_all_day_events_outside_range(start_date, end_date, events):
+  return list(iter_events_inside_range(start_date, end_date, events))
 
 
 def filter_canceled_events(events, recurrences_expanded):
@@ -187,19 +212,30 @@ def get_datetimes(cal_entry):
   if cal_entry.recurrence:
     return parse_recurrence(cal_entry.recurrence.text)
   else:
-    freq = None
     when = cal_entry.when[0]
-    try:
-      # Trim the string data from "when" to only include down to seconds
-      start_time_data = time.strptime(when.start_time[:19],
-                                      '%Y-%m-%dT%H:%M:%S')
-      end_time_data = time.strptime(when.end_time[:19],
-                                    '%Y-%m-%dT%H:%M:%S')
-    except ValueError:
-      # Try to handle date format for all-day events
-      start_time_data = time.strptime(when.start_time, '%Y-%m-%d')
-      end_time_data = time.strptime(when.end_time, '%Y-%m-%d')
-  return (start_time_data, end_time_data, freq)
+    return parse_when(when.start_time, when.end_time)
+
+
+def parse_when(start_time, end_time):
+  """Parse the start and end times of a non-recurring event.
+
+  Keyword arguments:
+    start_time: Value of the startTime attribute of the event's gd:when.
+    end_time: Value of the endTime attribute of the event's gd:when.
+
+  Returns:
+    (start_time, end_time, None). See get_datetimes.
+
+  """
+  try:
+    # Trim the string data from "when" to only include down to seconds
+    start_time_data = time.strptime(start_time[:19], '%Y-%m-%dT%H:%M:%S')
+    end_time_data = time.strptime(end_time[:19], '%Y-%m-%dT%H:%M:%S')
+  except ValueError:
+    # Try to handle date format for all-day events
+    start_time_data = time.strptime(start_time, '%Y-%m-%d')
+    end_time_data = time.strptime(end_time, '%Y-%m-%d')
+  return (start_time_data, end_time_data, None)
 
 
 def parse_recurrence(time_string):
@@ -234,7 +270,28 @@ def parse_recurrence(time_string):
   return (start_time, end_time, freq)
 
 
+class EventRecord(googlecl.base.EntryRecord):
+  """Snapshot of an event entry. See googlecl.base.EntryRecord."""
+  __slots__ = ('recurrence', 'start_time', 'end_time', 'wheres')
+
+  def snapshot(self, entry):
+    googlecl.base.EntryRecord.snapshot(self, entry)
+    self.recurrence = googlecl.base.get_text(entry, 'recurrence')
+    if entry.when:
+      self.start_time = entry.when[0].start_time
+      self.end_time = entry.when[0].end_time
+    else:
+      self.start_time = self.end_time = None
+    self.wheres = googlecl.base.snapshot_items(
+        entry.where, lambda where: where.value_string)
+
+
 class CalendarEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
+  FIELDS = googlecl.base.field_table([
+      ('when where', googlecl.base.Field(lite=True, record=True))],
+      base=googlecl.base.BaseEntryToStringWrapper.FIELDS)
+  RECORD_CLASS = EventRecord
+
   def __init__(self, entry, config):
     """Initialize a CalendarEntry wrapper.
 
@@ -245,10 +302,16 @@ class CalendarEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
     googlecl.base.BaseEntryToStringWrapper.__init__(self, entry)
     self.config_parser = config
 
-  @property
+  @googlecl.base.cached_property
   def when(self):
     """When event takes place."""
-    start_date, end_date, freq = get_datetimes(self.entry)
+    if self.record.recurrence:
+      start_date, end_date, freq = parse_recurrence(self.record.recurrence)
+    elif self.record.start_time:
+      start_date, end_date, freq = parse_when(self.record.start_time,
+                                              self.record.end_time)
+    else:
+      return None
     print_format = self.config_parser.lazy_get(SECTION_HEADER,
                                                       'date_print_format')
     start_text = time.strftime(print_format, start_date)
@@ -261,13 +324,16 @@ class CalendarEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
         value += ' (' + freq['FREQ'].lower() + ')'
     return value
 
-  @property
+  @googlecl.base.cached_property
   def where(self):
     """Where event takes place"""
-    return self._join(self.entry.where, text_attribute='value_string')
+    return self._join(self.record.wheres)
 
 
 def _list(client, options, args):
+  if options.offline:
+    _list_offline(client, options, args)
+    return
   cal_user_list = client.get_calendar_user_list(options.cal)
   if not cal_user_list:
     LOG.error('No calendar matches "' + options.cal + '"')
@@ -275,21 +341,55 @@ def _list(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
   parser = DateRangeParser()
   date_range = parser.parse(options.date)
+  lite = googlecl.fastparse.supports_fields(CalendarEntryToStringWrapper,
+                                            options.fields.split(','))
+  record_class = googlecl.base.get_record_class(CalendarEntryToStringWrapper,
+                                                options.fields.split(','))
+  formatter = googlecl.output.build_formatter(options.fields.split(','),
+                                             options.delimiter, options.output)
   for cal in cal_user_list:
-    print ''
-    print safe_encode('[' + unicode(cal) + ']')
-    single_events = client.get_events(cal.user,
-                                      start_date=date_range.start,
-                                      end_date=date_range.end,
-                                      titles=titles_list,
-                                      query=options.query,
-                                      split=False)
-
-    for entry in single_events:
-      print googlecl.base.compile_entry_string(
-                            CalendarEntryToStringWrapper(entry, client.config),
-                            options.fields.split(','),
-                            delimiter=options.delimiter)
+    if not formatter.structured:
+      print ''
+      print safe_encode('[' + unicode(cal) + ']')
+    single_events = client.iter_events(cal.user,
+                                       start_date=date_range.start,
+                                       end_date=date_range.end,
+                                       titles=titles_list,
+                                       query=options.query,
+                                       lite=lite,
+                                       record_class=record_class)
+
+    googlecl.output.print_entries(
+        (CalendarEntryToStringWrapper(entry, client.config)
+         for entry in single_events), formatter)
+
+
+def _list_offline(client, options, args):
+  titles_list = googlecl.build_titles_list(options.title, args)
+  parser = DateRangeParser()
+  date_range = parser.parse(options.date)
+  if options.query:
+    LOG.warning('Ignoring --query, which needs the server.')
+  events = googlecl.mirror.iter_records(client, client.email, 'events',
+                                        CalendarEntryToStringWrapper,
+                                        options.fields.split(','),
+                                        titles_list,
+                                        [options.cal or client.email],
+                                        with_parents=True)
+  if events is None:
+    return
+  formatter = googlecl.output.build_formatter(options.fields.split(','),
+                                             options.delimiter, options.output)
+  for cal_name, cal_events in itertools.groupby(events,
+                                                operator.itemgetter(0)):
+    if not formatter.structured:
+      print ''
+      print safe_encode('[' + cal_name + ']')
+    records = iter_records_inside_range(date_range.start, date_range.end,
+                                        [record for _, record in cal_events])
+    googlecl.output.print_entries(
+        (CalendarEntryToStringWrapper(record, client.config)
+         for record in records), formatter)
 
 
 #===============================================================================
@@ -374,20 +474,32 @@ def _run_delete(client, options, args):
       LOG.warning('No events found that match your options!')
 
 
-TASKS = {'list': googlecl.base.Task('List events on a calendar',
-                                    callback=_run_list,
-                                    required=['fields', 'delimiter'],
-                                    optional=['title', 'query',
-                                              'date', 'cal']),
-         'today': googlecl.base.Task('List events for the next 24 hours',
-                                     callback=_run_list_today,
-                                     required=['fields', 'delimiter'],
-                                     optional=['title', 'query', 'cal']),
-         'add': googlecl.base.Task('Add event to a calendar',
-                                   callback=_run_add,
-                                   required='src',
-                                   optional='cal'),
-         'delete': googlecl.base.Task('Delete event from a calendar',
-                                      callback=_run_delete,
-                                      required=[['title', 'query']],
-                                      optional=['date', 'cal'])}
+def _run_sync(client, options, args):
+  cal_user_list = client.get_calendar_user_list(options.cal)
+  if not cal_user_list:
+    LOG.error('No calendar matches "' + options.cal + '"')
+    return
+  mirror = googlecl.mirror.open_mirror()
+  if mirror is None:
+    return
+  get_sort_key = lambda entry: entry.when and entry.when[0].start_time or None
+  try:
+    for cal in cal_user_list:
+      # Recurring events are kept whole, rather than as their occurrences.
+      counts = googlecl.mirror.sync_scope(
+          mirror, client, client.email, 'events',
+          lambda: client.iter_events(cal.user, expand_recurrence=False),
+          EventRecord, scope=cal.user, parent=unicode(cal),
+          get_sort_key=get_sort_key)
+      googlecl.mirror.report_sync('events', counts, unicode(cal))
+  finally:
+    mirror.close()
+
+
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'list': _run_list,
+    'today': _run_list_today,
+    'add': _run_add,
+    'delete': _run_delete,
+    'sync': _run_sync})
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the calendar tasks."""
+
+import optparse
+import unittest
+
+import googlecl.calendar
+
+
+class FakeLink(object):
+  def __init__(self, href):
+    self.href = href
+
+
+class FakeEvent(object):
+  def __init__(self, title):
+    self.title = title
+
+  def GetHtmlLink(self):
+    return FakeLink('http://calendar/' + self.title)
+
+
+class FakeCalendar(object):
+  user = 'me@example.com'
+
+  def __unicode__(self):
+    return u'Mine'
+
+
+class FakeCalendarClient(object):
+
+  def __init__(self):
+    self.added = []
+    self.deleted = []
+
+  def get_calendar_user_list(self, cal_name=None):
+    return [FakeCalendar()]
+
+  def quick_add_event(self, quick_add_strings, calendar_user):
+    self.added.extend(quick_add_strings)
+    return [FakeEvent(text) for text in quick_add_strings]
+
+  def get_events(self, calendar_user, start_date=None, end_date=None,
+                 titles=None, query=None, expand_recurrence=True):
+    return [FakeEvent(title) for title in titles], []
+
+  def DeleteEntryList(self, entries, entry_type, prompt):
+    self.deleted.extend(entry.title for entry in entries)
+
+
+def make_options(**values):
+  # Tasks that print no rows have no fields, since --fields has no default.
+  options = optparse.Values({'cal': None, 'date': None, 'delimiter': ',',
+                             'fields': None, 'prompt': False, 'query': None,
+                             'reminder': None, 'src': [], 'title': None})
+  options._update_loose(values)
+  return options
+
+
+class TaskTest(unittest.TestCase):
+
+  def testAddNeedsNoFields(self):
+    client = FakeCalendarClient()
+    googlecl.calendar._run_add(client, make_options(src=['Dinner at 6pm']),
+                               [])
+    self.assertEqual(client.added, ['Dinner at 6pm'])
+
+  def testDeleteNeedsNoFields(self):
+    client = FakeCalendarClient()
+    googlecl.calendar._run_delete(client, make_options(title='Dinner'), [])
+    self.assertEqual(client.deleted, ['Dinner'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -27,6 +27,7 @@ __author__ = 'tom.h.miller@gmail.com (Tom Miller)'
 import gdata.calendar.service
 import googlecl.base
 import googlecl.service
+import itertools
 import logging
 import urllib
 from googlecl import safe_encode, safe_decode
@@ -79,6 +80,8 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
 
   """
 
+  supports_batch = True
+
   def __init__(self, config):
     """Constructor."""
     gdata.calendar.service.CalendarService.__init__(self)
@@ -87,7 +90,6 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
   def _batch_delete_recur(self, event, cal_user,
                           start_date=None, end_date=None):
     """Delete a subset of instances of recurring events."""
-    request_feed = gdata.calendar.CalendarEventFeed()
     # Don't need to decode event.title.text here because it's not being
     # displayed to the user. Totally internal.
     _, recurring_events = self.get_events(cal_user, start_date=start_date,
@@ -99,8 +101,8 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
                      e.original_event.id == event.original_event.id]
     if not delete_events:
       raise EventsNotFound
-    map(request_feed.AddDelete, [None], delete_events, [None])
-    self.ExecuteBatch(request_feed, USER_BATCH_URL_FORMAT % cal_user)
+    self.run_batch('delete', delete_events, 'event',
+                   uri=USER_BATCH_URL_FORMAT % cal_user)
 
   def add_reminders(self, calendar_user, events, minutes):
     """Add default reminders to events.
@@ -114,7 +116,6 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
       List of events with batch results.
 
     """
-    request_feed = gdata.calendar.CalendarEventFeed()
     for event in events:
       if event.when:
         for a_when in event.when:
@@ -123,10 +124,8 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
         LOG.debug('No "when" data for event!')
         event.when.append(gdata.calendar.When())
         event.when[0].reminder.append(gdata.calendar.Reminder(minutes=minutes))
-      request_feed.AddUpdate(entry=event)
-    response_feed = self.ExecuteBatch(request_feed,
-                                      USER_BATCH_URL_FORMAT % calendar_user)
-    return response_feed.entry
+    return self.run_batch('update', events, 'event',
+                          uri=USER_BATCH_URL_FORMAT % calendar_user)
 
   AddReminders = add_reminders
 
@@ -309,9 +308,10 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
 
   GetCalendarUserList = get_calendar_user_list
 
-  def get_events(self, calendar_user, start_date=None, end_date=None,
-                 titles=None, query=None, expand_recurrence=True, split=True):
-    """Get events.
+  def iter_events(self, calendar_user, start_date=None, end_date=None,
+                  titles=None, query=None, expand_recurrence=True,
+                  lite=False, record_class=None):
+    """Iterate over events, as each page of them is retrieved.
 
     Keyword arguments:
       calendar_user: "user" of the calendar to get events for.
@@ -324,10 +324,12 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
              titles and content.
       expand_recurrence: If true, expand recurring events per the 'singleevents'
                          query parameter. Otherwise, don't.
-      split: Split events into "one-time" and "recurring" events.
+      lite: Return lite entries. See BaseCL.iter_entries.
+      record_class: Snapshot entries into this record class. See
+                    BaseCL.iter_entries.
 
     Returns:
-      List of events from calendar that match the given params.
+      Iterator over events from calendar that match the given params.
     """
     query = gdata.calendar.service.CalendarEventQuery(user=calendar_user,
                                                       text_query=query)
@@ -340,34 +342,50 @@ class CalendarServiceCL(gdata.calendar.service.CalendarService,
       query.singleevents = 'true'
     query.orderby = 'starttime'
     query.sortorder = 'ascend'
-    events = self.GetEntries(query.ToUri(), titles,
-                           converter=gdata.calendar.CalendarEventFeedFromString)
+    filter_range = start_date or end_date
+    if filter_range:
+      # The date range filter reads the entries, so snapshot them after it.
+      page_record_class = None
+    else:
+      page_record_class = record_class
+    events = self.IterEntries(query.ToUri(), titles,
+                           converter=gdata.calendar.CalendarEventFeedFromString,
+                           lite=lite, record_class=page_record_class)
+    if filter_range:
+      # Because of how the "when" info on all-day events is stored, we need to
+      # do a filter step to remove all-day events on the edge of the date
+      # range.
+      events = googlecl.calendar.iter_events_inside_range(start_date, end_date,
+                                                          events)
+      if record_class:
+        events = itertools.imap(record_class, events)
+    return events
+
+  IterEvents = iter_events
 
+  def get_events(self, calendar_user, start_date=None, end_date=None,
+                 titles=None, query=None, expand_recurrence=True, split=True):
+    """Get events.
+
+    See iter_events for a description of the other arguments.
+
+    Keyword arguments:
+      split: Split events into "one-time" and "recurring" events.
+
+    Returns:
+      List of events from calendar that match the given params, or if split is
+      True, a tuple of the one-time events and the recurring events.
+    """
+    events = list(self.iter_events(calendar_user, start_date, end_date, titles,
+                                   query, expand_recurrence))
     if split:
       single_events = googlecl.calendar.filter_recurring_events(events,
                                                               expand_recurrence)
       recurring_events = googlecl.calendar.filter_single_events(events,
                                                               expand_recurrence)
-      if start_date or end_date:
-        # Because of how the "when" info on all-day events is stored, we need to
-        # do a filter step to remove all-day events on the edge of the date
-        # range.
-        single_events = \
-            googlecl.calendar.filter_all_day_events_outside_range(start_date,
-                                                                  end_date,
-                                                                  single_events)
-        recurring_events = \
-            googlecl.calendar.filter_all_day_events_outside_range(start_date,
-                                                                  end_date,
-                                                               recurring_events)
       return single_events, recurring_events
     else:
-      if start_date or end_date:
-        return googlecl.calendar.filter_all_day_events_outside_range(start_date,
-                                                                     end_date,
-                                                                     events)
-      else:
-        return events
+      return events
 
   GetEvents = get_events
 
@@ -17,13 +17,38 @@
   the command line."""
 
 
+import atom.core
+import atom.http_core
 import gdata.client
+import gdata.data
 import googlecl
 import googlecl.base
+import googlecl.connection
 import logging
 
 LOG = logging.getLogger(__name__)
 
+
+def parse_feed(body, desired_class=None, api_version=None):
+  """Parse a feed the way GDClient.get_feed does.
+
+  Args:
+    body: Raw XML of the feed.
+    desired_class: Class to parse the feed into. Default None for
+        gdata.data.GDFeed.
+    api_version: Version of the API the feed was requested with, which decides
+        the namespaces of some elements. Default None for the parser's default.
+
+  Returns:
+    Instance of desired_class.
+  """
+  desired_class = desired_class or gdata.data.GDFeed
+  if api_version is not None:
+    version = gdata.client.get_xml_version(api_version)
+    return atom.core.parse(body, desired_class, version=version)
+  return atom.core.parse(body, desired_class)
+
+
 # This class CANNOT be used unless an instance also inherits from
 # gdata.client.GDClient somehow.
 # TODO: pylint bugs out over the missing functions/attributes here,
@@ -42,6 +67,10 @@ class BaseClientCL(googlecl.base.BaseCL):
     self.original_request = self.request
     self.request = self.retry_request
 
+    # Reuse keep-alive connections across requests (and commands, in
+    # interactive mode).
+    googlecl.connection.install_from_config(self.http_client, config, section)
+
     LOG.debug('Initialized googlecl.client.BaseClientCL')
 
   def is_token_valid(self, test_uri):
@@ -56,8 +85,44 @@ class BaseClientCL(googlecl.base.BaseCL):
 
   def retry_request(self, *args, **kwargs):
     """Retries a request."""
-    self.original_operation = self.original_request
-    return self.retry_operation(*args, **kwargs)
+    return self.retry_operation(self.original_request, *args, **kwargs)
+
+  def _fetch_feed_page(self, uri, headers):
+    """Retrieve the raw body of a feed page. See BaseCL._fetch_feed_page."""
+    http_request = atom.http_core.HttpRequest()
+    http_request.headers.update(headers)
+    try:
+      response = self.request('GET', uri, http_request=http_request)
+    except self.request_error, err:
+      # gdata.client raises NotModified for a 304.
+      if getattr(err, 'status', None) == 304:
+        return 304, {}, None
+      raise err
+    headers = dict((name.lower(), value)
+                   for name, value in response.getheaders())
+    return response.status, headers, response.read()
+
+  def _parse_feed(self, body, converter=None, desired_class=None):
+    """Parse the raw body of a feed page. See BaseCL._parse_feed."""
+    if converter:
+      # gdata.client converters are handed the whole response.
+      return converter(atom.http_core.HttpResponse(status=200, reason='OK',
+                                                   body=body))
+    return parse_feed(body, desired_class, self.api_version)
+
+  def _build_batch_feed(self, operation, items):
+    """Build a batch feed. See BaseCL._build_batch_feed."""
+    feed = gdata.data.BatchFeed()
+    for batch_id, entry in items:
+      if operation == 'delete':
+        feed.add_delete(entry=entry, batch_id_string=batch_id)
+      else:
+        feed.add_update(entry, batch_id_string=batch_id)
+    return feed
+
+  def _post_batch_feed(self, feed, uri):
+    """Post a batch feed. See BaseCL._post_batch_feed."""
+    return self.batch(feed, uri=uri)
 
   def request_access(self, domain, display_name, scopes=None, browser=None):
     """Do all the steps involved with getting an OAuth access token.
@@ -12,49 +12,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import ConfigParser
+import logging
+import os
 import googlecl
+import googlecl.registry
 import parser
 
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+
+# Configurations already loaded in this process, keyed on absolute path.
+_LOADED_CONFIGS = {}
+
 
 def _create_basic_options():
   """Set the most basic options in the config file."""
-  import googlecl.docs
-  import googlecl.contacts
-  import googlecl.calendar
-  import googlecl.sites
-  import googlecl.youtube
   import getpass
   import socket
-  # These may be useful to define at the module level, but for now,
-  # keep them here.
-  # REMEMBER: updating these means you need to update the CONFIG readme.
-  default_hostid = getpass.getuser() + '@' +  socket.gethostname()
-  _youtube = {'max_results': '50'}
-  _contacts = {'fields': 'name,email'}
-  _calendar = {'fields': 'title,when'}
-  _sites = {'fields': 'title,page_name,id'}
-  _general = {'max_retries': '2',
-              'retry_delay': '0.5',
-              'regex': 'True',
-              'url_field': 'site',
-              'fields': 'title,url-site',
-              'missing_field_value': 'N/A',
-              'date_print_format': '%b %d %H:%M',
-              'cap_results': 'False',
-              'hostid': default_hostid}
-  _docs = {'document_format': 'txt',
-           'spreadsheet_format': 'xls',
-           'presentation_format': 'ppt',
-           'drawing_format': 'png',
-           'format': 'txt',
-           'spreadsheet_editor': 'openoffice.org',
-           'presentation_editor': 'openoffice.org'}
-  return {googlecl.docs.SECTION_HEADER: _docs,
-          googlecl.contacts.SECTION_HEADER: _contacts,
-          googlecl.calendar.SECTION_HEADER: _calendar,
-          googlecl.sites.SECTION_HEADER: _sites,
-          googlecl.youtube.SECTION_HEADER: _youtube,
-          'GENERAL': _general}
+  # The defaults are kept in the service manifest, so that loading the config
+  # does not import the service packages.
+  options = googlecl.registry.get_default_options()
+  options['GENERAL']['hostid'] = (getpass.getuser() + '@' +
+                                  socket.gethostname())
+  return options
 
 
 def get_config_path(filename='config',
@@ -71,6 +52,9 @@ def get_config_path(filename='config',
 def load_configuration(path=None):
   """Loads configuration file.
 
+  The file is parsed once per process. Later calls return the same parser,
+  unless the file has been modified on disk in the meantime.
+
   Args:
     path: Path to the configuration file. Default None for the default location.
 
@@ -82,6 +66,10 @@ def load_configuration(path=None):
     if not path:
       LOG.error('Could not create config directory!')
       return False
+  path = os.path.abspath(path)
+  config = _LOADED_CONFIGS.get(path)
+  if config and not config.is_stale():
+    return config
   config = parser.ConfigParser(ConfigParser.ConfigParser)
   config.associate(path)
   made_changes = config.ensure_basic_options(_create_basic_options())
@@ -90,4 +78,5 @@ def load_configuration(path=None):
   # Set the encoding again, now that the config file is loaded.
   # (the config file may have a default encoding setting)
   googlecl.TERMINAL_ENCODING = googlecl.determine_terminal_encoding(config)
+  _LOADED_CONFIGS[path] = config
   return config
@@ -22,6 +22,15 @@ LOGGER_NAME = __name__
 LOG = logging.getLogger(LOGGER_NAME)
 
 
+def get_file_stamp(path):
+  """Return the (mtime, size) of a file, or None if it does not exist."""
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return stat.st_mtime, stat.st_size
+
+
 class ConfigParser(object):
   def __init__(self, config_parser_class):
     """Initializes the object.
@@ -35,6 +44,13 @@ class ConfigParser(object):
     except:
       pass
     self.path = None
+    # get_file_stamp of the file when it was last read or written.
+    self.stamp = None
+    # True if options have been set since the file was last read or written.
+    self.dirty = False
+    # Flat {option: value} views of a section and its backup section, keyed
+    # on (section, backup section). See _get_view.
+    self._views = {}
 
   def associate(self, config_file_path):
     """Associates parser with a config file.
@@ -47,6 +63,34 @@ class ConfigParser(object):
     else:
       LOG.debug('Config file does not exist, starting with empty parser')
     self.path = config_file_path
+    self.stamp = get_file_stamp(config_file_path)
+    self.dirty = False
+    self._views = {}
+
+  def is_stale(self):
+    """Check if the associated file has changed since it was read."""
+    return self.path is not None and get_file_stamp(self.path) != self.stamp
+
+  def _get_view(self, section, backup_section):
+    """Return every option of a section, falling back to a backup section.
+
+    Built once, then kept until an option is set, so lazy_get is a single
+    dictionary lookup.
+
+    Returns:
+      Dictionary mapping option names to (interpolated) string values.
+    """
+    key = (section, backup_section)
+    try:
+      return self._views[key]
+    except KeyError:
+      pass
+    view = {}
+    for name in (backup_section, section):
+      if name and self.parser.has_section(name):
+        view.update(self.parser.items(name))
+    self._views[key] = view
+    return view
 
   def ensure_basic_options(self, basic_options):
     """Sets options if they are missing.
@@ -106,9 +150,7 @@ class ConfigParser(object):
       Value of the option if it exists in the config file, or value of "default"
       if option does not exist.
     """
-    value = self.safe_get(section, option)
-    if value is None:
-      value = self.safe_get(backup_section, option)
+    value = self._get_view(section, backup_section).get(option)
     if value is None:
       return default
 
@@ -132,7 +174,11 @@ class ConfigParser(object):
 
   def set(self, section, option, value):
     """Sets option in a section."""
-    return self.parser.set(section, option, value)
+    if self.safe_get(section, option) == value:
+      return
+    self.parser.set(section, option, value)
+    self.dirty = True
+    self._views = {}
 
   def set_missing_default(self, section, option, value):
     """Sets the option for a section if not defined already.
@@ -158,6 +204,9 @@ class ConfigParser(object):
   def write_out_parser(self, path=None):
     """Writes options in config parser to file.
 
+    The associated file is only written if some option has changed since it
+    was read or last written.
+
     Args:
       path: Path to write to. Default None for path associated with instance.
 
@@ -169,5 +218,11 @@ class ConfigParser(object):
         path = self.path
       else:
         raise IOError('No path given or associated')
+    if path == self.path and not self.dirty and self.stamp is not None:
+      LOG.debug('Configuration unchanged, not writing %s', path)
+      return
     with open(path, 'w') as config_file:
       self.parser.write(config_file)
+    if path == self.path:
+      self.stamp = get_file_stamp(path)
+      self.dirty = False
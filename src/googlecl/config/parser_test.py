@@ -0,0 +1,91 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the configuration parser and its per-process cache."""
+
+from __future__ import with_statement
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import googlecl.config
+
+CONFIG = """[GENERAL]
+max_results = 10
+regex = True
+
+[DOCS]
+max_results = 5
+"""
+
+
+class ConfigTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'config')
+    with open(self.path, 'w') as config_file:
+      config_file.write(CONFIG)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def touch(self, seconds):
+    """Move the modification time of the config file forward."""
+    stat = os.stat(self.path)
+    os.utime(self.path, (stat.st_atime, stat.st_mtime + seconds))
+
+  def testLazyGetFallsBack(self):
+    config = googlecl.config.load_configuration(self.path)
+    self.assertEqual(config.lazy_get('DOCS', 'max_results', option_type=int),
+                     5)
+    self.assertEqual(config.lazy_get('PICASA', 'max_results'), '10')
+    self.assertEqual(config.lazy_get('PICASA', 'regex', option_type=bool),
+                     True)
+    self.assertEqual(config.lazy_get(None, 'missing', 'default'), 'default')
+    config.set('GENERAL', 'max_results', '20')
+    self.assertEqual(config.lazy_get('PICASA', 'max_results'), '20')
+
+  def testLoadedOncePerProcess(self):
+    config = googlecl.config.load_configuration(self.path)
+    stamp = config.stamp
+    self.assertTrue(googlecl.config.load_configuration(self.path) is config)
+    self.assertEqual(config.stamp, stamp)
+    self.touch(10)
+    reloaded = googlecl.config.load_configuration(self.path)
+    self.assertFalse(reloaded is config)
+
+  def testWritesOnlyChanges(self):
+    config = googlecl.config.load_configuration(self.path)
+    self.touch(10)
+    config = googlecl.config.load_configuration(self.path)
+    stamp = config.stamp
+    config.set_missing_default('DOCS', 'max_results', 50)
+    config.set('GENERAL', 'regex', 'True')
+    self.assertFalse(config.dirty)
+    config.write_out_parser()
+    self.assertEqual(config.stamp, stamp)
+    config.set_missing_default('DOCS', 'user', 'me')
+    self.assertTrue(config.dirty)
+    config.write_out_parser()
+    self.assertFalse(config.dirty)
+    self.assertTrue(googlecl.config.load_configuration(self.path) is config)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,353 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Keep-alive HTTP connection pooling for the gdata transports.
+
+Both gdata.service (via atom.http) and gdata.client (via atom.http_core) open
+a brand new httplib connection for every request. install() replaces the
+connection factory of a client's http_client with one that hands out
+connections from a shared ConnectionPool, so consecutive requests to the same
+host reuse one TCP (and TLS) session.
+
+The same hook can send every request to a different server (the
+http_endpoint option, for the stand-in server in googlecl.replay) and record
+each response (the http_record_file option).
+
+"""
+import httplib
+import logging
+import os
+import select
+import socket
+import threading
+import time
+import urlparse
+
+import googlecl.replay
+import googlecl.stats
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_IDLE_TIMEOUT = 60
+
+# Environment variables that make the atom Proxied*HttpClient classes tunnel
+# through a proxy. Connections to a proxy are left to the original code.
+_PROXY_VARIABLES = ('http_proxy', 'HTTP_PROXY', 'https_proxy', 'HTTPS_PROXY')
+
+_SHARED_POOL = None
+_SHARED_POOL_LOCK = threading.Lock()
+
+
+class _PooledConnectionMixin:
+  """Hands the connection back to its pool once a response is fully read."""
+
+  pool = None
+  pool_key = None
+  last_used = 0
+  # googlecl.replay.HttpRecorder to write responses to, if any.
+  recorder = None
+  _request_line = None
+
+  def putrequest(self, method, url, *args, **kwargs):
+    self._request_line = (method, url)
+    return self._base_class.putrequest(self, method, url, *args, **kwargs)
+
+  def send(self, data):
+    if isinstance(data, str):
+      googlecl.stats.record_bytes(sent=len(data))
+    return self._base_class.send(self, data)
+
+  def getresponse(self, *args, **kwargs):
+    response = self._base_class.getresponse(self, *args, **kwargs)
+    if googlecl.stats.is_enabled() or self.recorder is not None:
+      self._wrap_read(response)
+    if response.will_close or self.pool is None:
+      return response
+    original_close = response.close
+    released = []
+    def close():
+      original_close()
+      if not released:
+        released.append(True)
+        self.pool.release(self)
+    # httplib calls self.close() on the response when the last of the body has
+    # been read, as well as when the caller closes it explicitly.
+    response.close = close
+    return response
+
+  def _wrap_read(self, response):
+    """Count the bytes read from a response, and record it once fully read."""
+    original_read = response.read
+    request_line = self._request_line
+    # Holds the recorder until the response has been recorded, so that it is
+    # only recorded once.
+    pending = self.recorder and [self.recorder] or []
+    chunks = []
+    def read(*read_args):
+      data = original_read(*read_args)
+      googlecl.stats.record_bytes(received=len(data))
+      if pending:
+        chunks.append(data)
+        if response.isclosed():
+          self._record(pending.pop(), request_line, response, ''.join(chunks))
+          del chunks[:]
+      return data
+    response.read = read
+
+  def _record(self, recorder, request_line, response, body):
+    method, url = request_line or ('GET', '/')
+    # Proxied clients send the whole URL rather than just the path.
+    parsed = urlparse.urlsplit(url)
+    path = parsed.path or '/'
+    if parsed.query:
+      path += '?' + parsed.query
+    recorder.record(method, parsed.netloc or self.host, path,
+                    response.status, response.reason, response.getheaders(),
+                    body)
+
+  def is_dropped(self):
+    """Return True if the server has closed this idle connection."""
+    if self.sock is None:
+      return True
+    try:
+      readable, _, _ = select.select([self.sock], [], [], 0)
+    except (select.error, socket.error, ValueError):
+      return True
+    # An idle keep-alive connection should have nothing to read. If it does,
+    # it is either at EOF or holding garbage; either way it is unusable.
+    return bool(readable)
+
+
+class PooledHTTPConnection(_PooledConnectionMixin, httplib.HTTPConnection):
+  _base_class = httplib.HTTPConnection
+
+
+class PooledHTTPSConnection(_PooledConnectionMixin, httplib.HTTPSConnection):
+  _base_class = httplib.HTTPSConnection
+
+
+class ConnectionPool(object):
+
+  """Thread-safe pool of idle keep-alive connections, keyed per host."""
+
+  def __init__(self, max_size=DEFAULT_POOL_SIZE,
+               idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Constructor.
+
+    Args:
+      max_size: Maximum number of idle connections to keep for each host.
+      idle_timeout: Seconds an idle connection is kept before being closed.
+    """
+    self.max_size = max_size
+    self.idle_timeout = idle_timeout
+    self._idle = {}
+    self._lock = threading.Lock()
+
+  def get(self, scheme, host, port=None):
+    """Return a connection to a host, reusing an idle one if possible.
+
+    Args:
+      scheme: 'http' or 'https'.
+      host: Host name to connect to.
+      port: Port to connect to, or None for the scheme's default.
+
+    Returns:
+      PooledHTTPConnection or PooledHTTPSConnection.
+    """
+    if port is not None:
+      port = int(port)
+    key = (scheme, host, port)
+    now = time.time()
+    stale = []
+    connection = None
+    self._lock.acquire()
+    try:
+      idle = self._idle.get(key, [])
+      while idle:
+        candidate = idle.pop()
+        if now - candidate.last_used > self.idle_timeout:
+          stale.append(candidate)
+        else:
+          connection = candidate
+          break
+    finally:
+      self._lock.release()
+    for old in stale:
+      old.close()
+    if connection is not None:
+      if not connection.is_dropped():
+        LOG.debug('Reusing connection to %s://%s', scheme, host)
+        return connection
+      connection.close()
+    if scheme == 'https':
+      connection = PooledHTTPSConnection(host, port)
+    else:
+      connection = PooledHTTPConnection(host, port)
+    connection.pool = self
+    connection.pool_key = key
+    return connection
+
+  def release(self, connection):
+    """Return a connection to the pool, or close it if the pool is full."""
+    connection.last_used = time.time()
+    self._lock.acquire()
+    try:
+      idle = self._idle.setdefault(connection.pool_key, [])
+      if len(idle) < self.max_size:
+        idle.append(connection)
+        return
+    finally:
+      self._lock.release()
+    connection.close()
+
+  def clear(self):
+    """Close every idle connection."""
+    self._lock.acquire()
+    try:
+      idle, self._idle = self._idle, {}
+    finally:
+      self._lock.release()
+    for connections in idle.values():
+      for connection in connections:
+        connection.close()
+
+
+def get_shared_pool(max_size=DEFAULT_POOL_SIZE,
+                    idle_timeout=DEFAULT_IDLE_TIMEOUT):
+  """Return the process-wide connection pool, creating it if needed.
+
+  The pool outlives the client objects, so connections opened by one command
+  in interactive mode are reused by the next.
+  """
+  global _SHARED_POOL
+  _SHARED_POOL_LOCK.acquire()
+  try:
+    if _SHARED_POOL is None:
+      _SHARED_POOL = ConnectionPool(max_size, idle_timeout)
+    else:
+      _SHARED_POOL.max_size = max_size
+      _SHARED_POOL.idle_timeout = idle_timeout
+    return _SHARED_POOL
+  finally:
+    _SHARED_POOL_LOCK.release()
+
+
+def _proxy_configured():
+  for variable in _PROXY_VARIABLES:
+    if os.environ.get(variable):
+      return True
+  return False
+
+
+def parse_endpoint(endpoint):
+  """Split an http_endpoint option into (scheme, host, port).
+
+  Args:
+    endpoint: URL such as "http://localhost:8080". A bare "host:port" is
+        taken to be http.
+
+  Returns:
+    Tuple of (scheme, host, port), port being None if not given.
+
+  Raises:
+    ValueError: The endpoint is not an http or https URL.
+  """
+  if '://' not in endpoint:
+    endpoint = 'http://' + endpoint
+  parsed = urlparse.urlsplit(endpoint)
+  if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+    raise ValueError('Not an http or https URL: %s' % endpoint)
+  return parsed.scheme, parsed.hostname, parsed.port
+
+
+def install(http_client, pool, endpoint=None, recorder=None):
+  """Make an atom http client open its connections through a pool.
+
+  Works with both atom.http.HttpClient (used by gdata.service), which creates
+  connections in _prepare_connection, and atom.http_core.HttpClient (used by
+  gdata.client), which creates them in _get_connection. If a proxy is
+  configured, the client's own connection handling is used instead, unless
+  requests are redirected to another endpoint.
+
+  Args:
+    http_client: The http_client attribute of a gdata service or client.
+    pool: ConnectionPool to take connections from.
+    endpoint: (scheme, host, port) to send every request to, whatever host
+        it is addressed to. Default None to use the request's own host.
+    recorder: googlecl.replay.HttpRecorder to record every response with.
+        Default None to record nothing.
+
+  Returns:
+    True if the pool was installed, False if the client was not recognized.
+  """
+  def connect(scheme, host, port):
+    if endpoint:
+      scheme, host, port = endpoint
+    connection = pool.get(scheme, host, port)
+    connection.recorder = recorder
+    return connection
+
+  if hasattr(http_client, '_get_connection'):
+    original = http_client._get_connection
+    def get_connection(uri, headers=None):
+      if _proxy_configured() and not endpoint:
+        return original(uri, headers=headers)
+      return connect(uri.scheme, uri.host, uri.port)
+    http_client._get_connection = get_connection
+  elif hasattr(http_client, '_prepare_connection'):
+    original = http_client._prepare_connection
+    def prepare_connection(url, headers):
+      if ((_proxy_configured() and not endpoint) or
+          not hasattr(url, 'protocol')):
+        return original(url, headers)
+      return connect(url.protocol, url.host, url.port or None)
+    http_client._prepare_connection = prepare_connection
+  else:
+    return False
+  return True
+
+
+def install_from_config(http_client, config, section):
+  """Install the shared pool on an http client, according to config options.
+
+  Args:
+    http_client: The http_client attribute of a gdata service or client.
+    config: Configuration parser (see googlecl.config.parser).
+    section: Section to look for options in.
+  """
+  # A pool size of 0 still hands out (counted) connections, it just never
+  # keeps any for reuse.
+  pool_size = max(0, config.lazy_get(section, 'connection_pool_size',
+                                     default=DEFAULT_POOL_SIZE,
+                                     option_type=int))
+  idle_timeout = config.lazy_get(section, 'connection_idle_timeout',
+                                 default=DEFAULT_IDLE_TIMEOUT,
+                                 option_type=float)
+  endpoint = config.lazy_get(section, 'http_endpoint')
+  if endpoint:
+    try:
+      endpoint = parse_endpoint(endpoint)
+    except ValueError, err:
+      LOG.error('Ignoring http_endpoint: %s', err)
+      endpoint = None
+    else:
+      LOG.debug('Sending all %s requests to %s://%s:%s', section, *endpoint)
+  record_file = config.lazy_get(section, 'http_record_file')
+  recorder = None
+  if record_file:
+    recorder = googlecl.replay.get_recorder(os.path.expanduser(record_file))
+  if not install(http_client, get_shared_pool(pool_size, idle_timeout),
+                 endpoint, recorder):
+    LOG.debug('Not pooling connections for %s', http_client)
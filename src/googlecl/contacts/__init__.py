@@ -13,44 +13,111 @@
 # limitations under the License.
 import googlecl
 import googlecl.base
+import googlecl.mirror
+import googlecl.registry
 
 service_name = __name__.split('.')[-1]
 LOGGER_NAME = __name__
 SECTION_HEADER = service_name.upper()
 
 
+def _get_organization_text(entry, v1_name, v3_name):
+  organization = getattr(entry, 'organization', None)
+  if organization is None:
+    return None
+  # v1 of gdata ("service" modules) and v3 ("client" modules) name the parts
+  # of an organization differently.
+  if hasattr(organization, v1_name):
+    return googlecl.base.get_text(organization, v1_name)
+  return googlecl.base.get_text(organization, v3_name)
+
+
+class ContactRecord(googlecl.base.EntryRecord):
+  """Snapshot of a contact or group entry. See googlecl.base.EntryRecord."""
+  __slots__ = ('addresses', 'birthday', 'emails', 'events', 'ims', 'notes',
+               'nickname', 'organization', 'org_title', 'phone_numbers',
+               'relations', 'user_defined', 'websites')
+
+  def snapshot(self, entry):
+    googlecl.base.EntryRecord.snapshot(self, entry)
+    get_text = lambda element: element.text
+    if getattr(entry, 'postal_address', None):
+      self.addresses = googlecl.base.snapshot_items(entry.postal_address,
+                                                    get_text)
+    else:
+      self.addresses = googlecl.base.snapshot_items(
+          getattr(entry, 'structured_postal_address', None),
+          lambda address: googlecl.base.get_text(address, 'formatted_address'))
+    self.birthday = getattr(getattr(entry, 'birthday', None), 'when', None)
+    self.emails = googlecl.base.snapshot_items(getattr(entry, 'email', None),
+                                               lambda email: email.address)
+    self.events = googlecl.base.snapshot_items(
+        getattr(entry, 'event', None), lambda event: event.when.start,
+        label_attribute='rel')
+    self.ims = googlecl.base.snapshot_items(getattr(entry, 'im', None),
+                                            lambda im: im.address,
+                                            label_attribute='protocol')
+    self.notes = googlecl.base.get_text(entry, 'content')
+    self.nickname = googlecl.base.get_text(entry, 'nickname')
+    self.organization = _get_organization_text(entry, 'org_name', 'name')
+    self.org_title = _get_organization_text(entry, 'org_title', 'title')
+    self.phone_numbers = googlecl.base.snapshot_items(
+        getattr(entry, 'phone_number', None), get_text)
+    self.relations = googlecl.base.snapshot_items(
+        getattr(entry, 'relation', None), get_text)
+    self.user_defined = googlecl.base.snapshot_items(
+        getattr(entry, 'user_defined_field', None), lambda field: field.value,
+        label_attribute='key')
+    self.websites = googlecl.base.snapshot_items(
+        getattr(entry, 'website', None), lambda website: website.href)
+
+
 class ContactsEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
-  @property
+  # Contacts are never parsed lite. title is the job title here.
+  FIELDS = googlecl.base.field_table([
+      ('address where',
+       googlecl.base.Field('gd:postalAddress,gd:structuredPostalAddress',
+                           record=True)),
+      ('birthday bday', googlecl.base.Field('gContact:birthday', record=True)),
+      ('email', googlecl.base.Field('gd:email', record=True)),
+      ('event events dates when',
+       googlecl.base.Field('gContact:event,gContact:birthday', record=True)),
+      ('im', googlecl.base.Field('gd:im', record=True)),
+      ('job organization company title org_title',
+       googlecl.base.Field('gd:organization', record=True)),
+      ('notes', googlecl.base.Field('content', record=True)),
+      ('nickname', googlecl.base.Field('gContact:nickname', record=True)),
+      ('phone_number phone',
+       googlecl.base.Field('gd:phoneNumber', record=True)),
+      ('relation relations',
+       googlecl.base.Field('gContact:relation', record=True)),
+      ('user_defined other',
+       googlecl.base.Field('gContact:userDefinedField', record=True)),
+      ('website links', googlecl.base.Field('gContact:website', record=True))],
+      base=googlecl.base.BaseEntryToStringWrapper.FIELDS)
+  RECORD_CLASS = ContactRecord
+
+  @googlecl.base.cached_property
   def address(self):
     """Postal addresses."""
-    if self.entry.postal_address:
-      # For v1 of gdata ("service" modules)?
-      return self._join(self.entry.postal_address, text_attribute='text')
-    else:
-      # For v3 of gdata ("client" modules)?
-      get_address_text = \
-          lambda address: getattr(getattr(address, 'formatted_address'), 'text')
-      return self._join(self.entry.structured_postal_address,
-                        text_extractor=get_address_text)
+    return self._join(self.record.addresses)
   where = address
 
-  @property
+  @googlecl.base.cached_property
   def birthday(self):
     """Birthday."""
-    return self.entry.birthday.when
+    return self.record.birthday
   bday=birthday
 
-  @property
+  @googlecl.base.cached_property
   def email(self):
     """Email addresses."""
-    return self._join(self.entry.email, text_attribute='address')
+    return self._join(self.record.emails)
 
-  @property
+  @googlecl.base.cached_property
   def event(self):
     """Events such as anniversaries and birthdays."""
-    get_start_time = lambda event: getattr(getattr(event, 'when'), 'start')
-    events = self._join(self.entry.event, text_extractor=get_start_time,
-                        label_attribute='rel')
+    events = self._join(self.record.events)
     # Birthdays are technically their own element, but add them in here because
     # that policy is silly (as far as the end user is concerned).
     if self.label_delimiter is None:
@@ -62,71 +129,59 @@ class ContactsEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
   dates = event
   when = event
 
-  @property
+  @googlecl.base.cached_property
   def im(self):
     """Instant messanger handles."""
-    return self._join(self.entry.im, text_attribute='address',
-                      label_attribute='protocol')
+    return self._join(self.record.ims)
 
-  @property
+  @googlecl.base.cached_property
   def job(self):
     return self.title + ' at '  + self.organization
 
-  @property
+  @googlecl.base.cached_property
   def notes(self):
     """Additional notes."""
-    return self.entry.content.text
+    return self.record.notes
 
-  @property
+  @googlecl.base.cached_property
   def nickname(self):
-    return self.entry.nickname.text
+    return self.record.nickname
 
-  @property
+  @googlecl.base.cached_property
   def organization(self):
     """Name of the organization/employer."""
-    try:
-      # For v1 of gdata ("service" modules)?
-      return self.entry.organization.org_name.text
-    except AttributeError:
-      # For v3 of gdata ("client" modules)?
-      return self.entry.organization.name.text
+    return self.record.organization
   company = organization
 
-  @property
+  @googlecl.base.cached_property
   def phone_number(self):
     """Phone numbers."""
-    return self._join(self.entry.phone_number, text_attribute='text')
+    return self._join(self.record.phone_numbers)
   phone = phone_number
 
-  @property
+  @googlecl.base.cached_property
   def relation(self):
     """Relationships."""
-    return self._join(self.entry.relation, text_attribute='text')
+    return self._join(self.record.relations)
   relations = relation
 
-  @property
+  @googlecl.base.cached_property
   # Overrides Base's title. "name" will still give name of contact.
   def title(self):
     """Title of contact in organization."""
-    try:
-      # For v1 of gdata ("service" modules)?
-      return self.entry.organization.org_title.text
-    except AttributeError:
-      # For v3 of gdata ("client" modules)?
-      return self.entry.organization.title.text
+    return self.record.org_title
   org_title = title
 
-  @property
+  @googlecl.base.cached_property
   def user_defined(self):
     """User defined fields."""
-    return self._join(self.entry.user_defined_field, text_attribute='value',
-                      label_attribute='key')
+    return self._join(self.record.user_defined)
   other = user_defined
 
-  @property
+  @googlecl.base.cached_property
   def website(self):
     """Websites."""
-    return self._join(self.entry.website, text_attribute='href')
+    return self._join(self.record.websites)
   links = website
 
 
@@ -141,12 +196,14 @@ class ContactsEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
 #===============================================================================
 def _run_list(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
-  entries = client.GetContacts(titles_list)
-  for entry in entries:
-    print googlecl.base.compile_entry_string(
-                                            ContactsEntryToStringWrapper(entry),
-                                            options.fields.split(','),
-                                            delimiter=options.delimiter)
+
+  def iter_entries(fields, lite, record_class):
+    return client.IterContacts(titles_list, fields=fields,
+                               record_class=record_class)
+  googlecl.base.run_list(options, ContactsEntryToStringWrapper, iter_entries,
+                         client=client,
+                         mirror_scope=(client.email, 'contacts', titles_list,
+                                       None))
 
 
 def _run_add(client, options, args):
@@ -175,26 +232,38 @@ def _run_delete_groups(client, options, args):
 
 def _run_list_groups(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
-  entries = client.GetGroups(titles_list)
-  for entry in entries:
-    print googlecl.base.compile_entry_string(
-                                         ContactsEntryToStringWrapper(entry),
-                                         ['name'],
-                                         delimiter=options.delimiter)
+
+  def iter_entries(fields, lite, record_class):
+    return client.IterGroups(titles_list, fields=fields,
+                             record_class=record_class)
+  googlecl.base.run_list(options, ContactsEntryToStringWrapper, iter_entries,
+                         client=client,
+                         mirror_scope=(client.email, 'groups', titles_list,
+                                       None),
+                         field_names=['name'])
+
+
+def _run_sync(client, options, args):
+  mirror = googlecl.mirror.open_mirror()
+  if mirror is None:
+    return
+  try:
+    for feed, iter_entries in (('contacts', client.IterContacts),
+                               ('groups', client.IterGroups)):
+      counts = googlecl.mirror.sync_scope(mirror, client, client.email, feed,
+                                          lambda: iter_entries(None),
+                                          ContactRecord)
+      googlecl.mirror.report_sync(feed, counts)
+  finally:
+    mirror.close()
 
 # XXX: Don't require title for list tasks.
-TASKS = {'list': googlecl.base.Task('List contacts', callback=_run_list,
-                                    required=['fields', 'title', 'delimiter']),
-         'add': googlecl.base.Task('Add contacts', callback=_run_add,
-                                   required='src'),
-         'delete': googlecl.base.Task('Delete contacts', callback=_run_delete,
-                                      required='title'),
-         'add-groups': googlecl.base.Task('Add contact group(s)',
-                                          callback=_run_add_groups,
-                                          required='title'),
-         'delete-groups': googlecl.base.Task('Delete contact group(s)',
-                                             callback=_run_delete_groups,
-                                             required='title'),
-         'list-groups': googlecl.base.Task('List contact groups',
-                                           callback=_run_list_groups,
-                                           required='title')}
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'list': _run_list,
+    'add': _run_add,
+    'delete': _run_delete,
+    'add-groups': _run_add_groups,
+    'delete-groups': _run_delete_groups,
+    'list-groups': _run_list_groups,
+    'sync': _run_sync})
@@ -49,6 +49,10 @@ class ContactsClientCL(gdata.contacts.client.ContactsClient,
 
   """
 
+  supports_partial_response = True
+  supports_batch = True
+  supports_show_deleted = True
+
   def __init__(self, config):
     """Constructor."""
     gdata.contacts.client.ContactsClient.__init__(self)
@@ -64,11 +68,22 @@ class ContactsClientCL(gdata.contacts.client.ContactsClient,
   def _get_contact_entry(self):
     return gdata.contacts.data.ContactEntry() 
 
+  def iter_contacts(self, name, fields=None, record_class=None):
+    """Iterate over all contacts that match a name.
+
+    See BaseCL.iter_entries for a description of fields and record_class.
+    """
+    uri = self.GetFeedUri()
+    return self.IterEntries(uri, name,
+                            desired_class=gdata.contacts.data.ContactsFeed,
+                            fields=fields,
+                            record_class=record_class)
+
+  IterContacts = iter_contacts
+
   def get_contacts(self, name):
     """Get all contacts that match a name."""
-    uri = self.GetFeedUri()
-    return self.GetEntries(uri, name,
-                           desired_class=gdata.contacts.data.ContactsFeed)
+    return list(self.iter_contacts(name))
 
   GetContacts = get_contacts
 
@@ -80,11 +95,22 @@ class ContactsClientCL(gdata.contacts.client.ContactsClient,
 
   AddGroup = add_group
 
+  def iter_groups(self, name, fields=None, record_class=None):
+    """Iterate over all groups that match a name.
+
+    See BaseCL.iter_entries for a description of fields and record_class.
+    """
+    uri = self.GetFeedUri(kind='groups')
+    return self.IterEntries(uri, name,
+                            desired_class=gdata.contacts.data.GroupsFeed,
+                            fields=fields,
+                            record_class=record_class)
+
+  IterGroups = iter_groups
+
   def get_groups(self, name):
     """Get all groups that match a name."""
-    uri = self.GetFeedUri(kind='groups')
-    return self.GetEntries(uri, name,
-                           desired_class=gdata.contacts.data.GroupsFeed)
+    return list(self.iter_groups(name))
 
   GetGroups = get_groups
 
@@ -49,6 +49,9 @@ class ContactsServiceCL(gdata.contacts.service.ContactsService,
 
   """
 
+  supports_batch = True
+  supports_show_deleted = True
+
   def __init__(self, config):
     """Constructor."""
     gdata.contacts.service.ContactsService.__init__(self)
@@ -63,11 +66,22 @@ class ContactsServiceCL(gdata.contacts.service.ContactsService,
   def _get_contact_entry(self):
     return gdata.contacts.ContactEntry() 
 
+  def iter_contacts(self, name, fields=None, record_class=None):
+    """Iterate over all contacts that match a name.
+
+    See BaseCL.iter_entries for a description of fields and record_class.
+    """
+    uri = self.GetFeedUri()
+    return self.IterEntries(uri, name,
+                            converter=gdata.contacts.ContactsFeedFromString,
+                            fields=fields,
+                            record_class=record_class)
+
+  IterContacts = iter_contacts
+
   def get_contacts(self, name):
     """Get all contacts that match a name."""
-    uri = self.GetFeedUri()
-    return self.GetEntries(uri, name,
-                           converter=gdata.contacts.ContactsFeedFromString)
+    return list(self.iter_contacts(name))
 
   GetContacts = get_contacts
 
@@ -78,11 +92,22 @@ class ContactsServiceCL(gdata.contacts.service.ContactsService,
 
   AddGroup = add_group
 
+  def iter_groups(self, name, fields=None, record_class=None):
+    """Iterate over all groups that match a name.
+
+    See BaseCL.iter_entries for a description of fields and record_class.
+    """
+    uri = self.GetFeedUri(kind='groups')
+    return self.IterEntries(uri, name,
+                            converter=gdata.contacts.GroupsFeedFromString,
+                            fields=fields,
+                            record_class=record_class)
+
+  IterGroups = iter_groups
+
   def get_groups(self, name):
     """Get all groups that match a name."""
-    uri = self.GetFeedUri(kind='groups')
-    return self.GetEntries(uri, name,
-                           converter=gdata.contacts.GroupsFeedFromString)
+    return list(self.iter_groups(name))
 
   GetGroups = get_groups
 
@@ -0,0 +1,553 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Resident GoogleCL process that runs commands forwarded over a socket.
+
+"google --daemon" serves commands on a Unix domain socket in the data
+directory, keeping the interpreter, imported services, configuration and
+authenticated clients warm between them. While it is listening, "google"
+forwards its arguments, working directory and (if the command reads it) stdin
+to the daemon, and writes out what the command prints as it arrives. Prompts
+are answered from the client's stdin, which the daemon asks for a line at a
+time.
+
+Every connection is a session handled by its own thread. Messages in both
+directions are frames of a one character type, a payload length and the
+payload:
+  r - request from the client: JSON with argv, cwd, stdin, encoding and
+      whether stdin and stdout are terminals.
+  o - text the command wrote to stdout.
+  e - text the command wrote to stderr, including log messages.
+  i - the command reads stdin: "line" for the next line, "all" for the rest.
+  d - the client's answer to "i". Empty at the end of its stdin.
+  x - exit status of the command, ending the session.
+
+"""
+from __future__ import with_statement
+
+import logging
+import os
+import socket
+import SocketServer
+import struct
+import sys
+import threading
+import time
+import traceback
+import googlecl
+import googlecl.workers
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+SOCKET_FILE_NAME = 'daemon.sock'
+# Idle clients older than this are dropped, so that their access tokens are
+# checked again by the next command that needs one.
+CLIENT_TTL_SECONDS = 3600
+# Idle clients kept per service and user.
+MAX_IDLE_CLIENTS = 4
+
+_REQUEST = 'r'
+_STDOUT = 'o'
+_STDERR = 'e'
+_INPUT = 'i'
+_DATA = 'd'
+_EXIT = 'x'
+_HEADER = struct.Struct('!cI')
+
+# Session served by the current thread, if any.
+_local = threading.local()
+
+
+def get_socket_path(create_missing_dir=False):
+  return googlecl.get_data_path(SOCKET_FILE_NAME,
+                                create_missing_dir=create_missing_dir)
+
+
+def _send_frame(sock, kind, payload):
+  sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _receive_exactly(sock, size):
+  chunks = []
+  while size:
+    chunk = sock.recv(min(size, 65536))
+    if not chunk:
+      raise EOFError('Connection closed')
+    chunks.append(chunk)
+    size -= len(chunk)
+  return ''.join(chunks)
+
+
+def _receive_frame(sock):
+  kind, size = _HEADER.unpack(_receive_exactly(sock, _HEADER.size))
+  return kind, _receive_exactly(sock, size)
+
+
+def _connect(path):
+  """Return a socket connected to the daemon at path, or None."""
+  if not path or not os.path.exists(path):
+    return None
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(path)
+  except socket.error, err:
+    LOG.debug('No daemon listening on %s: %s', path, err)
+    sock.close()
+    return None
+  return sock
+
+
+def forward(argv):
+  """Run a command in the daemon, if one is listening.
+
+  Args:
+    argv: Command line arguments, without the program name.
+
+  Returns:
+    Exit status of the command, or None if no daemon is listening and the
+    command should be run in this process.
+  """
+  if not hasattr(socket, 'AF_UNIX'):
+    return None
+  sock = _connect(get_socket_path())
+  if not sock:
+    return None
+  stdin = ''
+  # Only read stdin if the command asks for it (see insert_stdin in google.py)
+  if '_' in argv or '__' in argv:
+    stdin = sys.stdin.read()
+  # latin-1 carries any byte string through JSON unchanged.
+  request = {'argv': [arg.decode('latin-1') for arg in argv],
+             'cwd': os.getcwd().decode('latin-1'),
+             'stdin': stdin.decode('latin-1'),
+             'encoding': getattr(sys.stdout, 'encoding', None),
+             'stdin_tty': _isatty(sys.stdin),
+             'stdout_tty': _isatty(sys.stdout)}
+  LOG.debug('Forwarding command to the daemon')
+  try:
+    try:
+      _send_frame(sock, _REQUEST, json.dumps(request))
+      while True:
+        kind, payload = _receive_frame(sock)
+        if kind == _STDOUT:
+          sys.stdout.write(payload)
+          sys.stdout.flush()
+        elif kind == _STDERR:
+          sys.stderr.write(payload)
+          sys.stderr.flush()
+        elif kind == _INPUT:
+          if payload == 'all':
+            data = sys.stdin.read()
+          else:
+            data = sys.stdin.readline()
+          _send_frame(sock, _DATA, data)
+        elif kind == _EXIT:
+          return int(payload)
+    except (socket.error, EOFError), err:
+      LOG.error('Lost connection to the GoogleCL daemon: %s', err)
+      return 1
+  finally:
+    sock.close()
+
+
+def _isatty(stream):
+  isatty = getattr(stream, 'isatty', None)
+  return bool(isatty and isatty())
+
+
+def get_exit_status(result):
+  """Convert the return value of run_once into an exit status."""
+  if result is None or result is True:
+    return 0
+  if isinstance(result, int):
+    return result and 1
+  return 1
+
+
+class ClientPool(object):
+
+  """Authenticated clients left idle by earlier commands."""
+
+  def __init__(self, ttl=CLIENT_TTL_SECONDS, max_idle=MAX_IDLE_CLIENTS):
+    self.ttl = ttl
+    self.max_idle = max_idle
+    self._idle = {}
+    self._lock = threading.Lock()
+
+  def checkout(self, key, config):
+    """Take an idle client out of the pool.
+
+    Args:
+      key: Identifies the clients that are interchangeable, e.g.
+          (service, user).
+      config: Configuration the client has to have been built with. Clients
+          built with a configuration that has since been reloaded are
+          dropped.
+
+    Returns:
+      Client, or None if there is no suitable idle client.
+    """
+    oldest = time.time() - self.ttl
+    with self._lock:
+      clients = self._idle.get(key, [])
+      while clients:
+        client, idle_since = clients.pop()
+        if client.config is config and idle_since > oldest:
+          return client
+    return None
+
+  def checkin(self, key, client):
+    """Keep an authenticated client for the next command under key."""
+    with self._lock:
+      clients = self._idle.setdefault(key, [])
+      if len(clients) < self.max_idle:
+        clients.append((client, time.time()))
+
+
+class _SessionStream(object):
+
+  """File-like object sending what is written to it to a client."""
+
+  def __init__(self, session, kind):
+    self.session = session
+    self.kind = kind
+    self.encoding = session.encoding
+    self.softspace = 0
+
+  def write(self, data):
+    if isinstance(data, unicode):
+      data = data.encode(self.encoding or 'utf-8', 'replace')
+    if data:
+      self.session.send(self.kind, data)
+
+  def writelines(self, lines):
+    for line in lines:
+      self.write(line)
+
+  def flush(self):
+    pass
+
+  def isatty(self):
+    return self.session.ttys.get(self.kind, False)
+
+
+class _SessionInput(object):
+
+  """File-like object reading the stdin of a client.
+
+  What the client sent with the request is read first. After that, the
+  client is asked for more, so that prompts are answered from its terminal.
+  """
+
+  def __init__(self, session, data):
+    self.session = session
+    self.encoding = session.encoding
+    self._buffer = data
+    self._eof = False
+
+  def _fill(self, how):
+    """Append "line" or "all" of the client's remaining stdin to the buffer."""
+    if self._eof:
+      return
+    data = self.session.receive_input(how)
+    self._buffer += data
+    if how == 'all' or not data:
+      self._eof = True
+
+  def _take(self, size):
+    data, self._buffer = self._buffer[:size], self._buffer[size:]
+    return data
+
+  def read(self, size=-1):
+    if size < 0:
+      self._fill('all')
+      return self._take(len(self._buffer))
+    while len(self._buffer) < size and not self._eof:
+      self._fill('line')
+    return self._take(size)
+
+  def readline(self, size=-1):
+    if '\n' not in self._buffer:
+      self._fill('line')
+    end = self._buffer.find('\n') + 1 or len(self._buffer)
+    if size >= 0:
+      end = min(end, size)
+    return self._take(end)
+
+  def readlines(self, sizehint=0):
+    return list(self)
+
+  def __iter__(self):
+    return iter(self.readline, '')
+
+  def isatty(self):
+    return self.session.ttys.get(_INPUT, False)
+
+
+class _Session(object):
+
+  """One forwarded command: its socket, streams, terminals and log level."""
+
+  def __init__(self, sock, encoding, stdin, ttys=None):
+    self.sock = sock
+    self.encoding = encoding
+    # Frame type (_INPUT for stdin) to whether the client has a terminal there.
+    self.ttys = ttys or {}
+    self.lock = threading.Lock()
+    self.input_lock = threading.Lock()
+    self.stdin = _SessionInput(self, stdin)
+    self.stdout = _SessionStream(self, _STDOUT)
+    self.stderr = _SessionStream(self, _STDERR)
+    self.log_level = logging.INFO
+
+  def send(self, kind, data):
+    # Tasks may print from more than one thread.
+    with self.lock:
+      _send_frame(self.sock, kind, data)
+
+  def receive_input(self, how):
+    """Ask the client for "line" or "all" of its stdin, and return it."""
+    with self.input_lock:
+      self.send(_INPUT, how)
+      try:
+        kind, data = _receive_frame(self.sock)
+      except EOFError, err:
+        raise socket.error(str(err))
+      if kind != _DATA:
+        raise socket.error('Expected stdin from the client, got %r' % kind)
+      return data
+
+
+def _get_session():
+  return getattr(_local, 'session', None)
+
+
+def _capture_session():
+  """Let worker threads write to the session of the thread starting them."""
+  session = _get_session()
+
+  def _restore():
+    _local.session = session
+  return _restore
+
+
+googlecl.workers.add_thread_context(_capture_session)
+
+
+def set_log_level(level):
+  """Set the level of the log messages sent to the current session."""
+  session = _get_session()
+  if session:
+    session.log_level = level
+
+
+class _StreamRouter(object):
+
+  """Stands in for sys.stdin, sys.stdout or sys.stderr in the daemon.
+
+  Reads and writes go to the session served by the current thread (or by the
+  thread that started it, for googlecl.workers threads), or to the daemon's
+  own stream for any other thread.
+  """
+
+  def __init__(self, name, default):
+    self.__dict__['_name'] = name
+    self.__dict__['_default'] = default
+
+  def _get_stream(self):
+    session = _get_session()
+    if session:
+      return getattr(session, self._name)
+    return self._default
+
+  def __getattr__(self, name):
+    return getattr(self._get_stream(), name)
+
+  def __setattr__(self, name, value):
+    # print sets softspace on the stream.
+    setattr(self._get_stream(), name, value)
+
+
+class _SessionLogFilter(logging.Filter):
+
+  """Drops log records below the level of the session they belong to."""
+
+  def __init__(self, level):
+    logging.Filter.__init__(self)
+    self.level = level
+
+  def filter(self, record):
+    session = _get_session()
+    if session:
+      return record.levelno >= session.log_level
+    return record.levelno >= self.level
+
+
+class _DirectoryGate(object):
+
+  """Lets sessions run at once as long as they share a working directory.
+
+  The working directory belongs to the whole process, so a session for
+  another directory waits until the running sessions are done.
+  """
+
+  def __init__(self):
+    self._condition = threading.Condition()
+    self._directory = None
+    self._running = 0
+
+  def enter(self, directory):
+    with self._condition:
+      while self._running and directory != self._directory:
+        self._condition.wait()
+      if directory != self._directory:
+        os.chdir(directory)
+        self._directory = directory
+      self._running += 1
+
+  def leave(self):
+    with self._condition:
+      self._running -= 1
+      if not self._running:
+        self._condition.notifyAll()
+
+
+class _Handler(SocketServer.BaseRequestHandler):
+
+  def handle(self):
+    try:
+      kind, payload = _receive_frame(self.request)
+    except (socket.error, EOFError, struct.error), err:
+      LOG.debug('Could not read request: %s', err)
+      return
+    if kind != _REQUEST:
+      return
+    request = json.loads(payload)
+    session = _Session(self.request, request.get('encoding'),
+                       request.get('stdin', u'').encode('latin-1'),
+                       {_INPUT: request.get('stdin_tty', False),
+                        _STDOUT: request.get('stdout_tty', False)})
+    argv = [arg.encode('latin-1') for arg in request['argv']]
+    status = 1
+    _local.session = session
+    try:
+      try:
+        self.server.directories.enter(request['cwd'].encode('latin-1'))
+        try:
+          status = get_exit_status(self.server.run_command(argv))
+        finally:
+          self.server.directories.leave()
+      except SystemExit, err:
+        if err.code is None or isinstance(err.code, int):
+          status = err.code or 0
+        else:
+          print >> session.stderr, err.code
+      except socket.error, err:
+        LOG.debug('Client went away: %s', err)
+        return
+      except Exception:
+        traceback.print_exc(file=session.stderr)
+    finally:
+      _local.session = None
+    try:
+      session.send(_EXIT, str(status))
+    except socket.error:
+      pass
+
+
+class _Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+
+  # SocketServer.UnixStreamServer, which only exists where AF_UNIX does.
+  address_family = getattr(socket, 'AF_UNIX', None)
+  daemon_threads = True
+
+  def __init__(self, path, run_command):
+    self.run_command = run_command
+    self.directories = _DirectoryGate()
+    # Only the user running the daemon may connect to it.
+    old_umask = os.umask(0177)
+    try:
+      SocketServer.TCPServer.__init__(self, path, _Handler)
+    finally:
+      os.umask(old_umask)
+
+
+def serve(run_command, log_level=logging.INFO):
+  """Serve forwarded commands until interrupted.
+
+  Args:
+    run_command: Function taking the arguments of a command (without the
+        program name) and returning what run_once returned for it.
+    log_level: Level of the log messages the daemon itself prints.
+
+  Returns:
+    Exit status for the daemon.
+  """
+  if not hasattr(socket, 'AF_UNIX'):
+    LOG.error('The daemon needs Unix domain sockets.')
+    return 1
+  path = get_socket_path(create_missing_dir=True)
+  sock = _connect(path)
+  if sock:
+    sock.close()
+    LOG.error('A GoogleCL daemon is already listening on %s', path)
+    return 1
+  if os.path.exists(path):
+    os.remove(path)
+  server = _Server(path, run_command)
+
+  streams = (sys.stdin, sys.stdout, sys.stderr)
+  sys.stdin = _StreamRouter('stdin', sys.stdin)
+  sys.stdout = _StreamRouter('stdout', sys.stdout)
+  sys.stderr = _StreamRouter('stderr', sys.stderr)
+  # Handlers made by logging.basicConfig hold on to the original stderr.
+  root = logging.getLogger()
+  log_filter = _SessionLogFilter(log_level)
+  handler_streams = []
+  for handler in root.handlers:
+    if getattr(handler, 'stream', None) is streams[2]:
+      handler_streams.append(handler)
+      handler.stream = sys.stderr
+    handler.addFilter(log_filter)
+  # Levels are decided per session by the filter.
+  levels = [(logger, logger.level) for logger in
+            (root, logging.getLogger(googlecl.LOGGER_NAME))]
+  for logger, _ in levels:
+    logger.setLevel(logging.DEBUG)
+
+  LOG.info('Serving GoogleCL commands on %s', path)
+  try:
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+  finally:
+    server.server_close()
+    try:
+      os.remove(path)
+    except OSError:
+      pass
+    sys.stdin, sys.stdout, sys.stderr = streams
+    for handler in root.handlers:
+      handler.removeFilter(log_filter)
+    for handler in handler_streams:
+      handler.stream = streams[2]
+    for logger, level in levels:
+      logger.setLevel(level)
+  return 0
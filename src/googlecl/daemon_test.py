@@ -0,0 +1,155 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for forwarding commands to the daemon."""
+
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import googlecl.daemon
+import googlecl.workers
+
+
+def run_command(argv):
+  """Stands in for run_forwarded in google.py."""
+  if argv[0] == 'exit':
+    sys.exit(int(argv[1]))
+  if argv[0] == 'workers':
+    def _print(number):
+      # The client and the daemon share stdout in these tests.
+      print 'worker', number, googlecl.daemon._get_session() is not None
+      return number
+    numbers = googlecl.workers.iter_ahead(range(int(argv[1])))
+    googlecl.workers.map_ordered(_print, numbers, 3)
+    return True
+  if argv[0] == 'prompt':
+    answers = []
+    try:
+      while True:
+        answers.append(raw_input('? '))
+    except EOFError:
+      pass
+    print answers, sys.stdin.isatty()
+    return True
+  print ' '.join(argv), os.path.basename(os.getcwd()), sys.stdin.read()
+  print >> sys.stderr, 'done'
+  return -1
+
+
+class FakeClient(object):
+  def __init__(self, config):
+    self.config = config
+
+
+class ForwardTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.environment = os.environ.get('XDG_DATA_HOME')
+    os.environ['XDG_DATA_HOME'] = self.directory
+    self.streams = sys.stdin, sys.stdout, sys.stderr
+    self.stdout = StringIO.StringIO()
+    self.stderr = StringIO.StringIO()
+    sys.stdin = googlecl.daemon._StreamRouter('stdin',
+                                              StringIO.StringIO('input'))
+    sys.stdout = googlecl.daemon._StreamRouter('stdout', self.stdout)
+    sys.stderr = googlecl.daemon._StreamRouter('stderr', self.stderr)
+    self.server = None
+
+  def tearDown(self):
+    if self.server:
+      self.server.shutdown()
+      self.server.server_close()
+    sys.stdin, sys.stdout, sys.stderr = self.streams
+    if self.environment is None:
+      del os.environ['XDG_DATA_HOME']
+    else:
+      os.environ['XDG_DATA_HOME'] = self.environment
+    shutil.rmtree(self.directory)
+
+  def start_server(self):
+    path = googlecl.daemon.get_socket_path(create_missing_dir=True)
+    self.server = googlecl.daemon._Server(path, run_command)
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+
+  def testNoDaemon(self):
+    self.assertEqual(googlecl.daemon.forward(['help']), None)
+
+  def testForwardRunsCommand(self):
+    self.start_server()
+    cwd = os.getcwd()
+    os.chdir(self.directory)
+    try:
+      status = googlecl.daemon.forward(['docs', 'list', '_'])
+    finally:
+      os.chdir(cwd)
+    self.assertEqual(status, 1)
+    self.assertEqual(self.stdout.getvalue(),
+                     'docs list _ %s input\n' %
+                     os.path.basename(self.directory))
+    self.assertEqual(self.stderr.getvalue(), 'done\n')
+
+  def testPromptsReadClientStdin(self):
+    self.start_server()
+    sys.stdin = googlecl.daemon._StreamRouter('stdin',
+                                              StringIO.StringIO('yes\nno'))
+    self.assertEqual(googlecl.daemon.forward(['prompt']), 0)
+    self.assertEqual(self.stdout.getvalue(), "? ? ? ['yes', 'no'] False\n")
+
+  def testWorkerOutputGoesToClient(self):
+    self.start_server()
+    self.assertEqual(googlecl.daemon.forward(['workers', '5']), 0)
+    self.assertEqual(sorted(self.stdout.getvalue().splitlines()),
+                     ['worker %d True' % number for number in range(5)])
+    self.assertEqual(self.stderr.getvalue(), '')
+
+  def testExitStatus(self):
+    self.start_server()
+    self.assertEqual(googlecl.daemon.forward(['exit', '5']), 5)
+    self.assertEqual(googlecl.daemon.forward(['exit', '0']), 0)
+
+
+class ClientPoolTest(unittest.TestCase):
+
+  def testCheckout(self):
+    pool = googlecl.daemon.ClientPool()
+    config = object()
+    client = FakeClient(config)
+    pool.checkin(('docs', 'me'), client)
+    self.assertEqual(pool.checkout(('docs', 'you'), config), None)
+    self.assertTrue(pool.checkout(('docs', 'me'), config) is client)
+    self.assertEqual(pool.checkout(('docs', 'me'), config), None)
+
+  def testStaleClientsAreDropped(self):
+    pool = googlecl.daemon.ClientPool(ttl=60)
+    config = object()
+    pool.checkin('docs', FakeClient(object()))
+    self.assertEqual(pool.checkout('docs', config), None)
+    pool.checkin('docs', FakeClient(config))
+    pool._idle['docs'][0] = (pool._idle['docs'][0][0], time.time() - 120)
+    self.assertEqual(pool.checkout('docs', config), None)
+
+
+if __name__ == '__main__':
+  unittest.main()
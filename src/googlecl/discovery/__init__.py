@@ -34,8 +34,10 @@ Examples:
 
 import httplib2
 import logging
+import threading
 
 import googlecl
+import googlecl.workers
 
 from apiclient.discovery import build_from_document
 from googlecl.discovery import authentication
@@ -47,11 +49,80 @@ import simplejson as json
 LOG = logging.getLogger(googlecl.LOGGER_NAME)
 DISCOVERY_URI = '%s/discovery/v1/apis/{api}/{apiVersion}/rest'
 
+# Whether build_from_document accepts a parsed document. Older versions of
+# apiclient only take JSON.
+_build_from_parsed = True
+
+
+def build_service(doc, base_uri, **kwargs):
+  """ Builds a service object from a parsed Discovery document
+  Passes the document as is when apiclient allows it, which spares
+  serializing it to JSON only to have it parsed again.
+
+  Args:
+    doc: Discovery document for the service
+    base_uri: Discovery URI template, as taken by build_from_document
+    kwargs: Other arguments for build_from_document (http, developerKey)
+  """
+  global _build_from_parsed
+  if _build_from_parsed:
+    try:
+      return build_from_document(doc, base_uri, **kwargs)
+    except (TypeError, AttributeError), err:
+      LOG.debug('Cannot build from a parsed document: ' + str(err))
+      _build_from_parsed = False
+  return build_from_document(json.dumps(doc), base_uri, **kwargs)
+
+
+class ServiceCache():
+  """ Built service objects, kept for later commands of the same session
+
+  Services are keyed by (service name, version, email), where email is None
+  for services used without authentication. A service is checked out while
+  a command uses it, so that commands run at once by the daemon never share
+  one http object.
+  """
+  def __init__(self):
+    self._idle = {}
+    self._lock = threading.Lock()
+
+  def checkout(self, key, doc):
+    """ Takes the service stored under key out of the cache
+
+    Args:
+      key: Identifies the service, as described above
+      doc: Documentation the service must have been built from. Services
+        built from a document that has since been refreshed are dropped.
+
+    Returns:
+      The service object, or None
+    """
+    self._lock.acquire()
+    try:
+      built_from, service = self._idle.pop(key, (None, None))
+    finally:
+      self._lock.release()
+    if built_from is doc:
+      return service
+    return None
+
+  def checkin(self, key, doc, service):
+    """ Keeps a service built from doc for the next command under key """
+    self._lock.acquire()
+    try:
+      self._idle[key] = (doc, service)
+    finally:
+      self._lock.release()
+
+
 class DiscoveryManager():
 
   def __init__(self, email):
     self.dataManager = data.DefaultManager(email)
-    self.docManager = docs.DocManager(self.dataManager.local_apis, self.dataManager.base_url)
+    self.services = ServiceCache()
+    self.docManager = docs.DocManager(self.dataManager.local_apis,
+                                      self.dataManager.base_url,
+                                      self.dataManager.cache_hours)
 
   def run(self, argv):
    try:
@@ -83,23 +154,56 @@ class DiscoveryManager():
     except TypeError:
       return
 
+    all_pages = '--all-pages' in args
+    if all_pages:
+      args.remove('--all-pages')
+
     LOG.debug('Managing auth...')
     # Checks if credentials are needed and, if so, whether they are possessed.
     # If not, gets appropriate credentials.
+    force_auth = False
     if 'auth' in doc:
       if '--force-auth' in args:
         args.remove('--force-auth')
         force_auth = True
+      key = (servicename, version, self.dataManager.email)
+    else:
+      key = (servicename, version, None)
+
+    # Reuses the service built by an earlier command, if any
+    service = None
+    if not force_auth:
+      service = self.services.checkout(key, doc)
+    if not service:
+      if 'auth' in doc:
+        http = authentication.authenticate(self.dataManager.email,
+          servicename, doc, http, self.dataManager.client_id,
+          self.dataManager.client_secret, force_auth)
+        # Builds the service and finds the method
+        service = build_service(doc, DISCOVERY_URI % self.dataManager.base_url,
+                                http=http)
       else:
-        force_auth = False
-      http = authentication.authenticate(self.dataManager.email, servicename, doc, http,
-        self.dataManager.client_id, self.dataManager.client_secret, force_auth)
+        service = build_service(doc, DISCOVERY_URI % self.dataManager.base_url,
+                                developerKey=self.dataManager.devkey2,
+                                http=http)
+    try:
+      self.run_method(service, doc, args, all_pages)
+    finally:
+      self.services.checkin(key, doc, service)
+   except Exception, err:
+    print 'Uncaught error'
+    raise
 
-      # Builds the service and finds the method
-      service = build_from_document(json.dumps(doc), DISCOVERY_URI % self.dataManager.base_url, http=http)
-    else:
-      service = build_from_document(json.dumps(doc), DISCOVERY_URI % self.dataManager.base_url,
-                      developerKey=self.dataManager.devkey2, http=http)
+  def run_method(self, service, doc, args, all_pages=False):
+    """ Finds, executes and displays the output of the method in args
+
+    Args:
+      service: The service object being used
+      doc: Documentation describing the service
+      args: List containing the method path and its parameters
+      all_pages: Whether to follow nextPageToken through every page of
+        the response, printing items as each page arrives
+    """
     LOG.debug('Determining task...')
     try:
       metinfo, method, args = getMethod(service, doc, args)
@@ -114,6 +218,17 @@ class DiscoveryManager():
       raise
       return
 
+    if all_pages:
+      if 'pageToken' in metinfo.get('parameters', {}):
+        LOG.debug('Executing method for every page...')
+        try:
+          output.output_pages(googlecl.workers.iter_ahead(
+              iter_pages(method, kwargs)), self.dataManager.formatting)
+        except Exception, err:
+          LOG.error(err)
+        return
+      LOG.warning('Method does not return pages, ignoring --all-pages')
+
     LOG.debug('Executing method...')
     try:
       resp = method(**kwargs).execute()
@@ -124,9 +239,6 @@ class DiscoveryManager():
     LOG.debug('Displaying output...')
     # Displays formatted output
     output.output(resp, self.dataManager.formatting)
-   except Exception, err:
-    print 'Uncaught error'
-    raise
 
   def apis_list(self):
     # Returns a list of the APIs that may be used
@@ -175,3 +287,23 @@ def getMethod(service, doc, args):
     if not 'id' in obj:
       attr = attr()
   return obj, attr, args[i:]
+
+def iter_pages(method, kwargs):
+  """ Executes a method once for every page of its response
+  Follows nextPageToken until the last page
+
+  Args:
+    method: The method to be executed
+    kwargs: Parameters for the method, which may include a first pageToken
+
+  Yields:
+    The response for each page
+  """
+  kwargs = dict(kwargs)
+  while True:
+    resp = method(**kwargs).execute()
+    yield resp
+    token = resp.get('nextPageToken')
+    if not token or token == kwargs.get('pageToken'):
+      return
+    kwargs['pageToken'] = token
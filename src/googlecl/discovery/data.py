@@ -57,6 +57,8 @@ class DefaultManager:
     if '[' in self.local_apis or '(' in self.local_apis:
       self.local_apis = json.loads(self.local_apis)
     self.base_url = config.lazy_get(None, 'base_url', default='https://www.googleapis.com', option_type=str)
+    self.cache_hours = config.lazy_get(None, 'discovery_cache_hours',
+         default=24, option_type=float)
     editor = config.safe_get('DOCS', 'document_editor')
     if not editor:
       editor = config.safe_get(None, 'editor')
@@ -19,23 +19,114 @@ In charge of saving/loading the API directory,
 and retrieves and stores the Discovery documents.
 """
 
+import cPickle as pickle
 import httplib2
 import logging
+import os
+import time
+import urllib
 
 import simplejson as json
 import googlecl
+import googlecl.tokenstore
 
 LOG = logging.getLogger(googlecl.LOGGER_NAME)
 apis_path = googlecl.get_data_path('apis.dat', create_missing_dir=True)
 SERVICE_BLACKLIST = ['latitude']
 LIST_URL = '%s/discovery/v1/apis?preferred=true&pp=0'
 SERVICE_URL = '%s/discovery/v1/apis/%s/%s/rest'
+DOC_CACHE_DIR_NAME = 'discovery_cache'
+DEFAULT_DOC_CACHE_HOURS = 24
+_DOC_FILE_SUFFIX = '.doc'
+
+
+def load_pickled(path):
+  """Return the object pickled in a file, or None if it cannot be read."""
+  try:
+    f = open(path, 'rb')
+    try:
+      return pickle.load(f)
+    finally:
+      f.close()
+  except IOError:
+    return None
+  except Exception, err:
+    # Truncated file, or one written in another format.
+    LOG.debug('Could not unpickle ' + path + ': ' + str(err))
+    return None
+
+
+def save_pickled(path, obj):
+  """Pickle an object to a file, replacing it atomically."""
+  try:
+    googlecl.tokenstore.write_atomically(
+        path, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+  except EnvironmentError, err:
+    LOG.debug('Could not write ' + path + ': ' + str(err))
+
+
+class DocCache():
+  """ Keeps the Discovery documents of each API version on disk
+
+  Documents are stored already parsed, along with the validators the server
+  sent, and are used without asking the server until they are older than
+  the TTL. After that, they are revalidated with a conditional request.
+  """
+  def __init__(self, directory, ttl_hours=DEFAULT_DOC_CACHE_HOURS):
+    self.directory = directory
+    self.ttl = ttl_hours * 3600
+    if not os.path.isdir(directory):
+      os.makedirs(directory, 0700)
+
+  def _path(self, servicename, version):
+    # Names come from the command line, so keep them inside the directory.
+    name = urllib.quote(servicename + '.' + version, safe='.')
+    return os.path.join(self.directory, name + _DOC_FILE_SUFFIX)
+
+  def get(self, servicename, version):
+    """ Returns the cached entry for an API version, or None
+
+    Returns:
+      Dictionary with the document ('doc'), the time it was last validated
+      ('checked'), and the 'etag' and 'last_modified' validators, if any.
+    """
+    entry = load_pickled(self._path(servicename, version))
+    if not isinstance(entry, dict) or 'doc' not in entry:
+      return None
+    return entry
+
+  def is_fresh(self, entry):
+    return time.time() - entry['checked'] < self.ttl
+
+  def put(self, servicename, version, doc, etag=None, last_modified=None):
+    save_pickled(self._path(servicename, version),
+                 {'doc': doc, 'checked': time.time(),
+                  'etag': etag, 'last_modified': last_modified})
+
+  def clear(self):
+    """ Removes every cached document """
+    for filename in os.listdir(self.directory):
+      if filename.endswith(_DOC_FILE_SUFFIX):
+        try:
+          os.remove(os.path.join(self.directory, filename))
+        except OSError:
+          pass
+
 
 class DocManager():
-  def __init__(self, local, base_url):
+  def __init__(self, local, base_url, cache_hours=DEFAULT_DOC_CACHE_HOURS):
     self.base_url = base_url
-    self.load()
     self.apis = {}
+    self.local = None
+    self.cache = None
+    if cache_hours > 0:
+      try:
+        self.cache = DocCache(googlecl.get_data_path(DOC_CACHE_DIR_NAME,
+                                                     create_missing_dir=True),
+                              cache_hours)
+      except OSError, err:
+        LOG.debug('Discovery document cache disabled: ' + str(err))
+    self.load()
     self.local = local
     if self.local:
       if isinstance(self.local, list): # local comes from the config file
@@ -47,32 +138,80 @@ class DocManager():
   def load(self, force=False):
     """ Loads the currently saved list of preferred APIs, 
         or downloads the latest version.
-        Can be forced with the command 'refresh apis'
+        Can be forced with the command 'refresh apis', which also drops
+        the cached Discovery documents.
 
     Args:
       force: If true, the will always download a new document
     """
-    try:
-      if force:
-        raise
-      f = open(apis_path, 'r')
-      self.directory = json.load(f)
-    except:
+    self.directory = None
+    if force:
+      self.apis = {}
+      if self.cache:
+        self.cache.clear()
+    else:
+      self.directory = load_pickled(apis_path)
+      if not isinstance(self.directory, dict):
+        # Written as JSON by older versions.
+        try:
+          self.directory = json.load(open(apis_path, 'r'))
+        except:
+          self.directory = None
+    if not self.directory:
       http = httplib2.Http()
       resp, content = http.request(LIST_URL % self.base_url)
       self.directory = json.loads(content)
       # Removes blacklisted APIs (currently just latitude)
       self.directory['items'] = [a for a in self.directory['items'] 
                                  if a['name'] not in SERVICE_BLACKLIST]
-      f = open(apis_path, 'w')
-      json.dump(self.directory, f, indent=2)
-    if hasattr(self, 'local') and self.local:
+      save_pickled(apis_path, self.directory)
+    if self.local:
       if isinstance(self.local, list): # local comes from the config file
         for filename in self.local:    # Be sure to give the correct path.
           self.loadDoc(filename)
       else:
         self.loadDoc(self.local)
 
+  def fetchDoc(self, http, servicename, version):
+    """ Returns the Discovery document of an API version
+    Uses the on-disk cache while it is fresh, and otherwise asks the server
+    whether the cached copy has changed before downloading it again.
+
+    Args:
+      http: The httplib2.Http object to make requests with
+      servicename: Name of the API
+      version: Version of the API
+    """
+    entry = None
+    headers = {}
+    if self.cache:
+      entry = self.cache.get(servicename, version)
+      if entry:
+        if self.cache.is_fresh(entry):
+          return entry['doc']
+        if entry['etag']:
+          headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+          headers['If-Modified-Since'] = entry['last_modified']
+    resp, content = http.request(
+        SERVICE_URL % (self.base_url, servicename, version), headers=headers)
+    if resp.status == 304 and entry:
+      LOG.debug('Discovery document for %s %s has not changed',
+                servicename, version)
+      doc = entry['doc']
+    else:
+      doc = json.loads(content)
+    if self.cache and resp.status in (200, 304) and 'error' not in doc:
+      if resp.status == 304:
+        # A 304 need not repeat the validators.
+        etag = resp.get('etag', entry['etag'])
+        last_modified = resp.get('last-modified', entry['last_modified'])
+      else:
+        etag = resp.get('etag')
+        last_modified = resp.get('last-modified')
+      self.cache.put(servicename, version, doc, etag, last_modified)
+    return doc
+
   def loadDoc(self, filename):
     """ Loads a discovery document stored locally
 
@@ -125,8 +264,7 @@ class DocManager():
     if servicename + '.' + version in self.apis:
       doc = self.apis[servicename + '.' + version]
     else:
-      resp, content = http.request(SERVICE_URL % (self.base_url, servicename, version))
-      doc = json.loads(content)
+      doc = self.fetchDoc(http, servicename, version)
       self.apis[servicename + '.' + version] = doc
 
     if 'error' in doc:
@@ -18,6 +18,7 @@
 Manages the formatting and output of generated responses
 """
 import pprint
+import sys
 
 def output(resp, mode = 'pprint'):
   """Outputs the generated response according to defined formatting
@@ -33,6 +34,36 @@ def output(resp, mode = 'pprint'):
   elif mode == 'clean':
     cprint(resp)
 
+def output_pages(pages, mode = 'pprint'):
+  """Outputs the items of every page of a response, as each page arrives
+
+  Args:
+    pages: Iterable of the responses for each page
+    mode: What type of formatting is used
+  """
+  for page in pages:
+    items = get_items(page)
+    if items is None:
+      output(page, mode)
+    else:
+      for item in items:
+        output(item, mode)
+    sys.stdout.flush()
+
+def get_items(resp):
+  """Returns the list of items in one page of a response, or None if
+  there is no single list to take them from
+
+  Args:
+    resp: The response for the page
+  """
+  if isinstance(resp.get('items'), list):
+    return resp['items']
+  lists = [value for value in resp.values() if isinstance(value, list)]
+  if len(lists) == 1:
+    return lists[0]
+  return None
+
 def cprint(resp, st=1):
   """ Displays a json object, dict, or list
   More readable that pprint, but interchangeable.
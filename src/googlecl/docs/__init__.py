@@ -13,6 +13,8 @@
 # limitations under the License.
 import googlecl
 import googlecl.base
+import googlecl.mirror
+import googlecl.registry
 import logging
 import os
 
@@ -144,13 +146,29 @@ def _run_get(client, options, args):
 
 def _run_list(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
-  folder_entries = client.get_folder(options.folder)
-  entries = client.get_doclist(titles_list, folder_entries)
-  for entry in entries:
-    print googlecl.base.compile_entry_string(
-                               googlecl.base.BaseEntryToStringWrapper(entry),
-                               options.fields.split(','),
-                               delimiter=options.delimiter)
+
+  def iter_entries(fields, lite, record_class):
+    folder_entries = client.get_folder(options.folder)
+    return client.iter_doclist(titles_list, folder_entries, fields=fields,
+                               lite=lite)
+  googlecl.base.run_list(options, googlecl.base.BaseEntryToStringWrapper,
+                         iter_entries, client=client,
+                         mirror_scope=(client.email, 'documents', titles_list,
+                                       options.folder and [options.folder]))
+
+
+def _run_sync(client, options, args):
+  mirror = googlecl.mirror.open_mirror()
+  if mirror is None:
+    return
+  try:
+    counts = googlecl.mirror.sync_scope(
+        mirror, client, client.email, 'documents', client.iter_doclist,
+        googlecl.base.EntryRecord,
+        get_parent=googlecl.mirror.get_parent_title)
+    googlecl.mirror.report_sync('documents', counts)
+  finally:
+    mirror.close()
 
 
 def _run_upload(client, options, args):
@@ -216,20 +234,11 @@ def _run_delete(client, options, args):
   client.DeleteEntryList(entries, 'document', options.prompt)
 
 
-TASKS = {'upload': googlecl.base.Task('Upload a document',
-                                      callback=_run_upload,
-                                      required='src',
-                                      optional=['title', 'folder', 'format']),
-         'edit': googlecl.base.Task('Edit a document', callback=_run_edit,
-                                    required=['title'],
-                                    optional=['format', 'editor', 'folder']),
-         'get': googlecl.base.Task('Download a document', callback=_run_get,
-                                   required=[['title', 'folder'], 'dest'],
-                                   optional='format'),
-         'list': googlecl.base.Task('List documents', callback=_run_list,
-                                    required=['fields', 'delimiter'],
-                                    optional=['title', 'folder']),
-         'delete': googlecl.base.Task('Delete documents',
-                                      callback=_run_delete,
-                                      required='title',
-                                      optional='folder')}
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'upload': _run_upload,
+    'edit': _run_edit,
+    'get': _run_get,
+    'list': _run_list,
+    'sync': _run_sync,
+    'delete': _run_delete})
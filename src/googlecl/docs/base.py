@@ -35,7 +35,9 @@ import os
 import shlex
 import shutil
 import sys
+import time
 import googlecl
+import googlecl.stats
 from googlecl.docs import SECTION_HEADER
 
 # Renamed here to reduce verbosity in other sections
@@ -228,6 +230,7 @@ class DocsBaseCL(object):
       else:
         path = base_path + extension
       LOG.info(safe_encode('Downloading ' + entry_title + ' to ' + path))
+      start_time = time.time()
       try:
         if can_export(entry):
           self.Export(entry, path, grid_id)
@@ -236,6 +239,8 @@ class DocsBaseCL(object):
             self.Download(entry, path)
           else:
             self.DownloadResource(entry, path)
+        googlecl.stats.record_transfer('download', path,
+                                       time.time() - start_time)
       except self.request_error, err:
         LOG.error(safe_encode('Download of ' + entry_title + ' failed: ' +
                               unicode(err)))
@@ -382,6 +387,7 @@ class DocsBaseCL(object):
     if not convert:
       post_uri += '?convert=false'
     
+    start_time = time.time()
     try:
       new_entry = self._transmit_doc(path, entry_title, post_uri, content_type,
                                      file_ext)
@@ -399,6 +405,7 @@ class DocsBaseCL(object):
                    '--format=txt')
       return None
     else:
+      googlecl.stats.record_transfer('upload', path, time.time() - start_time)
       LOG.info('Upload success! Direct link: %s',
                new_entry.GetAlternateLink().href)
     return new_entry
@@ -54,6 +54,10 @@ class DocsClientCL(gdata.docs.client.DocsClient,
 
   """
 
+  supports_partial_response = True
+  supports_batch = True
+  supports_show_deleted = True
+
   # Versions 2.0.5-2.0.14 of python gdata included a DOCLIST_FEED_URI variable,
   # but 2.0.15 removed it, so we hard code it here.
   DOCLIST_FEED_URI = '/feeds/default/private/full'
@@ -214,8 +218,9 @@ class DocsClientCL(gdata.docs.client.DocsClient,
 
   Export = export
 
-  def get_doclist(self, titles=None, folder_entry_list=None):
-    """Get a list of document entries from a feed.
+  def iter_doclist(self, titles=None, folder_entry_list=None, fields=None,
+                   lite=False):
+    """Iterate over document entries from a feed.
 
     Keyword arguments:
       titles: list or string Title(s) of entries to return. Will be compared
@@ -224,24 +229,36 @@ class DocsClientCL(gdata.docs.client.DocsClient,
       folder_entry_list: List of GDataEntry's of folders to get from.
              Only files found in these folders will be returned.
              Default None for all folders.
+      fields: Partial response selector. See BaseCL.iter_entries.
+      lite: Return lite entries. See BaseCL.iter_entries.
 
-    Returns:
-      List of entries.
+    Yields:
+      Entries, as each page of them is retrieved.
 
     """
     if folder_entry_list:
-      entries = []
-      for folder in folder_entry_list:
-        # folder.content.src is the uri to query for documents in that folder.
-        entries.extend(self.GetEntries(folder.content.src,
-                                       titles,
-                                       desired_class=self._doclist_class()))
+      # folder.content.src is the uri to query for documents in that folder.
+      uris = [folder.content.src for folder in folder_entry_list]
     else:
-      entries = self.GetEntries(DocsClientCL.DOCLIST_FEED_URI,
-                                titles,
-                                desired_class=self._doclist_class())
+      uris = [DocsClientCL.DOCLIST_FEED_URI]
+    for uri in uris:
+      for entry in self.IterEntries(uri,
+                                    titles,
+                                    desired_class=self._doclist_class(),
+                                    fields=fields,
+                                    lite=lite):
+        yield entry
 
-    return entries
+  def get_doclist(self, titles=None, folder_entry_list=None):
+    """Get a list of document entries from a feed.
+
+    See iter_doclist for a description of the arguments.
+
+    Returns:
+      List of entries.
+
+    """
+    return list(self.iter_doclist(titles, folder_entry_list))
 
   def get_single_doc(self, title=None, folder_entry_list=None):
     """Return exactly one doc_entry.
@@ -299,9 +316,9 @@ class DocsClientCL(gdata.docs.client.DocsClient,
       docs_uri = DocsClientCL.DOCLIST_FEED_URI
       sheets_uri = ('https://spreadsheets.google.com/feeds/spreadsheets'
                     '/private/full')
-    docs_test = googlecl.client.BaseClientCL.IsTokenValid(self, docs_uri)
-    sheets_test = googlecl.client.BaseClientCL.IsTokenValid(self, sheets_uri)
-    return docs_test and sheets_test
+    # No need to ask Spreadsheets if Docs already refused the token.
+    return (googlecl.client.BaseClientCL.IsTokenValid(self, docs_uri) and
+            googlecl.client.BaseClientCL.IsTokenValid(self, sheets_uri))
 
   IsTokenValid = is_token_valid
 
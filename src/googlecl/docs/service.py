@@ -150,8 +150,9 @@ class DocsServiceCL(gdata.docs.service.DocsService,
 
   Export = export
 
-  def get_doclist(self, titles=None, folder_entry_list=None):
-    """Get a list of document entries from a feed.
+  def iter_doclist(self, titles=None, folder_entry_list=None, fields=None,
+                   lite=False):
+    """Iterate over document entries from a feed.
 
     Keyword arguments:
       titles: list or string Title(s) of entries to return. Will be compared
@@ -160,24 +161,36 @@ class DocsServiceCL(gdata.docs.service.DocsService,
       folder_entry_list: List of GDataEntry's of folders to get from.
              Only files found in these folders will be returned.
              Default None for all folders.
+      fields: Partial response selector. See BaseCL.iter_entries.
+      lite: Return lite entries. See BaseCL.iter_entries.
 
-    Returns:
-      List of entries.
+    Yields:
+      Entries, as each page of them is retrieved.
 
     """
     if folder_entry_list:
-      entries = []
-      for folder in folder_entry_list:
-        # folder.content.src is the uri to query for documents in that folder.
-        entries.extend(self.GetEntries(folder.content.src,
-                                       titles,
-                               converter=gdata.docs.DocumentListFeedFromString))
+      # folder.content.src is the uri to query for documents in that folder.
+      uris = [folder.content.src for folder in folder_entry_list]
     else:
-      query = gdata.docs.service.DocumentQuery()
-      entries = self.GetEntries(query.ToUri(),
-                                titles,
-                                converter=gdata.docs.DocumentListFeedFromString)
-    return entries
+      uris = [gdata.docs.service.DocumentQuery().ToUri()]
+    for uri in uris:
+      for entry in self.IterEntries(uri,
+                                    titles,
+                               converter=gdata.docs.DocumentListFeedFromString,
+                                    fields=fields,
+                                    lite=lite):
+        yield entry
+
+  def get_doclist(self, titles=None, folder_entry_list=None):
+    """Get a list of document entries from a feed.
+
+    See iter_doclist for a description of the arguments.
+
+    Returns:
+      List of entries.
+
+    """
+    return list(self.iter_doclist(titles, folder_entry_list))
 
   def get_single_doc(self, title=None, folder_entry_list=None):
     """Return exactly one doc_entry.
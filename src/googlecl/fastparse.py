@@ -0,0 +1,331 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Lightweight feed parser for tasks that only list entries.
+
+The gdata converters build a full object tree for every element of a feed.
+parse_feed instead reads the feed incrementally with ElementTree's iterparse,
+copies the handful of values the list tasks print into small records, and
+throws each entry's elements away as soon as it has been read.
+
+The records answer the same attribute paths as gdata entries do
+(entry.title.text, entry.GetHtmlLink().href, entry.media.keywords.text, ...),
+so the EntryToStringWrapper classes work on them unchanged. The FIELDS table
+of a wrapper says which fields can be printed from a lite entry; see
+supports_fields.
+
+"""
+import logging
+from cStringIO import StringIO
+
+try:
+  from xml.etree import cElementTree as ElementTree
+except ImportError:
+  from xml.etree import ElementTree
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+_ATOM = '{http://www.w3.org/2005/Atom}'
+_GD = '{http://schemas.google.com/g/2005}'
+_GPHOTO = '{http://schemas.google.com/photos/2007}'
+_MEDIA = '{http://search.yahoo.com/mrss/}'
+_YT = '{http://gdata.youtube.com/schemas/2007}'
+_OPENSEARCH = ('{http://a9.com/-/spec/opensearchrss/1.0/}',
+               '{http://a9.com/-/spec/opensearch/1.1/}')
+
+_ENTRY = _ATOM + 'entry'
+_LINK = _ATOM + 'link'
+_CONTENT = _ATOM + 'content'
+_CATEGORY = _ATOM + 'category'
+_AUTHOR = _ATOM + 'author'
+_WHEN = _GD + 'when'
+_WHERE = _GD + 'where'
+_MEDIA_GROUP = _MEDIA + 'group'
+
+# Element holding the text of each single-valued attribute of LiteEntry.
+_TEXT_ATTRIBUTES = {_ATOM + 'id': 'id',
+                    _ATOM + 'title': 'title',
+                    _ATOM + 'summary': 'summary',
+                    _ATOM + 'published': 'published',
+                    _ATOM + 'updated': 'updated',
+                    _GD + 'recurrence': 'recurrence',
+                    _GD + 'resourceId': 'resource_id',
+                    _GPHOTO + 'access': 'access',
+                    _GPHOTO + 'location': 'location',
+                    _GPHOTO + 'id': 'gphoto_id'}
+
+
+class Text(object):
+  """Text of an element, as element.text."""
+  __slots__ = ('text',)
+
+  def __init__(self, text):
+    self.text = text
+
+
+class Link(object):
+  """An atom:link."""
+  __slots__ = ('rel', 'type', 'href')
+
+  def __init__(self, rel, type, href):
+    self.rel = rel
+    self.type = type
+    self.href = href
+
+
+class Content(object):
+  """An atom:content, which has either a src or text."""
+  __slots__ = ('src', 'type', 'text')
+
+  def __init__(self, src, type, text):
+    self.src = src
+    self.type = type
+    self.text = text
+
+
+class Category(object):
+  """An atom:category."""
+  __slots__ = ('scheme', 'term', 'label')
+
+  def __init__(self, scheme, term, label):
+    self.scheme = scheme
+    self.term = term
+    self.label = label
+
+
+class Person(object):
+  """An atom:author."""
+  __slots__ = ('name', 'email')
+
+  def __init__(self, name, email):
+    self.name = name
+    self.email = email
+
+
+class When(object):
+  """A gd:when."""
+  __slots__ = ('start_time', 'end_time')
+
+  def __init__(self, start_time, end_time):
+    self.start_time = start_time
+    self.end_time = end_time
+
+
+class Where(object):
+  """A gd:where."""
+  __slots__ = ('value_string',)
+
+  def __init__(self, value_string):
+    self.value_string = value_string
+
+
+class Duration(object):
+  """A yt:duration."""
+  __slots__ = ('seconds',)
+
+  def __init__(self, seconds):
+    self.seconds = seconds
+
+
+class Media(object):
+  """The parts of a media:group that get listed."""
+  __slots__ = ('title', 'description', 'keywords', 'duration')
+
+  def __init__(self, title, description, keywords, duration):
+    self.title = title
+    self.description = description
+    self.keywords = keywords
+    self.duration = duration
+
+
+class _LinksMixin(object):
+  """The link lookups of atom.Entry and atom.Feed that listing uses."""
+  __slots__ = ()
+
+  def _find_link(self, rel, link_type=None):
+    for link in self.link:
+      if link.rel == rel and (link_type is None or link.type == link_type):
+        return link
+    return None
+
+  def GetHtmlLink(self):
+    return self._find_link('alternate', 'text/html')
+
+  def GetNextLink(self):
+    return self._find_link('next')
+
+  get_html_link = GetHtmlLink
+  get_next_link = GetNextLink
+
+
+class LiteEntry(_LinksMixin):
+
+  """The listable parts of a feed entry.
+
+  Single-valued elements that were missing are None, and repeated ones are
+  sequences, as with gdata entries. Only alternate links are kept.
+  """
+
+  __slots__ = ('id', 'title', 'summary', 'published', 'updated', 'recurrence',
+               'resource_id', 'access', 'location', 'gphoto_id', 'content',
+               'link', 'category', 'author', 'when', 'where', 'media')
+
+  def __init__(self):
+    self.id = self.title = self.summary = self.published = None
+    self.updated = self.recurrence = self.resource_id = self.access = None
+    self.location = self.gphoto_id = self.content = self.media = None
+    # Most entries lack most repeated elements; share one empty sequence.
+    self.link = self.category = self.author = self.when = self.where = ()
+
+  def __str__(self):
+    # The raw XML is gone. Wrappers do not mark "xml" as lite for this.
+    return '<LiteEntry %s>' % (self.id and self.id.text)
+
+
+class LiteFeed(_LinksMixin):
+
+  """A page of a feed, holding LiteEntry objects."""
+
+  __slots__ = ('title', 'link', 'entry', 'total_results', 'start_index',
+               'items_per_page')
+
+  def __init__(self):
+    self.title = None
+    self.link = []
+    self.entry = []
+    self.total_results = None
+    self.start_index = None
+    self.items_per_page = None
+
+
+def _get_text(element, tag):
+  child = element.find(tag)
+  if child is None:
+    return None
+  return Text(child.text)
+
+
+def _build_media(group):
+  duration = group.find(_YT + 'duration')
+  if duration is not None:
+    duration = Duration(duration.get('seconds'))
+  return Media(_get_text(group, _MEDIA + 'title'),
+               _get_text(group, _MEDIA + 'description'),
+               _get_text(group, _MEDIA + 'keywords'),
+               duration)
+
+
+def _build_entry(element):
+  entry = LiteEntry()
+  links = []
+  categories = []
+  authors = []
+  whens = []
+  wheres = []
+  # One pass over the children, rather than a find() for each attribute.
+  for child in element:
+    tag = child.tag
+    attribute = _TEXT_ATTRIBUTES.get(tag)
+    if attribute:
+      setattr(entry, attribute, Text(child.text))
+    elif tag == _LINK:
+      # Only alternate links are ever listed; edit and self links make up
+      # most of the links of an entry.
+      if child.get('rel') == 'alternate':
+        links.append(Link('alternate', child.get('type'), child.get('href')))
+    elif tag == _CONTENT:
+      entry.content = Content(child.get('src'), child.get('type'), child.text)
+    elif tag == _CATEGORY:
+      categories.append(Category(child.get('scheme'), child.get('term'),
+                                 child.get('label')))
+    elif tag == _AUTHOR:
+      authors.append(Person(_get_text(child, _ATOM + 'name'),
+                            _get_text(child, _ATOM + 'email')))
+    elif tag == _WHEN:
+      whens.append(When(child.get('startTime'), child.get('endTime')))
+    elif tag == _WHERE:
+      wheres.append(Where(child.get('valueString')))
+    elif tag == _MEDIA_GROUP:
+      entry.media = _build_media(child)
+  if links:
+    entry.link = links
+  if categories:
+    entry.category = categories
+  if authors:
+    entry.author = authors
+  if whens:
+    entry.when = whens
+  if wheres:
+    entry.where = wheres
+  return entry
+
+
+def parse_feed(body):
+  """Parse a feed into a LiteFeed.
+
+  Can be used as the converter of a gdata.service or gdata.client request.
+
+  Args:
+    body: The feed, as a string or as a response object to read it from.
+
+  Returns:
+    LiteFeed
+
+  Raises:
+    SyntaxError: The feed is not well-formed XML.
+  """
+  if hasattr(body, 'read'):
+    body = body.read()
+  feed = LiteFeed()
+  element = None
+  for _, element in ElementTree.iterparse(StringIO(body)):
+    if element.tag == _ENTRY:
+      feed.entry.append(_build_entry(element))
+      # Everything in the entry has been copied out; let it go.
+      element.clear()
+  # The last element to end is the feed itself, which by now only holds its
+  # own elements and the emptied entries.
+  if element is not None:
+    feed.title = _get_text(element, _ATOM + 'title')
+    feed.link = [Link(link.get('rel'), link.get('type'), link.get('href'))
+                 for link in element.findall(_LINK)]
+    for tag in _OPENSEARCH:
+      if feed.total_results is None:
+        feed.total_results = _get_text(element, tag + 'totalResults')
+      if feed.start_index is None:
+        feed.start_index = _get_text(element, tag + 'startIndex')
+      if feed.items_per_page is None:
+        feed.items_per_page = _get_text(element, tag + 'itemsPerPage')
+  return feed
+
+
+def supports_fields(wrapper_class, field_names):
+  """Check that every field can be printed from a LiteEntry.
+
+  Args:
+    wrapper_class: BaseEntryToStringWrapper or a subclass, whose FIELDS
+        mark the fields that only read elements copied into a LiteEntry as
+        lite (see googlecl.base.Field).
+    field_names: Names of the fields to be printed.
+
+  Returns:
+    True if the entries can be parsed with parse_feed.
+  """
+  fields = getattr(wrapper_class, 'FIELDS', {})
+  for name in field_names:
+    field = fields.get(name.replace('-', '_'))
+    if not field or not field.lite:
+      LOG.debug('Field %s needs full entries', name)
+      return False
+  return True
@@ -0,0 +1,145 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the lightweight feed parser."""
+
+import unittest
+
+import googlecl.base
+import googlecl.base_test
+import googlecl.calendar
+import googlecl.fastparse
+import googlecl.picasa
+import googlecl.synthetic
+import googlecl.youtube
+
+
+class SyntheticClient(googlecl.base.BaseCL):
+  """Serves synthetic feed pages, and records how they were parsed."""
+
+  service = 'youtube'
+
+  def __init__(self, kind, total, **options):
+    options.setdefault('max_results', 10)
+    googlecl.base.BaseCL.__init__(
+        self, 'TEST', googlecl.base_test.FakeConfig(**options), Exception)
+    self.kind = kind
+    self.total = total
+    self.converters = []
+
+  def _fetch_feed_page(self, uri, headers):
+    path = uri.replace('http://localhost', '')
+    return 200, {}, googlecl.synthetic.build_page_for_path(
+        path, {self.kind: self.total})
+
+  def _parse_feed(self, body, converter=None, desired_class=None):
+    self.converters.append(converter)
+    return converter(body)
+
+
+def lite_entries(kind, count=3):
+  body = googlecl.synthetic.build_feed(kind, count)
+  return googlecl.fastparse.parse_feed(body).entry
+
+
+class ParseFeedTest(unittest.TestCase):
+
+  def testPaging(self):
+    body = googlecl.synthetic.build_feed(googlecl.synthetic.DOCS, 30,
+                                         start_index=11, max_results=10,
+                                         gdata_version=2)
+    feed = googlecl.fastparse.parse_feed(body)
+    self.assertEqual(len(feed.entry), 10)
+    self.assertEqual(feed.total_results.text, '30')
+    self.assertEqual(feed.start_index.text, '11')
+    self.assertTrue('start-index=21' in feed.GetNextLink().href)
+
+  def testEntryFields(self):
+    entry = lite_entries(googlecl.synthetic.PHOTOS)[1]
+    self.assertEqual(entry.title.text, 'IMG_000002.jpg')
+    self.assertEqual(entry.GetHtmlLink().href, 'http://localhost/photo/2')
+    self.assertTrue(entry.content.src.endswith('IMG_000002.jpg'))
+    self.assertEqual(entry.media.keywords.text, 'synthetic, tag2')
+    self.assertEqual(entry.recurrence, None)
+    self.assertEqual(entry.gphoto_id.text, '2')
+
+  def testMissingElementsBehaveLikeGdata(self):
+    entry = lite_entries(googlecl.synthetic.GROUPS)[0]
+    self.assertEqual(entry.GetHtmlLink(), None)
+    self.assertEqual(entry.summary, None)
+    self.assertEqual(list(entry.when), [])
+    self.assertRaises(AttributeError, lambda: entry.media.description)
+
+  def testWrappers(self):
+    video = lite_entries(googlecl.synthetic.VIDEOS)[1]
+    self.assertEqual(
+        googlecl.base.compile_entry_string(
+            googlecl.youtube.VideoEntryToStringWrapper(video),
+            ['title', 'url', 'tags', 'minutes', 'author', 'summary'], ','),
+        'Video 2,http://localhost/watch?v=v2,synthetic;tag2,0:02,synthetic,'
+        'Synthetic video 2')
+    photo = lite_entries(googlecl.synthetic.PHOTOS)[0]
+    self.assertEqual(
+        googlecl.base.compile_entry_string(
+            googlecl.picasa.PhotoEntryToStringWrapper(photo),
+            ['title', 'caption', 'url-direct'], ','),
+        'IMG_000001.jpg,Synthetic photo 1,'
+        'http://localhost/photos/1/IMG_000001.jpg')
+    event = lite_entries(googlecl.synthetic.EVENTS)[0]
+    wrapper = googlecl.calendar.CalendarEntryToStringWrapper(
+        event, googlecl.base_test.FakeConfig())
+    self.assertEqual(wrapper.where, 'Room 1')
+    self.assertEqual(event.when[0].start_time, '2010-02-02T09:00:00.000Z')
+
+  def testSupportsFields(self):
+    supports = googlecl.fastparse.supports_fields
+    wrapper = googlecl.picasa.PhotoEntryToStringWrapper
+    self.assertTrue(supports(wrapper, ['title', 'url-direct', 'tags']))
+    self.assertFalse(supports(wrapper, ['title', 'xml']))
+    self.assertFalse(supports(wrapper, ['fstop']))
+
+
+class LiteIterEntriesTest(unittest.TestCase):
+
+  def testLiteEntriesAcrossPages(self):
+    client = SyntheticClient(googlecl.synthetic.VIDEOS, 35)
+    entries = list(client.iter_entries('/feeds/api/users/default/uploads',
+                                       converter=self.fail, lite=True))
+    self.assertEqual([entry.title.text for entry in entries],
+                     ['Video %d' % i for i in range(1, 36)])
+    self.assertEqual(set(client.converters),
+                     set([googlecl.fastparse.parse_feed]))
+
+  def testSerialPaging(self):
+    client = SyntheticClient(googlecl.synthetic.VIDEOS, 25,
+                             prefetch_threads=1)
+    entries = list(client.iter_entries('/feeds/api/users/default/uploads',
+                                       titles=['Video 2.*'], lite=True))
+    self.assertEqual([entry.title.text for entry in entries],
+                     ['Video 2'] + ['Video %d' % i for i in range(20, 26)])
+
+  def testDisabledByConfig(self):
+    client = SyntheticClient(googlecl.synthetic.VIDEOS, 5, lite_parse=False)
+    parse = lambda body: googlecl.fastparse.parse_feed(body)
+    client.GetFeed = lambda uri, converter=None, desired_class=None: (
+        converter(client._fetch_feed_page(uri, {})[2]))
+    list(client.iter_entries('/feeds/api/users/default/uploads',
+                             converter=parse, lite=True))
+    self.assertEqual(client.converters, [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -12,11 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import googlecl
+import googlecl.registry
 import inspect
 import logging
 import os
 import sys
-from googlecl.base import Task
 
 
 safe_encode = googlecl.safe_encode
@@ -230,37 +230,14 @@ def _run_list_transactions(client, options, args):
   TransactionFormatter(options.fields).output(transactions)
 
 
-TASKS = {'create': Task('Create a portfolio',
-                        callback=_run_create,
-                        required=['title', 'currency']),
-         'delete': Task('Delete portfolios',
-                        callback=_run_delete,
-                        required=['title']),
-         'list':   Task('List portfolios',
-                        callback=_run_list,
-                        optional=['fields']),
-         'create-pos': Task('Create position',
-                            callback=_run_create_position,
-                            required=['title', 'ticker']),
-         'delete-pos': Task('Delete positions',
-                            callback=_run_delete_positions,
-                            required=['title'],
-                            optional=['ticker']),
-         'list-pos':  Task('List positions',
-                           callback=_run_list_positions,
-                           required=['title'],
-                           optional=['fields']),
-         'create-txn': Task('Create transaction',
-                            callback=_run_create_transaction,
-                            required=['title', 'ticker', 'ttype',
-                                      'shares', 'price'],
-                            optional=['shares', 'price', 'date',
-                                      'commission', 'currency', 'notes']),
-         'list-txn': Task('List transactions',
-                          callback=_run_list_transactions,
-                          required=['title', 'ticker']),
-         'delete-txn': Task('Delete transactions',
-                            callback=_run_delete_transactions,
-                            required=['title', 'ticker'],
-                            optional=['txnid']),
-}
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'create': _run_create,
+    'delete': _run_delete,
+    'list': _run_list,
+    'create-pos': _run_create_position,
+    'delete-pos': _run_delete_positions,
+    'list-pos': _run_list_positions,
+    'create-txn': _run_create_transaction,
+    'list-txn': _run_list_transactions,
+    'delete-txn': _run_delete_transactions})
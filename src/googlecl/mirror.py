@@ -0,0 +1,481 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Local SQLite mirror of service feeds, for listing without the network.
+
+"google <service> sync" copies the entries of a service's feeds into a
+SQLite database in the data directory, as the EntryRecord snapshots that list
+tasks print from (see googlecl.base.get_record_class). List tasks given
+--offline read them back with iter_records instead of retrieving the feeds.
+
+Each feed is mirrored in scopes (one calendar, one album, ...). The first
+sync of a scope retrieves every entry. Later ones only ask for the entries
+updated since the last sync, with the updated-min query parameter, and
+remove the entries the server reports as deleted. Since not every service
+reports deletions, a scope is synced in full again once its last full sync
+is older than the mirror_full_sync_hours option.
+
+"""
+import cPickle as pickle
+import datetime
+import logging
+import re
+import sqlite3
+
+import googlecl
+import googlecl.base
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+MIRROR_FILE_NAME = 'mirror.sqlite'
+# Bump whenever the tables, or the records pickled into them, change.
+SCHEMA_VERSION = 1
+DEFAULT_FULL_SYNC_HOURS = 24
+# Incremental syncs reach back this far before the last sync, in case the
+# clocks of this machine and the server disagree.
+SYNC_OVERLAP = datetime.timedelta(minutes=5)
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+_SCHEMA = """
+CREATE TABLE entries (
+  account TEXT NOT NULL,
+  service TEXT NOT NULL,
+  feed TEXT NOT NULL,
+  scope TEXT NOT NULL,
+  id TEXT NOT NULL,
+  title TEXT,
+  updated TEXT,
+  parent TEXT,
+  sort_key TEXT,
+  record BLOB NOT NULL,
+  PRIMARY KEY (account, service, feed, id)
+);
+CREATE INDEX entries_title ON entries (account, service, feed, title);
+CREATE INDEX entries_updated ON entries (account, service, feed, updated);
+CREATE INDEX entries_parent ON entries (account, service, feed, parent,
+                                        sort_key);
+CREATE TABLE syncs (
+  account TEXT NOT NULL,
+  service TEXT NOT NULL,
+  feed TEXT NOT NULL,
+  scope TEXT NOT NULL,
+  synced TEXT NOT NULL,
+  full_synced TEXT NOT NULL,
+  PRIMARY KEY (account, service, feed, scope)
+);
+"""
+
+_PARENT_REL = 'http://schemas.google.com/docs/2007#parent'
+_CANCELED_STATUS = 'http://schemas.google.com/g/2005#event.canceled'
+
+
+class MirrorError(Exception):
+  """Base error for the local mirror."""
+  pass
+
+
+def _regexp(pattern, value):
+  """REGEXP function for SQLite, matching the way title filters do."""
+  if value is None:
+    return False
+  return re.match(pattern, value) is not None
+
+
+def format_timestamp(value):
+  """Format a UTC datetime as an RFC 3339 timestamp."""
+  return value.strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(text):
+  """Parse a timestamp written by format_timestamp."""
+  # Not strptime, which fails to import the calendar module when scripts run
+  # from the googlecl directory, where googlecl.calendar shadows it.
+  parts = re.split('[-T:Z]', text)[:6]
+  return datetime.datetime(*[int(part) for part in parts])
+
+
+class Mirror(object):
+
+  """SQLite database of mirrored entries."""
+
+  def __init__(self, path):
+    """Constructor.
+
+    Args:
+      path: Path to the database file. Created if missing.
+    """
+    self.path = path
+    try:
+      self.connection = sqlite3.connect(path)
+    except sqlite3.Error, err:
+      raise MirrorError('Could not open mirror %s: %s' % (path, err))
+    self.connection.create_function('REGEXP', 2, _regexp)
+    self._create_schema()
+
+  def _create_schema(self):
+    version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+    if version == SCHEMA_VERSION:
+      return
+    if version:
+      LOG.info('Mirror was made by another version of GoogleCL; ' +
+               'it will be synced again from scratch.')
+    self.connection.execute('DROP TABLE IF EXISTS entries')
+    self.connection.execute('DROP TABLE IF EXISTS syncs')
+    self.connection.executescript(_SCHEMA)
+    self.connection.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+    self.connection.commit()
+
+  def close(self):
+    self.connection.close()
+
+  def get_sync_times(self, account, service, feed, scope):
+    """Return when a scope was last synced, and last synced in full.
+
+    Returns:
+      Tuple of (synced, full_synced) UTC datetimes, or (None, None) if the
+      scope has never been synced.
+    """
+    row = self.connection.execute(
+        'SELECT synced, full_synced FROM syncs WHERE account = ? AND '
+        'service = ? AND feed = ? AND scope = ?',
+        (account, service, feed, scope)).fetchone()
+    if row is None:
+      return None, None
+    return parse_timestamp(row[0]), parse_timestamp(row[1])
+
+  def get_scopes(self, account, service, feed):
+    """Return the scopes of a feed that have been synced."""
+    return [row[0] for row in self.connection.execute(
+        'SELECT scope FROM syncs WHERE account = ? AND service = ? AND '
+        'feed = ?', (account, service, feed))]
+
+  def store(self, account, service, feed, scope, rows, synced, full=False):
+    """Store the entries retrieved by a sync of one scope.
+
+    Nothing is changed unless every row is stored, so a sync that fails part
+    of the way through leaves the mirror as it was.
+
+    Args:
+      account: Account the entries were retrieved with.
+      service: Name of the service, e.g. 'docs'.
+      feed: Name of the feed, e.g. 'events'.
+      scope: Part of the feed that was synced, e.g. a calendar. '' if the
+          feed is synced as a whole.
+      rows: Iterable of MirrorRow. Rows with no record remove the entry.
+      synced: UTC datetime the sync started at.
+      full: True if rows hold every entry in the scope, so that any others
+          should be removed.
+
+    Returns:
+      Tuple of the number of entries stored and removed.
+    """
+    stored_ids = set()
+    removed = 0
+    connection = self.connection
+    try:
+      if full:
+        previous_ids = set([result[0] for result in connection.execute(
+            'SELECT id FROM entries WHERE account = ? AND service = ? AND '
+            'feed = ? AND scope = ?', (account, service, feed, scope))])
+        connection.execute(
+            'DELETE FROM entries WHERE account = ? AND service = ? AND '
+            'feed = ? AND scope = ?', (account, service, feed, scope))
+      for row in rows:
+        if row.record is None:
+          removed += connection.execute(
+              'DELETE FROM entries WHERE account = ? AND service = ? AND '
+              'feed = ? AND id = ?', (account, service, feed, row.id)).rowcount
+          continue
+        connection.execute(
+            'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, '
+            '?, ?)', (account, service, feed, scope, row.id, row.title,
+                      row.updated, row.parent, row.sort_key,
+                      sqlite3.Binary(pickle.dumps(row.record,
+                                                  pickle.HIGHEST_PROTOCOL))))
+        stored_ids.add(row.id)
+      synced_text = format_timestamp(synced)
+      if full:
+        removed = len(previous_ids - stored_ids)
+        full_synced_text = synced_text
+      else:
+        full_synced_text = connection.execute(
+            'SELECT full_synced FROM syncs WHERE account = ? AND '
+            'service = ? AND feed = ? AND scope = ?',
+            (account, service, feed, scope)).fetchone()[0]
+      connection.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?, ?, ?, '
+                         '?, ?)', (account, service, feed, scope, synced_text,
+                                   full_synced_text))
+    except:
+      connection.rollback()
+      raise
+    connection.commit()
+    return len(stored_ids), removed
+
+  def remove_scope(self, account, service, feed, scope):
+    """Forget a scope, such as an album that no longer exists."""
+    self.connection.execute(
+        'DELETE FROM entries WHERE account = ? AND service = ? AND feed = ? '
+        'AND scope = ?', (account, service, feed, scope))
+    self.connection.execute(
+        'DELETE FROM syncs WHERE account = ? AND service = ? AND feed = ? '
+        'AND scope = ?', (account, service, feed, scope))
+    self.connection.commit()
+
+  def iter_records(self, account, service, feed, titles=None, parents=None,
+                   use_regex=True, with_parents=False):
+    """Iterate over the records of mirrored entries.
+
+    Args:
+      account: Account the entries were retrieved with.
+      service: Name of the service, e.g. 'docs'.
+      feed: Name of the feed, e.g. 'events'.
+      titles: List of titles to look for, as for BaseCL.iter_entries.
+          Default None for any title.
+      parents: List of titles of the folder, album, calendar or blog the
+          entries should be in, matched the same way. Default None for any.
+      use_regex: Match titles and parents as regular expressions, rather
+          than exactly. Default True.
+      with_parents: Yield (parent, record) tuples instead of records, for
+          listings that print a heading per parent. Default False.
+
+    Yields:
+      The records, by parent and then in feed order where the feed has one
+      (such as the start times of events), or by title.
+    """
+    query = ('SELECT parent, record FROM entries WHERE account = ? AND '
+             'service = ? AND feed = ?')
+    params = [account, service, feed]
+    for column, values in (('title', titles), ('parent', parents)):
+      clause, clause_params = _build_match_clause(column, values, use_regex)
+      if clause:
+        query += ' AND ' + clause
+        params.extend(clause_params)
+    query += ' ORDER BY parent, sort_key'
+    for parent, record in self.connection.execute(query, params):
+      record = pickle.loads(str(record))
+      if with_parents:
+        yield parent, record
+      else:
+        yield record
+
+  def has_feed(self, account, service, feed):
+    """Check if any scope of a feed has been synced."""
+    return bool(self.get_scopes(account, service, feed))
+
+
+def _build_match_clause(column, values, use_regex):
+  """Build a WHERE clause matching a column the way title filters do."""
+  if not values or (len(values) == 1 and not values[0]):
+    return None, []
+  values = [googlecl.safe_decode(value) for value in values]
+  if use_regex:
+    return column + ' REGEXP ?', [u'|'.join(values)]
+  return (column + ' IN (' + ', '.join(['?'] * len(values)) + ')', values)
+
+
+class MirrorRow(object):
+
+  """An entry as stored in the mirror."""
+
+  __slots__ = ('id', 'title', 'updated', 'parent', 'sort_key', 'record')
+
+  def __init__(self, id, title=None, updated=None, parent=None, sort_key=None,
+               record=None):
+    self.id = id
+    self.title = title
+    self.updated = updated
+    self.parent = parent
+    self.sort_key = sort_key
+    self.record = record
+
+
+def get_mirror_path():
+  """Return the path to the mirror database."""
+  return googlecl.get_data_path(MIRROR_FILE_NAME, create_missing_dir=True)
+
+
+def open_mirror():
+  """Open the mirror in the data directory.
+
+  Returns:
+    Mirror, or None if the database could not be opened.
+  """
+  try:
+    return Mirror(get_mirror_path())
+  except MirrorError, err:
+    LOG.error(err)
+    return None
+
+
+def is_deleted(entry):
+  """Check if the server reported an entry as deleted."""
+  if getattr(entry, 'deleted', None) is not None:
+    return True
+  status = getattr(entry, 'event_status', None)
+  return status is not None and status.value == _CANCELED_STATUS
+
+
+def get_parent_title(entry):
+  """Return the title of the first folder a Docs entry is in, or None."""
+  for link in getattr(entry, 'link', ()):
+    if link.rel == _PARENT_REL:
+      return googlecl.safe_decode(link.title)
+  return None
+
+
+def updated_before(entry, when):
+  """Check if an entry was last updated before a UTC datetime."""
+  updated = getattr(entry, 'updated', None)
+  if updated is None or not updated.text:
+    return False
+  # RFC 3339 timestamps in UTC sort as strings; fractions are ignored.
+  return updated.text[:19] < format_timestamp(when)[:19]
+
+
+def build_row(entry, record_class, parent=None, sort_key=None):
+  """Build the MirrorRow of an entry.
+
+  Args:
+    entry: Entry retrieved from the server.
+    record_class: EntryRecord subclass to snapshot the entry into.
+    parent: Title of the folder, album, calendar or blog the entry is in.
+    sort_key: String to order the entries of a parent by. Default None to
+        order them by title.
+
+  Returns:
+    MirrorRow, with no record if the entry has been deleted.
+  """
+  entry_id = entry.id.text
+  if is_deleted(entry):
+    return MirrorRow(entry_id)
+  record = record_class(entry)
+  title = googlecl.safe_decode(record.title)
+  if sort_key is None and title:
+    sort_key = title.lower()
+  updated = getattr(entry, 'updated', None)
+  return MirrorRow(entry_id, title, updated and updated.text, parent,
+                   sort_key, record)
+
+
+def sync_scope(mirror, client, account, feed, iter_entries, record_class,
+               scope='', parent=None, get_parent=None, get_sort_key=None,
+               incremental=True):
+  """Sync one scope of a feed into the mirror.
+
+  Args:
+    mirror: Mirror to store the entries in.
+    client: Client of the service (a BaseCL subclass).
+    account: Account the entries belong to, usually client.email.
+    feed: Name of the feed, e.g. 'events'.
+    iter_entries: Function taking no arguments and returning an iterator
+        over the entries of the scope. client.updated_min is set while it
+        runs, for BaseCL.iter_entries to use.
+    record_class: EntryRecord subclass to store the entries as.
+    scope: Part of the feed iter_entries covers. Default '' for all of it.
+    parent: Title of the folder, album, calendar or blog of every entry.
+    get_parent: Function returning the parent of an entry, for scopes whose
+        entries are in different parents.
+    get_sort_key: Function returning the sort key of an entry. Default None
+        to order entries by title.
+    incremental: Whether the feed understands updated-min. Default True.
+
+  Returns:
+    Tuple of the number of entries stored and removed, or None if the feed
+    could not be retrieved.
+  """
+  service = client.config_section
+  now = datetime.datetime.utcnow()
+  synced, full_synced = mirror.get_sync_times(account, service, feed, scope)
+  full_sync_hours = client.config.lazy_get(service, 'mirror_full_sync_hours',
+                                           default=DEFAULT_FULL_SYNC_HOURS,
+                                           option_type=float)
+  full = (not incremental or synced is None or
+          now - full_synced > datetime.timedelta(hours=full_sync_hours))
+  if not full:
+    client.updated_min = format_timestamp(synced - SYNC_OVERLAP)
+  feed_errors = client.feed_errors
+  def iter_rows():
+    for entry in iter_entries():
+      entry_parent = parent
+      if get_parent:
+        entry_parent = get_parent(entry)
+      yield build_row(entry, record_class, entry_parent,
+                      get_sort_key and get_sort_key(entry))
+  try:
+    try:
+      # The rows are only committed once the whole scope has been read.
+      rows = list(iter_rows())
+    except client.request_error, err:
+      LOG.error('Failed to get entries: ' + str(err))
+      return None
+  finally:
+    client.updated_min = None
+  if client.feed_errors != feed_errors:
+    return None
+  return mirror.store(account, service, feed, scope, rows, now, full)
+
+
+def report_sync(feed, counts, scope_name=None):
+  """Log the outcome of sync_scope."""
+  name = feed
+  if scope_name:
+    name = u'%s in %s' % (feed, scope_name)
+  if counts is None:
+    LOG.error(googlecl.safe_encode(u'Could not sync ' + name))
+  else:
+    LOG.info(googlecl.safe_encode(u'Synced %s: %d updated, %d removed' %
+                                  ((name,) + counts)))
+
+
+def iter_records(client, account, feed, wrapper_class, field_names,
+                 titles=None, parents=None, with_parents=False):
+  """Iterate over mirrored records, for a list task given --offline.
+
+  Args:
+    client: Client of the service.
+    account: Account the entries belong to, as given to sync_scope.
+    feed: Name of the feed, e.g. 'events'.
+    wrapper_class: BaseEntryToStringWrapper subclass the task prints with.
+    field_names: Names of the fields to be printed.
+    titles: Titles to look for. See Mirror.iter_records.
+    parents: Parents to look in. See Mirror.iter_records.
+    with_parents: Yield (parent, record) tuples. See Mirror.iter_records.
+
+  Returns:
+    Iterator over records, or None if the fields cannot be printed from the
+    mirror or the feed has not been synced.
+  """
+  if googlecl.base.get_record_class(wrapper_class, field_names) is None:
+    LOG.error('Some of the fields ' + ','.join(field_names) +
+              ' are not kept in the local mirror. Run without --offline.')
+    return None
+  mirror = open_mirror()
+  if mirror is None:
+    return None
+  if not mirror.has_feed(account, client.config_section, feed):
+    LOG.error('Nothing has been synced for ' + feed + ' yet. Run "google ' +
+              client.config_section.lower() + ' sync" first.')
+    mirror.close()
+    return None
+  return _iter_and_close(mirror, mirror.iter_records(
+      account, client.config_section, feed, titles, parents,
+      client.use_regex, with_parents))
+
+
+def _iter_and_close(mirror, records):
+  try:
+    for record in records:
+      yield record
+  finally:
+    mirror.close()
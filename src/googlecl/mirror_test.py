@@ -0,0 +1,174 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the local mirror of feeds."""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import googlecl.base_test
+import googlecl.fastparse
+import googlecl.mirror
+import googlecl.picasa
+import googlecl.synthetic
+
+
+class FakeClient(object):
+  """Serves synthetic photos, and records how they were asked for."""
+
+  config_section = 'PICASA'
+  request_error = googlecl.base_test.FakeRequestError
+  use_regex = True
+
+  def __init__(self, count, **options):
+    self.config = googlecl.base_test.FakeConfig(**options)
+    self.entries = photos(count)
+    self.updated_min = None
+    self.feed_errors = 0
+    self.requests = []
+    self.fail = False
+
+  def iter_entries(self):
+    self.requests.append(self.updated_min)
+    if self.fail:
+      self.feed_errors += 1
+      return iter(self.entries[:1])
+    return iter(self.entries)
+
+
+def photos(count):
+  body = googlecl.synthetic.build_feed(googlecl.synthetic.PHOTOS, count)
+  return googlecl.fastparse.parse_feed(body).entry
+
+
+def titles(records):
+  return [record.title for record in records]
+
+
+class MirrorTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.mirror = googlecl.mirror.Mirror(os.path.join(self.directory,
+                                                      'mirror.sqlite'))
+
+  def tearDown(self):
+    self.mirror.close()
+    shutil.rmtree(self.directory)
+
+  def store(self, rows, scope='', full=True, synced=None):
+    return self.mirror.store('me', 'PICASA', 'photos', scope, rows,
+                             synced or datetime.datetime.utcnow(), full)
+
+  def rows(self, entries, parent=None):
+    return [googlecl.mirror.build_row(entry, googlecl.picasa.PhotoRecord,
+                                      parent) for entry in entries]
+
+  def testStoreAndFilter(self):
+    entries = photos(12)
+    self.assertEqual(self.store(self.rows(entries[:6], 'Trip'), 'a'), (6, 0))
+    self.assertEqual(self.store(self.rows(entries[6:], 'Home'), 'b'), (6, 0))
+    records = list(self.mirror.iter_records('me', 'PICASA', 'photos',
+                                            titles=['IMG_00001.*'],
+                                            parents=['Home']))
+    self.assertEqual(titles(records), ['IMG_000010.jpg', 'IMG_000011.jpg',
+                                       'IMG_000012.jpg'])
+    self.assertEqual(records[0].keywords, 'synthetic, tag10')
+    records = self.mirror.iter_records('me', 'PICASA', 'photos',
+                                       titles=['IMG_000001.jpg', 'IMG_0'],
+                                       use_regex=False, with_parents=True)
+    self.assertEqual([(parent, record.title) for parent, record in records],
+                     [(u'Trip', u'IMG_000001.jpg')])
+    self.assertEqual(list(self.mirror.iter_records('you', 'PICASA',
+                                                   'photos')), [])
+
+  def testIncrementalStoreRemovesDeleted(self):
+    entries = photos(3)
+    self.store(self.rows(entries))
+    rows = self.rows(entries[:1])
+    rows.append(googlecl.mirror.MirrorRow(entries[1].id.text))
+    self.assertEqual(self.store(rows, full=False), (1, 1))
+    self.assertEqual(titles(self.mirror.iter_records('me', 'PICASA',
+                                                     'photos')),
+                     ['IMG_000001.jpg', 'IMG_000003.jpg'])
+
+  def testFullStoreReplacesScope(self):
+    entries = photos(3)
+    self.store(self.rows(entries))
+    self.assertEqual(self.store(self.rows(entries[2:])), (1, 2))
+    self.assertEqual(titles(self.mirror.iter_records('me', 'PICASA',
+                                                     'photos')),
+                     ['IMG_000003.jpg'])
+
+  def testOtherSchemaVersionIsDropped(self):
+    self.store(self.rows(photos(2)))
+    self.mirror.connection.execute('PRAGMA user_version = 999')
+    self.mirror.connection.commit()
+    self.mirror.close()
+    self.mirror = googlecl.mirror.Mirror(self.mirror.path)
+    self.assertFalse(self.mirror.has_feed('me', 'PICASA', 'photos'))
+
+
+class SyncScopeTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.mirror = googlecl.mirror.Mirror(os.path.join(self.directory,
+                                                      'mirror.sqlite'))
+
+  def tearDown(self):
+    self.mirror.close()
+    shutil.rmtree(self.directory)
+
+  def sync(self, client):
+    return googlecl.mirror.sync_scope(self.mirror, client, 'me', 'photos',
+                                      client.iter_entries,
+                                      googlecl.picasa.PhotoRecord,
+                                      parent='Album')
+
+  def testIncrementalAfterFirstSync(self):
+    client = FakeClient(5)
+    self.assertEqual(self.sync(client), (5, 0))
+    self.assertEqual(self.sync(client), (5, 0))
+    self.assertEqual(client.requests[0], None)
+    synced, full_synced = self.mirror.get_sync_times('me', 'PICASA',
+                                                     'photos', '')
+    self.assertEqual(client.requests[1], googlecl.mirror.format_timestamp(
+        full_synced - googlecl.mirror.SYNC_OVERLAP))
+    self.assertEqual(client.updated_min, None)
+
+  def testFullSyncWhenDue(self):
+    client = FakeClient(5, mirror_full_sync_hours=0)
+    self.sync(client)
+    self.mirror.connection.execute(
+        "UPDATE syncs SET full_synced = '2010-01-01T00:00:00Z'")
+    self.sync(client)
+    self.assertEqual(client.requests, [None, None])
+
+  def testFailedSyncKeepsMirror(self):
+    client = FakeClient(5)
+    self.sync(client)
+    client.fail = True
+    self.assertEqual(self.sync(client), None)
+    self.assertEqual(len(list(self.mirror.iter_records('me', 'PICASA',
+                                                       'photos'))), 5)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,366 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Formatting and printing the entries listed by list tasks.
+
+A formatter works out how to read each field once, when it is created, and
+then turns each wrapped entry into a single encoded row. RowFormatter writes
+the delimited rows GoogleCL has always printed; JsonLinesFormatter,
+CsvFormatter and TsvFormatter write the rows of --output. print_entries
+writes the rows for a whole listing through an EntryPrinter, which batches
+them into few writes to stdout.
+
+  formatter = build_formatter(['title', 'url'], ',', options.output)
+  print_entries((Wrapper(entry) for entry in entries), formatter)
+
+"""
+import csv
+import logging
+import operator
+import sys
+import time
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
+
+import googlecl
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+# Rows to collect before writing them out, when stdout is not a terminal.
+BUFFER_ROWS = 512
+# Longest time, in seconds, that a row waits in the buffer once a later one
+# has been produced. Keeps a pipe fed while a feed is still being retrieved.
+BUFFER_SECONDS = 0.5
+
+# Values of --output.
+OUTPUT_FORMATS = ('jsonl', 'csv', 'tsv')
+
+
+class EntryFormatter(object):
+
+  """Reads the fields of wrapped entries. Subclasses turn them into rows."""
+
+  # True for formats that are meant to be read by other programs, whose
+  # output should hold nothing but rows.
+  structured = False
+
+  def __init__(self, field_names, missing_field_value=None,
+               intra_property_delimiter=';'):
+    """Constructor.
+
+    Args:
+      field_names: List of fields to print, as given to --fields.
+      missing_field_value: Value to use for fields that are missing or empty.
+      intra_property_delimiter: String to put between the values of fields
+          that have more than one, such as tags.
+    """
+    self.field_names = list(field_names)
+    self.missing_field_value = missing_field_value
+    self.intra_property_delimiter = intra_property_delimiter
+    # Accessors for the wrapper attributes behind each field.
+    self.fields = [(name, operator.attrgetter(name.replace('-', '_')))
+                   for name in field_names]
+
+  def get_missing_value(self, wrapped_entry, name, err):
+    """Return the value of a field that could not be read from the wrapper."""
+    if isinstance(err, AttributeError):
+      LOG.debug(err.args[0] + ' (value for field ' + name + ')')
+      try:
+        # Last ditch effort to blindly grab the attribute
+        return (getattr(wrapped_entry.entry, name).text or
+                self.missing_field_value)
+      except AttributeError:
+        pass
+    else:
+      LOG.debug(err.args[0] + ' (Did not add value for field ' + name + ')')
+    return self.missing_field_value
+
+  def get_values(self, wrapped_entry):
+    """Return the raw value of every field, in order."""
+    wrapped_entry.intra_property_delimiter = self.intra_property_delimiter
+    values = []
+    for name, getter in self.fields:
+      try:
+        # Replace NoneTypes and empty strings with the missing field value.
+        value = getter(wrapped_entry) or self.missing_field_value
+      except (ValueError, AttributeError), err:
+        value = self.get_missing_value(wrapped_entry, name, err)
+      values.append(value)
+    return values
+
+  def get_header(self):
+    """Return the row to print before the first entry, or None.
+
+    A header is returned once per formatter, so listings printed in several
+    parts (such as one per calendar) only get one.
+    """
+    return None
+
+  def format(self, wrapped_entry):
+    """Return a wrapped entry as a row, as an encoded string."""
+    raise NotImplementedError
+
+
+class RowFormatter(EntryFormatter):
+
+  """Formats wrapped entries as delimited rows of fields."""
+
+  def __init__(self, field_names, delimiter=',', missing_field_value=None,
+               newline_replacer=' '):
+    """Constructor.
+
+    Args:
+      field_names: List of fields to print, as given to --fields.
+      delimiter: String to put between fields. Default ','.
+      missing_field_value: Value to print for fields that are missing or
+          empty. Default None, which prints as "None".
+      newline_replacer: String to replace newlines in fields with. Default ' '.
+          Set to None to leave newlines in place.
+    """
+    self.delimiter = googlecl.safe_decode(delimiter or ',')
+    self.byte_delimiter = self.delimiter.encode('utf-8')
+    if self.delimiter.strip() == ',':
+      intra_property_delimiter = ';'
+    else:
+      intra_property_delimiter = ','
+    EntryFormatter.__init__(self, field_names,
+                            googlecl.safe_decode(missing_field_value),
+                            intra_property_delimiter)
+    self.newline_replacer = newline_replacer
+
+  def format_values(self, wrapped_entry):
+    """Return the values of every field, ready to be joined into a row.
+
+    Values are unicode, or byte strings encoded in UTF-8.
+    """
+    wrapped_entry.intra_property_delimiter = self.intra_property_delimiter
+    delimiter = self.delimiter
+    byte_delimiter = self.byte_delimiter
+    newline_replacer = self.newline_replacer
+    values = []
+    for name, getter in self.fields:
+      try:
+        # Replace NoneTypes and empty strings with the missing field value.
+        value = getter(wrapped_entry) or self.missing_field_value
+      except (ValueError, AttributeError), err:
+        value = self.get_missing_value(wrapped_entry, name, err)
+      if name == 'xml':
+        # The raw xml is dumped as is, in place of the fields before it.
+        values = [value]
+        continue
+      # Ensure the delimiter won't appear in a non-delineation role. Byte
+      # strings are left for format to decode, a row at a time.
+      if isinstance(value, str):
+        value = value.replace(byte_delimiter, ' ')
+      else:
+        value = googlecl.safe_decode(value).replace(delimiter, ' ')
+      if newline_replacer is not None:
+        value = value.replace('\n', newline_replacer)
+      values.append(value)
+    return values
+
+  def format(self, wrapped_entry):
+    """Return a wrapped entry as a row, encoded for the terminal."""
+    values = self.format_values(wrapped_entry)
+    try:
+      # Fast when the byte strings are ASCII, as they usually are.
+      row = self.delimiter.join(values)
+    except UnicodeDecodeError:
+      # Apparently, atom(?) doesn't always return a Unicode type when there
+      # are non-latin characters, so force everything to Unicode.
+      row = self.delimiter.join([googlecl.safe_decode(value)
+                                 for value in values])
+    return row.rstrip(self.delimiter).encode(googlecl.TERMINAL_ENCODING,
+                                             'backslashreplace')
+
+
+def _to_text(value):
+  """Return a field value as unicode, or None if it is None."""
+  if value is None or isinstance(value, unicode):
+    return value
+  return googlecl.safe_decode(value)
+
+
+class JsonLinesFormatter(EntryFormatter):
+
+  """Formats wrapped entries as JSON objects, one per line.
+
+  Keys are the field names, in the order given. Missing fields are null.
+  """
+
+  structured = True
+
+  def __init__(self, field_names):
+    EntryFormatter.__init__(self, field_names)
+    # Keys never change, so encode them once.
+    self.keys = [json.dumps(googlecl.safe_decode(name)) + ': '
+                 for name in self.field_names]
+
+  def format(self, wrapped_entry):
+    """Return a wrapped entry as a line of ASCII JSON."""
+    values = self.get_values(wrapped_entry)
+    # Joined by hand to keep the fields in order; json escapes any newlines.
+    return '{' + ', '.join([key + json.dumps(_to_text(value))
+                            for key, value in zip(self.keys, values)]) + '}'
+
+
+class _RowHolder(object):
+  """File-like target for csv.writer, keeping the last row written."""
+  __slots__ = ('row',)
+
+  def write(self, row):
+    self.row = row
+
+
+class CsvFormatter(EntryFormatter):
+
+  """Formats wrapped entries as CSV records, quoted as needed.
+
+  Rows are encoded in UTF-8, and the first row holds the field names.
+  Missing fields are empty.
+  """
+
+  structured = True
+  dialect = csv.excel
+
+  def __init__(self, field_names):
+    EntryFormatter.__init__(self, field_names, missing_field_value='')
+    self._holder = _RowHolder()
+    # The printer puts a newline after each row; values keep their own.
+    self._writer = csv.writer(self._holder, self.dialect, lineterminator='')
+    self._header_pending = True
+
+  def _write_row(self, values):
+    self._writer.writerow([_to_text(value).encode('utf-8')
+                           for value in values])
+    return self._holder.row
+
+  def get_header(self):
+    if not self._header_pending:
+      return None
+    self._header_pending = False
+    return self._write_row(self.field_names)
+
+  def format(self, wrapped_entry):
+    """Return a wrapped entry as a CSV record."""
+    return self._write_row(self.get_values(wrapped_entry))
+
+
+class TsvFormatter(CsvFormatter):
+
+  """Formats wrapped entries as tab separated records, quoted as needed."""
+
+  dialect = csv.excel_tab
+
+
+_STRUCTURED_FORMATTERS = {'jsonl': JsonLinesFormatter,
+                          'csv': CsvFormatter,
+                          'tsv': TsvFormatter}
+
+
+def build_formatter(field_names, delimiter=',', output_format=None):
+  """Create the formatter for a list task.
+
+  Args:
+    field_names: List of fields to print, as given to --fields.
+    delimiter: String to put between fields of delimited rows.
+    output_format: One of OUTPUT_FORMATS, as given to --output. Default None
+        for delimited rows.
+
+  Returns:
+    EntryFormatter
+  """
+  if not output_format:
+    return RowFormatter(field_names, delimiter)
+  try:
+    formatter_class = _STRUCTURED_FORMATTERS[output_format]
+  except KeyError:
+    raise ValueError('Unknown output format: ' + output_format)
+  return formatter_class(field_names)
+
+
+class EntryPrinter(object):
+
+  """Writes formatted rows to a file, a batch at a time."""
+
+  def __init__(self, formatter, out=None, buffer_rows=BUFFER_ROWS):
+    """Constructor.
+
+    Args:
+      formatter: EntryFormatter to format entries with. Its header, if it
+          has one, is the first row written.
+      out: File to write to. Default None for sys.stdout.
+      buffer_rows: Number of rows to collect before writing. Rows going to a
+          terminal are written as they come, so that they show up while the
+          rest of a feed is retrieved. Otherwise, rows are also written once
+          they have waited BUFFER_SECONDS.
+    """
+    self.formatter = formatter
+    self.out = out or sys.stdout
+    isatty = getattr(self.out, 'isatty', None)
+    if isatty and isatty():
+      buffer_rows = 1
+    self.buffer_rows = max(buffer_rows, 1)
+    self.rows = []
+    self.deadline = None
+    header = formatter.get_header()
+    if header is not None:
+      self.rows.append(header)
+
+  def write(self, wrapped_entry):
+    """Format a wrapped entry, and write it once enough rows are ready."""
+    rows = self.rows
+    rows.append(self.formatter.format(wrapped_entry))
+    if len(rows) >= self.buffer_rows:
+      self.flush()
+    elif self.deadline is None:
+      self.deadline = time.time() + BUFFER_SECONDS
+    elif time.time() >= self.deadline:
+      # Rows come a page at a time, so this writes out the rows of earlier
+      # pages once the next one has been retrieved.
+      self.flush()
+
+  def flush(self):
+    """Write any rows still held."""
+    if self.rows:
+      self.rows.append('')
+      self.out.write('\n'.join(self.rows))
+      self.rows = []
+    self.deadline = None
+    self.out.flush()
+
+
+def print_entries(wrapped_entries, formatter, out=None):
+  """Print a row for each wrapped entry.
+
+  Args:
+    wrapped_entries: Iterable of BaseEntryToStringWrapper instances.
+    formatter: EntryFormatter to format them with.
+    out: File to write to. Default None for sys.stdout.
+
+  Returns:
+    Number of entries printed.
+  """
+  printer = EntryPrinter(formatter, out)
+  count = 0
+  try:
+    for wrapped_entry in wrapped_entries:
+      printer.write(wrapped_entry)
+      count += 1
+  finally:
+    printer.flush()
+  return count
@@ -0,0 +1,160 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for formatting and printing listed entries."""
+
+import csv
+import unittest
+from StringIO import StringIO
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
+
+import googlecl.base
+import googlecl.output
+
+
+class FakeWrapper(object):
+  def __init__(self, **fields):
+    self.__dict__.update(fields)
+    self.entry = None
+
+
+class CountingFile(StringIO):
+  def __init__(self):
+    StringIO.__init__(self)
+    self.writes = 0
+
+  def write(self, data):
+    self.writes += 1
+    StringIO.write(self, data)
+
+
+class RowFormatterTest(unittest.TestCase):
+
+  def testFormat(self):
+    formatter = googlecl.output.RowFormatter(['title', 'url-site', 'summary'],
+                                             ',')
+    wrapper = FakeWrapper(title='a, b', url_site='http://x', summary='1\n2')
+    self.assertEqual(formatter.format(wrapper), 'a  b,http://x,1 2')
+    self.assertEqual(wrapper.intra_property_delimiter, ';')
+
+  def testMissingFields(self):
+    formatter = googlecl.output.RowFormatter(['title', 'tags', 'nothing'], ' ',
+                                             missing_field_value='N/A')
+    wrapper = FakeWrapper(title='photo', tags='')
+    self.assertEqual(formatter.format(wrapper), 'photo N/A N/A')
+
+  def testXmlIsDumpedAsIs(self):
+    formatter = googlecl.output.RowFormatter(['title', 'xml'], ',')
+    wrapper = FakeWrapper(title='doc', xml='<entry>\n, </entry>')
+    self.assertEqual(formatter.format(wrapper), '<entry>\n, </entry>')
+
+  def testNonAscii(self):
+    formatter = googlecl.output.RowFormatter(['title', 'summary'], ',')
+    wrapper = FakeWrapper(title=u'caf\xe9',
+                          summary='cr\xc3\xa8me, br\xc3\xbbl\xc3\xa9e')
+    self.assertEqual(
+        formatter.format(wrapper),
+        u'caf\xe9,cr\xe8me  br\xfbl\xe9e'.encode(googlecl.TERMINAL_ENCODING,
+                                                 'backslashreplace'))
+
+  def testCompileEntryString(self):
+    wrapper = FakeWrapper(title='a', name='b')
+    self.assertEqual(
+        googlecl.base.compile_entry_string(wrapper, ['title', 'name'], '|'),
+        'a|b')
+
+
+class StructuredFormatterTest(unittest.TestCase):
+
+  def testJsonLines(self):
+    formatter = googlecl.output.build_formatter(
+        ['title', 'url-site', 'summary', 'nothing'], ',', 'jsonl')
+    wrapper = FakeWrapper(title='a, "b"', url_site='http://x',
+                          summary='cr\xc3\xa8me\n')
+    row = formatter.format(wrapper)
+    self.assertEqual(row, '{"title": "a, \\"b\\"", "url-site": "http://x", '
+                     '"summary": "cr\\u00e8me\\n", "nothing": null}')
+    self.assertEqual(json.loads(row)['summary'], u'cr\xe8me\n')
+    self.assertEqual(formatter.get_header(), None)
+
+  def testCsv(self):
+    formatter = googlecl.output.build_formatter(['title', 'tags', 'summary'],
+                                                '|', 'csv')
+    wrapper = FakeWrapper(title='a, b', tags='x;y', summary=u'caf\xe9\n"2"')
+    self.assertEqual(formatter.get_header(), 'title,tags,summary')
+    self.assertEqual(formatter.get_header(), None)
+    row = formatter.format(wrapper)
+    self.assertEqual(row, '"a, b",x;y,"caf\xc3\xa9\n""2"""')
+    self.assertEqual(list(csv.reader(StringIO(row))),
+                     [['a, b', 'x;y', 'caf\xc3\xa9\n"2"']])
+    self.assertEqual(wrapper.intra_property_delimiter, ';')
+
+  def testTsv(self):
+    formatter = googlecl.output.build_formatter(['title', 'nothing'], ',',
+                                                'tsv')
+    self.assertEqual(formatter.format(FakeWrapper(title='a\tb')), '"a\tb"\t')
+
+  def testUnknownFormat(self):
+    self.assertRaises(ValueError, googlecl.output.build_formatter, ['title'],
+                      ',', 'yaml')
+
+
+class PrintEntriesTest(unittest.TestCase):
+
+  def testWritesInBatches(self):
+    out = CountingFile()
+    formatter = googlecl.output.RowFormatter(['title'], ',')
+    wrappers = [FakeWrapper(title=str(i)) for i in range(1000)]
+    self.assertEqual(googlecl.output.print_entries(wrappers, formatter, out),
+                     1000)
+    self.assertEqual(out.getvalue(),
+                     ''.join(['%d\n' % i for i in range(1000)]))
+    self.assertEqual(out.writes, 2)
+
+  def testHeaderOncePerFormatter(self):
+    out = StringIO()
+    formatter = googlecl.output.CsvFormatter(['title'])
+    googlecl.output.print_entries([], formatter, out)
+    googlecl.output.print_entries([FakeWrapper(title='a')], formatter, out)
+    self.assertEqual(out.getvalue(), 'title\na\n')
+
+  def testWritesBufferedRowsAfterDelay(self):
+    out = CountingFile()
+    formatter = googlecl.output.JsonLinesFormatter(['title'])
+    printer = googlecl.output.EntryPrinter(formatter, out)
+    printer.write(FakeWrapper(title='a'))
+    self.assertEqual(out.writes, 0)
+    printer.deadline = 0
+    printer.write(FakeWrapper(title='b'))
+    self.assertEqual(out.getvalue(), '{"title": "a"}\n{"title": "b"}\n')
+
+  def testFlushesOnError(self):
+    out = StringIO()
+    formatter = googlecl.output.RowFormatter(['title'], ',')
+    def wrappers():
+      yield FakeWrapper(title='first')
+      raise KeyboardInterrupt
+    self.assertRaises(KeyboardInterrupt, googlecl.output.print_entries,
+                      wrappers(), formatter, out)
+    self.assertEqual(out.getvalue(), 'first\n')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,6 +14,8 @@
 import datetime
 import googlecl
 import googlecl.base
+import googlecl.mirror
+import googlecl.registry
 import logging
 
 
@@ -49,15 +51,58 @@ def _map_access_string(access_string, default_value='private'):
   return default_value
 
 
+EXIF_TAGS = ('distance', 'exposure', 'flash', 'focallength', 'fstop',
+             'imageUniqueID', 'iso', 'make', 'model', 'time')
+
+
+class PhotoRecord(googlecl.base.EntryRecord):
+  """Snapshot of a photo entry. See googlecl.base.EntryRecord."""
+  __slots__ = ('keywords', 'exif')
+
+  def snapshot(self, entry):
+    googlecl.base.EntryRecord.snapshot(self, entry)
+    self.keywords = googlecl.base.get_text(entry, 'media', 'keywords')
+    exif = getattr(entry, 'exif', None)
+    if exif is None:
+      self.exif = None
+    else:
+      self.exif = dict((tag, googlecl.base.get_text(exif, tag))
+                       for tag in EXIF_TAGS)
+
+
+class AlbumRecord(googlecl.base.EntryRecord):
+  """Snapshot of an album entry. See googlecl.base.EntryRecord."""
+  __slots__ = ('access', 'location', 'published')
+
+  def snapshot(self, entry):
+    googlecl.base.EntryRecord.snapshot(self, entry)
+    self.access = googlecl.base.get_text(entry, 'access')
+    self.location = googlecl.base.get_text(entry, 'location')
+    self.published = googlecl.base.get_text(entry, 'published')
+
+
 class PhotoEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
+  FIELDS = googlecl.base.field_table([
+      ('caption tags labels keywords url_download',
+       googlecl.base.Field(lite=True, record=True)),
+      ('distance ev exposure shutter speed flash focallength fstop '
+       'imageUniqueID id iso make model time when',
+       googlecl.base.Field(record=True))],
+      base=googlecl.base.BaseEntryToStringWrapper.FIELDS)
+  RECORD_CLASS = PhotoRecord
   caption = googlecl.base.BaseEntryToStringWrapper.summary
 
-  @property
+  def _exif(self, tag):
+    if self.record.exif is None:
+      raise AttributeError('Entry has no EXIF data')
+    return self.record.exif[tag]
+
+  @googlecl.base.cached_property
   def distance(self):
     """The distance to the subject."""
-    return self.entry.exif.distance.text
+    return self._exif('distance')
 
-  @property
+  @googlecl.base.cached_property
   def ev(self):
     """Exposure value, if possible to calculate"""
     try:
@@ -80,60 +125,60 @@ class PhotoEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
       # Don't really care what goes wrong -- result is the same.
       return None
 
-  @property
+  @googlecl.base.cached_property
   def exposure(self):
     """The exposure time used."""
-    return self.entry.exif.exposure.text
+    return self._exif('exposure')
   shutter = exposure
   speed = exposure
 
-  @property
+  @googlecl.base.cached_property
   def flash(self):
     """Boolean value indicating whether the flash was used."""
-    return self.entry.exif.flash.text
+    return self._exif('flash')
 
-  @property
+  @googlecl.base.cached_property
   def focallength(self):
     """The focal length used."""
-    return self.entry.exif.focallength.text
+    return self._exif('focallength')
 
-  @property
+  @googlecl.base.cached_property
   def fstop(self):
     """The fstop value used."""
-    return self.entry.exif.fstop.text
+    return self._exif('fstop')
 
-  @property
+  @googlecl.base.cached_property
   def imageUniqueID(self):
     """The unique image ID for the photo."""
-    return self.entry.exif.imageUniqueID.text
+    return self._exif('imageUniqueID')
   id = imageUniqueID
 
-  @property
+  @googlecl.base.cached_property
   def iso(self):
     """The iso equivalent value used."""
-    return self.entry.exif.iso.text
+    return self._exif('iso')
 
-  @property
+  @googlecl.base.cached_property
   def make(self):
     """The make of the camera used."""
-    return self.entry.exif.make.text
+    return self._exif('make')
 
-  @property
+  @googlecl.base.cached_property
   def model(self):
     """The model of the camera used."""
-    return self.entry.exif.model.text
+    return self._exif('model')
 
-  @property
+  @googlecl.base.cached_property
   def tags(self):
     """Tags / keywords or labels."""
-    tags_text = self.entry.media.keywords.text
+    tags_text = self.record.keywords
     tags_text = tags_text.replace(', ', ',')
     tags_list = tags_text.split(',')
     return self.intra_property_delimiter.join(tags_list)
   labels = tags
   keywords = tags
 
-  @property
+  @googlecl.base.cached_property
   def time(self):
     """The date/time the photo was taken.
 
@@ -141,22 +186,28 @@ class PhotoEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
     Note: The value of this element should always be identical to the value of
     the <gphoto:timestamp>.
     """
-    return self.entry.exif.time.text
+    return self._exif('time')
   when = time
 
   # Overload from base.EntryToStringWrapper to use make_download_url
-  @property
+  @googlecl.base.cached_property
   def url_download(self):
     """URL to the original uploaded image, suitable for downloading from."""
     return make_download_url(self.url_direct)
 
 
 class AlbumEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
-  @property
+  FIELDS = googlecl.base.field_table([
+      ('access visibility location where published when',
+       googlecl.base.Field(lite=True, record=True))],
+      base=googlecl.base.BaseEntryToStringWrapper.FIELDS)
+  RECORD_CLASS = AlbumRecord
+
+  @googlecl.base.cached_property
   def access(self):
     """Access level of the album, one of "public", "private", or "unlisted"."""
     # Convert values to ones the user selects on the web
-    txt = self.entry.access.text
+    txt = self.record.access
     if txt == 'protected':
       return 'private'
     if txt == 'private':
@@ -164,16 +215,16 @@ class AlbumEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
     return txt
   visibility = access
 
-  @property
+  @googlecl.base.cached_property
   def location(self):
     """Location of the album (where pictures were taken)."""
-    return self.entry.location.text
+    return self.record.location
   where = location
 
-  @property
+  @googlecl.base.cached_property
   def published(self):
     """When the album was published/uploaded in local time."""
-    date = datetime.datetime.strptime(self.entry.published.text,
+    date = datetime.datetime.strptime(self.record.published,
                                       googlecl.calendar.date.QUERY_DATE_FORMAT)
     date = date - googlecl.calendar.date.get_utc_timedelta()
     return date.strftime('%Y-%m-%dT%H:%M:%S')
@@ -222,26 +273,81 @@ def _run_delete(client, options, args):
 
 def _run_list(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
-  entries = client.build_entry_list(user=options.owner or options.user,
-                                    titles=titles_list,
-                                    query=options.query,
-                                    force_photos=True,
-                                    photo_title=options.photo)
-  for entry in entries:
-    print googlecl.base.compile_entry_string(PhotoEntryToStringWrapper(entry),
-                                             options.fields.split(','),
-                                             delimiter=options.delimiter)
+  user = options.owner or options.user
+
+  def iter_entries(fields, lite, record_class):
+    return client.iter_entry_list(user=user,
+                                  titles=titles_list,
+                                  query=options.query,
+                                  force_photos=True,
+                                  photo_title=options.photo,
+                                  lite=lite,
+                                  record_class=record_class)
+  googlecl.base.run_list(options, PhotoEntryToStringWrapper, iter_entries,
+                         client=client,
+                         mirror_scope=(user, 'photos',
+                                       options.photo and [options.photo],
+                                       titles_list))
 
 
 def _run_list_albums(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
-  entries = client.build_entry_list(user=options.owner or options.user,
-                                    titles=titles_list,
-                                    force_photos=False)
-  for entry in entries:
-    print googlecl.base.compile_entry_string(AlbumEntryToStringWrapper(entry),
-                                             options.fields.split(','),
-                                             delimiter=options.delimiter)
+  user = options.owner or options.user
+
+  def iter_entries(fields, lite, record_class):
+    return client.iter_entry_list(user=user,
+                                  titles=titles_list,
+                                  force_photos=False,
+                                  lite=lite,
+                                  record_class=record_class)
+  googlecl.base.run_list(options, AlbumEntryToStringWrapper, iter_entries,
+                         client=client,
+                         mirror_scope=(user, 'albums', titles_list, None))
+
+
+def _run_sync(client, options, args):
+  user = options.owner or options.user
+  mirror = googlecl.mirror.open_mirror()
+  if mirror is None:
+    return
+  albums = []
+  def iter_albums():
+    for album in client.IterAlbum(user=user):
+      albums.append(album)
+      yield album
+  try:
+    # Album feeds do not report deleted albums, so always sync them in full.
+    counts = googlecl.mirror.sync_scope(mirror, client, user, 'albums',
+                                        iter_albums, AlbumRecord,
+                                        incremental=False)
+    googlecl.mirror.report_sync('albums', counts)
+    if counts is None:
+      return
+    album_ids = set()
+    for album in albums:
+      album_id = album.gphoto_id.text
+      album_title = googlecl.safe_decode(album.title.text)
+      album_ids.add(album_id)
+      # An album is updated whenever its photos are, so skip those that have
+      # not changed since they were last synced.
+      synced, _ = mirror.get_sync_times(user, SECTION_HEADER, 'photos',
+                                        album_id)
+      if synced and googlecl.mirror.updated_before(
+          album, synced - googlecl.mirror.SYNC_OVERLAP):
+        continue
+      uri = '/data/feed/api/user/%s/albumid/%s?kind=photo' % (user, album_id)
+      counts = googlecl.mirror.sync_scope(mirror, client, user, 'photos',
+                                          lambda: client.IterEntries(uri),
+                                          PhotoRecord, scope=album_id,
+                                          parent=album_title,
+                                          incremental=False)
+      googlecl.mirror.report_sync('photos', counts, album_title)
+    deleted_album_ids = set(mirror.get_scopes(user, SECTION_HEADER,
+                                              'photos')) - album_ids
+    for album_id in deleted_album_ids:
+      mirror.remove_scope(user, SECTION_HEADER, 'photos', album_id)
+  finally:
+    mirror.close()
 
 
 def _run_post(client, options, args):
@@ -284,32 +390,13 @@ def _run_tag(client, options, args):
     LOG.error('No matches for the title and/or query you gave.')
 
 
-TASKS = {'create': googlecl.base.Task('Create an album',
-                                      callback=_run_create,
-                                      required='title',
-                                      optional=['src', 'date',
-                                                'summary', 'tags', 'access']),
-         'post': googlecl.base.Task('Post photos to an album',
-                                    callback=_run_post,
-                                    required=['title', 'src'],
-                                    optional=['tags', 'owner', 'photo',
-                                              'summary']),
-         'delete': googlecl.base.Task('Delete photos or albums',
-                                      callback=_run_delete,
-                                      required=[['title', 'query']],
-                                      optional='photo'),
-         'list': googlecl.base.Task('List photos', callback=_run_list,
-                                    required=['fields', 'delimiter'],
-                                    optional=['title', 'query',
-                                              'owner', 'photo']),
-         'list-albums': googlecl.base.Task('List albums',
-                                           callback=_run_list_albums,
-                                           required=['fields', 'delimiter'],
-                                           optional=['title', 'owner']),
-         'get': googlecl.base.Task('Download albums', callback=_run_get,
-                                   required=['title', 'dest'],
-                                   optional=['owner', 'format', 'photo']),
-         'tag': googlecl.base.Task('Tag/caption photos', callback=_run_tag,
-                                   required=[['title', 'query'],
-                                             ['tags', 'summary']],
-                                   optional=['owner', 'photo'])}
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'create': _run_create,
+    'post': _run_post,
+    'delete': _run_delete,
+    'list': _run_list,
+    'list-albums': _run_list_albums,
+    'get': _run_get,
+    'tag': _run_tag,
+    'sync': _run_sync})
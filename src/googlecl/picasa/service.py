@@ -30,6 +30,7 @@ from gdata.photos.service import PhotosService, GooglePhotosException
 import googlecl
 import googlecl.base
 import googlecl.service
+import googlecl.stats
 import googlecl.picasa
 import googlecl.calendar.date
 
@@ -70,6 +71,9 @@ class PhotosServiceCL(PhotosService, googlecl.service.BaseServiceCL):
 
   """
 
+  # PhotosService.GetFeed parses any kind of Picasa feed.
+  default_feed_converter = staticmethod(gdata.photos.AnyFeedFromString)
+
   def __init__(self, config):
     """Constructor."""
     PhotosService.__init__(self)
@@ -77,9 +81,10 @@ class PhotosServiceCL(PhotosService, googlecl.service.BaseServiceCL):
                                             googlecl.picasa.SECTION_HEADER,
                                             config)
 
-  def build_entry_list(self, user='default', titles=None, query=None,
-                       force_photos=False, photo_title=None):
-    """Build a list of entries of either photos or albums.
+  def iter_entry_list(self, user='default', titles=None, query=None,
+                      force_photos=False, photo_title=None, lite=False,
+                      record_class=None):
+    """Iterate over entries of either photos or albums.
 
     If no title is specified, entries will be of photos matching the query.
     If no query is specified, entries will be of albums matching the title.
@@ -94,31 +99,56 @@ class PhotosServiceCL(PhotosService, googlecl.service.BaseServiceCL):
                     typically be returned. The entries will be for all photos
                     in each album.
       photo_title: Title of the photo(s) to return. Default None for all photos.
+      lite: Return lite entries. See BaseCL.iter_entries. Albums searched for
+            photos are always full entries.
+      record_class: Snapshot entries into this record class. See
+                    BaseCL.iter_entries.
 
-    Returns:
-      A list of entries, as specified above.
+    Yields:
+      Entries, as specified above, as each page of them is retrieved.
 
     """
+    want_albums = titles[0] or not(titles[0] or query)
+    if not (photo_title or query or force_photos):
+      if want_albums:
+        for entry in self.IterAlbum(user=user, titles=titles, lite=lite,
+                                    record_class=record_class):
+          yield entry
+      return
+
     album_entry = []
-    if titles[0] or not(titles[0] or query):
+    if want_albums:
       album_entry = self.GetAlbum(user=user, titles=titles)
-    if photo_title or query or force_photos:
-      uri = '/data/feed/api/user/' + user
-      if query and not album_entry:
-        entries = self.GetEntries(uri + '?kind=photo&q=' + query, photo_title)
-      else:
-        entries = []
-        uri += '/albumid/%s?kind=photo'
-        if query:
-          uri += '&q=' + query
-        for album in album_entry:
-          photo_entries = self.GetEntries(uri % album.gphoto_id.text,
-                                          photo_title)
-          entries.extend(photo_entries)
+    uri = '/data/feed/api/user/' + user
+    if query and not album_entry:
+      for entry in self.IterEntries(uri + '?kind=photo&q=' + query,
+                                    photo_title, lite=lite,
+                                    record_class=record_class):
+        yield entry
     else:
-      entries = album_entry
+      uri += '/albumid/%s?kind=photo'
+      if query:
+        uri += '&q=' + query
+      for album in album_entry:
+        for entry in self.IterEntries(uri % album.gphoto_id.text,
+                                      photo_title, lite=lite,
+                                      record_class=record_class):
+          yield entry
+
+  IterEntryList = iter_entry_list
+
+  def build_entry_list(self, user='default', titles=None, query=None,
+                       force_photos=False, photo_title=None):
+    """Build a list of entries of either photos or albums.
+
+    See iter_entry_list for a description of the arguments.
+
+    Returns:
+      A list of entries, as specified above.
 
-    return entries
+    """
+    return list(self.iter_entry_list(user, titles, query, force_photos,
+                                      photo_title))
 
   def create_album(self, title, summary, access, date):
     """Create photo album
@@ -235,10 +265,34 @@ class PhotosServiceCL(PhotosService, googlecl.service.BaseServiceCL):
             photo_concat += 1
         LOG.info(safe_encode('Downloading %s to %s' %
                              (safe_decode(photo_or_video.title.text), path)))
+        start_time = time.time()
         urllib.urlretrieve(url, path)
+        googlecl.stats.record_transfer('download', path,
+                                       time.time() - start_time)
 
   DownloadAlbum = download_album
 
+  def iter_album(self, user='default', titles=None, lite=False,
+                 record_class=None):
+    """Iterate over albums from a user feed.
+
+    Keyword arguments:
+      user: The user whose albums are being retrieved. (Default 'default')
+      titles: list or string Title(s) that the album(s) should have.
+              Default None, for all albums.
+      lite: Return lite entries. See BaseCL.iter_entries.
+      record_class: Snapshot entries into this record class. See
+                    BaseCL.iter_entries.
+
+    Yields:
+      Albums that match parameters.
+
+    """
+    uri = '/data/feed/api/user/' + user + '?kind=album'
+    return self.IterEntries(uri, titles, lite=lite, record_class=record_class)
+
+  IterAlbum = iter_album
+
   def get_album(self, user='default', titles=None):
     """Get albums from a user feed.
 
@@ -251,8 +305,7 @@ class PhotosServiceCL(PhotosService, googlecl.service.BaseServiceCL):
       List of albums that match parameters, or [] if none do.
 
     """
-    uri = '/data/feed/api/user/' + user + '?kind=album'
-    return self.GetEntries(uri, titles)
+    return list(self.iter_album(user, titles))
 
   GetAlbum = get_album
 
@@ -298,6 +351,7 @@ class PhotosServiceCL(PhotosService, googlecl.service.BaseServiceCL):
       title = photo_name
       if not title:
         title = os.path.split(path)[1]
+      start_time = time.time()
       try:
         self.InsertPhotoSimple(album_url,
                                title=title,
@@ -305,6 +359,8 @@ class PhotosServiceCL(PhotosService, googlecl.service.BaseServiceCL):
                                filename_or_handle=path,
                                keywords=keywords,
                                content_type=content_type)
+        googlecl.stats.record_transfer('upload', path,
+                                       time.time() - start_time)
       except GooglePhotosException, err:
         LOG.error('Failed to upload %s. (%s: %s)', path,
                                                    err.args[0],
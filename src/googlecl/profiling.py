@@ -0,0 +1,290 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Profile of a GoogleCL run, reported by --profile.
+
+Breaks the wall time of a command into startup, authentication, task and
+output, times the import of every googlecl and gdata module, and saves the
+cProfile statistics of the command for pstats.
+
+Nothing is recorded until enable() is called, and phase() does nothing
+until then.
+
+"""
+from __future__ import with_statement
+
+import __builtin__
+import logging
+import sys
+import threading
+import time
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+PSTATS_FILE_NAME = 'googlecl.pstats'
+# Only imports of these packages are listed. atom ships with gdata.
+REPORTED_PACKAGES = ('googlecl', 'gdata', 'atom')
+SLOWEST_IMPORTS_SHOWN = 15
+# Phases in the order they are reported. startup and output are not timed
+# with phase(), see Profiler.get_phases.
+PHASES = ['startup', 'authentication', 'task', 'output']
+
+
+def _is_reported(module_name):
+  return module_name.split('.', 1)[0] in REPORTED_PACKAGES
+
+
+def _get_candidate_names(name, globals, fromlist, level):
+  """Return the modules an import statement could load, most specific first.
+
+  Python 2 tries an import relative to the importing package before the
+  absolute one, and "from package import module" loads a submodule, so more
+  than one name has to be checked.
+  """
+  bases = [name]
+  if level != 0 and globals and globals.get('__name__'):
+    if '__path__' in globals:
+      package = globals['__name__']
+    else:
+      package = globals['__name__'].rpartition('.')[0]
+    if package:
+      bases.insert(0, package + '.' + name)
+  names = []
+  for base in bases:
+    names.extend([base + '.' + item for item in fromlist or []
+                  if item != '*'])
+    names.append(base)
+  return names
+
+
+class ImportTimer(object):
+
+  """Times the first import of each module, not counting its own imports."""
+
+  def __init__(self):
+    self.self_seconds = {}
+    self.total = 0.0
+    self._original_import = None
+    self._local = threading.local()
+
+  def install(self):
+    if not self._original_import:
+      self._original_import = __builtin__.__import__
+      __builtin__.__import__ = self._import
+
+  def uninstall(self):
+    if self._original_import:
+      __builtin__.__import__ = self._original_import
+      self._original_import = None
+
+  def _import(self, name, globals=None, locals=None, fromlist=None, level=-1):
+    candidates = [candidate for candidate in
+                  _get_candidate_names(name, globals, fromlist, level)
+                  if not sys.modules.get(candidate)]
+    if not candidates:
+      return self._original_import(name, globals, locals, fromlist, level)
+    # Seconds spent in nested imports, for each import in progress.
+    stack = self._local.__dict__.setdefault('stack', [])
+    stack.append(0.0)
+    start = time.time()
+    try:
+      return self._original_import(name, globals, locals, fromlist, level)
+    finally:
+      seconds = time.time() - start
+      nested = stack.pop()
+      if stack:
+        stack[-1] += seconds
+      else:
+        self.total += seconds
+      for candidate in candidates:
+        if sys.modules.get(candidate):
+          self.self_seconds[candidate] = (self.self_seconds.get(candidate, 0.0)
+                                          + seconds - nested)
+          break
+
+
+class _TimedStream(object):
+
+  """File wrapper that adds up the time spent writing."""
+
+  def __init__(self, stream):
+    self.stream = stream
+    self.seconds = 0.0
+
+  def write(self, data):
+    start = time.time()
+    try:
+      self.stream.write(data)
+    finally:
+      self.seconds += time.time() - start
+
+  def writelines(self, lines):
+    for line in lines:
+      self.write(line)
+
+  def flush(self):
+    start = time.time()
+    try:
+      self.stream.flush()
+    finally:
+      self.seconds += time.time() - start
+
+  def __getattr__(self, name):
+    return getattr(self.stream, name)
+
+
+class Profiler(object):
+
+  """Collects the phases, imports and cProfile statistics of one run."""
+
+  def __init__(self, start_time):
+    """Initializes the object.
+
+    Args:
+      start_time: time.time() when the process started, or as close to it as
+          the caller can get.
+    """
+    self.start_time = start_time
+    self.end_time = None
+    self.imports = ImportTimer()
+    self.phase_seconds = {}
+    self.first_phase_time = None
+    self.stdout = _TimedStream(sys.stdout)
+    self.profile = None
+
+  def start_phase(self, name):
+    now = time.time()
+    if self.first_phase_time is None:
+      self.first_phase_time = now
+    return now, self.stdout.seconds
+
+  def end_phase(self, name, started):
+    start, output_seconds = started
+    # Writing output is reported as a phase of its own.
+    seconds = (time.time() - start) - (self.stdout.seconds - output_seconds)
+    self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+
+  def run(self, function, *args, **kwargs):
+    """Call function under cProfile, timing what it writes to stdout."""
+    import cProfile
+    self.profile = cProfile.Profile()
+    if self.first_phase_time is None:
+      self.first_phase_time = time.time()
+    sys.stdout = self.stdout
+    try:
+      return self.profile.runcall(function, *args, **kwargs)
+    finally:
+      sys.stdout = self.stdout.stream
+      self.end_time = time.time()
+
+  def get_phases(self):
+    """Return a list of (phase, seconds), and the total wall time."""
+    end_time = self.end_time or time.time()
+    wall = end_time - self.start_time
+    phase_seconds = dict(self.phase_seconds)
+    phase_seconds['startup'] = ((self.first_phase_time or end_time) -
+                                self.start_time)
+    phase_seconds['output'] = self.stdout.seconds
+    phases = [(name, phase_seconds.get(name, 0.0)) for name in PHASES]
+    phases.append(('other', max(0.0, wall - sum(phase_seconds.values()))))
+    return phases, wall
+
+  def format(self, pstats_path=None):
+    """Return the phases and slowest imports as a human-readable report."""
+    phases, wall = self.get_phases()
+    lines = ['%-16s %10s %6s' % ('phase', 'seconds', '%')]
+    for name, seconds in phases + [('total', wall)]:
+      lines.append('%-16s %10.3f %6.1f' % (name, seconds,
+                                            100.0 * seconds / (wall or 1)))
+    reported = sorted([(seconds, name) for name, seconds in
+                       self.imports.self_seconds.items()
+                       if _is_reported(name)], reverse=True)
+    lines.append('')
+    lines.append('Imported %d googlecl/gdata modules in %.3fs '
+                 '(all imports: %.3fs)' %
+                 (len(reported), sum([s for s, _ in reported]),
+                  self.imports.total))
+    if reported:
+      lines.append('%-40s %10s' % ('slowest imports', 'ms'))
+      for seconds, name in reported[:SLOWEST_IMPORTS_SHOWN]:
+        lines.append('%-40s %10.1f' % (name, seconds * 1000))
+    if pstats_path:
+      lines.append('')
+      lines.append('cProfile statistics saved to %s '
+                   '(python -m pstats %s)' % (pstats_path, pstats_path))
+    return '\n'.join(lines)
+
+  def write_report(self, out, pstats_path=PSTATS_FILE_NAME):
+    """Save the cProfile statistics, and write the report to out."""
+    if self.profile:
+      try:
+        self.profile.dump_stats(pstats_path)
+      except IOError, err:
+        LOG.error('Could not save profile to %s: %s', pstats_path, err)
+        pstats_path = None
+    else:
+      pstats_path = None
+    print >> out, self.format(pstats_path)
+
+
+class _Phase(object):
+
+  """Context manager that times a phase if profiling is enabled."""
+
+  def __init__(self, name):
+    self.name = name
+    self.started = None
+
+  def __enter__(self):
+    if PROFILER:
+      self.started = PROFILER.start_phase(self.name)
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if PROFILER and self.started:
+      PROFILER.end_phase(self.name, self.started)
+    return False
+
+
+PROFILER = None
+
+
+def enable(start_time=None):
+  """Start profiling this process, including the imports that follow."""
+  global PROFILER
+  PROFILER = Profiler(start_time or time.time())
+  PROFILER.imports.install()
+
+
+def is_enabled():
+  return PROFILER is not None
+
+
+def phase(name):
+  """Return a context manager timing the code run inside it as phase name."""
+  return _Phase(name)
+
+
+def run(function, *args, **kwargs):
+  """Call function under cProfile if profiling is enabled."""
+  if PROFILER:
+    return PROFILER.run(function, *args, **kwargs)
+  return function(*args, **kwargs)
+
+
+def write_report(out):
+  """Stop timing imports, and write the report for this process to out."""
+  if PROFILER:
+    PROFILER.imports.uninstall()
+    PROFILER.write_report(out)
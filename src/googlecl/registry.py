@@ -0,0 +1,340 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Static manifest of the services GoogleCL supports.
+
+Lists every service, the tasks it offers with their requirements, and the
+options written to a new config file. google.py and googlecl.config read
+these from here, so that a command only imports the package (and the gdata
+modules) of the service it runs, and --help or loading the config imports
+none of them.
+
+This is the only place tasks are described. Each service package builds its
+TASKS with bind_tasks, which only adds the callbacks that run them, and
+refuses a package whose callbacks do not name exactly the tasks listed here.
+
+"""
+import copy
+import logging
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+
+# The use of login_required has been deprecated - all tasks now require
+# logging in, and google.py does not check whether or not a task
+# says otherwise.
+class Task(object):
+  """A container of requirements.
+
+  Each requirement matches up with one of the attributes of the option parser
+  used to parse command line arguments. Requirements are given as lists.
+  For example, if a task needs to have attr1 and attr2 and either attr3 or 4,
+  the list would look like ['attr1', 'attr2', ['attr3', 'attr4']]
+  """
+
+  def __init__(self, description, callback=None, required=[], optional=[],
+               login_required=True, args_desc=''):
+    """Constructor.
+
+    Keyword arguments:
+      description: Description of what the task does.
+      callback: Function to use to execute task.
+                (Default None, prints a message instead of running)
+      required: Required options for the task. (Default None)
+      optional: Optional options for the task. (Default None)
+      login_required: If logging in with a username is required to do this task.
+                If True, can typically ignore 'user' as a required attribute.
+                (Default True)
+      args_desc: Description of what the arguments should be.
+                 (Default '', for no arguments necessary for this task)
+    """
+    if isinstance(required, basestring):
+      required = [required]
+    if isinstance(optional, basestring):
+      optional = [optional]
+    self.description = description
+    self.run = callback or self._not_impl
+    self.required = required
+    self.optional = optional
+    self.login_required = login_required
+    # Take the "required" list, join all the terms by the following rules:
+    # 1) if the term is a string, leave it.
+    # 2) if the term is a list, join it with the ' OR ' string.
+    # Then join the resulting list with ' AND '.
+    if self.required:
+      req_str = ' AND '.join(['('+' OR '.join(a)+')' if isinstance(a, list) \
+                              else a for a in self.required])
+    else:
+      req_str = 'none'
+    if self.optional:
+      opt_str = ' Optional: ' + str(self.optional)[1:-1].replace("'", '')
+    else:
+      opt_str = ''
+    if args_desc:
+      args_desc = ' Arguments: ' + args_desc
+    self.usage = 'Requires: ' + req_str + opt_str + args_desc
+
+  def get_outstanding_requirements(self, options):
+    """Return a list of required options that are missing.
+
+    The requirements that have been specified in <options> are removed
+    from self.required, and any sublists in self.required have been replaced
+    by the first item in that sublist if none of the requirements in the
+    sublist were given.
+
+    Args:
+      options: instance Has attributes with names corresponding to the
+               requirements specified by self.required and self.optional
+
+    Returns:
+      A subset of self.required containing only strings representing unmet
+      requirements.
+    """
+    missing_options_set = set(attr for attr in dir(options)
+                              if not attr.startswith('_') and
+                              getattr(options, attr) is None)
+    missing_requirements = []
+    for requirement in self.required:
+      if isinstance(requirement, list):
+        sub_req_set = set(requirement)
+        # If every element in sub_req_set is in missing_options_set,
+        # add the first element of the requirements list to the missing
+        # requirements.
+        if sub_req_set <= missing_options_set:
+          missing_requirements.append(requirement[0])
+        # Otherwise, the user specified one of the elements of the list, so
+        # we can use that one.
+      elif requirement in missing_options_set:
+        missing_requirements.append(requirement)
+    return missing_requirements
+
+  def is_optional(self, attribute):
+    """See if an attribute is optional"""
+    # No list of lists in the optional fields
+    if attribute in self.optional:
+      return True
+    return False
+
+  def bind(self, callback):
+    """Return a copy of this task that runs callback."""
+    task = copy.copy(self)
+    task.run = callback
+    return task
+
+  def _not_impl(self, *args):
+    """Just use this as a place-holder for Task callbacks."""
+    LOG.error('Sorry, this task is not yet implemented!')
+
+
+# In the order they are listed in help.
+SERVICES = ['picasa', 'blogger', 'youtube', 'docs', 'contacts', 'calendar',
+            'finance', 'sites']
+
+TASKS = {
+    'picasa': {
+        'create': Task('Create an album',
+                       required='title',
+                       optional=['src', 'date', 'summary', 'tags', 'access']),
+        'post': Task('Post photos to an album',
+                     required=['title', 'src'],
+                     optional=['tags', 'owner', 'photo', 'summary']),
+        'delete': Task('Delete photos or albums',
+                       required=[['title', 'query']],
+                       optional='photo'),
+        'list': Task('List photos',
+                     required=['fields', 'delimiter'],
+                     optional=['title', 'query', 'owner', 'photo']),
+        'list-albums': Task('List albums',
+                            required=['fields', 'delimiter'],
+                            optional=['title', 'owner']),
+        'get': Task('Download albums',
+                    required=['title', 'dest'],
+                    optional=['owner', 'format', 'photo']),
+        'tag': Task('Tag/caption photos',
+                    required=[['title', 'query'], ['tags', 'summary']],
+                    optional=['owner', 'photo']),
+        'sync': Task('Sync albums and photos to the local mirror',
+                     optional='owner')},
+    'blogger': {
+        'delete': Task('Delete a post.',
+                       required=['blog', 'title']),
+        'post': Task('Post content.',
+                     required=['src', 'blog'],
+                     optional=['title', 'tags', 'access']),
+        'list': Task('List posts in a blog',
+                     required=['fields', 'blog', 'delimiter'],
+                     optional=['title', 'owner']),
+        'tag': Task('Label posts',
+                    required=['blog', 'title', 'tags']),
+        'sync': Task('Sync posts to the local mirror',
+                     required='blog',
+                     optional='owner')},
+    'youtube': {
+        'post': Task('Post a video.',
+                     required=['src', 'category', 'devkey'],
+                     optional=['title', 'summary', 'tags', 'access']),
+        'delete': Task('Delete videos.',
+                       required=['title', 'devkey']),
+        'list': Task('List videos by user.',
+                     required=['fields', 'delimiter'],
+                     optional=['title', 'owner']),
+        'tag': Task('Add tags to a video and/or change its category.',
+                    required=['title', ['tags', 'category'], 'devkey'])},
+    'docs': {
+        'upload': Task('Upload a document',
+                       required='src',
+                       optional=['title', 'folder', 'format']),
+        'edit': Task('Edit a document',
+                     required=['title'],
+                     optional=['format', 'editor', 'folder']),
+        'get': Task('Download a document',
+                    required=[['title', 'folder'], 'dest'],
+                    optional='format'),
+        'list': Task('List documents',
+                     required=['fields', 'delimiter'],
+                     optional=['title', 'folder']),
+        'sync': Task('Sync documents to the local mirror'),
+        'delete': Task('Delete documents',
+                       required='title',
+                       optional='folder')},
+    'contacts': {
+        'list': Task('List contacts',
+                     required=['fields', 'title', 'delimiter']),
+        'add': Task('Add contacts',
+                    required='src'),
+        'delete': Task('Delete contacts',
+                       required='title'),
+        'add-groups': Task('Add contact group(s)',
+                           required='title'),
+        'delete-groups': Task('Delete contact group(s)',
+                              required='title'),
+        'list-groups': Task('List contact groups',
+                            required='title'),
+        'sync': Task('Sync contacts and groups to the local mirror')},
+    'calendar': {
+        'list': Task('List events on a calendar',
+                     required=['fields', 'delimiter'],
+                     optional=['title', 'query', 'date', 'cal']),
+        'today': Task('List events for the next 24 hours',
+                      required=['fields', 'delimiter'],
+                      optional=['title', 'query', 'cal']),
+        'add': Task('Add event to a calendar',
+                    required='src',
+                    optional='cal'),
+        'delete': Task('Delete event from a calendar',
+                       required=[['title', 'query']],
+                       optional=['date', 'cal']),
+        'sync': Task('Sync events to the local mirror',
+                     optional='cal')},
+    'finance': {
+        'create': Task('Create a portfolio',
+                       required=['title', 'currency']),
+        'delete': Task('Delete portfolios',
+                       required=['title']),
+        'list': Task('List portfolios',
+                     optional=['fields']),
+        'create-pos': Task('Create position',
+                           required=['title', 'ticker']),
+        'delete-pos': Task('Delete positions',
+                           required=['title'],
+                           optional=['ticker']),
+        'list-pos': Task('List positions',
+                         required=['title'],
+                         optional=['fields']),
+        'create-txn': Task('Create transaction',
+                           required=['title', 'ticker', 'ttype', 'shares',
+                                     'price'],
+                           optional=['shares', 'price', 'date', 'commission',
+                                     'currency', 'notes']),
+        'list-txn': Task('List transactions',
+                         required=['title', 'ticker']),
+        'delete-txn': Task('Delete transactions',
+                           required=['title', 'ticker'],
+                           optional=['txnid'])},
+    'sites': {
+        'sites': Task('List all sites user can access (site feed)',
+                      required=['fields', 'delimiter'],
+                      optional=['domain', 'site']),
+        'list': Task("List site's contents with optional query (site content)",
+                     required=['fields', 'delimiter'],
+                     optional=['domain', 'site', 'max_results', 'query']),
+        'upload': Task('Upload a Sites page',
+                       required=['site', 'src'],
+                       optional=['domain', 'title', 'folder', 'format']),
+        'delete': Task('Delete a Sites page',
+                       required=['site', 'title'],
+                       optional=['domain'])},
+}
+
+# Options written to a new config file, by section. See googlecl.config.
+# REMEMBER: updating these means you need to update the CONFIG readme.
+DEFAULT_OPTIONS = {
+    'GENERAL': {'max_retries': '2',
+                'retry_delay': '0.5',
+                'regex': 'True',
+                'url_field': 'site',
+                'fields': 'title,url-site',
+                'missing_field_value': 'N/A',
+                'date_print_format': '%b %d %H:%M',
+                'cap_results': 'False'},
+    'DOCS': {'document_format': 'txt',
+             'spreadsheet_format': 'xls',
+             'presentation_format': 'ppt',
+             'drawing_format': 'png',
+             'format': 'txt',
+             'spreadsheet_editor': 'openoffice.org',
+             'presentation_editor': 'openoffice.org'},
+    'CONTACTS': {'fields': 'name,email'},
+    'CALENDAR': {'fields': 'title,when'},
+    'SITES': {'fields': 'title,page_name,id'},
+    'YOUTUBE': {'max_results': '50'}}
+
+
+def get_section_header(service):
+  """Return the config file section of a service, e.g. 'DOCS' for 'docs'."""
+  return service.upper()
+
+
+def get_tasks(service):
+  """Return the tasks of a service, without callbacks, or None if unknown."""
+  return TASKS.get(service)
+
+
+def bind_tasks(service, callbacks):
+  """Return the tasks of a service, with the callbacks that run them.
+
+  Args:
+    service: Name of the service, e.g. 'docs'.
+    callbacks: Dictionary mapping the name of every task of the service to
+        the function that runs it.
+
+  Returns:
+    Dictionary of Tasks, to be the TASKS of the service package.
+
+  Raises:
+    ValueError: callbacks does not name exactly the tasks listed in TASKS.
+  """
+  tasks = TASKS[service]
+  mismatched = set(tasks).symmetric_difference(callbacks)
+  if mismatched:
+    raise ValueError('Tasks of %s do not match googlecl.registry: %s' %
+                     (service, ', '.join(sorted(mismatched))))
+  return dict((name, task.bind(callbacks[name]))
+              for name, task in tasks.iteritems())
+
+
+def get_default_options():
+  """Return a copy of DEFAULT_OPTIONS that can be changed freely."""
+  return dict((section, dict(options))
+              for section, options in DEFAULT_OPTIONS.iteritems())
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests that the service manifest agrees with the service packages."""
+
+import sys
+import unittest
+
+import googlecl.config
+import googlecl.registry
+
+
+class ManifestTest(unittest.TestCase):
+
+  def testPackagesRunEveryTask(self):
+    for service in googlecl.registry.SERVICES:
+      # Fails rather than skips a package that cannot be imported, which
+      # should only need gdata once a task runs.
+      package = __import__('googlecl.' + service, fromlist=['TASKS'])
+      manifest = googlecl.registry.get_tasks(service)
+      self.assertEqual(sorted(package.TASKS), sorted(manifest))
+      for name, task in package.TASKS.iteritems():
+        self.assertEqual(task.usage, manifest[name].usage)
+        self.assertNotEqual(task.run, manifest[name].run,
+                            '%s %s has no callback' % (service, name))
+      self.assertEqual(googlecl.registry.get_section_header(service),
+                       package.SECTION_HEADER)
+
+  def testBindTasksRefusesMismatch(self):
+    callbacks = dict((name, None) for name in
+                     googlecl.registry.get_tasks('docs'))
+    self.assertEqual(
+        len(googlecl.registry.bind_tasks('docs', callbacks)), len(callbacks))
+    del callbacks['list']
+    callbacks['lsit'] = None
+    self.assertRaises(ValueError, googlecl.registry.bind_tasks, 'docs',
+                      callbacks)
+
+  def testDefaultOptionsAreCopied(self):
+    options = googlecl.config._create_basic_options()
+    self.assertTrue(options['GENERAL']['hostid'])
+    self.assertFalse('hostid' in googlecl.registry.DEFAULT_OPTIONS['GENERAL'])
+
+  def testConfigLoadsNoServices(self):
+    services = ['googlecl.' + service
+                for service in googlecl.registry.SERVICES]
+    loaded = [name for name in services if sys.modules.get(name)]
+    # Only meaningful when nothing else in this process imported them.
+    if not loaded:
+      googlecl.config._create_basic_options()
+      self.assertEqual([name for name in services if sys.modules.get(name)],
+                       [])
+
+
+if __name__ == '__main__':
+  unittest.main()
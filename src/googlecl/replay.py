@@ -0,0 +1,286 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Record HTTP exchanges, and serve them back from a local stand-in server.
+
+With the http_record_file option set, every request GoogleCL makes and the
+response it gets are appended to a file, one JSON object per line. The
+server in this module replays such a file, and serves synthetic feeds (see
+googlecl.synthetic) for feed requests it has no recording of. Point GoogleCL
+at it with the http_endpoint option to benchmark or regression-test without
+a Google account:
+
+  python -m googlecl.replay --port 8080 --entries photos=100000 rec.jsonl
+  google picasa list --config bench.conf   # with http_endpoint = http://localhost:8080
+
+"""
+from __future__ import with_statement
+
+import BaseHTTPServer
+import SocketServer
+import base64
+import logging
+import optparse
+import sys
+import threading
+import time
+import urlparse
+
+import googlecl.synthetic
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+DEFAULT_PORT = 8080
+
+# Hop-by-hop headers, and ones describing the body as it was sent. The server
+# sets its own.
+_SKIPPED_HEADERS = ('connection', 'content-length', 'keep-alive',
+                    'transfer-encoding', 'content-encoding')
+
+_RECORDERS = {}
+_RECORDERS_LOCK = threading.Lock()
+
+
+class HttpRecorder(object):
+
+  """Appends request/response pairs to a file, one JSON object per line."""
+
+  def __init__(self, path):
+    self.path = path
+    self._lock = threading.Lock()
+
+  def record(self, method, host, path, status, reason, headers, body):
+    """Record one exchange.
+
+    Args:
+      method: HTTP method of the request.
+      host: Host the request was sent to.
+      path: Path and query string of the request.
+      status: Status code of the response.
+      reason: Reason phrase of the response.
+      headers: List of (name, value) headers of the response.
+      body: Body of the response, as a string.
+    """
+    line = json.dumps({'time': time.time(),
+                       'method': method,
+                       'host': host,
+                       'path': path,
+                       'status': status,
+                       'reason': reason,
+                       'headers': [[name, value] for name, value in headers],
+                       'body': base64.b64encode(body or '')})
+    self._lock.acquire()
+    try:
+      with open(self.path, 'ab') as record_file:
+        record_file.write(line + '\n')
+    except IOError, err:
+      LOG.debug('Could not record request to %s: %s', self.path, err)
+    finally:
+      self._lock.release()
+
+
+def get_recorder(path):
+  """Return the recorder writing to a file, shared by every connection."""
+  _RECORDERS_LOCK.acquire()
+  try:
+    recorder = _RECORDERS.get(path)
+    if recorder is None:
+      recorder = HttpRecorder(path)
+      _RECORDERS[path] = recorder
+    return recorder
+  finally:
+    _RECORDERS_LOCK.release()
+
+
+def load_recording(path):
+  """Load a recording made by HttpRecorder.
+
+  Args:
+    path: Path of the recording.
+
+  Returns:
+    Dictionary of (method, path) to the list of recorded responses to that
+    request, oldest first. Each response is a (status, reason, headers, body)
+    tuple.
+  """
+  exchanges = {}
+  with open(path, 'rb') as record_file:
+    for line_number, line in enumerate(record_file):
+      if not line.strip():
+        continue
+      try:
+        record = json.loads(line)
+        response = (record['status'], record['reason'],
+                    [tuple(header) for header in record['headers']],
+                    base64.b64decode(record['body']))
+        key = (record['method'].upper(), record['path'])
+      except (ValueError, KeyError, TypeError), err:
+        LOG.warning('Skipping line %d of %s: %s', line_number + 1, path, err)
+        continue
+      exchanges.setdefault(key, []).append(response)
+  return exchanges
+
+
+class ReplayServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+  """Stand-in for the GData servers.
+
+  Requests are answered, in order of preference, with:
+    * The recorded responses to the same method and path, in the order they
+      were recorded. The last one is repeated once the others are used up.
+    * A synthetic feed page, for GETs of a known feed path.
+    * An empty 200 response, for other GETs, and any POST, PUT or DELETE.
+  """
+
+  daemon_threads = True
+  allow_reuse_address = True
+
+  def __init__(self, address, exchanges=None, totals=None, latency=0):
+    """Constructor.
+
+    Args:
+      address: (host, port) to listen on.
+      exchanges: Recorded responses, as returned by load_recording.
+      totals: Sizes of synthetic feeds. See googlecl.synthetic.parse_totals.
+      latency: Seconds to wait before answering each request, to imitate a
+          remote server.
+    """
+    BaseHTTPServer.HTTPServer.__init__(self, address, ReplayRequestHandler)
+    self.exchanges = exchanges or {}
+    self.totals = totals or {}
+    self.latency = latency
+    self._replayed = {}
+    self._lock = threading.Lock()
+
+  def get_recorded(self, method, path):
+    """Return the next recorded response to a request, or None."""
+    responses = self.exchanges.get((method, path))
+    if not responses:
+      return None
+    self._lock.acquire()
+    try:
+      index = self._replayed.get((method, path), 0)
+      self._replayed[(method, path)] = index + 1
+    finally:
+      self._lock.release()
+    return responses[min(index, len(responses) - 1)]
+
+
+class ReplayRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+  """Answers one request on behalf of a ReplayServer."""
+
+  # Keep-alive, so that connection pooling behaves as it would for real.
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, format, *args):
+    LOG.debug('%s - %s', self.address_string(), format % args)
+
+  def _read_body(self):
+    length = int(self.headers.getheader('content-length') or 0)
+    if length:
+      self.rfile.read(length)
+
+  def _send(self, status, reason, headers, body):
+    self.send_response(status, reason)
+    for name, value in headers:
+      if name.lower() not in _SKIPPED_HEADERS:
+        self.send_header(name, value)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    if self.command != 'HEAD':
+      self.wfile.write(body)
+
+  def _handle(self):
+    self._read_body()
+    if self.server.latency:
+      time.sleep(self.server.latency)
+    method = self.command.upper()
+    recorded = self.server.get_recorded(method, self.path)
+    if recorded is not None:
+      self._send(*recorded)
+      return
+    if method in ('GET', 'HEAD'):
+      version = self.headers.getheader('gdata-version') or '1'
+      query = urlparse.parse_qs(self.path.partition('?')[2])
+      version = query.get('v', [version])[0]
+      try:
+        gdata_version = int(float(version))
+      except ValueError:
+        gdata_version = 1
+      host = self.headers.getheader('host') or 'localhost'
+      page = googlecl.synthetic.build_page_for_path(self.path,
+                                                    self.server.totals,
+                                                    gdata_version, host)
+      if page is not None:
+        self._send(200, 'OK',
+                   [('Content-Type', 'application/atom+xml; charset=UTF-8')],
+                   page)
+        return
+    self._send(200, 'OK', [('Content-Type', 'text/plain')], '')
+
+  do_GET = _handle
+  do_HEAD = _handle
+  do_POST = _handle
+  do_PUT = _handle
+  do_DELETE = _handle
+
+
+def main(argv=None):
+  usage = 'python -m googlecl.replay [options] [recording ...]'
+  parser = optparse.OptionParser(usage=usage)
+  parser.add_option('--host', default='localhost',
+                    help='Address to listen on. Default %default.')
+  parser.add_option('--port', type='int', default=DEFAULT_PORT,
+                    help='Port to listen on. Default %default.')
+  parser.add_option('--entries', action='append', default=[],
+                    metavar='[KIND=]COUNT',
+                    help=('Number of entries in synthetic feeds, for every '
+                          'kind or just one of: ' +
+                          ', '.join(googlecl.synthetic.KINDS) +
+                          '. Can be given more than once. Default %d.' %
+                          googlecl.synthetic.DEFAULT_TOTAL))
+  parser.add_option('--latency', type='float', default=0,
+                    help='Seconds to wait before answering each request.')
+  parser.add_option('--verbose', action='store_true',
+                    help='Log every request.')
+  options, args = parser.parse_args(argv)
+  logging.basicConfig(level=options.verbose and logging.DEBUG or logging.INFO)
+  try:
+    totals = googlecl.synthetic.parse_totals(options.entries)
+  except ValueError, err:
+    parser.error(str(err))
+  exchanges = {}
+  for path in args:
+    for key, responses in load_recording(path).items():
+      exchanges.setdefault(key, []).extend(responses)
+  server = ReplayServer((options.host, options.port), exchanges, totals,
+                        options.latency)
+  LOG.info('Serving %d recorded requests and synthetic feeds on '
+           'http://%s:%d/', len(exchanges), options.host,
+           server.server_address[1])
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for recording, replaying and synthesizing GData responses."""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from xml.etree import cElementTree as ElementTree
+
+import googlecl.connection
+import googlecl.replay
+import googlecl.synthetic
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+OPENSEARCH_V1 = '{http://a9.com/-/spec/opensearchrss/1.0/}'
+
+
+class SyntheticFeedTest(unittest.TestCase):
+
+  def testEveryKindIsWellFormed(self):
+    for kind in googlecl.synthetic.KINDS:
+      feed = ElementTree.fromstring(googlecl.synthetic.build_feed(kind, 3))
+      self.assertEqual(len(feed.findall(ATOM + 'entry')), 3, kind)
+
+  def testPaging(self):
+    page = googlecl.synthetic.build_page_for_path(
+        '/m8/feeds/contacts/default/full?start-index=11&max-results=10',
+        {googlecl.synthetic.CONTACTS: 25})
+    feed = ElementTree.fromstring(page)
+    self.assertEqual(feed.findtext(OPENSEARCH_V1 + 'totalResults'), '25')
+    self.assertEqual(feed.findtext(OPENSEARCH_V1 + 'startIndex'), '11')
+    self.assertEqual(len(feed.findall(ATOM + 'entry')), 10)
+    next_links = [link.get('href') for link in feed.findall(ATOM + 'link')
+                  if link.get('rel') == 'next']
+    self.assertEqual(len(next_links), 1)
+    self.assertTrue('start-index=21' in next_links[0])
+
+  def testLastPageHasNoNextLink(self):
+    page = googlecl.synthetic.build_feed(googlecl.synthetic.EVENTS, 5,
+                                         start_index=4, max_results=10)
+    feed = ElementTree.fromstring(page)
+    self.assertEqual(len(feed.findall(ATOM + 'entry')), 2)
+    self.assertFalse([link for link in feed.findall(ATOM + 'link')
+                      if link.get('rel') == 'next'])
+
+  def testGetKind(self):
+    get_kind = googlecl.synthetic.get_kind
+    self.assertEqual(get_kind('/data/feed/api/user/default?kind=album'),
+                     googlecl.synthetic.ALBUMS)
+    self.assertEqual(get_kind('/data/feed/api/user/bob/albumid/12?kind=photo'),
+                     googlecl.synthetic.PHOTOS)
+    self.assertEqual(get_kind('/feeds/default/private/full'),
+                     googlecl.synthetic.DOCS)
+    self.assertEqual(get_kind('/nothing/here'), None)
+
+  def testParseTotals(self):
+    totals = googlecl.synthetic.parse_totals(['photos=100000', '50'])
+    self.assertEqual(totals, {None: 50, 'photos': 100000})
+    self.assertRaises(ValueError, googlecl.synthetic.parse_totals, ['x=1'])
+
+
+class RecordReplayTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.servers = []
+    self.pool = googlecl.connection.ConnectionPool()
+
+  def tearDown(self):
+    self.pool.clear()
+    for server in self.servers:
+      server.shutdown()
+      server.server_close()
+    shutil.rmtree(self.directory)
+
+  def start_server(self, exchanges=None):
+    server = googlecl.replay.ReplayServer(('localhost', 0), exchanges,
+                                          {None: 30})
+    thread = threading.Thread(target=server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    self.servers.append(server)
+    return server.server_address[1]
+
+  def get(self, port, path, recorder=None):
+    connection = self.pool.get('http', 'localhost', port)
+    connection.recorder = recorder
+    connection.putrequest('GET', path)
+    connection.endheaders()
+    response = connection.getresponse()
+    return response.status, response.read()
+
+  def testRecordThenReplay(self):
+    port = self.start_server()
+    path = os.path.join(self.directory, 'recording.jsonl')
+    recorder = googlecl.replay.HttpRecorder(path)
+    uri = '/calendar/feeds/default/private/full?max-results=5'
+    status, body = self.get(port, uri, recorder)
+    self.assertEqual(status, 200)
+    self.assertEqual(len(ElementTree.fromstring(body).findall(ATOM + 'entry')),
+                     5)
+
+    exchanges = googlecl.replay.load_recording(path)
+    self.assertEqual(exchanges[('GET', uri)][0][3], body)
+    # Recorded responses take precedence over synthetic feeds.
+    exchanges[('GET', uri)][0] = (200, 'OK', [], 'recorded')
+    port = self.start_server(exchanges)
+    self.assertEqual(self.get(port, uri), (200, 'recorded'))
+
+  def testParseEndpoint(self):
+    parse = googlecl.connection.parse_endpoint
+    self.assertEqual(parse('http://localhost:8080'),
+                     ('http', 'localhost', 8080))
+    self.assertEqual(parse('localhost:8080'), ('http', 'localhost', 8080))
+    self.assertRaises(ValueError, parse, 'ftp://localhost')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -20,6 +20,7 @@
 import gdata.service
 import googlecl
 import googlecl.base
+import googlecl.connection
 import logging
 
 LOG = logging.getLogger(__name__)
@@ -29,6 +30,10 @@ class BaseServiceCL(googlecl.base.BaseCL):
 
   """Extension of gdata.GDataService specific to GoogleCL."""
 
+  # Converter GetFeed uses when it is not given one. Services whose GetFeed
+  # parses feeds differently by default should override this.
+  default_feed_converter = staticmethod(gdata.GDataFeedFromString)
+
   def __init__(self, section, config,
                request_error_class=gdata.service.RequestError,
                *args, **kwargs):
@@ -51,27 +56,69 @@ class BaseServiceCL(googlecl.base.BaseCL):
     self.Post = self.retry_post
     self.Put = self.retry_put
 
+    # Reuse keep-alive connections across requests (and commands, in
+    # interactive mode).
+    googlecl.connection.install_from_config(self.http_client, config, section)
+
     LOG.debug('Initialized googlecl.service.BaseServiceCL')
 
   def retry_get(self, *args, **kwargs):
     """Retries the Get method."""
-    self.original_operation = self.original_get
-    return self.retry_operation(*args, **kwargs)
+    return self.retry_operation(self.original_get, *args, **kwargs)
 
   def retry_delete(self, *args, **kwargs):
     """Retries the Delete method."""
-    self.original_operation = self.original_delete
-    return self.retry_operation(*args, **kwargs)
+    return self.retry_operation(self.original_delete, *args, **kwargs)
 
   def retry_post(self, *args, **kwargs):
     """Retries the Post method."""
-    self.original_operation = self.original_post
-    return self.retry_operation(*args, **kwargs)
+    return self.retry_operation(self.original_post, *args, **kwargs)
 
   def retry_put(self, *args, **kwargs):
     """Retries the Put method."""
-    self.original_operation = self.original_put
-    return self.retry_operation(*args, **kwargs)
+    return self.retry_operation(self.original_put, *args, **kwargs)
+
+  def _request_feed_page(self, uri, headers, redirects_remaining=4):
+    """Make a single GET request for a feed page, following redirects."""
+    response = self.request('GET', uri, headers=headers)
+    body = response.read()
+    if response.status == 302 and redirects_remaining > 0:
+      location = (response.getheader('Location') or
+                  response.getheader('location'))
+      if location:
+        return self._request_feed_page(location, headers,
+                                       redirects_remaining - 1)
+    if response.status not in (200, 304):
+      raise self.request_error({'status': response.status,
+                                'reason': response.reason,
+                                'body': body})
+    if response.status == 304:
+      body = None
+    headers = dict((name.lower(), value)
+                   for name, value in response.getheaders())
+    return response.status, headers, body
+
+  def _fetch_feed_page(self, uri, headers):
+    """Retrieve the raw body of a feed page. See BaseCL._fetch_feed_page."""
+    return self.retry_operation(self._request_feed_page, uri, headers)
+
+  def _parse_feed(self, body, converter=None, desired_class=None):
+    """Parse the raw body of a feed page. See BaseCL._parse_feed."""
+    return (converter or self.default_feed_converter)(body)
+
+  def _build_batch_feed(self, operation, items):
+    """Build a batch feed. See BaseCL._build_batch_feed."""
+    feed = gdata.BatchFeed()
+    for batch_id, entry in items:
+      if operation == 'delete':
+        feed.AddDelete(entry=entry, batch_id_string=batch_id)
+      else:
+        feed.AddUpdate(entry, batch_id_string=batch_id)
+    return feed
+
+  def _post_batch_feed(self, feed, uri):
+    """Post a batch feed. See BaseCL._post_batch_feed."""
+    return self.Post(feed, uri, converter=gdata.BatchFeedFromString)
 
   def request_access(self, domain, display_name, scopes=None, browser=None):
     """Do all the steps involved with getting an OAuth access token.
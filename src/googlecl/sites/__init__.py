@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import googlecl
-import gdata.client
 import googlecl.base
+import googlecl.output
+import googlecl.registry
 import logging
 import os
 import re
@@ -68,11 +69,11 @@ def _run_sites(client, options, args):
       options.fields.count('site_name')):
     options.fields = options.fields.replace('page_name', 'site_name', 1)
   sites = client.GetSiteFeed()
-  for entry in sites.entry:
-    print googlecl.base.compile_entry_string(
-        googlecl.base.BaseEntryToStringWrapper(entry),
-        options.fields.split(','),
-        delimiter=options.delimiter)
+  formatter = googlecl.output.build_formatter(options.fields.split(','),
+                                             options.delimiter, options.output)
+  googlecl.output.print_entries(
+      (googlecl.base.BaseEntryToStringWrapper(entry) for entry in sites.entry),
+      formatter)
 
 def _run_list(client, options, args):
   """Return content for site.
@@ -113,12 +114,11 @@ def _run_list(client, options, args):
   LOG.info('uri=%s' % uri)
   feed = client.GetContentFeed(uri=uri)
 
-  for entry in feed.entry:
-    #print 'entry=%s' % entry
-    print googlecl.base.compile_entry_string(
-        googlecl.base.BaseEntryToStringWrapper(entry),
-        options.fields.split(','),
-        delimiter=options.delimiter)
+  formatter = googlecl.output.build_formatter(options.fields.split(','),
+                                             options.delimiter, options.output)
+  googlecl.output.print_entries(
+      (googlecl.base.BaseEntryToStringWrapper(entry) for entry in feed.entry),
+      formatter)
 
 def _run_upload(client, options, args):
   """Upload a sites page.
@@ -161,7 +161,7 @@ def _run_upload(client, options, args):
   try:
     entry = client.CreatePage(options.format, options.title[0], html=src,
                               parent=parent)
-  except gdata.client.RequestError as err:
+  except client.request_error, err:
     LOG.error('Site page creation failed: %s' % err)
     return
   LOG.info('created page %s (%s) at %s', entry.title.text,
@@ -185,25 +185,9 @@ def _run_delete(client, options, args):
   client.Delete(entry)
 
 
-TASKS = {
-         'sites': googlecl.base.Task(
-             'List all sites user can access (site feed)',
-             callback=_run_sites,
-             required=['fields', 'delimiter'],
-             optional=['domain', 'site']),
-         'list': googlecl.base.Task(
-             "List site's contents with optional query (site content)",
-             callback=_run_list,
-             required=['fields', 'delimiter'],
-             optional=['domain', 'site', 'max_results', 'query']),
-         'upload': googlecl.base.Task(
-             'Upload a Sites page',
-             callback=_run_upload,
-             required=['site', 'src'],
-             optional=['domain', 'title', 'folder', 'format']),
-         'delete': googlecl.base.Task(
-             'Delete a Sites page',
-             callback=_run_delete,
-             required=['site', 'title'],
-             optional=['domain']),
-        }
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'sites': _run_sites,
+    'list': _run_list,
+    'upload': _run_upload,
+    'delete': _run_delete})
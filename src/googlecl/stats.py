@@ -0,0 +1,240 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Request metrics for a GoogleCL run, summarized by --stats.
+
+Recording is off until enable() is called, so instrumented code costs next to
+nothing in normal runs. All recording functions are thread-safe.
+
+"""
+import logging
+import os
+import threading
+import time
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+
+class _Timings(object):
+  """Count, total and individual durations of one kind of event."""
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0.0
+    self.samples = []
+
+  def add(self, seconds):
+    self.count += 1
+    self.total += seconds
+    self.samples.append(seconds)
+
+  def percentile(self, fraction):
+    if not self.samples:
+      return 0.0
+    ordered = sorted(self.samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+  def to_dict(self):
+    return {'count': self.count,
+            'total_seconds': round(self.total, 6),
+            'mean_seconds': round(self.count and self.total / self.count, 6),
+            'p50_seconds': round(self.percentile(0.5), 6),
+            'p95_seconds': round(self.percentile(0.95), 6),
+            'max_seconds': round(max(self.samples or [0.0]), 6)}
+
+
+class StatsRecorder(object):
+
+  """Accumulates request, parse and transfer metrics."""
+
+  def __init__(self):
+    self.enabled = False
+    self._lock = threading.Lock()
+    self.reset()
+
+  def reset(self):
+    self.start_time = time.time()
+    self.requests = {}
+    self.statuses = {}
+    self.retries = 0
+    self.bytes_sent = 0
+    self.bytes_received = 0
+    self.parses = _Timings()
+    self.transfers = {}
+    self.transfer_bytes = {}
+
+  def record_request(self, method, status, seconds):
+    """Record one attempt at a request.
+
+    Args:
+      method: HTTP method, or name of the operation attempted.
+      status: HTTP status code of the response, or None if unknown.
+      seconds: How long the attempt took.
+    """
+    if not self.enabled:
+      return
+    self._lock.acquire()
+    try:
+      self.requests.setdefault(method, _Timings()).add(seconds)
+      status = str(status or 'other')
+      self.statuses[status] = self.statuses.get(status, 0) + 1
+    finally:
+      self._lock.release()
+
+  def record_retry(self):
+    if not self.enabled:
+      return
+    self._lock.acquire()
+    try:
+      self.retries += 1
+    finally:
+      self._lock.release()
+
+  def record_bytes(self, sent=0, received=0):
+    if not self.enabled:
+      return
+    self._lock.acquire()
+    try:
+      self.bytes_sent += sent
+      self.bytes_received += received
+    finally:
+      self._lock.release()
+
+  def record_parse(self, seconds):
+    if not self.enabled:
+      return
+    self._lock.acquire()
+    try:
+      self.parses.add(seconds)
+    finally:
+      self._lock.release()
+
+  def record_transfer(self, direction, path, seconds):
+    """Record an upload or download of a file.
+
+    Args:
+      direction: 'upload' or 'download'.
+      path: Path of the local file that was sent or written.
+      seconds: How long the transfer took.
+    """
+    if not self.enabled:
+      return
+    try:
+      size = os.path.getsize(path)
+    except (OSError, TypeError):
+      size = 0
+    self._lock.acquire()
+    try:
+      self.transfers.setdefault(direction, _Timings()).add(seconds)
+      self.transfer_bytes[direction] = (self.transfer_bytes.get(direction, 0) +
+                                        size)
+    finally:
+      self._lock.release()
+
+  def summary(self):
+    """Return all metrics as a dictionary suitable for JSON."""
+    self._lock.acquire()
+    try:
+      transfers = {}
+      for direction, timings in self.transfers.items():
+        transfers[direction] = timings.to_dict()
+        transfers[direction]['bytes'] = self.transfer_bytes[direction]
+      return {'wall_seconds': round(time.time() - self.start_time, 6),
+              'requests': dict((method, timings.to_dict())
+                               for method, timings in self.requests.items()),
+              'statuses': dict(self.statuses),
+              'retries': self.retries,
+              'bytes_sent': self.bytes_sent,
+              'bytes_received': self.bytes_received,
+              'parse': self.parses.to_dict(),
+              'transfers': transfers}
+    finally:
+      self._lock.release()
+
+  def format_table(self):
+    """Return the metrics as a human-readable table."""
+    summary = self.summary()
+    row_format = '%-12s %6s %10s %10s %10s %10s'
+    lines = [row_format % ('', 'count', 'total(s)', 'mean(s)', 'p95(s)',
+                           'max(s)')]
+    def add_row(label, timings):
+      lines.append(row_format % (label, timings['count'],
+                                 '%.3f' % timings['total_seconds'],
+                                 '%.3f' % timings['mean_seconds'],
+                                 '%.3f' % timings['p95_seconds'],
+                                 '%.3f' % timings['max_seconds']))
+    for method in sorted(summary['requests']):
+      add_row(method, summary['requests'][method])
+    if summary['parse']['count']:
+      add_row('parse', summary['parse'])
+    for direction in sorted(summary['transfers']):
+      add_row(direction, summary['transfers'][direction])
+    lines.append('')
+    statuses = ', '.join('%s: %d' % item
+                         for item in sorted(summary['statuses'].items()))
+    lines.append('Statuses: %s' % (statuses or 'none'))
+    lines.append('Retries: %d' % summary['retries'])
+    lines.append('Bytes sent: %d, received: %d' % (summary['bytes_sent'],
+                                                   summary['bytes_received']))
+    for direction in sorted(summary['transfers']):
+      lines.append('Bytes %sed: %d' % (direction,
+                                       summary['transfers'][direction]['bytes']))
+    lines.append('Wall time: %.3fs' % summary['wall_seconds'])
+    return '\n'.join(lines)
+
+  def format(self, output_format='table'):
+    """Return the metrics as a 'table' or as 'json'."""
+    if output_format == 'json':
+      return json.dumps(self.summary(), sort_keys=True)
+    return self.format_table()
+
+
+RECORDER = StatsRecorder()
+
+
+def enable():
+  """Start recording metrics for this process."""
+  RECORDER.reset()
+  RECORDER.enabled = True
+
+
+def is_enabled():
+  return RECORDER.enabled
+
+
+def get_method_name(operation, args, kwargs):
+  """Name the HTTP method of a call made through retry_operation."""
+  name = getattr(operation, '__name__', 'request')
+  if name == 'request':
+    # gdata.client.GDClient.request(method, uri, ...)
+    method = kwargs.get('method')
+    if not method and args:
+      method = args[0]
+    return str(method or 'REQUEST').upper()
+  if name == '_request_feed_page':
+    return 'GET'
+  return name.upper()
+
+
+record_request = RECORDER.record_request
+record_retry = RECORDER.record_retry
+record_bytes = RECORDER.record_bytes
+record_parse = RECORDER.record_parse
+record_transfer = RECORDER.record_transfer
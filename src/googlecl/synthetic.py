@@ -0,0 +1,380 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Synthetic, arbitrarily large Atom feeds shaped like the GData services'.
+
+The feeds carry the elements GoogleCL's converters and list tasks look at
+(kind categories, links, openSearch paging, service-specific extensions), so
+they exercise the same parsing paths as real responses. Entry contents are a
+function of the entry's index alone, so any page can be generated without
+generating the pages before it.
+
+"""
+import re
+import urllib
+import urlparse
+from xml.sax import saxutils
+
+# Kinds of feed that can be generated.
+PHOTOS = 'photos'
+ALBUMS = 'albums'
+CONTACTS = 'contacts'
+GROUPS = 'groups'
+EVENTS = 'events'
+DOCS = 'docs'
+VIDEOS = 'videos'
+POSTS = 'posts'
+PORTFOLIOS = 'portfolios'
+KINDS = (PHOTOS, ALBUMS, CONTACTS, GROUPS, EVENTS, DOCS, VIDEOS, POSTS,
+         PORTFOLIOS)
+
+DEFAULT_TOTAL = 1000
+DEFAULT_PAGE_SIZE = 25
+# Largest page handed out, whatever max-results asks for.
+MAX_PAGE_SIZE = 1000
+
+# Request paths of each kind of feed, tried in order.
+_PATH_PATTERNS = [
+    (re.compile(r'^/data/feed/api/user/[^/]+/albumid/'), PHOTOS),
+    (re.compile(r'^/data/feed/api/user/[^/]+/?$'), ALBUMS),
+    (re.compile(r'^/m8/feeds/contacts/'), CONTACTS),
+    (re.compile(r'^/m8/feeds/groups/'), GROUPS),
+    (re.compile(r'^/calendar/feeds/[^/]+/(private|public)/'), EVENTS),
+    (re.compile(r'^/feeds/(documents|default)/private/full'), DOCS),
+    (re.compile(r'^/feeds/api/users/[^/]+/uploads'), VIDEOS),
+    (re.compile(r'^/feeds/[^/]+/posts/'), POSTS),
+    (re.compile(r'^/finance/feeds/[^/]+/portfolios'), PORTFOLIOS),
+]
+
+_NAMESPACES = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'app': 'http://www.w3.org/2007/app',
+    'gd': 'http://schemas.google.com/g/2005',
+    'gphoto': 'http://schemas.google.com/photos/2007',
+    'media': 'http://search.yahoo.com/mrss/',
+    'yt': 'http://gdata.youtube.com/schemas/2007',
+    'gf': 'http://schemas.google.com/finance/2007',
+    'docs': 'http://schemas.google.com/docs/2007',
+    'gContact': 'http://schemas.google.com/contact/2008',
+    'gCal': 'http://schemas.google.com/gCal/2005',
+}
+# openSearch moved namespaces between versions 1 and 2 of the GData protocol.
+_OPENSEARCH_V1 = 'http://a9.com/-/spec/opensearchrss/1.0/'
+_OPENSEARCH_V2 = 'http://a9.com/-/spec/opensearch/1.1/'
+
+_KIND_SCHEME = 'http://schemas.google.com/g/2005#kind'
+_FEED_KIND_TERMS = {
+    PHOTOS: 'http://schemas.google.com/photos/2007#album',
+    ALBUMS: 'http://schemas.google.com/photos/2007#user',
+    CONTACTS: 'http://schemas.google.com/contact/2008#contact',
+    GROUPS: 'http://schemas.google.com/contact/2008#group',
+    EVENTS: 'http://schemas.google.com/g/2005#event',
+    DOCS: None,
+    VIDEOS: 'http://gdata.youtube.com/schemas/2007#video',
+    POSTS: None,
+    PORTFOLIOS: 'http://schemas.google.com/finance/2007#portfolio',
+}
+
+_ENTRY_TEMPLATES = {
+    PHOTOS: """<entry>
+<id>%(base)s/photoid/%(n)d</id>
+<published>%(date)s</published><updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://schemas.google.com/photos/2007#photo"/>
+<title type="text">IMG_%(n)06d.jpg</title>
+<summary type="text">Synthetic photo %(n)d</summary>
+<content type="image/jpeg" src="http://%(host)s/photos/%(n)d/IMG_%(n)06d.jpg"/>
+<link rel="alternate" type="text/html" href="http://%(host)s/photo/%(n)d"/>
+<link rel="self" type="application/atom+xml" href="%(base)s/photoid/%(n)d"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/photoid/%(n)d/1"/>
+<gphoto:id>%(n)d</gphoto:id><gphoto:albumid>1</gphoto:albumid>
+<gphoto:width>2048</gphoto:width><gphoto:height>1536</gphoto:height>
+<gphoto:size>%(size)d</gphoto:size>
+<media:group><media:title type="plain">IMG_%(n)06d.jpg</media:title>
+<media:description type="plain">Synthetic photo %(n)d</media:description>
+<media:keywords>synthetic, tag%(tag)d</media:keywords>
+<media:content url="http://%(host)s/photos/%(n)d/IMG_%(n)06d.jpg" type="image/jpeg" medium="image"/>
+</media:group>
+</entry>""",
+    ALBUMS: """<entry>
+<id>%(base)s/albumid/%(n)d</id>
+<published>%(date)s</published><updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://schemas.google.com/photos/2007#album"/>
+<title type="text">Album %(n)d</title>
+<summary type="text">Synthetic album %(n)d</summary>
+<link rel="alternate" type="text/html" href="http://%(host)s/album/%(n)d"/>
+<link rel="self" type="application/atom+xml" href="%(base)s/albumid/%(n)d"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/albumid/%(n)d/1"/>
+<gphoto:id>%(n)d</gphoto:id><gphoto:name>Album%(n)d</gphoto:name>
+<gphoto:access>private</gphoto:access><gphoto:numphotos>%(tag)d</gphoto:numphotos>
+<media:group><media:title type="plain">Album %(n)d</media:title></media:group>
+</entry>""",
+    CONTACTS: """<entry>
+<id>%(base)s/base/%(n)x</id>
+<updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://schemas.google.com/contact/2008#contact"/>
+<title type="text">Contact %(n)d</title>
+<content type="text">Synthetic contact %(n)d</content>
+<link rel="self" type="application/atom+xml" href="%(base)s/full/%(n)x"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/full/%(n)x/1"/>
+<gd:name><gd:fullName>Contact %(n)d</gd:fullName><gd:givenName>Contact</gd:givenName><gd:familyName>%(n)d</gd:familyName></gd:name>
+<gd:email rel="http://schemas.google.com/g/2005#home" address="contact%(n)d@example.com" primary="true"/>
+<gd:phoneNumber rel="http://schemas.google.com/g/2005#mobile">+1 555 %(n)07d</gd:phoneNumber>
+<gd:postalAddress rel="http://schemas.google.com/g/2005#work">%(n)d Example Street</gd:postalAddress>
+<gContact:groupMembershipInfo deleted="false" href="%(base)s/base/6"/>
+</entry>""",
+    GROUPS: """<entry>
+<id>%(base)s/base/%(n)x</id>
+<updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://schemas.google.com/contact/2008#group"/>
+<title type="text">Group %(n)d</title>
+<content type="text">Group %(n)d</content>
+<link rel="self" type="application/atom+xml" href="%(base)s/full/%(n)x"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/full/%(n)x/1"/>
+</entry>""",
+    EVENTS: """<entry>
+<id>%(base)s/%(n)d</id>
+<published>%(date)s</published><updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://schemas.google.com/g/2005#event"/>
+<title type="text">Event %(n)d</title>
+<content type="text">Synthetic event %(n)d</content>
+<link rel="alternate" type="text/html" href="http://%(host)s/event?eid=%(n)d"/>
+<link rel="self" type="application/atom+xml" href="%(base)s/%(n)d"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/%(n)d/1"/>
+<author><name>Synthetic</name><email>synthetic@example.com</email></author>
+<gd:eventStatus value="http://schemas.google.com/g/2005#event.confirmed"/>
+<gd:where valueString="Room %(tag)d"/>
+<gd:when startTime="%(day)sT09:00:00.000Z" endTime="%(day)sT10:00:00.000Z"/>
+</entry>""",
+    DOCS: """<entry>
+<id>%(base)s/document%%3A%(n)d</id>
+<published>%(date)s</published><updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://schemas.google.com/docs/2007#document" label="document"/>
+<title type="text">Document %(n)d</title>
+<content type="text/html" src="http://%(host)s/export?id=%(n)d"/>
+<link rel="alternate" type="text/html" href="http://%(host)s/Doc?id=%(n)d"/>
+<link rel="self" type="application/atom+xml" href="%(base)s/document%%3A%(n)d"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/document%%3A%(n)d/1"/>
+<link rel="edit-media" type="text/html" href="%(base)s/media/document%%3A%(n)d"/>
+<author><name>Synthetic</name><email>synthetic@example.com</email></author>
+<gd:resourceId>document:%(n)d</gd:resourceId>
+<gd:lastModifiedBy><name>Synthetic</name><email>synthetic@example.com</email></gd:lastModifiedBy>
+<docs:writersCanInvite value="true"/>
+</entry>""",
+    VIDEOS: """<entry>
+<id>http://%(host)s/feeds/api/videos/v%(n)d</id>
+<published>%(date)s</published><updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://gdata.youtube.com/schemas/2007#video"/>
+<category scheme="http://gdata.youtube.com/schemas/2007/categories.cat" term="People" label="People &amp; Blogs"/>
+<title type="text">Video %(n)d</title>
+<content type="text">Synthetic video %(n)d</content>
+<link rel="alternate" type="text/html" href="http://%(host)s/watch?v=v%(n)d"/>
+<link rel="self" type="application/atom+xml" href="%(base)s/v%(n)d"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/v%(n)d/1"/>
+<author><name>synthetic</name><uri>http://%(host)s/feeds/api/users/synthetic</uri></author>
+<media:group>
+<media:title type="plain">Video %(n)d</media:title>
+<media:description type="plain">Synthetic video %(n)d</media:description>
+<media:keywords>synthetic, tag%(tag)d</media:keywords>
+<media:category scheme="http://gdata.youtube.com/schemas/2007/categories.cat" label="People &amp; Blogs">People</media:category>
+<media:player url="http://%(host)s/watch?v=v%(n)d"/>
+<media:thumbnail url="http://%(host)s/vi/v%(n)d/0.jpg" height="240" width="320"/>
+<yt:duration seconds="%(tag)d"/>
+</media:group>
+<gd:rating min="1" max="5" numRaters="%(tag)d" average="4.5"/>
+<yt:statistics favoriteCount="%(tag)d" viewCount="%(size)d"/>
+</entry>""",
+    POSTS: """<entry>
+<id>tag:blogger.com,1999:blog-1.post-%(n)d</id>
+<published>%(date)s</published><updated>%(date)s</updated>
+<category scheme="http://www.blogger.com/atom/ns#" term="tag%(tag)d"/>
+<title type="text">Post %(n)d</title>
+<content type="html">&lt;p&gt;Synthetic post %(n)d&lt;/p&gt;</content>
+<link rel="alternate" type="text/html" href="http://%(host)s/post-%(n)d.html"/>
+<link rel="self" type="application/atom+xml" href="%(base)s/%(n)d"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/%(n)d"/>
+<author><name>Synthetic</name><email>synthetic@example.com</email></author>
+</entry>""",
+    PORTFOLIOS: """<entry>
+<id>%(base)s/%(n)d</id>
+<updated>%(date)s</updated>
+<category scheme="%(kind_scheme)s" term="http://schemas.google.com/finance/2007#portfolio"/>
+<title type="text">Portfolio %(n)d</title>
+<link rel="self" type="application/atom+xml" href="%(base)s/%(n)d"/>
+<link rel="edit" type="application/atom+xml" href="%(base)s/%(n)d"/>
+<gd:feedLink href="%(base)s/%(n)d/positions"/>
+<gf:portfolioData currencyCode="USD" gainPercentage="0.%(tag)d" return1w="0.0" return4w="0.0" return3m="0.0" returnYTD="0.0" return1y="0.0" return3y="0.0" return5y="0.0" returnOverall="0.%(tag)d"/>
+</entry>""",
+}
+
+
+def get_kind(path):
+  """Return the kind of feed a request path is for, or None.
+
+  Args:
+    path: Path of the request, with or without its query string.
+  """
+  path, _, query = path.partition('?')
+  for pattern, kind in _PATH_PATTERNS:
+    if pattern.search(path):
+      if kind == PHOTOS or kind == ALBUMS:
+        # Picasa picks the kind of a user feed with the kind parameter.
+        requested = urlparse.parse_qs(query).get('kind', [''])[0]
+        if requested == 'photo':
+          return PHOTOS
+        if requested == 'album' or kind == ALBUMS:
+          return ALBUMS
+      return kind
+  return None
+
+
+def _build_entry(kind, index, base, host):
+  # Spread dates and tags out a little so that filters have something to do.
+  return _ENTRY_TEMPLATES[kind] % {
+      'n': index,
+      'base': base,
+      'host': host,
+      'kind_scheme': _KIND_SCHEME,
+      'tag': index % 97,
+      'size': 100000 + index * 13 % 900000,
+      'date': '2010-%02d-%02dT12:00:00.000Z' % (index % 12 + 1,
+                                                 index % 28 + 1),
+      'day': '2010-%02d-%02d' % (index % 12 + 1, index % 28 + 1)}
+
+
+def build_feed(kind, total=DEFAULT_TOTAL, start_index=1,
+               max_results=None, uri=None, gdata_version=1,
+               host='localhost'):
+  """Build one page of a synthetic feed.
+
+  Args:
+    kind: Kind of feed, one of KINDS.
+    total: Number of entries in the whole feed.
+    start_index: 1-based index of the first entry on the page.
+    max_results: Number of entries on the page. Default None for every entry
+        from start_index to the end of the feed.
+    uri: URI the page was requested with, used for the feed's self and next
+        links. Default None to make one up.
+    gdata_version: Version of the GData protocol the client speaks, which
+        decides the openSearch namespace. 1 or 2.
+    host: Host name to use in the links of entries.
+
+  Returns:
+    The page as a string of Atom XML.
+  """
+  if kind not in _ENTRY_TEMPLATES:
+    raise ValueError('Unknown kind of feed: %s' % kind)
+  start_index = max(1, int(start_index))
+  if max_results is None:
+    max_results = total
+  max_results = max(0, int(max_results))
+  end_index = min(total, start_index + max_results - 1)
+  if uri is None:
+    uri = 'http://%s/feeds/synthetic/%s' % (host, kind)
+  base = uri.split('?')[0]
+  opensearch = gdata_version >= 2 and _OPENSEARCH_V2 or _OPENSEARCH_V1
+  parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<feed']
+  for prefix, namespace in sorted(_NAMESPACES.items()):
+    if prefix == 'atom':
+      parts.append(' xmlns="%s"' % namespace)
+    else:
+      parts.append(' xmlns:%s="%s"' % (prefix, namespace))
+  parts.append(' xmlns:openSearch="%s">\n' % opensearch)
+  parts.append('<id>%s</id>\n<updated>2010-12-31T12:00:00.000Z</updated>\n'
+               % saxutils.escape(base))
+  if _FEED_KIND_TERMS[kind]:
+    parts.append('<category scheme="%s" term="%s"/>\n' %
+                 (_KIND_SCHEME, _FEED_KIND_TERMS[kind]))
+  parts.append('<title type="text">Synthetic %s</title>\n' % kind)
+  parts.append('<link rel="self" type="application/atom+xml" href="%s"/>\n' %
+               saxutils.escape(uri, {'"': '&quot;'}))
+  if end_index < total and max_results:
+    next_uri = _set_params(uri, {'start-index': end_index + 1,
+                                 'max-results': max_results})
+    parts.append('<link rel="next" type="application/atom+xml" href="%s"/>\n'
+                 % saxutils.escape(next_uri, {'"': '&quot;'}))
+  parts.append('<openSearch:totalResults>%d</openSearch:totalResults>\n'
+               '<openSearch:startIndex>%d</openSearch:startIndex>\n'
+               '<openSearch:itemsPerPage>%d</openSearch:itemsPerPage>\n' %
+               (total, start_index, max_results))
+  escaped_base = saxutils.escape(base, {'"': '&quot;'})
+  for index in xrange(start_index, end_index + 1):
+    parts.append(_build_entry(kind, index, escaped_base, host))
+    parts.append('\n')
+  parts.append('</feed>\n')
+  return ''.join(parts)
+
+
+def build_page_for_path(path, totals, gdata_version=1, host='localhost'):
+  """Build the page of a synthetic feed that a request path asks for.
+
+  Honors the start-index and max-results query parameters the way the GData
+  servers do.
+
+  Args:
+    path: Path and query string of the request.
+    totals: Dictionary of kind to number of entries in feeds of that kind.
+        The value under None, if any, is used for kinds not in the dictionary.
+    gdata_version: See build_feed.
+    host: Host the request was made to.
+
+  Returns:
+    The page as a string, or None if the path is not for a known feed.
+  """
+  kind = get_kind(path)
+  if kind is None:
+    return None
+  params = urlparse.parse_qs(path.partition('?')[2])
+  try:
+    start_index = int(params.get('start-index', [1])[0])
+    max_results = int(params.get('max-results', [DEFAULT_PAGE_SIZE])[0])
+  except ValueError:
+    start_index = 1
+    max_results = DEFAULT_PAGE_SIZE
+  total = totals.get(kind, totals.get(None, DEFAULT_TOTAL))
+  return build_feed(kind, total, start_index,
+                    min(max_results, MAX_PAGE_SIZE),
+                    uri='http://%s%s' % (host, path),
+                    gdata_version=gdata_version, host=host)
+
+
+def _set_params(uri, params):
+  base, _, query = uri.partition('?')
+  pairs = [(name, value) for name, value in urlparse.parse_qsl(query)
+           if name not in params]
+  pairs.extend(sorted(params.items()))
+  return base + '?' + urllib.urlencode(pairs)
+
+
+def parse_totals(specs, default=DEFAULT_TOTAL):
+  """Parse feed sizes given as "<kind>=<entries>" or just "<entries>".
+
+  Args:
+    specs: List of strings. A bare number sets the size of every kind of
+        feed not given a size of its own.
+    default: Size of feeds not covered by any spec.
+
+  Returns:
+    Dictionary suitable for the totals argument of build_page_for_path.
+
+  Raises:
+    ValueError: A spec names an unknown kind or is not a number.
+  """
+  totals = {None: default}
+  for spec in specs:
+    kind, _, count = spec.rpartition('=')
+    kind = kind or None
+    if kind is not None and kind not in KINDS:
+      raise ValueError('Unknown kind of feed: %s (must be one of %s)' %
+                       (kind, ', '.join(KINDS)))
+    totals[kind] = int(count)
+  return totals
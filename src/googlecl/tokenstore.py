@@ -0,0 +1,194 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Access tokens shared safely by concurrent GoogleCL processes.
+
+Tokens are kept in the same pickled {service: token} file as before. Every
+change is made while holding an exclusive lock on a separate lock file, to
+a freshly read copy of the tokens, and written to a temporary file that is
+renamed over the old one. Readers therefore never see a half written file
+and need no lock. The decoded tokens are kept in memory, and only read again
+once the file on disk has been replaced.
+
+"""
+from __future__ import with_statement
+
+import logging
+import os
+import pickle
+import stat
+import tempfile
+import threading
+
+try:
+  import fcntl
+except ImportError:
+  # Not available on Windows, where changes are not locked.
+  fcntl = None
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+LOCK_FILE_SUFFIX = '.lock'
+FAILED_FILE_SUFFIX = '.failed'
+
+# Errors pickle.load raises for a corrupted file, or for tokens pickled with
+# another version of gdata.
+_LOAD_ERRORS = (pickle.UnpicklingError, EOFError, ImportError, IndexError,
+                KeyError, ValueError, AttributeError, TypeError)
+
+# {path: (file stamp, tokens)} for every tokens file read by this process.
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_file_stamp(path):
+  """Return what identifies a version of a file, or None if it is missing.
+
+  The inode changes every time the file is replaced, even within the
+  resolution of the modification time.
+  """
+  try:
+    file_stat = os.stat(path)
+  except OSError:
+    return None
+  return [file_stat.st_mtime, file_stat.st_size, file_stat.st_ino]
+
+
+def write_atomically(path, data, mode=stat.S_IRUSR | stat.S_IWUSR):
+  """Replace the contents of a file, so that readers see all or nothing.
+
+  Args:
+    path: Path of the file to replace.
+    data: String to write.
+    mode: Permissions of the new file. Default read/write for the owner only.
+  """
+  directory = os.path.dirname(os.path.abspath(path))
+  handle, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.',
+                                       dir=directory)
+  try:
+    try:
+      os.chmod(temp_path, mode)
+      os.write(handle, data)
+      os.fsync(handle)
+    finally:
+      os.close(handle)
+    if os.name == 'nt' and os.path.exists(path):
+      # rename does not replace files on Windows.
+      os.remove(path)
+    os.rename(temp_path, path)
+  except:
+    try:
+      os.remove(temp_path)
+    except OSError:
+      pass
+    raise
+
+
+class TokenStore(object):
+
+  """The access tokens of one account, keyed by service name."""
+
+  def __init__(self, path):
+    self.path = path
+    self.lock_path = path + LOCK_FILE_SUFFIX
+
+  def _load(self):
+    """Return the tokens on disk, read again only if the file has changed."""
+    stamp = get_file_stamp(self.path)
+    if stamp is None:
+      return {}
+    with _cache_lock:
+      cached = _cache.get(self.path)
+    if cached and cached[0] == stamp:
+      return cached[1]
+    try:
+      with open(self.path, 'rb') as tokens_file:
+        tokens = pickle.load(tokens_file)
+    except IOError, err:
+      LOG.debug('Could not read %s: %s', self.path, err)
+      return {}
+    if not isinstance(tokens, dict):
+      raise ValueError('Tokens file does not hold a dictionary')
+    with _cache_lock:
+      _cache[self.path] = (stamp, tokens)
+    return tokens
+
+  def _move_failed_file(self):
+    """Back up a tokens file that cannot be read."""
+    new_path = self.path + FAILED_FILE_SUFFIX
+    LOG.debug('Moving %s to %s', self.path, new_path)
+    try:
+      if os.path.isfile(new_path):
+        os.remove(new_path)
+      os.rename(self.path, new_path)
+    except EnvironmentError, err:
+      LOG.debug('Cannot move failed tokens file: %s', err)
+
+  def get(self, service):
+    """Return the token for a service, or None if there is none.
+
+    A tokens file that cannot be read is treated as holding no tokens.
+    """
+    try:
+      return self._load().get(service)
+    except _LOAD_ERRORS, err:
+      LOG.warning('Token file %s appears to be corrupted (%s). Not using.',
+                  self.path, err)
+      return None
+
+  def _update(self, service, token):
+    """Set (or, if token is None, remove) the token of a service.
+
+    Returns:
+      True if the tokens file was changed, False otherwise.
+    """
+    lock_file = open(self.lock_path, 'a')
+    try:
+      if fcntl:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+      try:
+        tokens = dict(self._load())
+      except _LOAD_ERRORS, err:
+        LOG.error('Failed to load token file (may be corrupted?): %s', err)
+        self._move_failed_file()
+        tokens = {}
+      if token is None:
+        if tokens.pop(service, None) is None:
+          LOG.debug('No token for ' + service)
+          return False
+      else:
+        tokens[service] = token
+      write_atomically(self.path, pickle.dumps(tokens))
+      with _cache_lock:
+        _cache[self.path] = (get_file_stamp(self.path), tokens)
+      return True
+    finally:
+      # Closing the file releases the lock.
+      lock_file.close()
+
+  def put(self, service, token):
+    """Store the token for a service."""
+    return self._update(service, token)
+
+  def remove(self, service):
+    """Remove the token for a service.
+
+    Returns:
+      True if there was a token to remove, False otherwise.
+    """
+    return self._update(service, None)
+
+  def get_stamp(self):
+    """Return what identifies the current version of the tokens file."""
+    return get_file_stamp(self.path)
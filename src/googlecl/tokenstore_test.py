@@ -0,0 +1,101 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the access token store."""
+
+from __future__ import with_statement
+
+import os
+import pickle
+import shutil
+import stat
+import tempfile
+import unittest
+
+import googlecl.tokenstore
+
+# Processes writing to the same store at once, and tokens each one writes.
+WRITERS = 8
+WRITES = 20
+
+
+class TokenStoreTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'access_tok_me')
+    self.store = googlecl.tokenstore.TokenStore(self.path)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testPutGetRemove(self):
+    self.assertEqual(self.store.get('docs'), None)
+    self.store.put('docs', 'docs token')
+    self.store.put('picasa', 'picasa token')
+    self.assertEqual(googlecl.tokenstore.TokenStore(self.path).get('docs'),
+                     'docs token')
+    self.assertTrue(self.store.remove('docs'))
+    self.assertFalse(self.store.remove('docs'))
+    self.assertEqual(self.store.get('docs'), None)
+    self.assertEqual(self.store.get('picasa'), 'picasa token')
+    self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0600)
+
+  def testReadsOldFormat(self):
+    with open(self.path, 'wb') as tokens_file:
+      pickle.dump({'docs': 'old token'}, tokens_file)
+    self.assertEqual(self.store.get('docs'), 'old token')
+
+  def testSeesChangesOfOtherProcesses(self):
+    self.store.put('docs', 'first')
+    self.assertEqual(self.store.get('docs'), 'first')
+    googlecl.tokenstore.write_atomically(self.path,
+                                         pickle.dumps({'docs': 'second'}))
+    self.assertEqual(self.store.get('docs'), 'second')
+
+  def testCorruptedFileIsMovedAside(self):
+    with open(self.path, 'wb') as tokens_file:
+      tokens_file.write('not a pickle')
+    self.assertEqual(self.store.get('docs'), None)
+    self.store.put('docs', 'token')
+    self.assertEqual(self.store.get('docs'), 'token')
+    self.assertTrue(os.path.exists(
+        self.path + googlecl.tokenstore.FAILED_FILE_SUFFIX))
+
+  def testConcurrentWriters(self):
+    if not googlecl.tokenstore.fcntl or not hasattr(os, 'fork'):
+      return
+    children = []
+    for writer in range(WRITERS):
+      pid = os.fork()
+      if not pid:
+        status = 0
+        try:
+          store = googlecl.tokenstore.TokenStore(self.path)
+          for write in range(WRITES):
+            store.put('service%d' % writer, write)
+        except BaseException:
+          status = 1
+        os._exit(status)
+      children.append(pid)
+    for pid in children:
+      self.assertEqual(os.waitpid(pid, 0)[1], 0)
+    for writer in range(WRITERS):
+      self.assertEqual(self.store.get('service%d' % writer), WRITES - 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,210 @@
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bounded thread pools for running GoogleCL requests concurrently."""
+
+import collections
+import logging
+import Queue
+import sys
+import threading
+
+LOGGER_NAME = __name__
+LOG = logging.getLogger(LOGGER_NAME)
+
+# How long to block at a time while waiting on a worker. Waiting in short
+# increments keeps the main thread responsive to KeyboardInterrupt.
+_WAIT_INTERVAL = 0.1
+
+# Functions capturing state that workers take over from the thread starting
+# them. See add_thread_context.
+_context_captures = []
+
+
+def add_thread_context(capture):
+  """Carry state of the thread starting workers over to the workers.
+
+  Args:
+    capture: Function called in the thread that starts a pool. It returns a
+        function that each worker calls before it does any work, e.g. to set
+        thread-local state to what capture found.
+  """
+  _context_captures.append(capture)
+
+
+def _start_thread(target):
+  """Start a daemon thread running target in the context of this thread."""
+  restores = [capture() for capture in _context_captures]
+
+  def _run():
+    for restore in restores:
+      restore()
+    target()
+
+  thread = threading.Thread(target=_run)
+  thread.setDaemon(True)
+  thread.start()
+  return thread
+
+
+class _Slot(object):
+  """Holds one item of work and, once finished, its result."""
+
+  def __init__(self, item):
+    self.item = item
+    self.value = None
+    self.exc_info = None
+    self.done = threading.Event()
+
+  def wait(self):
+    while not self.done.isSet():
+      self.done.wait(_WAIT_INTERVAL)
+
+
+def imap_ordered(function, items, num_workers, max_pending=None):
+  """Apply function to every item using a pool of threads.
+
+  Results are yielded in the same order as items, regardless of the order in
+  which the workers finish. Only a bounded number of items are in flight at
+  once, so results are not accumulated faster than they are consumed.
+
+  Args:
+    function: Function taking a single item.
+    items: Iterable of items to pass to function.
+    num_workers: Maximum number of threads to use. If this is 1 or less,
+        function is applied serially in the calling thread.
+    max_pending: Maximum number of items handed to workers but not yet
+        yielded. Default None for twice the number of workers.
+
+  Yields:
+    The result of function(item) for each item. If function raised an
+    exception for an item, it is re-raised when that item's turn comes up.
+  """
+  items = iter(items)
+  if num_workers <= 1:
+    for item in items:
+      yield function(item)
+    return
+  if not max_pending or max_pending < num_workers:
+    max_pending = num_workers * 2
+
+  tasks = Queue.Queue()
+  cancelled = threading.Event()
+
+  def _work():
+    while True:
+      slot = tasks.get()
+      if slot is None:
+        return
+      if not cancelled.isSet():
+        try:
+          slot.value = function(slot.item)
+        except Exception:
+          slot.exc_info = sys.exc_info()
+      slot.item = None
+      slot.done.set()
+
+  threads = []
+  for _ in range(num_workers):
+    threads.append(_start_thread(_work))
+
+  pending = collections.deque()
+  exhausted = False
+  try:
+    while True:
+      while not exhausted and len(pending) < max_pending:
+        try:
+          item = items.next()
+        except StopIteration:
+          exhausted = True
+        else:
+          slot = _Slot(item)
+          pending.append(slot)
+          tasks.put(slot)
+      if not pending:
+        break
+      slot = pending.popleft()
+      slot.wait()
+      if slot.exc_info:
+        exc_type, exc_value, exc_traceback = slot.exc_info
+        raise exc_type, exc_value, exc_traceback
+      value = slot.value
+      slot.value = None
+      yield value
+  finally:
+    # Stop workers from picking up anything that has not started yet, and let
+    # them exit once the queue drains.
+    cancelled.set()
+    for _ in threads:
+      tasks.put(None)
+
+
+def map_ordered(function, items, num_workers):
+  """Like imap_ordered, but returns a list of all the results."""
+  return list(imap_ordered(function, items, num_workers))
+
+
+def iter_ahead(items, max_ahead=1):
+  """Consume an iterable in a background thread, ahead of the caller.
+
+  Meant for iterables where each item depends on the one before (such as
+  pages linked by page tokens), so that they cannot be spread over a pool,
+  but the next one can still be retrieved while the caller handles this one.
+
+  Args:
+    items: Iterable to consume.
+    max_ahead: Maximum number of items retrieved but not yet yielded, on top
+        of the one the background thread is retrieving.
+
+  Yields:
+    The items of items, in order. An exception raised by the iterable is
+    re-raised when its turn comes up.
+  """
+  done = object()
+  results = Queue.Queue(max_ahead)
+  cancelled = threading.Event()
+
+  def _put(result):
+    while not cancelled.isSet():
+      try:
+        results.put(result, timeout=_WAIT_INTERVAL)
+        return True
+      except Queue.Full:
+        pass
+    return False
+
+  def _work():
+    try:
+      for item in items:
+        if not _put((item, None)):
+          return
+    except Exception:
+      _put((None, sys.exc_info()))
+      return
+    _put((done, None))
+
+  _start_thread(_work)
+  try:
+    while True:
+      try:
+        item, exc_info = results.get(timeout=_WAIT_INTERVAL)
+      except Queue.Empty:
+        continue
+      if exc_info:
+        exc_type, exc_value, exc_traceback = exc_info
+        raise exc_type, exc_value, exc_traceback
+      if item is done:
+        return
+      yield item
+  finally:
+    cancelled.set()
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for retrieving items ahead of the caller."""
+
+import threading
+import unittest
+
+import googlecl.workers
+
+
+def pages(count, fail_at=None):
+  for number in range(count):
+    if number == fail_at:
+      raise ValueError('page %d' % number)
+    yield number
+
+
+class IterAheadTest(unittest.TestCase):
+
+  def testItemsInOrder(self):
+    self.assertEqual(list(googlecl.workers.iter_ahead(pages(5))), range(5))
+    self.assertEqual(list(googlecl.workers.iter_ahead(pages(0))), [])
+
+  def testRetrievesNextItemWhileCallerWorks(self):
+    retrieved = threading.Event()
+
+    def items():
+      yield 1
+      retrieved.set()
+      yield 2
+
+    ahead = googlecl.workers.iter_ahead(items())
+    self.assertEqual(ahead.next(), 1)
+    retrieved.wait(5)
+    self.assertTrue(retrieved.isSet())
+    self.assertEqual(list(ahead), [2])
+
+  def testErrorIsRaisedInTurn(self):
+    ahead = googlecl.workers.iter_ahead(pages(5, fail_at=2))
+    self.assertEqual([ahead.next(), ahead.next()], [0, 1])
+    self.assertRaises(ValueError, ahead.next)
+
+
+if __name__ == '__main__':
+  unittest.main()
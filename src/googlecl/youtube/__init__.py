@@ -13,6 +13,7 @@
 # limitations under the License.
 import googlecl
 import googlecl.base
+import googlecl.registry
 import re
 
 service_name = __name__.split('.')[-1]
@@ -20,18 +21,37 @@ LOGGER_NAME = __name__
 SECTION_HEADER = service_name.upper()
 
 
+class VideoRecord(googlecl.base.EntryRecord):
+  """Snapshot of a video entry. See googlecl.base.EntryRecord."""
+  __slots__ = ('authors', 'seconds', 'keywords')
+
+  def snapshot(self, entry):
+    googlecl.base.EntryRecord.snapshot(self, entry)
+    self.authors = googlecl.base.snapshot_items(
+        entry.author, lambda author: googlecl.base.get_text(author, 'name'))
+    duration = getattr(getattr(entry, 'media', None), 'duration', None)
+    self.seconds = getattr(duration, 'seconds', None)
+    self.keywords = googlecl.base.get_text(entry, 'media', 'keywords')
+
+
 class VideoEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
-  @property
+  FIELDS = googlecl.base.field_table([
+      ('author owner minutes time length duration seconds tags labels '
+       'keywords', googlecl.base.Field(lite=True, record=True))],
+      base=googlecl.base.BaseEntryToStringWrapper.FIELDS)
+  RECORD_CLASS = VideoRecord
+
+  @googlecl.base.cached_property
   def author(self):
     """Author."""
-    # Name of author 'x' name is in entry.author[x].name.text
-    text_extractor = lambda entry: getattr(getattr(entry, 'name'), 'text')
-    return self._join(self.entry.author, text_extractor=text_extractor)
+    return self._join(self.record.authors)
   owner = author
 
-  @property
+  @googlecl.base.cached_property
   def minutes(self):
     """Length of the video, in minutes (MM:SS)."""
+    if self.seconds is None:
+      return None
     minutes = int(self.seconds) / 60
     seconds = int(self.seconds) % 60
     return '%d:%#02d' % (minutes, seconds)
@@ -39,10 +59,10 @@ class VideoEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
   length = minutes
   duration = minutes
 
-  @property
+  @googlecl.base.cached_property
   def seconds(self):
     """Length of the video, in seconds."""
-    return self.entry.media.duration.seconds
+    return self.record.seconds
 
   @property
   def status(self):
@@ -65,10 +85,10 @@ class VideoEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
       # or self.entry data structure...
       return 'public/unlisted'
 
-  @property
+  @googlecl.base.cached_property
   def tags(self):
     """Tags / keywords or labels."""
-    tags_text = self.entry.media.keywords.text
+    tags_text = self.record.keywords
     tags_text = tags_text.replace(', ', ',')
     tags_list = tags_text.split(',')
     return self.intra_property_delimiter.join(tags_list)
@@ -87,12 +107,13 @@ class VideoEntryToStringWrapper(googlecl.base.BaseEntryToStringWrapper):
 #===============================================================================
 def _run_list(client, options, args):
   titles_list = googlecl.build_titles_list(options.title, args)
-  entries = client.GetVideos(user=options.owner or 'default',
-                             titles=titles_list)
-  for vid in entries:
-    print googlecl.base.compile_entry_string(VideoEntryToStringWrapper(vid),
-                                             options.fields.split(','),
-                                             delimiter=options.delimiter)
+
+  def iter_entries(fields, lite, record_class):
+    return client.IterVideos(user=options.owner or 'default',
+                             titles=titles_list,
+                             lite=lite,
+                             record_class=record_class)
+  googlecl.base.run_list(options, VideoEntryToStringWrapper, iter_entries)
 
 
 def _run_post(client, options, args):
@@ -117,18 +138,9 @@ def _run_delete(client, options, args):
   client.DeleteEntryList(entries, 'video', options.prompt)
 
 
-TASKS = {'post': googlecl.base.Task('Post a video.', callback=_run_post,
-                                    required=['src', 'category', 'devkey'],
-                                    optional=['title', 'summary', 'tags',
-                                              'access']),
-         'list': googlecl.base.Task('List videos by user.',
-                                    callback=_run_list,
-                                    required=['fields', 'delimiter'],
-                                    optional=['title', 'owner']),
-         'tag': googlecl.base.Task('Add tags to a video and/or ' +\
-                                   'change its category.',
-                                   callback=_run_tag,
-                                   required=['title', ['tags', 'category'],
-                                             'devkey']),
-         'delete': googlecl.base.Task('Delete videos.', callback=_run_delete,
-                                      required=['title', 'devkey'])}
+# The descriptions and requirements of these tasks are in googlecl.registry.
+TASKS = googlecl.registry.bind_tasks(service_name, {
+    'post': _run_post,
+    'list': _run_list,
+    'tag': _run_tag,
+    'delete': _run_delete})
@@ -21,8 +21,10 @@ import atom
 import gdata.youtube
 import logging
 import os
+import time
 import googlecl.base
 import googlecl.service
+import googlecl.stats
 from googlecl.youtube import SECTION_HEADER
 from gdata.youtube.service import YouTubeService
 from googlecl import safe_encode
@@ -69,22 +71,41 @@ class YouTubeServiceCL(YouTubeService, googlecl.service.BaseServiceCL):
 
   CategorizeVideos = categorize_videos
 
-  def get_videos(self, user='default', titles=None):
-    """Get entries for videos uploaded by a user.
+  def iter_videos(self, user='default', titles=None, lite=False,
+                  record_class=None):
+    """Iterate over entries for videos uploaded by a user.
 
     Keyword arguments:
       user: The user whose videos are being retrieved. (Default 'default')
       title: list or string Title(s) that the video(s) should have.
              Default None, for all videos.
+      lite: Return lite entries. See BaseCL.iter_entries.
+      record_class: Snapshot entries into this record class. See
+                    BaseCL.iter_entries.
 
     Returns:
-      List of videos that match parameters, or [] if none do.
+      Iterator over videos that match parameters.
 
     """
     uri = 'http://gdata.youtube.com/feeds/api/users/' + user + '/uploads'
-    return self.GetEntries(uri,
-                           titles,
-                           converter=gdata.youtube.YouTubeVideoFeedFromString)
+    return self.IterEntries(uri,
+                            titles,
+                            converter=gdata.youtube.YouTubeVideoFeedFromString,
+                            lite=lite,
+                            record_class=record_class)
+
+  IterVideos = iter_videos
+
+  def get_videos(self, user='default', titles=None):
+    """Get entries for videos uploaded by a user.
+
+    See iter_videos for a description of the arguments.
+
+    Returns:
+      List of videos that match parameters, or [] if none do.
+
+    """
+    return list(self.iter_videos(user, titles))
 
   GetVideos = get_videos
 
@@ -142,6 +163,7 @@ class YouTubeServiceCL(YouTubeService, googlecl.service.BaseServiceCL):
         taglist = taglist.split(',')
         video_entry.AddDeveloperTags(taglist)
       LOG.info(safe_encode('Loading ' + path))
+      start_time = time.time()
       try:
         entry = self.InsertVideoEntry(video_entry, path)
       except gdata.service.RequestError, err:
@@ -157,6 +179,7 @@ class YouTubeServiceCL(YouTubeService, googlecl.service.BaseServiceCL):
                       'http://code.google.com/p/googlecl/wiki/Manual#YouTube')
         LOG.error(err_str)
       else:
+        googlecl.stats.record_transfer('upload', path, time.time() - start_time)
         LOG.info('Video uploaded: %s' % entry.GetHtmlLink().href)
 
   PostVideos = post_videos
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of printing the rows of a listing.
+
+Lists a synthetic photo feed (see googlecl.synthetic) three ways, writing to
+/dev/null:
+  legacy  - the string-concatenating compile_entry_string of GoogleCL 0.9.13,
+            with one print per row.
+  per-row - googlecl.base.compile_entry_string, with one print per row.
+  engine  - googlecl.output.print_entries.
+
+  $ ./output_benchmark.py
+  $ ./output_benchmark.py --rows 100000 --fields title,url,tags,summary
+
+"""
+import optparse
+import os
+import sys
+import timeit
+
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIRECTORY, os.pardir, 'src'))
+
+import googlecl
+import googlecl.base
+import googlecl.fastparse
+import googlecl.output
+import googlecl.picasa
+import googlecl.synthetic
+
+DEFAULT_ROWS = 100000
+DEFAULT_FIELDS = 'title,url,tags,summary'
+DEFAULT_REPEAT = 3
+
+
+def legacy_compile_entry_string(wrapped_entry, attribute_list, delimiter,
+                                missing_field_value=None, newline_replacer=' '):
+  """compile_entry_string as it was before googlecl.output, for comparison."""
+  return_string = ''
+  if not delimiter:
+    delimiter = ','
+  if delimiter.strip() == ',':
+    wrapped_entry.intra_property_delimiter = ';'
+  else:
+    wrapped_entry.intra_property_delimiter = ','
+  for attr in attribute_list:
+    try:
+      val = getattr(wrapped_entry, attr.replace('-','_')) or missing_field_value
+    except AttributeError:
+      val = missing_field_value
+    val = googlecl.safe_decode(val)
+    if attr != 'xml':
+      return_string += val.replace(delimiter, ' ') + delimiter
+    else:
+      return_string = val
+    if attr != 'xml':
+      return_string = return_string.replace('\n', newline_replacer)
+  return_string = return_string.rstrip(delimiter)
+  return return_string.encode(googlecl.TERMINAL_ENCODING, 'backslashreplace')
+
+
+def list_legacy(entries, fields, out):
+  for entry in entries:
+    print >> out, legacy_compile_entry_string(
+        googlecl.picasa.PhotoEntryToStringWrapper(entry), fields, ',')
+
+
+def list_per_row(entries, fields, out):
+  for entry in entries:
+    print >> out, googlecl.base.compile_entry_string(
+        googlecl.picasa.PhotoEntryToStringWrapper(entry), fields, ',')
+
+
+def list_engine(entries, fields, out):
+  formatter = googlecl.output.RowFormatter(fields, ',')
+  googlecl.output.print_entries(
+      (googlecl.picasa.PhotoEntryToStringWrapper(entry) for entry in entries),
+      formatter, out)
+
+
+MODES = [('legacy', list_legacy),
+         ('per-row', list_per_row),
+         ('engine', list_engine)]
+
+
+def main():
+  parser = optparse.OptionParser(usage='%prog [options]')
+  parser.add_option('--rows', type='int', default=DEFAULT_ROWS,
+                    help='Number of entries to list. Default %default')
+  parser.add_option('--fields', default=DEFAULT_FIELDS,
+                    help='Fields to print. Default %default')
+  parser.add_option('--repeat', type='int', default=DEFAULT_REPEAT,
+                    help='Runs per mode; the fastest counts. Default %default')
+  options, _ = parser.parse_args()
+
+  body = googlecl.synthetic.build_feed(googlecl.synthetic.PHOTOS, options.rows)
+  entries = googlecl.fastparse.parse_feed(body).entry
+  fields = options.fields.split(',')
+  out = open(os.devnull, 'w')
+  baseline = None
+  print '%-8s %10s %12s %8s' % ('mode', 'seconds', 'rows/s', 'speedup')
+  try:
+    for name, list_entries in MODES:
+      best = None
+      for _ in range(options.repeat):
+        start = timeit.default_timer()
+        list_entries(entries, fields, out)
+        elapsed = timeit.default_timer() - start
+        best = best is None and elapsed or min(best, elapsed)
+      baseline = baseline or best
+      print '%-8s %10.3f %12.0f %7.2fx' % (name, best, options.rows / best,
+                                           baseline / best)
+  finally:
+    out.close()
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
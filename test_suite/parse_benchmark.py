@@ -0,0 +1,329 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of parsing large feeds through the converters GoogleCL uses.
+
+Each case feeds a synthetic feed (see googlecl.synthetic) of a given size to
+the converter, or desired_class, that a GoogleCL list task hands to gdata.
+Every case runs in a fresh interpreter so that its peak memory is its own.
+Results are appended to a JSON file and compared with the previous run.
+
+  $ ./parse_benchmark.py
+  $ ./parse_benchmark.py --cases calendar,docs --sizes 1000,100000
+  $ ./parse_benchmark.py --gdata-path gdata_installs/gdata-2.0.14/lib/python
+
+"""
+import optparse
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import timeit
+
+try:
+  import json
+except ImportError:
+  import simplejson as json
+
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SRC_DIRECTORY = os.path.join(BASE_DIRECTORY, os.pardir, 'src')
+DEFAULT_RESULTS_FILE = os.path.join(BASE_DIRECTORY,
+                                    'parse_benchmark_results.json')
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+
+
+def _import(module_name):
+  __import__(module_name)
+  return sys.modules[module_name]
+
+
+class ServiceCase(object):
+
+  """A feed parsed by a gdata.service converter, as BaseServiceCL does."""
+
+  gdata_version = 1
+
+  def __init__(self, kind, module_name, converter_name):
+    self.kind = kind
+    self.module_name = module_name
+    self.converter_name = converter_name
+
+  def get_parser(self):
+    return getattr(_import(self.module_name), self.converter_name)
+
+
+class ClientCase(object):
+
+  """A feed parsed into a desired_class, as BaseClientCL does."""
+
+  gdata_version = 2
+
+  def __init__(self, kind, client_name, feed_names):
+    """Constructor.
+
+    Args:
+      kind: Kind of synthetic feed to parse.
+      client_name: Dotted name of the gdata client class, whose api_version
+          is used.
+      feed_names: Dotted names of feed classes to parse into. The first one
+          that exists in the installed gdata is used.
+    """
+    self.kind = kind
+    self.client_name = client_name
+    self.feed_names = feed_names
+
+  def get_parser(self):
+    import googlecl.client
+    module_name, class_name = self.client_name.rsplit('.', 1)
+    api_version = getattr(_import(module_name), class_name).api_version
+    for feed_name in self.feed_names:
+      module_name, class_name = feed_name.rsplit('.', 1)
+      desired_class = getattr(_import(module_name), class_name, None)
+      if desired_class is not None:
+        break
+    def parse(body):
+      return googlecl.client.parse_feed(body, desired_class, api_version)
+    return parse
+
+
+# Kept in step with the converters and desired classes of the list tasks.
+CASES = {
+    'blogger': ServiceCase('posts', 'gdata', 'GDataFeedFromString'),
+    'calendar': ServiceCase('events', 'gdata.calendar',
+                            'CalendarEventFeedFromString'),
+    'contacts': ClientCase('contacts', 'gdata.contacts.client.ContactsClient',
+                           ['gdata.contacts.data.ContactsFeed']),
+    'contacts-v1': ServiceCase('contacts', 'gdata.contacts',
+                               'ContactsFeedFromString'),
+    'docs': ClientCase('docs', 'gdata.docs.client.DocsClient',
+                       ['gdata.docs.data.ResourceFeed',
+                        'gdata.docs.data.DocList']),
+    'docs-v1': ServiceCase('docs', 'gdata.docs', 'DocumentListFeedFromString'),
+    'finance': ServiceCase('portfolios', 'gdata.finance',
+                           'PortfolioFeedFromString'),
+    'picasa': ServiceCase('photos', 'gdata.photos', 'AnyFeedFromString'),
+    'youtube': ServiceCase('videos', 'gdata.youtube',
+                           'YouTubeVideoFeedFromString'),
+}
+
+
+def _get_peak_rss_kb():
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux reports kilobytes, Mac OS X bytes.
+  if sys.platform == 'darwin':
+    peak /= 1024
+  return peak
+
+
+def run_case(name, size, repeat):
+  """Time one case in this process.
+
+  Args:
+    name: Name of the case, a key of CASES.
+    size: Number of entries in the feed.
+    repeat: Number of times to parse the feed. The fastest is reported.
+
+  Returns:
+    Dictionary of results.
+  """
+  import googlecl.synthetic
+  case = CASES[name]
+  parse = case.get_parser()
+  body = googlecl.synthetic.build_feed(case.kind, size,
+                                       gdata_version=case.gdata_version)
+  peak_before = _get_peak_rss_kb()
+  timings = []
+  entries = 0
+  for _ in range(repeat):
+    start = timeit.default_timer()
+    feed = parse(body)
+    timings.append(timeit.default_timer() - start)
+    entries = len(feed.entry)
+    del feed
+  if entries != size:
+    raise AssertionError('%s parsed %d of %d entries' % (name, entries, size))
+  best = min(timings)
+  return {'entries': entries,
+          'feed_bytes': len(body),
+          'parse_seconds': round(best, 6),
+          'entries_per_second': round(entries / max(best, 1e-9), 1),
+          'peak_rss_kb': _get_peak_rss_kb(),
+          'parse_peak_kb': _get_peak_rss_kb() - peak_before}
+
+
+def run_in_subprocess(name, size, repeat, gdata_path=None):
+  """Run one case in a new interpreter, and return its results."""
+  python_path = [SRC_DIRECTORY]
+  if gdata_path:
+    python_path.insert(0, gdata_path)
+  if os.environ.get('PYTHONPATH'):
+    python_path.append(os.environ['PYTHONPATH'])
+  env = dict(os.environ)
+  env['PYTHONPATH'] = os.pathsep.join(python_path)
+  process = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                              '--run-one', name, '--sizes', str(size),
+                              '--repeat', str(repeat)],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             env=env)
+  stdout, stderr = process.communicate()
+  if process.returncode:
+    return {'error': stderr.strip().splitlines()[-1:] or ['failed']}
+  return json.loads(stdout)
+
+
+def get_gdata_version(gdata_path=None):
+  if gdata_path:
+    sys.path.insert(0, gdata_path)
+  try:
+    import gdata
+  except ImportError:
+    return None
+  return getattr(gdata, '__version__', 'unknown')
+
+
+def load_runs(path):
+  try:
+    results_file = open(path)
+  except IOError:
+    return []
+  try:
+    return json.load(results_file)
+  finally:
+    results_file.close()
+
+
+def save_runs(path, runs):
+  temp_path = path + '.tmp'
+  results_file = open(temp_path, 'w')
+  try:
+    json.dump(runs, results_file, indent=1, sort_keys=True)
+  finally:
+    results_file.close()
+  os.rename(temp_path, path)
+
+
+def find_baseline(runs, name, size):
+  """Return the most recent earlier results for a case, or None."""
+  for run in reversed(runs):
+    results = run['results'].get(name, {}).get(str(size))
+    if results and 'error' not in results:
+      return results
+  return None
+
+
+def compare(results, baseline, threshold):
+  """Return descriptions of how results regressed from a baseline."""
+  regressions = []
+  if baseline['entries_per_second'] and (
+      results['entries_per_second'] <
+      baseline['entries_per_second'] * (1 - threshold)):
+    regressions.append('%.0f entries/s, was %.0f' %
+                       (results['entries_per_second'],
+                        baseline['entries_per_second']))
+  if baseline['parse_peak_kb'] and (
+      results['parse_peak_kb'] > baseline['parse_peak_kb'] * (1 + threshold)):
+    regressions.append('%d KB peak, was %d' % (results['parse_peak_kb'],
+                                               baseline['parse_peak_kb']))
+  return regressions
+
+
+def main():
+  parser = optparse.OptionParser(usage='%prog [options]')
+  parser.add_option('--cases', default=','.join(sorted(CASES)),
+                    help='Comma-separated cases to run. Default all: %default')
+  parser.add_option('--sizes',
+                    default=','.join([str(size) for size in DEFAULT_SIZES]),
+                    help='Comma-separated numbers of entries per feed. '
+                    'Default %default')
+  parser.add_option('--repeat', type='int', default=DEFAULT_REPEAT,
+                    help='Parses per case; the fastest counts. Default '
+                    '%default')
+  parser.add_option('--gdata-path',
+                    help='Directory to import gdata from, e.g. one of the '
+                    'gdata_installs/*/lib/python directories.')
+  parser.add_option('--results', default=DEFAULT_RESULTS_FILE,
+                    help='File to store results in. Default %default')
+  parser.add_option('--label', default='',
+                    help='Note to store with the results of this run.')
+  parser.add_option('--threshold', type='float', default=DEFAULT_THRESHOLD,
+                    help='Fraction by which a case may get slower or use more '
+                    'memory before it counts as a regression. Default '
+                    '%default')
+  parser.add_option('--no-save', dest='save', action='store_false',
+                    default=True, help='Do not store the results.')
+  parser.add_option('--check', action='store_true',
+                    help='Exit with status 1 if any case regressed.')
+  parser.add_option('--run-one', help=optparse.SUPPRESS_HELP)
+  options, _ = parser.parse_args()
+
+  sizes = [int(size) for size in options.sizes.split(',') if size]
+  if options.run_one:
+    print json.dumps(run_case(options.run_one, sizes[0], options.repeat))
+    return 0
+
+  names = [name for name in options.cases.split(',') if name]
+  unknown = [name for name in names if name not in CASES]
+  if unknown:
+    parser.error('Unknown cases: %s (choose from %s)' %
+                 (', '.join(unknown), ', '.join(sorted(CASES))))
+  gdata_version = get_gdata_version(options.gdata_path)
+  if gdata_version is None:
+    parser.error('gdata is not importable; see --gdata-path')
+
+  runs = load_runs(options.results)
+  run = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+         'label': options.label,
+         'python': platform.python_version(),
+         'gdata': gdata_version,
+         'results': {}}
+  row_format = '%-12s %8s %10s %12s %10s  %s'
+  print row_format % ('case', 'entries', 'parse(s)', 'entries/s', 'peak(KB)',
+                      '')
+  regressed = False
+  for name in names:
+    for size in sizes:
+      results = run_in_subprocess(name, size, options.repeat,
+                                  options.gdata_path)
+      run['results'].setdefault(name, {})[str(size)] = results
+      if 'error' in results:
+        print row_format % (name, size, '-', '-', '-',
+                            'ERROR: ' + ' '.join(results['error']))
+        continue
+      baseline = find_baseline(runs, name, size)
+      regressions = baseline and compare(results, baseline,
+                                         options.threshold) or []
+      regressed = regressed or bool(regressions)
+      print row_format % (name, size, '%.3f' % results['parse_seconds'],
+                          '%.0f' % results['entries_per_second'],
+                          results['parse_peak_kb'],
+                          regressions and 'REGRESSED: ' +
+                          '; '.join(regressions) or '')
+      sys.stdout.flush()
+  if options.save:
+    runs.append(run)
+    save_runs(options.results, runs)
+    print 'Results saved to %s' % options.results
+  if options.check and regressed:
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
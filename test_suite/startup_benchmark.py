@@ -0,0 +1,96 @@
+#!/usr/bin/python
+#
+# Copyright (C) 2010 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of the cold start of GoogleCL.
+
+Runs each step in a fresh interpreter, with a throwaway config directory,
+and reports the fastest time and the number of modules it loaded:
+  config  - googlecl.config.load_configuration, which every command runs.
+  usage   - building the usage text printed by --help.
+  service - importing the package of a single service (--service).
+
+  $ ./startup_benchmark.py
+  $ ./startup_benchmark.py --service docs --repeat 10
+
+"""
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SRC_DIRECTORY = os.path.join(BASE_DIRECTORY, os.pardir, 'src')
+
+DEFAULT_REPEAT = 5
+DEFAULT_SERVICE = 'calendar'
+
+# Each step prints its time in seconds and the number of modules loaded.
+_TIMER = """
+import sys, time
+start = time.time()
+%s
+print time.time() - start, len([m for m in sys.modules.values() if m])
+"""
+
+STEPS = [('config', """
+import googlecl.config
+googlecl.config.load_configuration()
+"""),
+         ('usage', """
+sys.argv = ['google']
+import google
+google.setup_parser(True)
+"""),
+         ('service', """
+import googlecl.%(service)s
+""")]
+
+
+def run_step(code, environment):
+  output = subprocess.Popen([sys.executable, '-c', _TIMER % code],
+                            cwd=SRC_DIRECTORY, env=environment,
+                            stdout=subprocess.PIPE).communicate()[0]
+  seconds, modules = output.split()[-2:]
+  return float(seconds), int(modules)
+
+
+def main():
+  parser = optparse.OptionParser(usage='%prog [options]')
+  parser.add_option('--repeat', type='int', default=DEFAULT_REPEAT,
+                    help='Runs per step; the fastest counts. Default %default')
+  parser.add_option('--service', default=DEFAULT_SERVICE,
+                    help='Service to import. Default %default')
+  options, _ = parser.parse_args()
+
+  config_directory = tempfile.mkdtemp()
+  environment = dict(os.environ, XDG_CONFIG_HOME=config_directory,
+                     PYTHONPATH=SRC_DIRECTORY, PYTHONDONTWRITEBYTECODE='1')
+  print '%-8s %10s %8s' % ('step', 'ms', 'modules')
+  try:
+    for name, code in STEPS:
+      code = code % {'service': options.service}
+      results = [run_step(code, environment) for _ in range(options.repeat)]
+      seconds, modules = min(results)
+      print '%-8s %10.1f %8d' % (name, seconds * 1000, modules)
+  finally:
+    shutil.rmtree(config_directory)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())